@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from api.auth import require_permissions
 from core.database import (
@@ -22,6 +25,7 @@ from core.database import (
 )
 from core.response import APIResponse
 from services.ai_engine import ai_engine
+from services.metrics_service import metrics
 
 router = APIRouter(prefix="/api/v1/ai", tags=["ai"])
 
@@ -113,14 +117,8 @@ def _build_context_summary(db: Session, req: ChatRequest, session: AIChatSession
     return " | ".join(parts)
 
 
-@router.post("/chat")
-async def chat(
-    req: ChatRequest,
-    request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_permissions("ai_chat")),
-):
-    trace_id = getattr(request.state, "trace_id", None) or str(uuid.uuid4())
+def _open_chat_turn(db: Session, req: ChatRequest, current_user: User) -> AIChatSession:
+    """校验或创建会话并写入用户消息（未提交）"""
     session: Optional[AIChatSession] = None
 
     if req.session_id:
@@ -146,6 +144,30 @@ async def chat(
         created_at=datetime.now(timezone.utc),
     )
     db.add(user_msg)
+    return session
+
+
+def _record_chat_metrics(elapsed_ms: float) -> None:
+    try:
+        metrics.inc("ai_chat_requests")
+        metrics.record_latency("ai_chat", elapsed_ms)
+    except Exception:
+        pass
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/chat")
+async def chat(
+    req: ChatRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permissions("ai_chat")),
+):
+    trace_id = getattr(request.state, "trace_id", None) or str(uuid.uuid4())
+    session = _open_chat_turn(db, req, current_user)
 
     context_summary = _build_context_summary(db, req, session)
     _t0 = time.monotonic()
@@ -165,13 +187,7 @@ async def chat(
     if not response_content:
         response_content = "模型返回为空，请稍后重试。"
 
-    try:
-        from services.metrics_service import metrics
-
-        metrics.inc("ai_chat_requests")
-        metrics.record_latency("ai_chat", elapsed_ms)
-    except Exception:
-        pass
+    _record_chat_metrics(elapsed_ms)
 
     ai_msg = AIChatMessage(
         session_id=session.id,
@@ -204,6 +220,99 @@ async def chat(
     )
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    req: ChatRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permissions("ai_chat")),
+):
+    """
+    流式对话（text/event-stream）：meta → token × N → done。
+    模型输出逐 token 转发；完整回复在 done 之前落库。客户端断开时取消生成并关闭上游连接，
+    释放模型槽位，此时不写入助手消息。
+    """
+    trace_id = getattr(request.state, "trace_id", None) or str(uuid.uuid4())
+    session = _open_chat_turn(db, req, current_user)
+    context_summary = _build_context_summary(db, req, session)
+    context = {
+        "type": req.context_type or session.context_type,
+        "id": req.context_id or session.context_id,
+        "summary": context_summary,
+    }
+    session_id = session.id
+    # 会话与用户消息先提交：响应体开始发送后请求级 db 会话即被关闭
+    db.commit()
+    stream_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+    async def event_stream():
+        _t0 = time.monotonic()
+        first_token_ms: Optional[float] = None
+        yield _sse("meta", {"session_id": session_id, "context": context, "trace_id": trace_id})
+        stream = ai_engine.chat_stream(
+            req.message,
+            context={
+                "summary": context_summary,
+                "context_type": context["type"],
+                "context_id": context["id"],
+            },
+            trace_id=trace_id,
+        )
+        try:
+            async for item in stream:
+                if item["type"] == "token":
+                    if first_token_ms is None:
+                        first_token_ms = (time.monotonic() - _t0) * 1000
+                        metrics.record_latency("ai_chat_first_token", first_token_ms)
+                    yield _sse("token", {"text": item["text"]})
+                    continue
+
+                elapsed_ms = (time.monotonic() - _t0) * 1000
+                _record_chat_metrics(elapsed_ms)
+                response_content = str(item.get("text") or "").strip() or "模型返回为空，请稍后重试。"
+                stream_db = stream_session_factory()
+                try:
+                    ai_msg = AIChatMessage(
+                        session_id=session_id,
+                        role="assistant",
+                        content=response_content,
+                        created_at=datetime.now(timezone.utc),
+                    )
+                    stream_db.add(ai_msg)
+                    stream_db.commit()
+                    message_id = ai_msg.id
+                finally:
+                    stream_db.close()
+                yield _sse(
+                    "done",
+                    {
+                        "session_id": session_id,
+                        "message_id": message_id,
+                        "message": response_content,
+                        "meta": {
+                            "degraded": bool(item.get("degraded")),
+                            "fallback_reason": item.get("fallback_reason"),
+                            "provider": item.get("provider"),
+                            "model": item.get("model"),
+                            "elapsed_ms": round(elapsed_ms, 2),
+                            "first_token_ms": round(first_token_ms, 2) if first_token_ms is not None else None,
+                            "trace_id": trace_id,
+                        },
+                    },
+                )
+        except (asyncio.CancelledError, GeneratorExit):
+            metrics.inc("ai_chat_stream_cancelled")
+            raise
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/sessions")
 async def get_sessions(
     db: Session = Depends(get_db),
@@ -4,17 +4,16 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
+from typing import Optional
 import hashlib
 import os
+import time
 
 from core.database import (
     get_db,
     User,
-    Role,
-    UserRole,
-    Permission,
-    RolePermission,
 )
+from services.rbac_cache import get_ttl_seconds as rbac_cache_ttl_seconds, rbac_cache
 
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 security = HTTPBearer()
@@ -35,39 +34,45 @@ def verify_password(plain: str, hashed: str) -> bool:
 
 def get_user_role(user: User, db: Session) -> str:
     """Get user's primary role name"""
-    user_role = db.query(UserRole).filter(UserRole.user_id == user.id).first()
-    if user_role:
-        role = db.query(Role).filter(Role.id == user_role.role_id).first()
-        if role:
-            return str(role.name)
-    return "viewer"
+    return rbac_cache.primary_role(db, int(user.id))
 
 
 def get_user_permissions(user: User, db: Session) -> list[str]:
-    rows = (
-        db.query(Permission.name)
-        .join(RolePermission, RolePermission.permission_id == Permission.id)
-        .join(UserRole, UserRole.role_id == RolePermission.role_id)
-        .filter(UserRole.user_id == user.id)
-        .all()
-    )
-    names = {str(row[0]) for row in rows if row and row[0]}
-    return sorted(names)
+    return sorted(rbac_cache.permissions(db, int(user.id)))
+
+
+def _claimed_permissions(request: Request, user: User) -> Optional[frozenset]:
+    """令牌内权限声明仍有效（版本标签一致且签发未超过缓存 TTL）时直接使用，免查库"""
+    claims = getattr(request.state, "token_claims", None)
+    if not isinstance(claims, dict) or claims.get("sub") != user.username:
+        return None
+    perms = claims.get("perms")
+    if not isinstance(perms, list) or claims.get("pv") != rbac_cache.version_tag():
+        return None
+    try:
+        issued_at = float(claims.get("iat"))
+    except (TypeError, ValueError):
+        return None
+    if time.time() - issued_at > rbac_cache_ttl_seconds():
+        return None
+    return frozenset(perms)
 
 
 def require_permissions(*required_permissions):
+    # Handle both list and individual string arguments
+    if len(required_permissions) == 1 and isinstance(required_permissions[0], list):
+        perms = tuple(required_permissions[0])
+    else:
+        perms = required_permissions
+
     async def _permission_dependency(
         request: Request,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db),
     ) -> User:
-        # Handle both list and individual string arguments
-        if len(required_permissions) == 1 and isinstance(required_permissions[0], list):
-            perms = required_permissions[0]
-        else:
-            perms = required_permissions
-        
-        permissions = set(get_user_permissions(current_user, db))
+        permissions = _claimed_permissions(request, current_user)
+        if permissions is None:
+            permissions = rbac_cache.permissions(db, int(current_user.id))
         missing = [name for name in perms if name not in permissions]
         if missing:
             trace_id = getattr(request.state, "trace_id", None)
@@ -118,6 +123,19 @@ class UserInfo(BaseModel):
     permissions: list[str]
 
 
+def _issue_token(username: str, role: str, permissions: list[str]) -> str:
+    now = datetime.now(timezone.utc)
+    token_data = {
+        "sub": username,
+        "role": role,
+        "perms": permissions,
+        "pv": rbac_cache.version_tag(),
+        "iat": int(now.timestamp()),
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+    return jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(request: LoginRequest, db: Session = Depends(get_db)):
     if not request.username or not request.password:
@@ -130,15 +148,11 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
     if not verify_password(request.password, str(user.password_hash)):
         raise HTTPException(status_code=401, detail="用户名或密码错误")
 
+    # 登录时以数据库为准重新加载该用户的角色
+    rbac_cache.forget_user(int(user.id))
     role = get_user_role(user, db)
     permissions = get_user_permissions(user, db)
-    token_data = {
-        "sub": user.username,
-        "role": role,
-        "exp": datetime.now(timezone.utc)
-        + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    }
-    access_token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+    access_token = _issue_token(str(user.username), role, permissions)
 
     return TokenResponse(
         access_token=access_token,
@@ -147,6 +161,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
 ) -> User:
@@ -160,8 +175,9 @@ async def get_current_user(
             raise HTTPException(status_code=401, detail={"code": 40101, "message": "无效的认证令牌"})
     except JWTError:
         raise HTTPException(status_code=401, detail="无效的认证令牌")
+    request.state.token_claims = payload
 
-    user = db.query(User).filter(User.username == username).first()
+    user = rbac_cache.user(db, username)
     if user is None or getattr(user, "enabled", 0) != 1:
         raise HTTPException(status_code=401, detail="用户不存在或已禁用")
     return user
@@ -171,15 +187,10 @@ async def get_current_user(
 async def refresh_token(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
+    rbac_cache.forget_user(int(current_user.id))
     role = get_user_role(current_user, db)
     permissions = get_user_permissions(current_user, db)
-    token_data = {
-        "sub": current_user.username,
-        "role": role,
-        "exp": datetime.now(timezone.utc)
-        + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    }
-    access_token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+    access_token = _issue_token(str(current_user.username), role, permissions)
     return TokenResponse(
         access_token=access_token,
         user={"username": current_user.username, "role": role, "permissions": permissions},
@@ -1,10 +1,11 @@
 from datetime import datetime, timezone
 import asyncio
+import functools
 import hashlib
 import json
 import os
 import uuid
-from typing import Any, Callable, Dict, List, Optional, cast
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, cast
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
@@ -12,22 +13,40 @@ from sqlalchemy.orm import Session, sessionmaker
 
 from core.database import ExecutionTask, SessionLocal, ScanFinding, ThreatEvent, User, WorkflowRun, WorkflowStepRun, get_db
 from api.auth import require_permissions
-from services.ai_engine import ai_engine
+from services.ai_engine import ai_engine, non_urgent_assessment
+from services.assessment_batcher import get_batch_max_size as get_ai_batch_max_size
 from services.audit_service import AuditService
+from services.block_batcher import block_batcher
 from services.metrics_service import metrics
 from services.mcp_client import mcp_client
+from services.threat_event_store import (
+    EventKey,
+    event_key,
+    find_existing_event_ids,
+    insert_events_ignore_conflicts,
+)
+from services.threat_rollup import threat_rollup
 from services.workflow_rollout import (
     get_defense_workflow_rollout,
     set_defense_workflow_rollout,
     should_route_to_workflow_runtime,
 )
+from services.workflow_queue import RUN_MODE_QUEUE, get_run_mode, workflow_run_queue
 from services.workflow_runtime import run_published_workflow
 
 router = APIRouter(prefix="/api/v1/defense", tags=["defense"])
 compat_router = APIRouter(tags=["defense"])
 
 MAX_BLOCK_RETRIES = 3
+DEFENSE_RUNTIME_TRIGGER = "defense_approve"
 BASE_RETRY_DELAY_SECONDS = 1.0
+DEFAULT_AI_ENRICH_CONCURRENCY = 8
+DEFAULT_AI_ENRICH_DEADLINE_SECONDS = 20.0
+DEFAULT_BULK_EXECUTE_CONCURRENCY = 256
+BULK_MAX_ITEMS = 1000
+
+# (ip, device_id) -> mcp_client.block_ip 同结构的结果
+BlockCall = Callable[[str, Optional[int]], Awaitable[Dict[str, Any]]]
 
 
 def _get_defense_runtime_workflow_key() -> str:
@@ -35,6 +54,34 @@ def _get_defense_runtime_workflow_key() -> str:
     return value or "defense_default"
 
 
+def _get_bulk_execute_concurrency() -> int:
+    try:
+        value = int(os.getenv("DEFENSE_BULK_EXECUTE_CONCURRENCY", str(DEFAULT_BULK_EXECUTE_CONCURRENCY)))
+    except ValueError:
+        value = DEFAULT_BULK_EXECUTE_CONCURRENCY
+    return max(1, value)
+
+
+def _get_ai_enrich_concurrency() -> int:
+    """同时评估的事件数；未配置时按微批大小折算为约 DEFAULT_AI_ENRICH_CONCURRENCY 次并发模型调用"""
+    default = DEFAULT_AI_ENRICH_CONCURRENCY * get_ai_batch_max_size()
+    try:
+        value = int(os.getenv("DEFENSE_AI_ENRICH_CONCURRENCY", str(default)))
+    except ValueError:
+        value = default
+    return max(1, value)
+
+
+def _get_ai_enrich_deadline_seconds() -> float:
+    try:
+        value = float(
+            os.getenv("DEFENSE_AI_ENRICH_DEADLINE_SECONDS", str(DEFAULT_AI_ENRICH_DEADLINE_SECONDS))
+        )
+    except ValueError:
+        value = DEFAULT_AI_ENRICH_DEADLINE_SECONDS
+    return value if value > 0 else DEFAULT_AI_ENRICH_DEADLINE_SECONDS
+
+
 class HFishHTTPInfo(BaseModel):
     url: Optional[str] = None
     method: Optional[str] = None
@@ -101,6 +148,17 @@ class ApproveRequest(BaseModel):
     reason: Optional[str] = None
 
 
+class BulkApproveRequest(BaseModel):
+    event_ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    reason: Optional[str] = None
+
+
+class BulkUnblockRequest(BaseModel):
+    ips: List[str] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    device_id: Optional[int] = None
+    reason: Optional[str] = None
+
+
 class DefenseWorkflowRolloutRequest(BaseModel):
     mode: str = Field(..., description="legacy_only / workflow_gray / workflow_full")
     gray_percent: int = Field(0, ge=0, le=100)
@@ -297,6 +355,57 @@ async def _enrich_with_ai_assessment(event_payload: Dict[str, Any]) -> Dict[str,
     return event_payload
 
 
+def _mark_rule_fallback(event_payload: Dict[str, Any], reason_detail: str) -> Dict[str, Any]:
+    """未在批次截止时间内完成 AI 评估的事件，保留归一化阶段的规则评分并标记降级。"""
+    extra_json = _safe_json_loads(event_payload.get("extra_json"))
+    extra_json["ai_assessment"] = {
+        "provider": "ai_engine",
+        "model": "rule_fallback",
+        "degraded": True,
+        "fallback": "rule_engine",
+        "degrade_reason": reason_detail,
+        "assessed_at": _iso_z(_utc_now()),
+    }
+    event_payload["extra_json"] = _json_dumps(extra_json)
+    return event_payload
+
+
+async def _enrich_events_concurrently(
+    events: List[Dict[str, Any]],
+    *,
+    concurrency: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """并发执行 AI 评估：信号量限制并发数，整批共享一个截止时间，超时事件回落规则评分。"""
+    if not events:
+        return events
+
+    limit = concurrency if concurrency is not None else _get_ai_enrich_concurrency()
+    deadline = deadline_seconds if deadline_seconds is not None else _get_ai_enrich_deadline_seconds()
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _guarded(event_payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await _enrich_with_ai_assessment(event_payload)
+
+    # 入库富化属于非紧急评估，走微批
+    with non_urgent_assessment():
+        tasks = [asyncio.ensure_future(_guarded(event_payload)) for event_payload in events]
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        metrics.inc("defense_ai_enrich_deadline_fallback_total", len(pending))
+
+    for index, task in enumerate(tasks):
+        if task in pending or task.cancelled():
+            _mark_rule_fallback(events[index], "batch_deadline_exceeded")
+        elif task.exception() is not None:
+            _mark_rule_fallback(events[index], f"ai_enrich_failed:{task.exception().__class__.__name__}")
+    return events
+
+
 async def _sleep_for_retry(seconds: float) -> None:
     await asyncio.sleep(seconds)
 
@@ -429,6 +538,26 @@ def _sync_task_from_runtime(
     )
 
 
+def _sync_task_from_queued_run(db: Session, workflow_run: WorkflowRun) -> None:
+    """运行队列完成回调：按 trigger_ref 找回执行任务并回写状态"""
+    ref = str(workflow_run.trigger_ref or "")
+    if not ref.startswith("execution_task:"):
+        return
+    task = db.query(ExecutionTask).filter(ExecutionTask.id == _safe_int(ref.split(":", 1)[1], 0)).first()
+    if task is None:
+        return
+    _sync_task_from_runtime(
+        db,
+        event_id=_safe_int(task.event_id, 0),
+        task_id=task.id,
+        workflow_run_id=workflow_run.id,
+        trace_id=workflow_run.trace_id,
+    )
+
+
+workflow_run_queue.register_completion_hook(DEFENSE_RUNTIME_TRIGGER, _sync_task_from_queued_run)
+
+
 async def _execute_block_task_via_workflow_runtime(
     db: Session,
     event: ThreatEvent,
@@ -465,19 +594,25 @@ async def _execute_block_task_via_workflow_runtime(
         },
     }
 
+    queued = get_run_mode() == RUN_MODE_QUEUE
     try:
         runtime_result = await run_published_workflow(
             db,
             workflow_key=_get_defense_runtime_workflow_key(),
             input_payload=input_payload,
-            trigger_source="defense_approve",
+            trigger_source=DEFENSE_RUNTIME_TRIGGER,
             trigger_ref=f"execution_task:{task_id}",
             actor="defense_executor",
             trace_id=trace_id,
+            enqueue=queued,
         )
     except ValueError:
         return False
 
+    # 队列模式：任务保持 RUNNING，运行结束后由完成回调回写
+    if queued and runtime_result.run_state == "QUEUED":
+        return True
+
     _sync_task_from_runtime(
         db,
         event_id=event_id,
@@ -493,6 +628,7 @@ async def _execute_block_task(
     event: ThreatEvent,
     task: ExecutionTask,
     trace_id: str,
+    block_call: Optional[BlockCall] = None,
 ) -> None:
     task_id = _safe_int(getattr(task, "id", 0), 0)
     event_id = _safe_int(getattr(event, "id", 0), 0)
@@ -518,9 +654,10 @@ async def _execute_block_task(
     )
     db.commit()
 
+    block = block_call or mcp_client.block_ip
     attempt = 0
     while True:
-        result = await mcp_client.block_ip(event_ip, device_id)
+        result = await block(event_ip, device_id)
         if result.get("success") is True:
             done_time = _utc_now()
             db.query(ExecutionTask).filter(ExecutionTask.id == task_id).update(
@@ -616,6 +753,7 @@ async def _run_execution_task_background(
     trace_id: str,
     approval_reason: Optional[str],
     session_factory: Callable[[], Session] = SessionLocal,
+    block_call: Optional[BlockCall] = None,
 ) -> None:
     db = session_factory()
     try:
@@ -677,7 +815,7 @@ async def _run_execution_task_background(
                 trace_id=trace_id,
             )
 
-        await _execute_block_task(db=db, event=event, task=task, trace_id=trace_id)
+        await _execute_block_task(db=db, event=event, task=task, trace_id=trace_id, block_call=block_call)
     except Exception as exc:
         db.rollback()
         now = _utc_now()
@@ -694,6 +832,28 @@ async def _run_execution_task_background(
         db.close()
 
 
+async def _run_execution_tasks_bulk(
+    task_ids: List[int],
+    trace_id: str,
+    approval_reason: Optional[str],
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> None:
+    """批量审批的执行任务并发执行，直连路径的封禁经 block_batcher 按设备合批下发"""
+    semaphore = asyncio.Semaphore(_get_bulk_execute_concurrency())
+
+    async def run_one(task_id: int) -> None:
+        async with semaphore:
+            await _run_execution_task_background(
+                task_id,
+                trace_id,
+                approval_reason,
+                session_factory,
+                block_call=functools.partial(block_batcher.block, trace_id=trace_id),
+            )
+
+    await asyncio.gather(*[run_one(task_id) for task_id in task_ids])
+
+
 def _normalize_list_info(item: HFishListInfo, trace_id: str) -> Dict[str, Any]:
     raw = item.model_dump()
     attack_ip = (item.attack_ip or "").strip()
@@ -903,30 +1063,42 @@ async def receive_alert(
     deduped_event_ids: List[int] = []
 
     try:
+        # 阶段一：一次批量查询完成去重（含批内重复），随后结束只读事务，
+        # 避免在 AI 评估期间占用数据库连接上的事务。
+        existing_ids = find_existing_event_ids(db, [event_key(e) for e in normalized_events])
+        db.commit()
+
+        pending_events: List[Dict[str, Any]] = []
+        batch_duplicates: List[EventKey] = []
+        seen_keys: Set[EventKey] = set()
         for event_payload in normalized_events:
-            existing = (
-                db.query(ThreatEvent)
-                .filter(
-                    ThreatEvent.source_vendor == event_payload["source_vendor"],
-                    ThreatEvent.source_event_id == event_payload["source_event_id"],
-                )
-                .first()
-            )
-            if existing:
-                if existing.id is not None:
-                    existing_id = _safe_int(getattr(existing, "id", None), 0)
-                    if existing_id > 0:
-                        deduped_event_ids.append(existing_id)
+            key = event_key(event_payload)
+            if key in existing_ids:
+                deduped_event_ids.append(existing_ids[key])
                 continue
-
-            event_payload = await _enrich_with_ai_assessment(event_payload)
-            event = ThreatEvent(**event_payload)
-            db.add(event)
-            db.flush()
-            if event.id is not None:
-                event_id = _safe_int(getattr(event, "id", None), 0)
-                if event_id > 0:
-                    ingested_event_ids.append(event_id)
+            if key in seen_keys:
+                batch_duplicates.append(key)
+                continue
+            seen_keys.add(key)
+            pending_events.append(event_payload)
+
+        # 阶段二：有界并发 AI 评估，超出批次截止时间的事件回落规则评分
+        pending_events = await _enrich_events_concurrently(pending_events)
+
+        # 阶段三：单次短事务批量写入；评估期间被并发写入的事件由唯一索引忽略并计入去重
+        inserted_ids = insert_events_ignore_conflicts(db, pending_events)
+        raced_keys = [event_key(e) for e in pending_events if event_key(e) not in inserted_ids]
+        raced_ids = find_existing_event_ids(db, raced_keys) if raced_keys else {}
+        for event_payload in pending_events:
+            key = event_key(event_payload)
+            if key in inserted_ids:
+                ingested_event_ids.append(inserted_ids[key])
+            elif key in raced_ids:
+                deduped_event_ids.append(raced_ids[key])
+        for key in batch_duplicates:
+            duplicate_id = inserted_ids.get(key) or raced_ids.get(key)
+            if duplicate_id:
+                deduped_event_ids.append(duplicate_id)
 
         db.commit()
     except Exception as exc:
@@ -1241,6 +1413,7 @@ async def approve_event(
         trace_id,
         req.reason,
         request_session_factory,
+        block_call=functools.partial(block_batcher.block, trace_id=trace_id),
     )
 
     task_row = (
@@ -1265,6 +1438,115 @@ async def approve_event(
     }
 
 
+@router.post("/events/bulk-approve")
+async def bulk_approve_events(
+    background_tasks: BackgroundTasks,
+    req: BulkApproveRequest,
+    request: Request,
+    current_user: User = Depends(require_permissions("approve_event")),
+    db: Session = Depends(get_db),
+):
+    """批量批准处置事件：每个事件一个执行任务，同设备的封禁合批下发"""
+    event_ids = list(dict.fromkeys(req.event_ids))
+    found = {
+        row[0]
+        for row in db.query(ThreatEvent.id).filter(ThreatEvent.id.in_(event_ids)).all()
+    }
+    approved_ids = [event_id for event_id in event_ids if event_id in found]
+    if not approved_ids:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    trace_id = getattr(request.state, "trace_id", str(uuid.uuid4()))
+    now = _utc_now()
+    db.query(ThreatEvent).filter(ThreatEvent.id.in_(approved_ids)).update(
+        {"status": "APPROVED", "updated_at": now}, synchronize_session=False
+    )
+    tasks = [
+        ExecutionTask(event_id=event_id, action="BLOCK", state="QUEUED", trace_id=trace_id)
+        for event_id in approved_ids
+    ]
+    db.add_all(tasks)
+    db.commit()
+
+    task_ids = [_safe_int(getattr(task, "id", None), 0) for task in tasks]
+    AuditService.log(
+        db=db,
+        actor=current_user.username,
+        action="bulk_approve_event",
+        target=f"events:{len(approved_ids)}",
+        target_type="threat_event",
+        reason=_json_dumps({"event_ids": approved_ids, "task_ids": task_ids, "reason": req.reason}),
+        trace_id=trace_id,
+    )
+
+    request_session_factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=db.get_bind(),
+    )
+    background_tasks.add_task(
+        _run_execution_tasks_bulk,
+        task_ids,
+        trace_id,
+        req.reason,
+        request_session_factory,
+    )
+
+    return {
+        "code": 0,
+        "message": "Events approved",
+        "data": {
+            "tasks": [
+                {"event_id": event_id, "task_id": task_id, "task_state": "QUEUED"}
+                for event_id, task_id in zip(approved_ids, task_ids)
+            ],
+            "not_found": [event_id for event_id in event_ids if event_id not in found],
+        },
+    }
+
+
+@router.post("/ips/unblock")
+async def bulk_unblock_ips(
+    req: BulkUnblockRequest,
+    request: Request,
+    current_user: User = Depends(require_permissions("firewall_sync")),
+    db: Session = Depends(get_db),
+):
+    """批量解封 IP：同设备合批为一次 ACL 更新，返回逐 IP 结果"""
+    ips = list(dict.fromkeys(ip.strip() for ip in req.ips if ip.strip()))
+    if not ips:
+        raise HTTPException(status_code=400, detail="ips is empty")
+
+    trace_id = getattr(request.state, "trace_id", str(uuid.uuid4()))
+    AuditService.log(
+        db=db,
+        actor=current_user.username,
+        action="bulk_unblock_ip",
+        target=f"ips:{len(ips)}",
+        target_type="firewall_rule",
+        reason=_json_dumps({"ips": ips, "device_id": req.device_id, "reason": req.reason}),
+        trace_id=trace_id,
+    )
+
+    results = await asyncio.gather(*[
+        block_batcher.unblock(ip, req.device_id, operator=current_user.username, trace_id=trace_id) for ip in ips
+    ])
+    items = [
+        {
+            "ip": ip,
+            "success": bool(result.get("success")),
+            "error": None if result.get("success") else _extract_mcp_error(result),
+        }
+        for ip, result in zip(ips, results)
+    ]
+    failed = sum(1 for item in items if not item["success"])
+    return {
+        "code": 0,
+        "message": "IPs unblocked" if not failed else "Some IPs failed to unblock",
+        "data": {"items": items, "total": len(items), "failed": failed},
+    }
+
+
 @router.post("/events/{event_id}/reject")
 @compat_router.post("/events/{event_id}/reject", include_in_schema=False)
 async def reject_event(
@@ -1372,11 +1654,15 @@ async def trigger_hfish_sync(
     
     if not hfish_collector.enabled:
         raise HTTPException(status_code=400, detail="HFish 采集器未启用")
+    if hfish_collector.sync_in_progress:
+        raise HTTPException(status_code=409, detail="HFish 同步进行中，请稍后再试")
     
     trace_id = f"manual_sync_{uuid.uuid4().hex[:8]}"
     
     try:
         result = await hfish_collector.sync_once(trace_id)
+        if result.get("in_progress"):
+            raise HTTPException(status_code=409, detail="HFish 同步进行中，请稍后再试")
         
         AuditService.log(
             db=db,
@@ -1408,6 +1694,80 @@ async def trigger_hfish_sync(
         raise HTTPException(status_code=500, detail=f"同步失败: {str(e)}")
 
 
+class HFishSourceRequest(HFishConfigRequest):
+    name: str = Field(..., description="源名称（小写字母、数字、下划线、连字符），default 为默认源")
+
+
+@router.get("/hfish/sources")
+async def list_hfish_sources(
+    current_user: User = Depends(require_permissions(["system:config"])),
+):
+    """列出所有 HFish 源及其同步健康状态"""
+    from services.hfish_collector import hfish_federation
+
+    await hfish_federation.reload()
+    return {"code": 0, "data": hfish_federation.status()}
+
+
+@router.post("/hfish/sources")
+async def save_hfish_source(
+    payload: HFishSourceRequest,
+    current_user: User = Depends(require_permissions(["system:config"])),
+    db: Session = Depends(get_db),
+):
+    """注册或更新一个 HFish 源"""
+    from services.hfish_collector import hfish_federation
+
+    try:
+        collector = hfish_federation.register_source(
+            payload.name,
+            host_port=payload.host_port,
+            api_key=payload.api_key,
+            sync_interval=payload.sync_interval,
+            enabled=payload.enabled,
+            api_base_url=payload.api_base_url,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    AuditService.log(
+        db=db,
+        actor=current_user.username,
+        action="SAVE_HFISH_SOURCE",
+        target=f"hfish_source:{payload.name}",
+        result="SUCCESS",
+        trace_id=str(uuid.uuid4())
+    )
+    return {"code": 0, "message": "HFish 源已保存", "data": collector.status()}
+
+
+@router.delete("/hfish/sources/{name}")
+async def delete_hfish_source(
+    name: str,
+    current_user: User = Depends(require_permissions(["system:config"])),
+    db: Session = Depends(get_db),
+):
+    """删除一个 HFish 源（默认源不可删除）"""
+    from services.hfish_collector import hfish_federation
+
+    try:
+        removed = await hfish_federation.remove_source(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="HFish 源不存在")
+
+    AuditService.log(
+        db=db,
+        actor=current_user.username,
+        action="DELETE_HFISH_SOURCE",
+        target=f"hfish_source:{name}",
+        result="SUCCESS",
+        trace_id=str(uuid.uuid4())
+    )
+    return {"code": 0, "message": "HFish 源已删除"}
+
+
 # ── IP 关联查询：通过攻击 IP 查询 Nmap 扫描结果 ──
 
 # ── HFish 攻击日志查询 ──
@@ -1464,61 +1824,37 @@ async def get_hfish_stats(
     current_user: User = Depends(require_permissions("view_events")),
     db: Session = Depends(get_db),
 ):
-    """HFish 攻击统计：威胁等级分布 / 服务分布 / TOP IP / 近N天趋势"""
-    from sqlalchemy import func as sqlfunc
+    """HFish 攻击统计：威胁等级分布 / 服务分布 / TOP IP / 近N天趋势
+
+    已结束的整点小时读 threat_event_rollup，仅首尾不足一小时的部分扫描原始事件。
+    """
     from datetime import timedelta
 
     since = datetime.now(timezone.utc) - timedelta(days=days)
-    base = db.query(ThreatEvent).filter(
-        ThreatEvent.source_vendor == "hfish",
-        ThreatEvent.created_at >= since,
-    )
 
-    total = base.count()
+    total = threat_rollup.total(db, since, vendor="hfish")
 
     # 威胁等级分布
-    threat_rows = (
-        db.query(ThreatEvent.threat_label, sqlfunc.count(ThreatEvent.id).label("cnt"))
-        .filter(ThreatEvent.source_vendor == "hfish", ThreatEvent.created_at >= since)
-        .group_by(ThreatEvent.threat_label)
-        .all()
-    )
-    threat_stats = [{"level": r.threat_label or "未知", "count": r.cnt} for r in threat_rows]
+    threat_stats = [
+        {"level": label or "未知", "count": cnt}
+        for label, cnt in threat_rollup.count_by(db, "threat_label", since, vendor="hfish")
+    ]
 
     # 服务分布 TOP 10
-    svc_rows = (
-        db.query(ThreatEvent.service_name, sqlfunc.count(ThreatEvent.id).label("cnt"))
-        .filter(ThreatEvent.source_vendor == "hfish", ThreatEvent.created_at >= since, ThreatEvent.service_name.isnot(None))
-        .group_by(ThreatEvent.service_name)
-        .order_by(sqlfunc.count(ThreatEvent.id).desc())
-        .limit(10)
-        .all()
-    )
-    service_stats = [{"name": r.service_name or "unknown", "count": r.cnt} for r in svc_rows]
+    service_stats = [
+        {"name": name or "unknown", "count": cnt}
+        for name, cnt in threat_rollup.count_by(db, "service_name", since, vendor="hfish", limit=10)
+    ]
 
     # TOP IP
-    ip_rows = (
-        db.query(ThreatEvent.ip, sqlfunc.count(ThreatEvent.id).label("cnt"))
-        .filter(ThreatEvent.source_vendor == "hfish", ThreatEvent.created_at >= since)
-        .group_by(ThreatEvent.ip)
-        .order_by(sqlfunc.count(ThreatEvent.id).desc())
-        .limit(10)
-        .all()
-    )
-    ip_stats = [{"ip": r.ip, "count": r.cnt} for r in ip_rows]
+    ip_stats = [
+        {"ip": ip, "count": cnt}
+        for ip, cnt in threat_rollup.count_by(db, "ip", since, vendor="hfish", limit=10)
+    ]
 
     # 近N天趋势（按日期分组）
-    time_rows = (
-        db.query(
-            sqlfunc.strftime("%Y-%m-%d", ThreatEvent.created_at).label("date"),
-            sqlfunc.count(ThreatEvent.id).label("cnt"),
-        )
-        .filter(ThreatEvent.source_vendor == "hfish", ThreatEvent.created_at >= since)
-        .group_by(sqlfunc.strftime("%Y-%m-%d", ThreatEvent.created_at))
-        .order_by(sqlfunc.strftime("%Y-%m-%d", ThreatEvent.created_at))
-        .all()
-    )
-    time_stats = [{"date": r.date, "count": r.cnt} for r in time_rows]
+    daily = threat_rollup.daily_counts(db, "total", since, vendor="hfish")
+    time_stats = [{"date": day, "count": daily[day]} for day in sorted(daily) if daily[day]]
 
     return {
         "code": 0,
@@ -10,9 +10,9 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from api.auth import require_permissions
+from services.overview_stats import count_if, overview_cache
+from services.threat_rollup import threat_rollup
 from core.database import (
-    Asset,
-    CollectorConfig,
     ExecutionTask,
     ScanFinding,
     ScanTask,
@@ -34,22 +34,6 @@ def _iso_z(dt: Optional[datetime]) -> Optional[str]:
     return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def _config_map(db: Session, collector_type: str) -> Dict[str, str]:
-    rows = (
-        db.query(CollectorConfig)
-        .filter(CollectorConfig.collector_type == collector_type)
-        .all()
-    )
-    return {str(row.config_key): str(row.config_value or "") for row in rows}
-
-
-def _config_bool(configs: Dict[str, str], key: str = "enabled", default: bool = False) -> bool:
-    raw = configs.get(key)
-    if raw is None:
-        return default
-    return raw.strip().lower() in ("1", "true", "yes", "on")
-
-
 def _status_item(key: str, name: str, ok: bool, note: str, metric: Optional[str] = None) -> Dict[str, Any]:
     return {
         "key": key,
@@ -61,64 +45,32 @@ def _status_item(key: str, name: str, ok: bool, note: str, metric: Optional[str]
 
 
 def _build_chain_status(db: Session) -> Dict[str, List[Dict[str, Any]]]:
-    now = _utc_now()
-    last_24h = now - timedelta(hours=24)
-    last_7d = now - timedelta(days=7)
-
-    hfish_config = _config_map(db, "hfish")
-    nmap_config = _config_map(db, "nmap")
-    hfish_enabled = _config_bool(hfish_config, default=False)
-    nmap_enabled = _config_bool(nmap_config, default=False)
-
-    threat_24h = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= last_24h
-    ).scalar() or 0
-    threat_7d = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= last_7d
-    ).scalar() or 0
-    scored_7d = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= last_7d,
-        ThreatEvent.ai_score.isnot(None),
-    ).scalar() or 0
+    counts = overview_cache.counts(db)
+    threat = counts["threat"]
+    execution = counts["execution"]
+    scan_task = counts["scan_task"]
+
+    hfish_enabled = counts["collectors"]["hfish"]
+    nmap_enabled = counts["collectors"]["nmap"]
+
+    threat_24h = threat["last_24h"]
+    threat_7d = threat["last_7d"]
+    scored_7d = threat["scored_7d"]
     unscored_7d = max(threat_7d - scored_7d, 0)
 
-    execution_7d = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.created_at >= last_7d
-    ).scalar() or 0
-    execution_success_7d = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.created_at >= last_7d,
-        ExecutionTask.state == "SUCCESS",
-    ).scalar() or 0
-    execution_failed_7d = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.created_at >= last_7d,
-        ExecutionTask.state.in_(["FAILED", "RETRYING"]),
-    ).scalar() or 0
-    execution_manual_required = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.state == "MANUAL_REQUIRED"
-    ).scalar() or 0
-
-    assets_total = db.query(func.count(Asset.id)).scalar() or 0
-    enabled_assets = db.query(func.count(Asset.id)).filter(
-        Asset.enabled == 1
-    ).scalar() or 0
-
-    scan_total_7d = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.created_at >= last_7d
-    ).scalar() or 0
-    scan_running = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.state == "RUNNING"
-    ).scalar() or 0
-    scan_reported_7d = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.created_at >= last_7d,
-        ScanTask.state == "REPORTED",
-    ).scalar() or 0
-    scan_failed_7d = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.created_at >= last_7d,
-        ScanTask.state.in_(["FAILED", "FAILED_TIMEOUT", "FAILED_PARSE", "UNREACHABLE"]),
-    ).scalar() or 0
-    findings_7d = db.query(func.count(ScanFinding.id)).filter(
-        ScanFinding.created_at >= last_7d
-    ).scalar() or 0
+    execution_7d = execution["last_7d"]
+    execution_success_7d = execution["success_7d"]
+    execution_failed_7d = execution["failed_7d"]
+    execution_manual_required = execution["manual_required"]
+
+    assets_total = counts["asset"]["total"]
+    enabled_assets = counts["asset"]["enabled"]
+
+    scan_total_7d = scan_task["last_7d"]
+    scan_running = scan_task["running"]
+    scan_reported_7d = scan_task["reported_7d"]
+    scan_failed_7d = scan_task["failed_7d"]
+    findings_7d = counts["finding"]["last_7d"]
 
     defense = [
         _status_item(
@@ -202,7 +154,7 @@ def _build_chain_status(db: Session) -> Dict[str, List[Dict[str, Any]]]:
         ),
     ]
 
-    return {"defense": defense, "probe": probe}
+    return {"defense": defense, "probe": probe, "generated_at": counts["generated_at"]}
 
 
 # ──────────────────────────────────────────────────────────
@@ -224,56 +176,30 @@ async def get_metrics(
     - 扫描任务数（运行中 / 今日）
     - 漏洞统计（总数 / 高危数）
     """
-    now = _utc_now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    counts = overview_cache.counts(db)
+    threat = counts["threat"]
+    execution = counts["execution"]
+    scan_task = counts["scan_task"]
+    finding = counts["finding"]
 
     # ── 防御侧 ──
-    today_alerts = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= today_start
-    ).scalar() or 0
-
-    pending_events = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.status == "PENDING"
-    ).scalar() or 0
-
+    today_alerts = threat["today_alerts"]
+    pending_events = threat["pending"]
     # 高危（ai_score >= 80）待处理
-    high_risk_pending = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.status == "PENDING",
-        ThreatEvent.ai_score >= 80,
-    ).scalar() or 0
-
+    high_risk_pending = threat["high_risk_pending"]
     # 今日封禁成功
-    today_blocked = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.state == "SUCCESS",
-        ExecutionTask.ended_at >= today_start,
-    ).scalar() or 0
-
+    today_blocked = execution["today_blocked"]
     # 执行失败（需人工介入）
-    manual_required = db.query(func.count(ExecutionTask.id)).filter(
-        ExecutionTask.state == "MANUAL_REQUIRED",
-    ).scalar() or 0
+    manual_required = execution["manual_required"]
 
     # ── 探测侧 ──
-    total_assets = db.query(func.count(Asset.id)).scalar() or 0
-    enabled_assets = db.query(func.count(Asset.id)).filter(
-        Asset.enabled == 1
-    ).scalar() or 0
-
-    running_tasks = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.state == "RUNNING"
-    ).scalar() or 0
-
-    today_tasks = db.query(func.count(ScanTask.id)).filter(
-        ScanTask.created_at >= today_start
-    ).scalar() or 0
-
-    total_findings = db.query(func.count(ScanFinding.id)).scalar() or 0
-    high_findings = db.query(func.count(ScanFinding.id)).filter(
-        ScanFinding.severity == "HIGH"
-    ).scalar() or 0
-    medium_findings = db.query(func.count(ScanFinding.id)).filter(
-        ScanFinding.severity == "MEDIUM"
-    ).scalar() or 0
+    total_assets = counts["asset"]["total"]
+    enabled_assets = counts["asset"]["enabled"]
+    running_tasks = scan_task["running"]
+    today_tasks = scan_task["today"]
+    total_findings = finding["total"]
+    high_findings = finding["high"]
+    medium_findings = finding["medium"]
 
     return {
         "code": 0,
@@ -296,7 +222,7 @@ async def get_metrics(
                 "high_findings": high_findings,
                 "medium_findings": medium_findings,
             },
-            "generated_at": _iso_z(now),
+            "generated_at": _iso_z(counts["generated_at"]),
         },
     }
 
@@ -312,7 +238,7 @@ async def get_chain_status(
         "data": {
             "defense": snapshot["defense"],
             "probe": snapshot["probe"],
-            "generated_at": _iso_z(_utc_now()),
+            "generated_at": _iso_z(snapshot["generated_at"]),
         },
     }
 
@@ -347,32 +273,9 @@ async def get_trends(
 
     since = now - timedelta(days=days)
 
-    # 告警趋势：按天聚合
-    alert_rows = (
-        db.query(
-            func.date(ThreatEvent.created_at).label("day"),
-            func.count(ThreatEvent.id).label("cnt"),
-        )
-        .filter(ThreatEvent.created_at >= since)
-        .group_by(func.date(ThreatEvent.created_at))
-        .order_by(func.date(ThreatEvent.created_at))
-        .all()
-    )
-
-    # 高危告警趋势
-    high_alert_rows = (
-        db.query(
-            func.date(ThreatEvent.created_at).label("day"),
-            func.count(ThreatEvent.id).label("cnt"),
-        )
-        .filter(
-            ThreatEvent.created_at >= since,
-            ThreatEvent.ai_score >= 80,
-        )
-        .group_by(func.date(ThreatEvent.created_at))
-        .order_by(func.date(ThreatEvent.created_at))
-        .all()
-    )
+    # 告警 / 高危告警趋势：整点小时读汇总表，首尾不足部分读原始事件
+    alert_days = threat_rollup.daily_counts(db, "total", since)
+    high_alert_days = threat_rollup.daily_counts(db, "high", since)
 
     # 扫描任务趋势
     task_rows = (
@@ -386,9 +289,8 @@ async def get_trends(
         .all()
     )
 
-    def _fill_days(rows: list, since: datetime, days: int) -> List[Dict]:
+    def _fill_days(row_map: Dict[str, int], since: datetime, days: int) -> List[Dict]:
         """按天补齐缺失的日期（值为 0）"""
-        row_map = {str(r.day): r.cnt for r in rows}
         result = []
         for i in range(days):
             day = (since + timedelta(days=i)).strftime("%Y-%m-%d")
@@ -399,9 +301,9 @@ async def get_trends(
         "code": 0,
         "data": {
             "range": range_value,
-            "alert_trend": _fill_days(alert_rows, since, days),
-            "high_alert_trend": _fill_days(high_alert_rows, since, days),
-            "task_trend": _fill_days(task_rows, since, days),
+            "alert_trend": _fill_days(alert_days, since, days),
+            "high_alert_trend": _fill_days(high_alert_days, since, days),
+            "task_trend": _fill_days({str(r.day): r.cnt for r in task_rows}, since, days),
         },
     }
 
@@ -421,6 +323,8 @@ async def get_todos(
     - 失败任务 Top 5（执行任务 MANUAL_REQUIRED）
     - 高危漏洞发现 Top 5
     """
+    counts = overview_cache.counts(db)
+
     # 高优先级待审批事件
     pending_top = (
         db.query(ThreatEvent)
@@ -489,9 +393,9 @@ async def get_todos(
             "failed_tasks": [_task_to_dict(t) for t in failed_tasks],
             "high_findings": [_finding_to_dict(f) for f in high_findings],
             "counts": {
-                "pending_events": db.query(func.count(ThreatEvent.id)).filter(ThreatEvent.status == "PENDING").scalar() or 0,
-                "manual_required": db.query(func.count(ExecutionTask.id)).filter(ExecutionTask.state == "MANUAL_REQUIRED").scalar() or 0,
-                "high_findings_new": db.query(func.count(ScanFinding.id)).filter(ScanFinding.severity == "HIGH", ScanFinding.status == "NEW").scalar() or 0,
+                "pending_events": counts["threat"]["pending"],
+                "manual_required": counts["execution"]["manual_required"],
+                "high_findings_new": counts["finding"]["high_new"],
             },
         },
     }
@@ -515,25 +419,40 @@ async def get_defense_stats(
     - TOP 10 攻击 IP
     - 7天/24h 告警趋势
     """
-    now = _utc_now()
     days = 30 if range == "30d" else (1 if range == "24h" else 7)
-    since = now - timedelta(days=days)
+    return {
+        "code": 0,
+        "data": {
+            "range": range,
+            **overview_cache.get_or_compute(
+                db, f"defense_stats:{days}", lambda session: _compute_defense_stats(session, days)
+            ),
+        },
+    }
 
-    # 威胁等级分布（按 ai_score 分段）
-    threat_level_dist = []
+
+def _compute_defense_stats(db: Session, days: int) -> Dict[str, Any]:
+    since = _utc_now() - timedelta(days=days)
+
+    # 威胁等级分布（按 ai_score 分段）与总计：一次聚合
     ranges_def = [
         ("CRITICAL", 90, 100),
         ("HIGH", 70, 89),
         ("MEDIUM", 40, 69),
         ("LOW", 0, 39),
     ]
-    for label, lo, hi in ranges_def:
-        cnt = db.query(func.count(ThreatEvent.id)).filter(
-            ThreatEvent.created_at >= since,
-            ThreatEvent.ai_score >= lo,
-            ThreatEvent.ai_score <= hi,
-        ).scalar() or 0
-        threat_level_dist.append({"level": label, "count": cnt})
+    totals = db.query(
+        func.count(ThreatEvent.id).label("total"),
+        count_if(ThreatEvent.ai_score >= 80).label("high_total"),
+        *[
+            count_if(ThreatEvent.ai_score >= lo, ThreatEvent.ai_score <= hi).label(label)
+            for label, lo, hi in ranges_def
+        ],
+    ).filter(ThreatEvent.created_at >= since).one()
+    threat_level_dist = [
+        {"level": label, "count": int(getattr(totals, label) or 0)}
+        for label, _, _ in ranges_def
+    ]
 
     # 来源/服务分布
     service_rows = (
@@ -570,24 +489,10 @@ async def get_defense_stats(
         for r in top_ip_rows
     ]
 
-    # 总计
-    total = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= since
-    ).scalar() or 0
-
-    high_total = db.query(func.count(ThreatEvent.id)).filter(
-        ThreatEvent.created_at >= since,
-        ThreatEvent.ai_score >= 80,
-    ).scalar() or 0
-
     return {
-        "code": 0,
-        "data": {
-            "range": range,
-            "total": total,
-            "high_total": high_total,
-            "threat_level_dist": threat_level_dist,
-            "service_dist": service_dist,
-            "top_ips": top_ips,
-        },
+        "total": int(totals.total or 0),
+        "high_total": int(totals.high_total or 0),
+        "threat_level_dist": threat_level_dist,
+        "service_dist": service_dist,
+        "top_ips": top_ips,
     }
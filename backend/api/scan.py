@@ -549,6 +549,7 @@ async def get_scan_tasks(
                     "target_type": t.target_type,
                     "tool_name": t.tool_name,
                     "profile": t.profile,
+                    "parent_task_id": t.parent_task_id,
                     "state": t.state,
                     "priority": t.priority,
                     "timeout_seconds": t.timeout_seconds,
@@ -584,6 +585,7 @@ async def get_scan_task(
                 "target_type": task.target_type,
                 "tool_name": task.tool_name,
                 "profile": task.profile,
+                "parent_task_id": task.parent_task_id,
                 "state": task.state,
                 "priority": task.priority,
                 "error_message": task.error_message,
@@ -626,6 +628,17 @@ async def cancel_scan_task(
 
     success = await scanner.cancel_scan(task_id)
 
+    if not success and task.tool_name == "nmap":
+        from services.nmap_scanner import CANCELLED_MESSAGE, nmap_scanner
+
+        # 本进程内的 nmap 直接终止；其他进程的扫描通过任务状态轮询感知取消
+        success = await nmap_scanner.cancel_scan(task_id)
+        if not success and task.state == "RUNNING":
+            task.state = "FAILED"
+            task.error_message = CANCELLED_MESSAGE
+            db.commit()
+            success = True
+
     if success:
         return APIResponse.success(message="Scan task cancelled")
     else:
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timezone
 import os
+import hmac
+import ipaddress
 import json
 
 from core.database import (
@@ -17,11 +20,14 @@ from core.database import (
     ModelProfile,
 )
 from api.auth import get_current_user, get_user_role, get_user_permissions, require_permissions
+from services.audit_chain import get_verify_full_limit
 from services.audit_service import AuditService
 from services.mode_service import get_current_mode, set_mode
 
 router = APIRouter(prefix="/api/v1/system", tags=["system"])
 compat_router = APIRouter(prefix="/api/system", tags=["system"])
+# Prometheus 抓取端点挂在根路径 /metrics
+prometheus_router = APIRouter(tags=["metrics"])
 
 # In-memory system mode (persisted via system_config_snapshot)
 
@@ -365,6 +371,8 @@ async def save_ai_api_config(
         ai_engine.llm_client.base_url = base_url
         ai_engine.llm_client.model = model_name
         ai_engine.llm_client.api_key = final_api_key
+        # 模型变更后旧评估结果不再适用
+        ai_engine.assessment_cache.clear()
     except Exception:
         pass
 
@@ -651,13 +659,17 @@ async def get_audit_logs(
 
 
 @router.get("/audit/verify")
-async def verify_audit_chain(
-    limit: int = 200,
+def verify_audit_chain(
+    limit: Optional[int] = None,
+    full: bool = False,
     current_user: User = Depends(require_permissions("view_audit")),
     db: Session = Depends(get_db),
 ):
-    """校验审计日志哈希链完整性"""
-    result = AuditService.verify_chain(db, limit=min(limit, 1000))
+    """校验审计日志哈希链完整性（默认从最近签名检查点增量校验，full=true 全量校验）。
+    同步函数，由线程池执行，逐条哈希不阻塞事件循环；full 未指定 limit 时最多校验 AUDIT_VERIFY_FULL_LIMIT 条"""
+    if full and limit is None:
+        limit = get_verify_full_limit()
+    result = AuditService.verify_chain(db, limit=limit, full=full)
     return {
         "code": 0,
         "data": result,
@@ -698,6 +710,92 @@ async def get_system_metrics(
     return {"code": 0, "data": snap}
 
 
+@router.get("/ai-assess-cache")
+async def get_ai_assess_cache_stats(
+    current_user: User = Depends(require_permissions("view_system_mode")),
+):
+    """AI 威胁评估缓存状态（条目数、内存占用、命中/未命中/合并次数）"""
+    from services.ai_engine import ai_engine
+
+    return {"code": 0, "data": ai_engine.assessment_cache.stats()}
+
+
+@router.delete("/ai-assess-cache")
+async def flush_ai_assess_cache(
+    req: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permissions("system:config")),
+):
+    """清空 AI 威胁评估缓存"""
+    from services.ai_engine import ai_engine
+
+    flushed = ai_engine.assessment_cache.clear()
+    AuditService.log(
+        db=db,
+        actor=str(current_user.username),
+        action="flush_ai_assess_cache",
+        target="ai_assess_cache",
+        target_type="system_config",
+        reason=f"flushed {flushed} entries",
+        trace_id=getattr(req.state, "trace_id", None),
+    )
+    return {"code": 0, "data": {"flushed": flushed}, "message": "AI 评估缓存已清空"}
+
+
+@router.get("/rbac-cache")
+async def get_rbac_cache_stats(
+    current_user: User = Depends(require_permissions("view_system_mode")),
+):
+    """RBAC 权限缓存状态（版本标签、缓存用户/角色数、命中/未命中次数）"""
+    from services.rbac_cache import rbac_cache
+
+    return {"code": 0, "data": rbac_cache.stats()}
+
+
+@router.delete("/rbac-cache")
+async def flush_rbac_cache(
+    req: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permissions("system:config")),
+):
+    """清空 RBAC 权限缓存并使令牌内的权限声明失效（其他进程直接改库后使用）"""
+    from services.rbac_cache import rbac_cache
+
+    flushed = rbac_cache.invalidate("manual")
+    AuditService.log(
+        db=db,
+        actor=str(current_user.username),
+        action="flush_rbac_cache",
+        target="rbac_cache",
+        target_type="system_config",
+        reason=f"flushed {flushed} entries",
+        trace_id=getattr(req.state, "trace_id", None),
+    )
+    return {"code": 0, "data": {"flushed": flushed}, "message": "RBAC 权限缓存已清空"}
+
+
+def _is_loopback_client(request: Request) -> bool:
+    host = request.client.host if request.client else ""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+@prometheus_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus 文本格式指标：配置 METRICS_TOKEN 时需携带 Authorization: Bearer <token>，未配置时仅允许本机抓取"""
+    from services.metrics_service import metrics
+
+    token = os.getenv("METRICS_TOKEN", "").strip()
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise HTTPException(status_code=401, detail="无效的指标抓取令牌")
+    elif not _is_loopback_client(request):
+        raise HTTPException(status_code=403, detail="未配置 METRICS_TOKEN 时仅允许本机抓取指标")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # 告警阈值（内存存储，可通过 API 调整）
 _alert_thresholds = {
     "scan_fail_rate_pct": 20.0,
@@ -23,7 +23,12 @@ from core.database import (
 from services.audit_service import AuditService
 from services.workflow_release import apply_release_metadata, get_publish_lock
 from services.workflow_dsl import validate_workflow_dsl
-from services.workflow_runtime import WorkflowRuntimeError, build_workflow_debug_report, replay_workflow_run
+from services.workflow_runtime import (
+    WorkflowRuntimeError,
+    build_workflow_debug_report,
+    compiled_workflow_cache,
+    replay_workflow_run,
+)
 from services.workflow_validator import validate_workflow_publish
 
 router = APIRouter(prefix="/api/v1/workflows", tags=["workflow"])
@@ -881,6 +886,7 @@ async def publish_workflow(
             auto_commit=False,
         )
         db.commit()
+        compiled_workflow_cache.invalidate(definition.id)
     except HTTPException:
         db.rollback()
         raise
@@ -962,6 +968,7 @@ async def rollback_workflow(
             auto_commit=False,
         )
         db.commit()
+        compiled_workflow_cache.invalidate(definition.id)
     except HTTPException:
         db.rollback()
         raise
@@ -7,7 +7,9 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Float,
+    Index,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime, timezone
@@ -115,6 +117,21 @@ def get_db():
 
 class ThreatEvent(Base):
     __tablename__ = "threat_event"
+    __table_args__ = (
+        # 入站去重键：与 sql/mvp_schema.sql 中的 idx_threat_event_dedup 保持一致
+        Index(
+            "idx_threat_event_dedup",
+            "source_vendor",
+            "source_event_id",
+            unique=True,
+            sqlite_where=text("source_event_id IS NOT NULL"),
+            postgresql_where=text("source_event_id IS NOT NULL"),
+        ),
+        # 时间窗口统计与汇总压实的增量扫描
+        Index("idx_threat_event_created_at", "created_at"),
+        Index("idx_threat_event_updated_at", "updated_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     ip = Column(String, nullable=False, index=True)
     source = Column(String, nullable=False)
@@ -142,6 +159,36 @@ class ThreatEvent(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
 
+class ThreatEventRollup(Base):
+    """ThreatEvent 小时汇总：按 (小时, 来源厂商, 维度, 维度值) 计数，趋势与分布统计读此表"""
+    __tablename__ = "threat_event_rollup"
+    __table_args__ = (
+        Index(
+            "idx_threat_event_rollup_key",
+            "bucket_start", "source_vendor", "dimension", "dim_value",
+            unique=True,
+        ),
+        Index("idx_threat_event_rollup_dimension", "dimension", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime, nullable=False)  # 整点小时（UTC）
+    source_vendor = Column(String, nullable=False, default="")
+    dimension = Column(String, nullable=False)  # total / high / threat_label / service_name / ip
+    dim_value = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ThreatEventRollupState(Base):
+    """汇总压实水位（单行）：rolled_until 之前的整点小时已汇总"""
+    __tablename__ = "threat_event_rollup_state"
+    id = Column(Integer, primary_key=True)
+    rolled_until = Column(DateTime)
+    last_event_id = Column(Integer, nullable=False, default=0)  # 新插入事件水位
+    scanned_at = Column(DateTime)  # updated_at 水位（AI 评分等后续更新）
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
 class Asset(Base):
     __tablename__ = "asset"
     id = Column(Integer, primary_key=True, index=True)
@@ -180,6 +227,8 @@ class ScanTask(Base):
     tool_name = Column(String, nullable=False)
     profile = Column(String)
     script_set = Column(String)
+    # 大网段分片扫描：子任务指向父任务
+    parent_task_id = Column(Integer, ForeignKey("scan_task.id"), index=True)
     state = Column(String, nullable=False, default="CREATED")
     priority = Column(Integer, default=5)
     timeout_seconds = Column(Integer, default=3600)
@@ -397,6 +446,10 @@ class WorkflowVersion(Base):
 
 class WorkflowRun(Base):
     __tablename__ = "workflow_run"
+    __table_args__ = (
+        Index("idx_workflow_run_lease", "run_state", "lease_expires_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(Integer, ForeignKey("workflow_definition.id"), nullable=False, index=True)
     workflow_version_id = Column(Integer, ForeignKey("workflow_version.id"), nullable=False, index=True)
@@ -407,6 +460,13 @@ class WorkflowRun(Base):
     output_payload = Column(Text)
     context_json = Column(Text)
     trace_id = Column(String, nullable=False, index=True)
+    actor = Column(String)
+    start_node_id = Column(String)
+    # 运行队列租约：worker 认领后周期续租，租约过期视为孤儿由其他 worker 回收
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    claim_count = Column(Integer, nullable=False, default=0)
     started_at = Column(DateTime)
     ended_at = Column(DateTime)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
@@ -541,6 +601,17 @@ class CollectorConfig(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_log"
+    __table_args__ = (
+        # 与 sql/mvp_schema.sql 保持一致：链序号唯一；未封链记录走部分索引
+        Index("idx_audit_log_chain_seq", "chain_seq", unique=True),
+        Index(
+            "idx_audit_log_unsealed",
+            "id",
+            sqlite_where=text("integrity_hash IS NULL"),
+            postgresql_where=text("integrity_hash IS NULL"),
+        ),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     actor = Column(String, nullable=False)
     action = Column(String, nullable=False)
@@ -553,6 +624,18 @@ class AuditLog(Base):
     trace_id = Column(String, nullable=False, index=True)
     integrity_hash = Column(String)  # SHA-256 哈希链，用于不可篡改校验
     prev_hash = Column(String)  # 前一条日志的 integrity_hash
+    chain_seq = Column(Integer)  # 哈希链序号，由链写入器按序分配
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class AuditCheckpoint(Base):
+    """审计哈希链检查点：每 N 条记录一次链头，HMAC 签名防伪，用于增量校验"""
+    __tablename__ = "audit_checkpoint"
+    id = Column(Integer, primary_key=True, index=True)
+    chain_seq = Column(Integer, nullable=False, unique=True)
+    audit_log_id = Column(Integer, ForeignKey("audit_log.id"), nullable=False)
+    chain_hash = Column(String, nullable=False)
+    signature = Column(String, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 
@@ -660,14 +743,60 @@ def init_db():
         _ensure_sqlite_column("scan_finding", "os_type", "VARCHAR")
         _ensure_sqlite_column("scan_finding", "os_accuracy", "VARCHAR")
 
+        # scan_task: 分片扫描父子关系
+        _ensure_sqlite_column("scan_task", "parent_task_id", "INTEGER")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_scan_task_parent_task_id ON scan_task(parent_task_id)"
+        )
+
+        # workflow_run: 运行队列租约字段
+        _ensure_sqlite_column("workflow_run", "actor", "VARCHAR")
+        _ensure_sqlite_column("workflow_run", "start_node_id", "VARCHAR")
+        _ensure_sqlite_column("workflow_run", "lease_owner", "VARCHAR")
+        _ensure_sqlite_column("workflow_run", "lease_expires_at", "DATETIME")
+        _ensure_sqlite_column("workflow_run", "heartbeat_at", "DATETIME")
+        _ensure_sqlite_column("workflow_run", "claim_count", "INTEGER NOT NULL DEFAULT 0")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_workflow_run_lease ON workflow_run(run_state, lease_expires_at)"
+        )
+
         # threat_event: 历史库可能缺少以下字段，查询 ORM 全字段时会触发 no such column。
         _ensure_sqlite_column("threat_event", "service_port", "VARCHAR")
         _ensure_sqlite_column("threat_event", "ip_location", "VARCHAR")
         _ensure_sqlite_column("threat_event", "client_id", "VARCHAR")
         _ensure_sqlite_column("threat_event", "client_name", "VARCHAR")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_threat_event_created_at ON threat_event(created_at)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_threat_event_updated_at ON threat_event(updated_at)"
+        )
 
         # audit_log: 审计哈希链字段（日报/周报等写审计时依赖）
         _ensure_sqlite_column("audit_log", "integrity_hash", "VARCHAR")
         _ensure_sqlite_column("audit_log", "prev_hash", "VARCHAR")
+        _ensure_sqlite_column("audit_log", "chain_seq", "INTEGER")
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_log_chain_seq ON audit_log(chain_seq)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_unsealed ON audit_log(id) WHERE integrity_hash IS NULL"
+        )
+
+        # threat_event: 去重唯一索引。历史库若已存在重复数据则退化为普通索引，保证查找走索引。
+        duplicated = conn.exec_driver_sql(
+            "SELECT 1 FROM threat_event WHERE source_event_id IS NOT NULL "
+            "GROUP BY source_vendor, source_event_id HAVING COUNT(*) > 1 LIMIT 1"
+        ).first()
+        if duplicated is None:
+            conn.exec_driver_sql(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_threat_event_dedup "
+                "ON threat_event(source_vendor, source_event_id) WHERE source_event_id IS NOT NULL"
+            )
+        else:
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS idx_threat_event_source_lookup "
+                "ON threat_event(source_vendor, source_event_id)"
+            )
 
     _ensure_default_rbac_data()
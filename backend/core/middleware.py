@@ -1,122 +1,162 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.responses import JSONResponse
-from typing import Callable
-from collections import defaultdict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional
 import logging
+import os
 import time
 import uuid
 from functools import wraps
 
-logger = logging.getLogger("aimiguan")
-
-
-class TraceIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        trace_id = request.headers.get("X-Trace-ID") or str(uuid.uuid4())
-        request.state.trace_id = trace_id
-
-        start = time.monotonic()
-        response = await call_next(request)
-        elapsed_ms = (time.monotonic() - start) * 1000
-
-        response.headers["X-Trace-ID"] = trace_id
-
-        # 结构化日志
-        status = response.status_code
-        method = request.method
-        path = request.url.path
-        logger.info(
-            "request",
-            extra={
-                "trace_id": trace_id,
-                "method": method,
-                "path": path,
-                "status": status,
-                "elapsed_ms": round(elapsed_ms, 2),
-            },
-        )
-
-        # 指标采集
-        try:
-            from services.metrics_service import metrics
-            metrics.inc("http_requests_total")
-            if status >= 400:
-                metrics.inc("http_errors_total")
-            metrics.record_latency("api_request", elapsed_ms)
-        except Exception:
-            pass
-
-        return response
+from core.rate_limit import RateLimiter
+from services.metrics_service import metrics
 
+logger = logging.getLogger("aimiguan")
 
-# ── 接口限流中间件 ──
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """滑动窗口限流中间件。设置环境变量 TESTING=1 时自动禁用。"""
+class RequestMiddleware:
     """
-    滑动窗口限流。
-    - 全局默认：60 次/分
-    - 登录接口：5 次/分（防暴力）
+    纯 ASGI 请求中间件，合并限流与链路追踪（不经 BaseHTTPMiddleware，不额外创建任务与响应流，SSE 等流式响应直通）。
+    - 限流（GCRA，见 core.rate_limit）：全局 global_rpm 次/分，登录接口另限 login_rpm 次/分；
+      设置环境变量 TESTING=1 时不限流；429 响应不带追踪头、不计入请求指标。
+    - 追踪：沿用请求头 X-Trace-ID 或生成新值，写入 request.state.trace_id 与响应头；
+      响应头发出时计时，请求结束后输出结构化日志并采集指标。
     """
 
-    def __init__(self, app, global_rpm: int = 60, login_rpm: int = 5):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        global_rpm: int = 60,
+        login_rpm: int = 5,
+        limiter: Optional[RateLimiter] = None,
+        rate_limit: bool = True,
+        trace: bool = True,
+    ):
+        self.app = app
         self.global_rpm = global_rpm
         self.login_rpm = login_rpm
-        self._hits: dict[str, list[float]] = defaultdict(list)
+        self.limiter = (limiter or RateLimiter()) if rate_limit else None
+        self.trace = trace
 
-    def _client_ip(self, request: Request) -> str:
-        forwarded = request.headers.get("X-Forwarded-For")
+    def _client_ip(self, scope: Scope, headers: Headers) -> str:
+        forwarded = headers.get("x-forwarded-for")
         if forwarded:
             return forwarded.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
+        client = scope.get("client")
+        return client[0] if client else "unknown"
 
     def _is_limited(self, key: str, rpm: int) -> bool:
-        now = time.monotonic()
-        window = 60.0
-        hits = self._hits[key]
-        # 清理窗口外数据
-        self._hits[key] = [t for t in hits if now - t < window]
-        if len(self._hits[key]) >= rpm:
-            return True
-        self._hits[key].append(now)
-        return False
-
-    async def dispatch(self, request: Request, call_next: Callable):
-        import os
-        if os.environ.get("TESTING") == "1":
-            return await call_next(request)
-
-        client_ip = self._client_ip(request)
-        path = request.url.path
-
-        is_login = path.endswith("/auth/login") and request.method == "POST"
+        return self.limiter.hit(key, rpm)[0]
+
+    def _rate_limit_response(self, scope: Scope, headers: Headers) -> Optional[JSONResponse]:
+        client_ip = self._client_ip(scope, headers)
+
+        is_login = scope["path"].endswith("/auth/login") and scope["method"] == "POST"
         if is_login:
-            key = f"login:{client_ip}"
-            if self._is_limited(key, self.login_rpm):
+            limited, retry_after = self.limiter.hit(f"login:{client_ip}", self.login_rpm)
+            if limited:
                 return JSONResponse(
                     status_code=429,
                     content={
                         "code": 42900,
                         "message": "登录尝试过于频繁，请 1 分钟后重试",
                     },
+                    headers={"Retry-After": str(retry_after)},
                 )
 
         # 全局限流
-        global_key = f"global:{client_ip}"
-        if self._is_limited(global_key, self.global_rpm):
+        limited, retry_after = self.limiter.hit(f"global:{client_ip}", self.global_rpm)
+        if limited:
             return JSONResponse(
                 status_code=429,
                 content={
                     "code": 42901,
                     "message": "请求过于频繁，请稍后重试",
                 },
-                headers={"Retry-After": "60"},
+                headers={"Retry-After": str(retry_after)},
             )
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if self.limiter is not None and os.environ.get("TESTING") != "1":
+            response = self._rate_limit_response(scope, headers)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+
+        if not self.trace:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = headers.get("x-trace-id") or str(uuid.uuid4())
+        scope.setdefault("state", {})["trace_id"] = trace_id
+
+        start = time.monotonic()
+        started: dict = {}
+
+        async def send_with_trace(message: Message) -> None:
+            if message["type"] == "http.response.start" and not started:
+                started["status"] = message["status"]
+                started["elapsed_ms"] = (time.monotonic() - start) * 1000
+                MutableHeaders(scope=message)["X-Trace-ID"] = trace_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace)
+        if not started:
+            return
+
+        # 结构化日志
+        status = started["status"]
+        elapsed_ms = started["elapsed_ms"]
+        logger.info(
+            "request",
+            extra={
+                "trace_id": trace_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "elapsed_ms": round(elapsed_ms, 2),
+            },
+        )
+
+        # 指标采集
+        try:
+            metrics.inc("http_requests_total")
+            if status >= 400:
+                metrics.inc("http_errors_total")
+            # 按路由模板打标签，未匹配的路径（扫描探测等）归为一类，避免标签基数失控
+            route = scope.get("route")
+            metrics.record_latency(
+                "api_request",
+                elapsed_ms,
+                route=getattr(route, "path", None) or "unmatched",
+                method=scope["method"],
+                status=status,
+            )
+        except Exception:
+            pass
+
+
+class TraceIDMiddleware(RequestMiddleware):
+    """仅链路追踪（不限流）"""
+
+    def __init__(self, app: ASGIApp):
+        super().__init__(app, rate_limit=False)
+
+
+# ── 接口限流中间件 ──
+
+class RateLimitMiddleware(RequestMiddleware):
+    """仅限流（不追踪）。设置环境变量 TESTING=1 时自动禁用。"""
 
-        response = await call_next(request)
-        return response
+    def __init__(self, app: ASGIApp, global_rpm: int = 60, login_rpm: int = 5, limiter: Optional[RateLimiter] = None):
+        super().__init__(app, global_rpm=global_rpm, login_rpm=login_rpm, limiter=limiter, trace=False)
 
 
 def require_role(*allowed_roles: str):
@@ -0,0 +1,165 @@
+"""
+接口限流：GCRA（通用信元速率算法，等价于容量为 rpm 的令牌桶）。
+每个限流键只保存一个浮点数 TAT（理论到达时间），判定 O(1)：
+    new_tat = max(tat, now) + 60 / rpm；new_tat - now > 60 时拒绝，否则写回 new_tat。
+存储后端由 RATE_LIMIT_BACKEND 选择：
+- memory（默认）：进程内 LRU，键数上限 RATE_LIMIT_MAX_KEYS，伪造 X-Forwarded-For 扫描也不会无限增长；
+- sqlite：WAL 模式的共享 SQLite 文件（RATE_LIMIT_SQLITE_PATH），同机多个 uvicorn worker 共用一份限额，
+  单条 UPSERT ... RETURNING 原子完成判定与写回，作为 Redis 的本地替代。
+  判定在请求路径上同步执行：写锁忙等上限仅 RATE_LIMIT_SQLITE_BUSY_MS 毫秒，拿不到锁时本次放行，
+  多 worker 争用时不会拖慢整个事件循环。
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger("aimiguan")
+
+WINDOW_SECONDS = 60.0
+DEFAULT_BACKEND = "memory"
+DEFAULT_MAX_KEYS = 100000
+DEFAULT_SQLITE_PATH = "./ratelimit.db"
+SQLITE_PURGE_EVERY = 1000
+DEFAULT_SQLITE_BUSY_MS = 5
+# 60 / rpm 累加的浮点误差不应让第 rpm 次请求被误判
+_EPSILON = 1e-6
+
+
+def get_backend() -> str:
+    value = os.getenv("RATE_LIMIT_BACKEND", DEFAULT_BACKEND).strip().lower()
+    return value if value in {"memory", "sqlite"} else DEFAULT_BACKEND
+
+
+def get_max_keys() -> int:
+    try:
+        value = int(os.getenv("RATE_LIMIT_MAX_KEYS", str(DEFAULT_MAX_KEYS)))
+    except ValueError:
+        value = DEFAULT_MAX_KEYS
+    return max(100, value)
+
+
+def get_sqlite_path() -> str:
+    return os.getenv("RATE_LIMIT_SQLITE_PATH", DEFAULT_SQLITE_PATH).strip() or DEFAULT_SQLITE_PATH
+
+
+def get_sqlite_busy_seconds() -> float:
+    try:
+        value = float(os.getenv("RATE_LIMIT_SQLITE_BUSY_MS", str(DEFAULT_SQLITE_BUSY_MS)))
+    except ValueError:
+        value = DEFAULT_SQLITE_BUSY_MS
+    return min(max(0.0, value), 100.0) / 1000
+
+
+class MemoryRateLimitStore:
+    """进程内 GCRA 状态，按最近使用淘汰"""
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or get_max_keys()
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def acquire(self, key: str, interval: float, now: float) -> Tuple[bool, float]:
+        """返回 (是否放行, 被拒绝时需等待的秒数)"""
+        tat = self._tat.get(key, now)
+        new_tat = max(tat, now) + interval
+        if new_tat - now > WINDOW_SECONDS + _EPSILON:
+            return False, new_tat - now - WINDOW_SECONDS
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        # 被淘汰的是最久未访问的键，重新出现时按新客户端处理
+        while len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+        return True, 0.0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class SQLiteRateLimitStore:
+    """跨进程共享的 GCRA 状态（WAL 模式 SQLite）"""
+
+    _UPSERT = (
+        "INSERT INTO rate_limit (key, tat) VALUES (:key, :now + :interval) "
+        "ON CONFLICT(key) DO UPDATE SET tat = max(tat, :now) + :interval "
+        "WHERE max(tat, :now) + :interval - :now <= :window "
+        "RETURNING tat"
+    )
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_sqlite_path()
+        self._local = threading.local()
+        self._calls = 0
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limit (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            # 建表完成后把忙等缩短到毫秒级，请求路径上的判定不会长时间占住事件循环
+            conn.execute(f"PRAGMA busy_timeout = {int(get_sqlite_busy_seconds() * 1000)}")
+            self._local.conn = conn
+        return conn
+
+    def now(self) -> float:
+        # 多进程共享状态，只能用墙钟
+        return time.time()
+
+    def acquire(self, key: str, interval: float, now: float) -> Tuple[bool, float]:
+        conn = self._connect()
+        row = conn.execute(
+            self._UPSERT,
+            {"key": key, "now": now, "interval": interval, "window": WINDOW_SECONDS + _EPSILON},
+        ).fetchone()
+        self._calls += 1
+        if self._calls % SQLITE_PURGE_EVERY == 0:
+            # TAT 已过去的键与不存在等价，定期清理
+            conn.execute("DELETE FROM rate_limit WHERE tat < ?", (now,))
+        if row is not None:
+            return True, 0.0
+        current = conn.execute("SELECT tat FROM rate_limit WHERE key = ?", (key,)).fetchone()
+        tat = float(current[0]) if current else now
+        return False, max(0.0, max(tat, now) + interval - now - WINDOW_SECONDS)
+
+    def __len__(self) -> int:
+        return int(self._connect().execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0])
+
+
+class RateLimiter:
+    """按键限流：rpm 次/分，允许一次性突发 rpm 次"""
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else create_store()
+
+    def hit(self, key: str, rpm: int) -> Tuple[bool, int]:
+        """返回 (是否被限流, Retry-After 秒数)；存储异常时放行"""
+        interval = WINDOW_SECONDS / max(1, rpm)
+        try:
+            allowed, wait = self.store.acquire(key, interval, self.store.now())
+        except sqlite3.OperationalError:
+            # 共享库写锁忙（多 worker 争用），按放行处理，不记告警日志以免刷屏
+            metrics.inc("rate_limit_store_busy_total")
+            return False, 0
+        except Exception as e:
+            logger.warning(f"限流存储异常，本次放行: {e}")
+            return False, 0
+        if allowed:
+            return False, 0
+        return True, max(1, math.ceil(wait))
+
+
+def create_store():
+    if get_backend() == "sqlite":
+        return SQLiteRateLimitStore()
+    return MemoryRateLimitStore()
@@ -12,9 +12,12 @@ from core.response import (
     validation_exception_handler,
     general_exception_handler,
 )
-from core.middleware import TraceIDMiddleware, RateLimitMiddleware
+from core.middleware import RequestMiddleware
 from api import auth, defense, scan, report, ai_chat, tts, firewall, system, push, overview, plugin, device, workflow
 from services.scheduler_service import scheduler_service
+from services.audit_chain import audit_chain
+from services.mcp_client import mcp_client
+from services.http_clients import http_clients
 
 
 def print_banner():
@@ -45,6 +48,8 @@ async def lifespan(app: FastAPI):
     print_banner()
     init_db()
     print("✓ 数据库初始化完成")
+    await audit_chain.start()
+    await http_clients.start()
     print("✓ API 路由注册完成")
     print("✓ 中间件加载完成")
     
@@ -67,6 +72,13 @@ async def lifespan(app: FastAPI):
     # 停止后台调度服务
     await scheduler_service.stop()
     print("✓ 后台调度服务已停止")
+
+    # 关闭 MCP stdio 会话进程与出站 HTTP 连接池
+    await mcp_client.close()
+    await http_clients.aclose()
+
+    # 封完剩余审计记录后退出
+    await audit_chain.stop()
     
     print("✓ 数据库连接已关闭")
     print("✓ 系统已安全退出")
@@ -88,8 +100,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(TraceIDMiddleware)
-app.add_middleware(RateLimitMiddleware, global_rpm=120, login_rpm=5)
+# 限流 + 链路追踪/日志/指标，单层纯 ASGI 中间件
+app.add_middleware(RequestMiddleware, global_rpm=120, login_rpm=5)
 
 # Register exception handlers
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
@@ -100,6 +112,7 @@ app.add_exception_handler(Exception, general_exception_handler)
 app.include_router(auth.router)
 app.include_router(system.router)
 app.include_router(system.compat_router)  # /api/system/* compatibility
+app.include_router(system.prometheus_router)  # /metrics
 app.include_router(defense.router)
 app.include_router(defense.compat_router)
 app.include_router(scan.router)
@@ -26,6 +26,7 @@ from core.database import (
     ThreatEvent,
     User,
 )
+from services.threat_rollup import threat_rollup
 
 DEMO_TRACE_PREFIX = "demo_"
 DEMO_TAG = "aimiguard-demo"
@@ -206,6 +207,8 @@ def clear_demo_data(db) -> None:
         db.query(ThreatEvent).filter(ThreatEvent.id.in_(demo_event_ids)).delete(
             synchronize_session=False
         )
+        # 原始事件被删除：清空汇总，下次压实时重建
+        threat_rollup.reset(db)
 
     db.query(AIReport).filter(AIReport.trace_id.like(f"{DEMO_TRACE_PREFIX}%")).delete(
         synchronize_session=False
@@ -5,10 +5,28 @@ from __future__ import annotations
 import json
 import os
 import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
-import httpx
+from services.assessment_batcher import AssessmentBatcher, get_batch_max_size
+from services.assessment_cache import AssessmentCache, fingerprint
+from services.http_clients import UPSTREAM_LLM, http_clients
+from services.metrics_service import metrics
+
+# 当前上下文中的评估是否紧急；非紧急评估走微批
+_assess_urgent: ContextVar[bool] = ContextVar("ai_assess_urgent", default=True)
+
+
+@contextmanager
+def non_urgent_assessment() -> Iterator[None]:
+    """块内（及块内创建的任务中）的 assess_threat 调用走微批评估"""
+    token = _assess_urgent.set(False)
+    try:
+        yield
+    finally:
+        _assess_urgent.reset(token)
 
 
 def _bool_env(name: str, default: bool = False) -> bool:
@@ -101,6 +119,9 @@ def _default_report_markdown(report_type: str, data: Dict[str, Any], reason: str
     )
 
 
+CHAT_SYSTEM_PROMPT = "你是 SOC 安全运营助手，回答要结合上下文，优先给出可执行建议。"
+
+
 def _default_chat_reply(message: str, context: Any, reason: str) -> str:
     context_text = str(context or "无上下文")
     msg = _truncate(message, 300)
@@ -167,10 +188,10 @@ class LocalLLMClient:
         if system:
             payload["system"] = system
 
-        async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-            response = await client.post(endpoint, headers=self._headers(), json=payload)
-            response.raise_for_status()
-            body = response.json()
+        client = http_clients.get(UPSTREAM_LLM)
+        response = await client.post(endpoint, headers=self._headers(), json=payload, timeout=self.timeout_seconds)
+        response.raise_for_status()
+        body = response.json()
 
         if isinstance(body.get("response"), str):
             return body["response"]
@@ -198,10 +219,10 @@ class LocalLLMClient:
             "temperature": 0.2,
         }
 
-        async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-            response = await client.post(endpoint, headers=self._headers(), json=payload)
-            response.raise_for_status()
-            body = response.json()
+        client = http_clients.get(UPSTREAM_LLM)
+        response = await client.post(endpoint, headers=self._headers(), json=payload, timeout=self.timeout_seconds)
+        response.raise_for_status()
+        body = response.json()
 
         choices = body.get("choices")
         if isinstance(choices, list) and choices:
@@ -214,6 +235,78 @@ class LocalLLMClient:
                     return first["text"]
         raise ValueError("invalid_openai_response")
 
+    async def _stream_ollama(self, prompt: str, system: Optional[str]) -> AsyncIterator[str]:
+        endpoint = f"{self.base_url.rstrip('/')}/api/generate"
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+        }
+        if system:
+            payload["system"] = system
+
+        client = http_clients.get(UPSTREAM_LLM)
+        async with client.stream(
+            "POST", endpoint, headers=self._headers(), json=payload, timeout=self.timeout_seconds
+        ) as response:
+            response.raise_for_status()
+            # Ollama 流式响应为 NDJSON：每行 {"response": "...", "done": false}
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ValueError(f"ollama_stream_error:{chunk['error']}")
+                token = chunk.get("response")
+                if isinstance(token, str) and token:
+                    yield token
+                if chunk.get("done"):
+                    return
+
+    async def _stream_openai_compatible(self, prompt: str, system: Optional[str]) -> AsyncIterator[str]:
+        endpoint = self._openai_endpoint()
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.2,
+            "stream": True,
+        }
+
+        client = http_clients.get(UPSTREAM_LLM)
+        async with client.stream(
+            "POST", endpoint, headers=self._headers(), json=payload, timeout=self.timeout_seconds
+        ) as response:
+            response.raise_for_status()
+            # OpenAI 兼容流式响应为 SSE：data: {...choices[0].delta.content...}，以 data: [DONE] 结束
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                choices = chunk.get("choices")
+                if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+                    continue
+                delta = choices[0].get("delta")
+                token = delta.get("content") if isinstance(delta, dict) else choices[0].get("text")
+                if isinstance(token, str) and token:
+                    yield token
+
+    def generate_stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """逐 token 产出模型输出；调用方关闭生成器即断开上游连接，模型侧随之停止生成"""
+        provider = self.provider.strip().lower()
+        if provider in {"ollama", "localai", "local"}:
+            return self._stream_ollama(prompt, system)
+        return self._stream_openai_compatible(prompt, system)
+
     async def generate(self, prompt: str, system: Optional[str] = None) -> str:
         provider = self.provider.strip().lower()
         if provider in {"ollama", "localai", "local"}:
@@ -234,6 +327,8 @@ class AIEngine:
 
     def __init__(self) -> None:
         self.llm_client = LocalLLMClient()
+        self.assessment_cache = AssessmentCache()
+        self.assessment_batcher = AssessmentBatcher(self)
 
     async def assess_threat(
         self,
@@ -243,14 +338,113 @@ class AIEngine:
         history: Optional[str] = None,
         trace_id: Optional[str] = None,
     ) -> Dict[str, Any]:
+        """同一 (ip, 攻击类型, 攻击次数分桶, history) 的评估复用缓存结果，并发请求合并为一次模型调用"""
+        batched = not _assess_urgent.get() and get_batch_max_size() > 1
+        assess = self.assessment_batcher.submit if batched else self._assess_threat_uncached
+        result = await self.assessment_cache.get_or_compute(
+            fingerprint(ip, attack_type, attack_count, history),
+            lambda: assess(ip, attack_type, attack_count, history),
+        )
+        return {**result, "trace_id": trace_id}
+
+    async def assess_threats_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        一次模型调用评估多条事件。items 为 {"id", "ip", "attack_type", "attack_count", "history"}；
+        返回 id -> 评估结果，响应中缺失或不合法的条目为 None（由调用方逐条重评）。
+        模型不可达时所有条目直接返回降级结果。
+        """
+        events = [
+            {
+                "id": item["id"],
+                "ip": item["ip"],
+                "attack_type": item["attack_type"],
+                "attack_count": item["attack_count"],
+                "history": item.get("history") or "none",
+            }
+            for item in items
+        ]
+        prompt = (
+            "你是安全分析助手。请逐条评估下面的威胁事件并严格输出 JSON:\n"
+            "{\n"
+            '  "results": [\n'
+            '    {"id": "事件 id", "score": 0-100, "reason": "简要原因", "action_suggest": "BLOCK 或 MONITOR"}\n'
+            "  ]\n"
+            "}\n"
+            "每个事件输出一项，id 与输入一致。\n\n"
+            f"events={json.dumps(events, ensure_ascii=False)}\n"
+        )
+
+        metrics.inc("ai_assess_batch_calls_total")
+        metrics.inc("ai_assess_batch_events_total", len(items))
+        try:
+            body = await self.llm_client.generate_json(
+                prompt,
+                system="你是 SOC 风险评估模型，只输出 JSON，不输出多余文本。",
+            )
+        except ValueError:
+            # 响应不是合法 JSON 对象：全部逐条重评
+            return {item["id"]: None for item in items}
+        except Exception as exc:
+            return {
+                item["id"]: self._fallback_assessment(
+                    item["ip"], item["attack_type"], item["attack_count"],
+                    f"llm_assess_failed:{exc.__class__.__name__}",
+                )
+                for item in items
+            }
+
+        parsed: Dict[str, Dict[str, Any]] = {}
+        entries = body.get("results")
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict) or entry.get("id") is None:
+                continue
+            try:
+                int(entry.get("score"))
+            except (TypeError, ValueError):
+                continue
+            parsed[str(entry["id"])] = entry
+
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        for item in items:
+            entry = parsed.get(item["id"])
+            if entry is None:
+                results[item["id"]] = None
+                continue
+            score = _clamp_score(entry.get("score"))
+            reason = entry.get("reason") or f"规则降级评分: {item['ip']} 在 {item['attack_type']} 下出现 {item['attack_count']} 次行为"
+            results[item["id"]] = {
+                "score": score,
+                "reason": _truncate(str(reason), 300),
+                "action_suggest": _normalize_action(entry.get("action_suggest"), score),
+                "degraded": False,
+                "fallback_reason": None,
+                "provider": self.llm_client.provider,
+                "model": self.llm_client.model,
+            }
+        return results
+
+    def _fallback_assessment(self, ip: str, attack_type: str, attack_count: int, reason: str) -> Dict[str, Any]:
         fallback_score = _clamp_score(50 + max(1, _safe_int(attack_count, 1)) * 10)
-        fallback_action = "BLOCK" if fallback_score >= 80 else "MONITOR"
-        fallback = {
+        return {
             "score": fallback_score,
             "reason": f"规则降级评分: {ip} 在 {attack_type} 下出现 {attack_count} 次行为",
-            "action_suggest": fallback_action,
+            "action_suggest": "BLOCK" if fallback_score >= 80 else "MONITOR",
+            "degraded": True,
+            "fallback_reason": reason,
+            "provider": self.llm_client.provider,
+            "model": self.llm_client.model,
         }
 
+    async def _assess_threat_uncached(
+        self,
+        ip: str,
+        attack_type: str,
+        attack_count: int,
+        history: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        fallback_score = _clamp_score(50 + max(1, _safe_int(attack_count, 1)) * 10)
+        fallback_reason = f"规则降级评分: {ip} 在 {attack_type} 下出现 {attack_count} 次行为"
+
         prompt = (
             "你是安全分析助手。请评估下面威胁事件并严格输出 JSON:\n"
             "{\n"
@@ -271,7 +465,7 @@ class AIEngine:
             )
             score = _clamp_score(result.get("score"), fallback_score)
             action = _normalize_action(result.get("action_suggest"), score)
-            reason = _truncate(str(result.get("reason") or fallback["reason"]), 300)
+            reason = _truncate(str(result.get("reason") or fallback_reason), 300)
             return {
                 "score": score,
                 "reason": reason,
@@ -280,17 +474,11 @@ class AIEngine:
                 "fallback_reason": None,
                 "provider": self.llm_client.provider,
                 "model": self.llm_client.model,
-                "trace_id": trace_id,
             }
         except Exception as exc:
-            return {
-                **fallback,
-                "degraded": True,
-                "fallback_reason": f"llm_assess_failed:{exc.__class__.__name__}",
-                "provider": self.llm_client.provider,
-                "model": self.llm_client.model,
-                "trace_id": trace_id,
-            }
+            return self._fallback_assessment(
+                ip, attack_type, attack_count, f"llm_assess_failed:{exc.__class__.__name__}"
+            )
 
     async def analyze_scan_result(
         self,
@@ -375,29 +563,29 @@ class AIEngine:
             )
         return result.as_dict() if with_meta else result.text
 
-    async def chat(
-        self,
-        message: str,
-        context: Optional[Any] = None,
-        trace_id: Optional[str] = None,
-        with_meta: bool = False,
-    ) -> Any:
+    @staticmethod
+    def _chat_prompt(message: str, context: Optional[Any]) -> str:
         context_text = ""
         if context is not None:
             if isinstance(context, str):
                 context_text = context
             else:
                 context_text = json.dumps(context, ensure_ascii=False)
-
-        system_prompt = (
-            "你是 SOC 安全运营助手，回答要结合上下文，优先给出可执行建议。"
-        )
-        prompt = message
         if context_text:
-            prompt = f"上下文:\n{_truncate(context_text, 4000)}\n\n用户问题:\n{message}"
+            return f"上下文:\n{_truncate(context_text, 4000)}\n\n用户问题:\n{message}"
+        return message
+
+    async def chat(
+        self,
+        message: str,
+        context: Optional[Any] = None,
+        trace_id: Optional[str] = None,
+        with_meta: bool = False,
+    ) -> Any:
+        prompt = self._chat_prompt(message, context)
 
         try:
-            text = _truncate(await self.llm_client.generate(prompt, system=system_prompt), 8000).strip()
+            text = _truncate(await self.llm_client.generate(prompt, system=CHAT_SYSTEM_PROMPT), 8000).strip()
             if not text:
                 raise ValueError("empty_chat_response")
             result = AIRunResult(
@@ -420,6 +608,55 @@ class AIEngine:
             )
         return result.as_dict() if with_meta else result.text
 
+    async def chat_stream(
+        self,
+        message: str,
+        context: Optional[Any] = None,
+        trace_id: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式对话：逐个产出 {"type": "token", "text": ...}，最后产出 {"type": "done", **AIRunResult}。
+        首个 token 前失败整体降级为规则化回复；中途失败保留已输出内容并标记 degraded。
+        调用方提前关闭本生成器时，上游模型连接随之关闭。
+        """
+        prompt = self._chat_prompt(message, context)
+        parts: List[str] = []
+        size = 0
+        fallback_reason: Optional[str] = None
+        stream = self.llm_client.generate_stream(prompt, system=CHAT_SYSTEM_PROMPT)
+        try:
+            async for token in stream:
+                if size + len(token) > 8000:
+                    token = token[: 8000 - size]
+                if token:
+                    parts.append(token)
+                    size += len(token)
+                    yield {"type": "token", "text": token}
+                if size >= 8000:
+                    break
+            if not "".join(parts).strip():
+                raise ValueError("empty_chat_response")
+        except Exception as exc:
+            if parts:
+                fallback_reason = f"llm_chat_stream_interrupted:{exc.__class__.__name__}"
+            else:
+                fallback_reason = f"llm_chat_failed:{exc.__class__.__name__}"
+                reply = _default_chat_reply(message, context, fallback_reason)
+                parts = [reply]
+                yield {"type": "token", "text": reply}
+        finally:
+            await stream.aclose()
+
+        result = AIRunResult(
+            text="".join(parts).strip(),
+            degraded=fallback_reason is not None,
+            fallback_reason=fallback_reason,
+            provider=self.llm_client.provider,
+            model=self.llm_client.model,
+            trace_id=trace_id,
+        )
+        yield {"type": "done", **result.as_dict()}
+
 
 ai_engine = AIEngine()
 
@@ -0,0 +1,129 @@
+"""
+AI 威胁评估微批。
+非紧急的评估请求在 AI_ASSESS_BATCH_WINDOW_MS 窗口内累积，或累积到 AI_ASSESS_BATCH_MAX_SIZE 条时，
+合并为一次 generate_json 调用（一个提示词评估多条事件，按事件 id 返回评分数组）；
+响应中缺失或格式不合法的条目回退为逐条评估。
+"""
+import asyncio
+import itertools
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WINDOW_MS = 200
+DEFAULT_BATCH_MAX_SIZE = 16
+
+
+def get_batch_window_seconds() -> float:
+    try:
+        value = float(os.getenv("AI_ASSESS_BATCH_WINDOW_MS", str(DEFAULT_BATCH_WINDOW_MS)))
+    except ValueError:
+        value = DEFAULT_BATCH_WINDOW_MS
+    return max(0.0, value) / 1000
+
+
+def get_batch_max_size() -> int:
+    """1 表示关闭微批（逐条评估）"""
+    try:
+        value = int(os.getenv("AI_ASSESS_BATCH_MAX_SIZE", str(DEFAULT_BATCH_MAX_SIZE)))
+    except ValueError:
+        value = DEFAULT_BATCH_MAX_SIZE
+    return max(1, min(100, value))
+
+
+@dataclass
+class _PendingBatch:
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    futures: Dict[str, asyncio.Future] = field(default_factory=dict)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class AssessmentBatcher:
+    """累积评估请求并按批调用 engine.assess_threats_batch"""
+
+    def __init__(self, engine: Any):
+        self.engine = engine
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Optional[_PendingBatch] = None
+        self._inflight: set = set()
+
+    async def submit(
+        self,
+        ip: str,
+        attack_type: str,
+        attack_count: int,
+        history: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 换事件循环（测试、脚本多次 asyncio.run）时旧批次已随旧循环失效
+            self._loop = loop
+            self._pending = None
+            self._inflight = set()
+
+        batch = self._pending
+        if batch is None:
+            batch = _PendingBatch()
+            self._pending = batch
+            batch.timer = loop.call_later(get_batch_window_seconds(), self._flush, batch)
+
+        event_id = f"e{next(self._ids)}"
+        future = loop.create_future()
+        batch.items.append({
+            "id": event_id,
+            "ip": ip,
+            "attack_type": attack_type,
+            "attack_count": attack_count,
+            "history": history,
+        })
+        batch.futures[event_id] = future
+        if len(batch.items) >= get_batch_max_size():
+            self._flush(batch)
+        return await asyncio.shield(future)
+
+    def _flush(self, batch: _PendingBatch) -> None:
+        if self._pending is batch:
+            self._pending = None
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: _PendingBatch) -> None:
+        try:
+            results = await self.engine.assess_threats_batch(batch.items)
+        except Exception as e:
+            logger.warning(f"AI 批量评估异常，回退逐条评估: {e}")
+            results = {}
+
+        missing = [item for item in batch.items if results.get(item["id"]) is None]
+        if missing:
+            metrics.inc("ai_assess_batch_fallback_total", len(missing))
+            singles = await asyncio.gather(
+                *[
+                    self.engine._assess_threat_uncached(
+                        item["ip"], item["attack_type"], item["attack_count"], item["history"]
+                    )
+                    for item in missing
+                ],
+                return_exceptions=True,
+            )
+            for item, single in zip(missing, singles):
+                results[item["id"]] = single
+
+        for event_id, future in batch.futures.items():
+            if future.done():
+                continue
+            result = results.get(event_id)
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,191 @@
+"""
+AI 威胁评估结果缓存。
+同一攻击者的事件按 (ip, 攻击类型, 攻击次数分桶, 历史摘要哈希) 指纹归并：TTL 内命中直接返回缓存结果；
+未命中时同一指纹同时只发起一次模型调用，其余请求等待同一结果（single-flight）。
+按 LRU 淘汰，条目数与估算内存均有上限；降级（模型调用失败）的结果只缓存较短时间。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.metrics_service import metrics
+
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_FAILURE_TTL_SECONDS = 10.0
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+Fingerprint = Tuple[str, str, int, str]
+
+
+def get_ttl_seconds() -> float:
+    """0 表示关闭缓存（仍合并并发请求）"""
+    try:
+        value = float(os.getenv("AI_ASSESS_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_TTL_SECONDS
+    return max(0.0, value)
+
+
+def get_failure_ttl_seconds() -> float:
+    try:
+        value = float(os.getenv("AI_ASSESS_CACHE_FAILURE_TTL_SECONDS", str(DEFAULT_FAILURE_TTL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_FAILURE_TTL_SECONDS
+    return max(0.0, value)
+
+
+def get_max_entries() -> int:
+    try:
+        value = int(os.getenv("AI_ASSESS_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES)))
+    except ValueError:
+        value = DEFAULT_MAX_ENTRIES
+    return max(1, value)
+
+
+def get_max_bytes() -> int:
+    try:
+        value = int(os.getenv("AI_ASSESS_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+    except ValueError:
+        value = DEFAULT_MAX_BYTES
+    return max(1024, value)
+
+
+def attack_count_bucket(attack_count: Any) -> int:
+    """攻击次数按 2 的幂分桶：1 / 2-3 / 4-7 / 8-15 ..."""
+    try:
+        count = int(attack_count)
+    except (TypeError, ValueError):
+        count = 1
+    return max(1, count).bit_length()
+
+
+def fingerprint(ip: str, attack_type: str, attack_count: Any, history: Optional[str] = None) -> Fingerprint:
+    """history 参与提示词，不同历史的评估结果不能互相复用"""
+    return (
+        str(ip or "").strip().lower(),
+        str(attack_type or "").strip().lower(),
+        attack_count_bucket(attack_count),
+        hashlib.sha256(history.encode("utf-8")).hexdigest()[:16] if history else "",
+    )
+
+
+class AssessmentCache:
+    """评估结果 TTL + LRU 缓存与同指纹请求合并"""
+
+    def __init__(self):
+        self._entries: OrderedDict[Fingerprint, Tuple[float, int, Dict[str, Any]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Fingerprint, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, key: Fingerprint) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: Fingerprint, value: Dict[str, Any], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        size = len(json.dumps(value, ensure_ascii=False, default=str)) + sum(len(str(part)) for part in key)
+        max_bytes = get_max_bytes()
+        if size > max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            max_entries = get_max_entries()
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                metrics.inc("ai_assess_cache_evicted_total")
+            self._update_gauges()
+
+    def _remove(self, key: Fingerprint) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("ai_assess_cache_entries", len(self._entries))
+        metrics.set_gauge("ai_assess_cache_bytes", self._bytes)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._update_gauges()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            size = self._bytes
+        return {
+            "entries": entries,
+            "bytes": size,
+            "inflight": len(self._inflight),
+            "max_entries": get_max_entries(),
+            "max_bytes": get_max_bytes(),
+            "ttl_seconds": get_ttl_seconds(),
+            "hits": metrics.get_counter("ai_assess_cache_hit_total"),
+            "misses": metrics.get_counter("ai_assess_cache_miss_total"),
+            "coalesced": metrics.get_counter("ai_assess_cache_coalesced_total"),
+            "evicted": metrics.get_counter("ai_assess_cache_evicted_total"),
+        }
+
+    async def get_or_compute(
+        self,
+        key: Fingerprint,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """命中返回缓存；未命中时同指纹只执行一次 compute，结果按是否降级设置 TTL"""
+        cached = self.get(key)
+        if cached is not None:
+            metrics.inc("ai_assess_cache_hit_total")
+            return cached
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 换事件循环（测试、脚本多次 asyncio.run）时旧循环上的在途任务已失效
+            self._loop = loop
+            self._inflight = {}
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc("ai_assess_cache_coalesced_total")
+        else:
+            metrics.inc("ai_assess_cache_miss_total")
+            task = loop.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+        # 发起方被取消不影响同指纹的其他等待方
+        return await asyncio.shield(task)
+
+    async def _compute(
+        self,
+        key: Fingerprint,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        try:
+            value = await compute()
+            ttl = get_ttl_seconds()
+            if value.get("degraded"):
+                ttl = min(ttl, get_failure_ttl_seconds())
+            self.put(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
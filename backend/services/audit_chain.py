@@ -0,0 +1,306 @@
+"""
+审计日志哈希链写入器。
+业务写审计时只插入原始记录（不查询链头、不持锁）；由进程内单一写入器按 id 顺序批量封链：
+分配 chain_seq，计算 prev_hash / integrity_hash 并批量回写。每 AUDIT_CHECKPOINT_INTERVAL 条
+写入一个 HMAC 签名检查点，校验时从最近的检查点增量向后校验。
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.database import AuditCheckpoint, AuditLog, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+GENESIS_HASH = "GENESIS"
+DEFAULT_SEAL_BATCH_SIZE = 500
+DEFAULT_CHECKPOINT_INTERVAL = 1000
+SEAL_INTERVAL_SECONDS = 1.0
+# 唤醒后稍作等待，把同一时刻的写入合并成一批
+SEAL_COALESCE_SECONDS = 0.05
+SEAL_MAX_ATTEMPTS = 3
+VERIFY_CHUNK_SIZE = 5000
+# 接口未指定 limit 时全量校验的默认上限，避免一次请求扫完整张审计表
+DEFAULT_VERIFY_FULL_LIMIT = 100000
+
+
+def compute_hash(
+    actor: str, action: str, target: str, result: str,
+    trace_id: str, created_at: str, prev_hash: str,
+) -> str:
+    """SHA-256 哈希链：当前记录内容 + 前一条哈希 -> 不可篡改"""
+    payload = f"{actor}|{action}|{target}|{result}|{trace_id}|{created_at}|{prev_hash}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _iso(value: Optional[datetime]) -> str:
+    return value.isoformat() if value else ""
+
+
+def get_seal_batch_size() -> int:
+    try:
+        value = int(os.getenv("AUDIT_SEAL_BATCH_SIZE", str(DEFAULT_SEAL_BATCH_SIZE)))
+    except ValueError:
+        value = DEFAULT_SEAL_BATCH_SIZE
+    return max(1, value)
+
+
+def get_checkpoint_interval() -> int:
+    try:
+        value = int(os.getenv("AUDIT_CHECKPOINT_INTERVAL", str(DEFAULT_CHECKPOINT_INTERVAL)))
+    except ValueError:
+        value = DEFAULT_CHECKPOINT_INTERVAL
+    return max(1, value)
+
+
+def get_verify_full_limit() -> int:
+    try:
+        value = int(os.getenv("AUDIT_VERIFY_FULL_LIMIT", str(DEFAULT_VERIFY_FULL_LIMIT)))
+    except ValueError:
+        value = DEFAULT_VERIFY_FULL_LIMIT
+    return max(1, value)
+
+
+def _checkpoint_key() -> bytes:
+    key = os.getenv("AUDIT_CHECKPOINT_KEY") or os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
+    return key.encode("utf-8")
+
+
+def sign_checkpoint(chain_seq: int, audit_log_id: int, chain_hash: str) -> str:
+    payload = f"{chain_seq}|{audit_log_id}|{chain_hash}".encode("utf-8")
+    return hmac.new(_checkpoint_key(), payload, hashlib.sha256).hexdigest()
+
+
+class AuditChainWriter:
+    """单写入器封链：进程内串行，跨进程依赖 chain_seq 唯一索引做乐观并发"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def notify(self, db: Session) -> None:
+        """新审计记录已提交：后台写入器运行时唤醒它，否则就地封链"""
+        if self.running and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+            return
+        try:
+            self.seal_pending(bind=db.get_bind())
+        except Exception as e:
+            logger.error(f"审计哈希链封链失败: {e}", exc_info=True)
+
+    def seal_pending(self, bind: Optional[Engine] = None) -> int:
+        """封链所有未封链记录，返回本次封链条数"""
+        batch_size = get_seal_batch_size()
+        interval = get_checkpoint_interval()
+        session = Session(bind=bind) if bind is not None else SessionLocal()
+        sealed = 0
+        attempts = 0
+        try:
+            with self._lock:
+                while True:
+                    try:
+                        count = self._seal_batch(session, batch_size, interval)
+                    except IntegrityError:
+                        # 其他进程抢先封了同一段链：回滚后基于新链头重试
+                        session.rollback()
+                        attempts += 1
+                        if attempts >= SEAL_MAX_ATTEMPTS:
+                            raise
+                        continue
+                    sealed += count
+                    if count < batch_size:
+                        return sealed
+        finally:
+            session.close()
+
+    def _seal_batch(self, session: Session, batch_size: int, interval: int) -> int:
+        table = AuditLog.__table__
+        head = session.execute(
+            select(table.c.chain_seq, table.c.integrity_hash)
+            .where(table.c.chain_seq.isnot(None))
+            .order_by(table.c.chain_seq.desc())
+            .limit(1)
+        ).first()
+        seq, prev_hash = (head.chain_seq, head.integrity_hash) if head else (0, GENESIS_HASH)
+
+        rows = session.execute(
+            select(
+                table.c.id, table.c.actor, table.c.action, table.c.target,
+                table.c.result, table.c.trace_id, table.c.created_at,
+            )
+            .where(table.c.integrity_hash.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return 0
+
+        updates: List[Dict[str, Any]] = []
+        checkpoints: List[Dict[str, Any]] = []
+        for row in rows:
+            seq += 1
+            integrity_hash = compute_hash(
+                row.actor, row.action, row.target, row.result,
+                row.trace_id, _iso(row.created_at), prev_hash,
+            )
+            updates.append({"_id": row.id, "_seq": seq, "_prev": prev_hash, "_hash": integrity_hash})
+            if seq % interval == 0:
+                checkpoints.append({
+                    "chain_seq": seq,
+                    "audit_log_id": row.id,
+                    "chain_hash": integrity_hash,
+                    "signature": sign_checkpoint(seq, row.id, integrity_hash),
+                })
+            prev_hash = integrity_hash
+
+        conn = session.connection()
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(
+                chain_seq=bindparam("_seq"),
+                prev_hash=bindparam("_prev"),
+                integrity_hash=bindparam("_hash"),
+            ),
+            updates,
+        )
+        if checkpoints:
+            conn.execute(insert(AuditCheckpoint.__table__), checkpoints)
+        session.commit()
+        return len(rows)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 退出前封完剩余记录
+        await asyncio.to_thread(self.seal_pending)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=SEAL_INTERVAL_SECONDS)
+                await asyncio.sleep(SEAL_COALESCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.seal_pending)
+            except Exception as e:
+                logger.error(f"审计哈希链封链失败: {e}", exc_info=True)
+
+    def verify(self, db: Session, limit: Optional[int] = None, full: bool = False) -> Dict[str, Any]:
+        """
+        校验哈希链完整性。默认从最近检查点开始增量校验，full=True 时从创世记录校验并核对沿途检查点。
+        返回 {"valid", "checked", "broken_at", "from_seq", "head_seq", "truncated"}
+        """
+        self.seal_pending(bind=db.get_bind())
+        table = AuditLog.__table__
+
+        result: Dict[str, Any] = {"valid": True, "checked": 0, "broken_at": None, "from_seq": 0, "head_seq": 0}
+        prev_seq, prev_hash = 0, GENESIS_HASH
+
+        if not full:
+            checkpoint = db.query(AuditCheckpoint).order_by(AuditCheckpoint.chain_seq.desc()).first()
+            if checkpoint is not None:
+                anchor = db.execute(
+                    select(table.c.id, table.c.integrity_hash).where(table.c.chain_seq == checkpoint.chain_seq)
+                ).first()
+                if not self._checkpoint_valid(checkpoint, anchor):
+                    result.update(valid=False, broken_at=checkpoint.audit_log_id)
+                    return result
+                prev_seq, prev_hash = checkpoint.chain_seq, checkpoint.chain_hash
+        result["from_seq"] = prev_seq
+        result["head_seq"] = prev_seq
+
+        while limit is None or result["checked"] < limit:
+            chunk_size = VERIFY_CHUNK_SIZE if limit is None else min(VERIFY_CHUNK_SIZE, limit - result["checked"])
+            rows = db.execute(
+                select(
+                    table.c.id, table.c.actor, table.c.action, table.c.target, table.c.result,
+                    table.c.trace_id, table.c.created_at, table.c.prev_hash,
+                    table.c.integrity_hash, table.c.chain_seq,
+                )
+                .where(table.c.chain_seq > prev_seq)
+                .order_by(table.c.chain_seq)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            checkpoints = {}
+            if full:
+                checkpoints = {
+                    cp.chain_seq: cp
+                    for cp in db.query(AuditCheckpoint).filter(
+                        AuditCheckpoint.chain_seq > prev_seq,
+                        AuditCheckpoint.chain_seq <= rows[-1].chain_seq,
+                    )
+                }
+
+            for row in rows:
+                result["checked"] += 1
+                expected_hash = compute_hash(
+                    row.actor, row.action, row.target, row.result,
+                    row.trace_id, _iso(row.created_at), prev_hash,
+                )
+                # 序号断档（记录被删除）、前驱不符或内容被改均视为断链
+                if (
+                    row.chain_seq != prev_seq + 1
+                    or row.prev_hash != prev_hash
+                    or row.integrity_hash != expected_hash
+                ):
+                    result.update(valid=False, broken_at=row.id)
+                    return result
+                checkpoint = checkpoints.get(row.chain_seq)
+                if checkpoint is not None and not self._checkpoint_valid(checkpoint, row):
+                    result.update(valid=False, broken_at=row.id)
+                    return result
+                prev_seq, prev_hash = row.chain_seq, row.integrity_hash
+                result["head_seq"] = prev_seq
+
+        # 达到 limit 时可能仍有未校验的记录，可从 head_seq 之后继续
+        result["truncated"] = limit is not None and result["checked"] >= limit
+        return result
+
+    @staticmethod
+    def _checkpoint_valid(checkpoint: AuditCheckpoint, anchor) -> bool:
+        if anchor is None:
+            return False
+        expected = sign_checkpoint(checkpoint.chain_seq, checkpoint.audit_log_id, checkpoint.chain_hash)
+        return (
+            hmac.compare_digest(expected, checkpoint.signature or "")
+            and anchor.id == checkpoint.audit_log_id
+            and anchor.integrity_hash == checkpoint.chain_hash
+        )
+
+
+# 全局单例
+audit_chain = AuditChainWriter()
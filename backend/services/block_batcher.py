@@ -0,0 +1,170 @@
+"""
+MCP 封禁/解封合批。
+同一设备、同一动作的单 IP 请求在 MCP_BATCH_WINDOW_MS 窗口内合并为一次 block_ips / unblock_ips 调用
+（设备侧一次 ACL 更新），达到 MCP_BATCH_MAX_SIZE 时立即下发；调用返回后按 IP 把结果分发回各个等待方。
+同一批内重复的 IP 只下发一次，共享同一结果。返回值与 mcp_client.block_ip 的结果结构一致。
+窗口内只有一个 IP 时直接走单 IP 调用；审计按 IP 记录，trace_id 取最先提交该 IP 的调用方。
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Tuple
+
+from services.mcp_client import MCPClient, _classify_error_retryable, _extract_batch_items, mcp_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WINDOW_MS = 50
+DEFAULT_BATCH_MAX_SIZE = 200
+
+BatchKey = Tuple[str, Optional[int], str]
+
+
+def get_batch_window_seconds() -> float:
+    try:
+        value = float(os.getenv("MCP_BATCH_WINDOW_MS", str(DEFAULT_BATCH_WINDOW_MS)))
+    except ValueError:
+        value = DEFAULT_BATCH_WINDOW_MS
+    return max(0.0, value) / 1000
+
+
+def get_batch_max_size() -> int:
+    try:
+        value = int(os.getenv("MCP_BATCH_MAX_SIZE", str(DEFAULT_BATCH_MAX_SIZE)))
+    except ValueError:
+        value = DEFAULT_BATCH_MAX_SIZE
+    return max(1, value)
+
+
+@dataclass
+class _PendingBatch:
+    waiters: Dict[str, asyncio.Future] = field(default_factory=dict)
+    trace_ids: Dict[str, str] = field(default_factory=dict)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MCPBlockBatcher:
+    """按 (动作, 设备, 操作人) 合批下发封禁/解封"""
+
+    def __init__(self, client: Optional[MCPClient] = None):
+        self.client = client or mcp_client
+        self.calls = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[BatchKey, _PendingBatch] = {}
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def block(
+        self, ip: str, device_id: Optional[int] = None, operator: str = "system", trace_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._submit("block", ip, device_id, operator, trace_id)
+
+    async def unblock(
+        self, ip: str, device_id: Optional[int] = None, operator: str = "system", trace_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._submit("unblock", ip, device_id, operator, trace_id)
+
+    async def _submit(
+        self, action: str, ip: str, device_id: Optional[int], operator: str, trace_id: Optional[str]
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 换事件循环（测试、脚本多次 asyncio.run）时旧批次已随旧循环失效
+            self._loop = loop
+            self._pending = {}
+            self._inflight = set()
+
+        key = (action, device_id, operator)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch()
+            self._pending[key] = batch
+            batch.timer = loop.call_later(get_batch_window_seconds(), self._flush, key, batch)
+
+        future = batch.waiters.get(ip)
+        if future is None:
+            future = loop.create_future()
+            batch.waiters[ip] = future
+            if trace_id:
+                batch.trace_ids[ip] = trace_id
+            if len(batch.waiters) >= get_batch_max_size():
+                self._flush(key, batch)
+        # 同批重复 IP 共享 future，单个等待方被取消不影响其他方
+        return await asyncio.shield(future)
+
+    def _flush(self, key: BatchKey, batch: _PendingBatch) -> None:
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        task = asyncio.get_running_loop().create_task(self._dispatch(key, batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, key: BatchKey, batch: _PendingBatch) -> None:
+        action, device_id, operator = key
+        ips = list(batch.waiters)
+        self.calls += 1
+        try:
+            if len(ips) == 1:
+                single = self.client.block_ip if action == "block" else self.client.unblock_ip
+                result = await single(ips[0], device_id, operator=operator, trace_id=batch.trace_ids.get(ips[0]))
+                self._resolve_single(batch, ips[0], result)
+                return
+            if action == "block":
+                result = await self.client.block_ips(
+                    ips, device_id=device_id, operator=operator, trace_ids=batch.trace_ids
+                )
+            else:
+                result = await self.client.unblock_ips(
+                    ips, device_id=device_id, operator=operator, trace_ids=batch.trace_ids
+                )
+        except Exception as e:
+            logger.warning(f"MCP 批量{action}调用异常: {e}")
+            error_msg = str(e)[:500]
+            result = {"success": False, "error": error_msg, "retryable": _classify_error_retryable(error_msg)}
+
+        tool_name = f"{action}_ip"
+        items = {item.get("ip"): item for item in _extract_batch_items(result)} if result.get("success") else {}
+        for ip, future in batch.waiters.items():
+            if future.done():
+                continue
+            if not result.get("success"):
+                future.set_result({
+                    "success": False,
+                    "error": result.get("error") or "mcp_batch_failed",
+                    "tool": tool_name,
+                    "retryable": result.get("retryable", True),
+                })
+                continue
+            item = items.get(ip)
+            if item is None:
+                future.set_result({
+                    "success": False,
+                    "error": "missing result in batch response",
+                    "tool": tool_name,
+                    "retryable": True,
+                })
+            elif item.get("success"):
+                future.set_result({"success": True, "result": item, "tool": tool_name})
+            else:
+                error_msg = str(item.get("error") or "mcp_call_failed")
+                retryable = item.get("retryable")
+                future.set_result({
+                    "success": False,
+                    "error": error_msg,
+                    "tool": tool_name,
+                    "retryable": _classify_error_retryable(error_msg) if retryable is None else bool(retryable),
+                })
+
+
+    @staticmethod
+    def _resolve_single(batch: _PendingBatch, ip: str, result: Dict[str, Any]) -> None:
+        future = batch.waiters[ip]
+        if not future.done():
+            future.set_result(result)
+
+
+# 全局单例
+block_batcher = MCPBlockBatcher()
@@ -6,29 +6,62 @@ import asyncio
 import hashlib
 import json
 import logging
+import os
+import re
+import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
-import urllib3
-import requests
+from typing import AsyncIterator, Dict, List, Optional, Any, Set
+import httpx
 from sqlalchemy.orm import Session
 
 from core.database import ThreatEvent, CollectorConfig, SessionLocal
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from services.metrics_service import metrics
+from services.threat_event_store import event_key, find_existing_event_ids, insert_events_ignore_conflicts
 
 logger = logging.getLogger(__name__)
 
+HFISH_PAGE_SIZE = 1000
+HFISH_MAX_PAGES_PER_SYNC = 50
+HFISH_CURSOR_KEY = "sync_cursor"
+HFISH_MAX_BACKOFF_SECONDS = 1800
+HFISH_DOWN_AFTER_FAILURES = 3
+
+# 默认源沿用历史 collector_type="hfish"，其余源为 "hfish:<name>"
+DEFAULT_SOURCE_NAME = "default"
+SOURCE_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+
+def _collector_type_for(source_name: str) -> str:
+    return "hfish" if source_name == DEFAULT_SOURCE_NAME else f"hfish:{source_name}"
+
 
 class HFishCollector:
-    """HFish 数据采集器"""
+    """HFish 数据采集器（一个实例对应一个 HFish 管理端）"""
     
-    def __init__(self):
+    def __init__(self, source_name: str = DEFAULT_SOURCE_NAME):
+        self.source_name = source_name
+        self.collector_type = _collector_type_for(source_name)
         self.host_port: Optional[str] = None
         self.api_base_url: Optional[str] = None
         self.api_key: Optional[str] = None
         self.sync_interval: int = 60
         self.enabled: bool = False
+        self.cursor: Optional[int] = None
         self._config_loaded: bool = False
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # 同一源同一时刻只允许一次同步，避免并发运行把游标写回旧值
+        self._sync_lock = asyncio.Lock()
+        # 源已被删除：不再写游标（否则会重新生成配置行），同步结束后关闭连接池
+        self.retired: bool = False
+
+        # 调度状态：退避与健康度
+        self.syncing: bool = False
+        self.consecutive_failures: int = 0
+        self.next_run_at: float = 0.0
+        self.last_success_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_count: int = 0
+        self.last_duration_seconds: float = 0.0
     
     def _ensure_config_loaded(self):
         """懒加载配置（仅在首次使用时加载）"""
@@ -42,7 +75,7 @@ class HFishCollector:
         db = SessionLocal()
         try:
             configs = db.query(CollectorConfig).filter(
-                CollectorConfig.collector_type == "hfish",
+                CollectorConfig.collector_type == self.collector_type,
                 CollectorConfig.enabled == 1
             ).all()
             
@@ -57,6 +90,8 @@ class HFishCollector:
                     self.sync_interval = int(config.config_value)
                 elif config.config_key == "enabled":
                     self.enabled = config.config_value == "true"
+                elif config.config_key == HFISH_CURSOR_KEY:
+                    self.cursor = int(config.config_value) if config.config_value else None
         except Exception as e:
             logger.warning(f"加载 HFish 配置失败: {e}")
         finally:
@@ -83,7 +118,7 @@ class HFishCollector:
             
             for key, (value, is_sensitive) in configs.items():
                 existing = db.query(CollectorConfig).filter(
-                    CollectorConfig.collector_type == "hfish",
+                    CollectorConfig.collector_type == self.collector_type,
                     CollectorConfig.config_key == key
                 ).first()
                 
@@ -93,7 +128,7 @@ class HFishCollector:
                     existing.updated_at = datetime.now(timezone.utc)
                 else:
                     new_config = CollectorConfig(
-                        collector_type="hfish",
+                        collector_type=self.collector_type,
                         config_key=key,
                         config_value=value,
                         is_sensitive=is_sensitive,
@@ -119,66 +154,103 @@ class HFishCollector:
         except (ValueError, TypeError):
             return None
     
-    def fetch_attack_logs(self, start_time: int = 0, end_time: int = 0) -> List[Dict[str, Any]]:
-        """
-        从 HFish API 获取攻击日志
-        
-        Args:
-            start_time: 开始时间戳（秒）
-            end_time: 结束时间戳（秒，0表示最新）
-        
-        Returns:
-            攻击日志列表
-        """
-        if not self.api_key or (not self.host_port and not self.api_base_url):
-            logger.error("HFish 配置未设置")
-            return []
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """共享 keep-alive 连接池（HFish 管理端通常为自签名证书）"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                verify=False,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._http_client
 
+    async def aclose(self):
+        """关闭共享 HTTP 客户端"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def close_when_idle(self):
+        """标记为已删除，等进行中的同步结束后关闭连接池"""
+        self.retired = True
+        async with self._sync_lock:
+            await self.aclose()
+
+    async def _fetch_page(self, start_time: int, end_time: int, page_no: int) -> List[Dict[str, Any]]:
+        """拉取单页攻击详情，请求失败或业务错误时抛出异常"""
         base = self.api_base_url.rstrip("/") if self.api_base_url else f"https://{self.host_port}"
-        url = f"{base}/api/v1/attack/detail?api_key={self.api_key}"
-        
+        url = f"{base}/api/v1/attack/detail"
+
         payload = {
             "start_time": start_time,
             "end_time": end_time,
-            "page_no": 1,
-            "page_size": 1000,
+            "page_no": page_no,
+            "page_size": HFISH_PAGE_SIZE,
             "intranet": -1,
             "threat_label": [],
             "client_id": [],
             "service_name": [],
             "info_confirm": "0"
         }
+
+        response = await self._get_http_client().post(
+            url,
+            params={"api_key": self.api_key},
+            json=payload,
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        if data.get("code") != 200:
+            raise RuntimeError(f"HFish API 错误: {data.get('msg', '未知错误')}")
+
+        return (data.get("data") or {}).get("detail_list") or []
+
+    async def iter_attack_log_pages(
+        self, start_time: int = 0, end_time: int = 0
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        分页拉取攻击日志，逐页产出，便于边拉取边入库
+
+        Args:
+            start_time: 开始时间戳（秒）
+            end_time: 结束时间戳（秒，0表示最新）
+        """
+        if not self.api_key or (not self.host_port and not self.api_base_url):
+            raise RuntimeError("HFish 配置未设置")
+
+        for page_no in range(1, HFISH_MAX_PAGES_PER_SYNC + 1):
+            page = await self._fetch_page(start_time, end_time, page_no)
+            if page:
+                yield page
+            if len(page) < HFISH_PAGE_SIZE:
+                return
+        logger.warning(f"HFish 单次同步达到分页上限 {HFISH_MAX_PAGES_PER_SYNC}，剩余数据留待下次同步")
+
+    async def fetch_attack_logs(self, start_time: int = 0, end_time: int = 0) -> List[Dict[str, Any]]:
+        """
+        从 HFish API 获取全部分页的攻击日志
         
-        headers = {"Content-Type": "application/json"}
+        Args:
+            start_time: 开始时间戳（秒）
+            end_time: 结束时间戳（秒，0表示最新）
         
+        Returns:
+            攻击日志列表
+        """
+        logs: List[Dict[str, Any]] = []
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                data=json.dumps(payload),
-                verify=False,
-                timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") != 200:
-                logger.error(f"HFish API 错误: {data.get('msg', '未知错误')}")
-                return []
-            
-            # 提取详情列表
-            if "data" in data and "detail_list" in data.get("data", {}):
-                return data["data"]["detail_list"]
-            
-            return []
-        
+            async for page in self.iter_attack_log_pages(start_time, end_time):
+                logs.extend(page)
         except Exception as e:
             logger.error(f"HFish API 请求失败: {e}", exc_info=True)
             return []
+        return logs
     
     def _build_event_id(self, log: Dict[str, Any]) -> str:
-        """构建唯一事件ID（用于去重）"""
-        key_parts = [
+        """构建唯一事件ID（用于去重）；非默认源带上源名称，不同管理端的同一次攻击各自入库"""
+        key_parts = [] if self.source_name == DEFAULT_SOURCE_NAME else [self.source_name]
+        key_parts += [
             log.get("attack_ip", ""),
             log.get("service_name", ""),
             log.get("service_port", ""),
@@ -214,58 +286,54 @@ class HFishCollector:
         if not logs:
             return 0
         
-        count = 0
+        rows: List[Dict[str, Any]] = []
+        seen_event_ids = set()
         for log in logs:
             try:
                 # 构建唯一事件ID
                 event_id = self._build_event_id(log)
-                
-                # 检查是否已存在
-                existing = db.query(ThreatEvent).filter(
-                    ThreatEvent.source_event_id == event_id
-                ).first()
-                
-                if existing:
-                    continue  # 跳过重复事件
+                if event_id in seen_event_ids:
+                    continue  # 跳过批内重复事件
+                seen_event_ids.add(event_id)
                 
                 # 转换时间戳
                 create_time = self._timestamp_to_datetime(log.get("create_time"))
                 
-                # 创建 ThreatEvent
-                event = ThreatEvent(
-                    ip=log.get("attack_ip", ""),
-                    source="hfish",
-                    source_vendor="hfish",
-                    source_type="honeypot",
-                    source_event_id=event_id,
-                    attack_count=1,
-                    asset_ip=log.get("client_ip", ""),
-                    service_name=log.get("service_name", ""),
-                    service_type=log.get("service_type", ""),
-                    service_port=str(log.get("service_port", "")),
-                    threat_label=log.get("threat_level", ""),
-                    ip_location=log.get("ip_location", ""),
-                    client_id=log.get("client_id", ""),
-                    client_name=log.get("client_name", ""),
-                    ai_score=self._map_threat_level_to_score(log.get("threat_level", "")),
-                    status="PENDING",
-                    trace_id=trace_id,
-                    raw_payload=json.dumps(log, ensure_ascii=False),
-                    created_at=create_time or datetime.now(timezone.utc)
-                )
-                
-                db.add(event)
-                count += 1
+                rows.append({
+                    "ip": log.get("attack_ip", ""),
+                    "source": self.collector_type,
+                    "source_vendor": "hfish",
+                    "source_type": "honeypot",
+                    "source_event_id": event_id,
+                    "attack_count": 1,
+                    "asset_ip": log.get("client_ip", ""),
+                    "service_name": log.get("service_name", ""),
+                    "service_type": log.get("service_type", ""),
+                    "service_port": str(log.get("service_port", "")),
+                    "threat_label": log.get("threat_level", ""),
+                    "ip_location": log.get("ip_location", ""),
+                    "client_id": log.get("client_id", ""),
+                    "client_name": log.get("client_name", ""),
+                    "ai_score": self._map_threat_level_to_score(log.get("threat_level", "")),
+                    "status": "PENDING",
+                    "trace_id": trace_id,
+                    "raw_payload": json.dumps(log, ensure_ascii=False),
+                    "created_at": create_time or datetime.now(timezone.utc),
+                })
             
             except Exception as e:
                 logger.error(f"处理 HFish 日志失败: {e}", exc_info=True)
                 continue
         
+        # 批量查询已存在事件，剩余部分一次写入（唯一索引兜底并发重复）
+        existing = find_existing_event_ids(db, [event_key(row) for row in rows])
+        new_rows = [row for row in rows if event_key(row) not in existing]
+        inserted = insert_events_ignore_conflicts(db, new_rows)
         db.commit()
-        return count
+        return len(inserted)
     
     def get_last_sync_timestamp(self, db: Session) -> int:
-        """获取最后同步的时间戳"""
+        """获取最后同步的时间戳（仅在尚无持久化游标时用于初始化）"""
         last_event = db.query(ThreatEvent).filter(
             ThreatEvent.source_vendor == "hfish"
         ).order_by(ThreatEvent.created_at.desc()).first()
@@ -273,10 +341,137 @@ class HFishCollector:
         if last_event and last_event.created_at:
             return int(last_event.created_at.timestamp())
         return 0
+
+    def _resolve_cursor(self) -> int:
+        """读取高水位游标；默认源首次同步时由历史事件推导，新注册的源从头回填"""
+        if self.cursor is not None:
+            return self.cursor
+        if self.source_name != DEFAULT_SOURCE_NAME:
+            return 0
+        db = SessionLocal()
+        try:
+            return self.get_last_sync_timestamp(db)
+        finally:
+            db.close()
+
+    def _save_cursor(self, cursor: int):
+        """持久化高水位游标到 CollectorConfig（只前进不后退）"""
+        if self.retired or (self.cursor is not None and cursor <= self.cursor):
+            return
+        db = SessionLocal()
+        try:
+            existing = db.query(CollectorConfig).filter(
+                CollectorConfig.collector_type == self.collector_type,
+                CollectorConfig.config_key == HFISH_CURSOR_KEY
+            ).first()
+            if existing:
+                existing.config_value = str(cursor)
+                existing.updated_at = datetime.now(timezone.utc)
+            else:
+                db.add(CollectorConfig(
+                    collector_type=self.collector_type,
+                    config_key=HFISH_CURSOR_KEY,
+                    config_value=str(cursor),
+                    is_sensitive=0,
+                    enabled=1,
+                    description="HFish 增量同步高水位游标（秒级时间戳）"
+                ))
+            db.commit()
+            self.cursor = cursor
+        finally:
+            db.close()
+
+    def _ingest_page(self, logs: List[Dict[str, Any]], trace_id: str) -> int:
+        """在工作线程中使用独立会话入库单页日志"""
+        db = SessionLocal()
+        try:
+            return self.ingest_logs(logs, db, trace_id)
+        finally:
+            db.close()
+
+    # ── 调度状态 ──
+
+    def is_due(self, now: Optional[float] = None) -> bool:
+        """启用、未在同步中且已到下次执行时间"""
+        now = time.monotonic() if now is None else now
+        return self.enabled and not self.syncing and not self.sync_in_progress and now >= self.next_run_at
+
+    @property
+    def sync_in_progress(self) -> bool:
+        return self._sync_lock.locked()
+
+    def health_status(self) -> str:
+        if not self.enabled:
+            return "disabled"
+        if self.consecutive_failures >= HFISH_DOWN_AFTER_FAILURES:
+            return "down"
+        if self.consecutive_failures > 0:
+            return "degraded"
+        return "healthy" if self.last_success_at else "pending"
+
+    def lag_seconds(self) -> Optional[int]:
+        """游标落后当前时间的秒数"""
+        if self.cursor is None:
+            return None
+        return max(0, int(time.time()) - self.cursor)
+
+    def _record_success(self, count: int, duration_seconds: float):
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_success_at = datetime.now(timezone.utc)
+        self.last_count = count
+        self.last_duration_seconds = duration_seconds
+        self.next_run_at = time.monotonic() + self.sync_interval
+
+        metrics.inc(f"hfish_sync_success_total:{self.source_name}")
+        metrics.inc(f"hfish_sync_events_total:{self.source_name}", count)
+        metrics.set_gauge(
+            f"hfish_sync_throughput_eps:{self.source_name}",
+            round(count / duration_seconds, 2) if duration_seconds > 0 else 0.0,
+        )
+        lag = self.lag_seconds()
+        if lag is not None:
+            metrics.set_gauge(f"hfish_sync_lag_seconds:{self.source_name}", lag)
+
+    def _record_failure(self, error: str):
+        """指数退避：sync_interval * 2^(连续失败次数)，封顶 HFISH_MAX_BACKOFF_SECONDS"""
+        self.consecutive_failures += 1
+        self.last_error = error
+        backoff = min(self.sync_interval * (2 ** self.consecutive_failures), HFISH_MAX_BACKOFF_SECONDS)
+        self.next_run_at = time.monotonic() + backoff
+        metrics.inc(f"hfish_sync_failure_total:{self.source_name}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.source_name,
+            "host_port": self.host_port,
+            "api_base_url": self.api_base_url,
+            "sync_interval": self.sync_interval,
+            "enabled": self.enabled,
+            "health": self.health_status(),
+            "syncing": self.syncing or self.sync_in_progress,
+            "cursor": self.cursor,
+            "lag_seconds": self.lag_seconds(),
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": max(0, round(self.next_run_at - time.monotonic(), 1)) if self.enabled else None,
+            "last_success_at": self.last_success_at.isoformat().replace("+00:00", "Z") if self.last_success_at else None,
+            "last_error": self.last_error,
+            "last_count": self.last_count,
+            "last_duration_seconds": round(self.last_duration_seconds, 3),
+        }
+
+    def _page_high_water_mark(self, logs: List[Dict[str, Any]]) -> int:
+        timestamps = [
+            int(dt.timestamp())
+            for dt in (self._timestamp_to_datetime(log.get("create_time")) for log in logs)
+            if dt is not None
+        ]
+        return max(timestamps) if timestamps else 0
     
     async def sync_once(self, trace_id: str) -> Dict[str, Any]:
         """
-        执行一次同步
+        执行一次增量同步：分页拉取，逐页在工作线程入库，全部成功后推进游标；
+        同一源已有同步在运行时直接返回 in_progress，不并发执行
         
         Args:
             trace_id: 追踪ID
@@ -284,44 +479,173 @@ class HFishCollector:
         Returns:
             同步结果
         """
-        self._ensure_config_loaded()
+        await asyncio.to_thread(self._ensure_config_loaded)
         
         if not self.enabled:
             return {"success": False, "message": "HFish 采集器未启用"}
-        
-        db = SessionLocal()
+        if self.sync_in_progress:
+            return {"success": False, "message": "同步进行中", "in_progress": True}
+
+        async with self._sync_lock:
+            return await self._sync_locked(trace_id)
+
+    async def _sync_locked(self, trace_id: str) -> Dict[str, Any]:
+        self.syncing = True
+        started = time.monotonic()
         try:
-            # 获取最后同步时间戳
-            last_timestamp = self.get_last_sync_timestamp(db)
+            last_timestamp = await asyncio.to_thread(self._resolve_cursor)
             
-            logger.info(f"[{trace_id}] 开始 HFish 同步，从时间戳 {last_timestamp} 开始")
+            logger.info(f"[{trace_id}] 开始 HFish 同步（源 {self.source_name}），从时间戳 {last_timestamp} 开始")
             
-            # 拉取日志
-            logs = self.fetch_attack_logs(start_time=last_timestamp)
+            count = 0
+            total_fetched = 0
+            pages = 0
+            last_page_size = 0
+            high_water_mark = last_timestamp
+            async for page in self.iter_attack_log_pages(start_time=last_timestamp):
+                pages += 1
+                last_page_size = len(page)
+                total_fetched += len(page)
+                count += await asyncio.to_thread(self._ingest_page, page, trace_id)
+                high_water_mark = max(high_water_mark, self._page_high_water_mark(page))
             
-            if not logs:
+            if not total_fetched:
                 logger.info(f"[{trace_id}] 无新数据")
+                self._record_success(0, time.monotonic() - started)
                 return {"success": True, "message": "无新数据", "count": 0}
             
-            # 入库
-            count = self.ingest_logs(logs, db, trace_id)
+            # 分页被截断时不推进游标（HFish 返回顺序不保证按时间升序），下次从原位置重拉，由去重兜底
+            truncated = pages >= HFISH_MAX_PAGES_PER_SYNC and last_page_size >= HFISH_PAGE_SIZE
+            if not truncated and high_water_mark > last_timestamp:
+                await asyncio.to_thread(self._save_cursor, high_water_mark)
             
             logger.info(f"[{trace_id}] HFish 同步完成，新增 {count} 条事件")
+            self._record_success(count, time.monotonic() - started)
             
             return {
                 "success": True,
                 "message": f"同步完成，新增 {count} 条事件",
                 "count": count,
-                "total_fetched": len(logs)
+                "total_fetched": total_fetched,
+                "cursor": self.cursor,
             }
         
         except Exception as e:
             logger.error(f"[{trace_id}] HFish 同步失败: {e}", exc_info=True)
+            self._record_failure(str(e))
             return {"success": False, "message": str(e)}
         
+        finally:
+            self.syncing = False
+
+
+class HFishFederation:
+    """多 HFish 管理端注册表：默认源 + CollectorConfig 中登记的 hfish:<name> 源"""
+
+    def __init__(self, default_collector: HFishCollector):
+        self.default = default_collector
+        self.sources: Dict[str, HFishCollector] = {DEFAULT_SOURCE_NAME: default_collector}
+        self._closing: Set[asyncio.Task] = set()
+
+    def get(self, source_name: str) -> Optional[HFishCollector]:
+        return self.sources.get(source_name)
+
+    def refresh(self) -> List[HFishCollector]:
+        """从数据库重新发现已注册的源并加载各自配置，返回已被删除的源"""
+        db = SessionLocal()
+        try:
+            collector_types = {
+                row[0]
+                for row in db.query(CollectorConfig.collector_type)
+                .filter(CollectorConfig.collector_type.like("hfish:%"))
+                .distinct()
+                .all()
+            }
+        finally:
+            db.close()
+
+        names = {DEFAULT_SOURCE_NAME} | {t.split(":", 1)[1] for t in collector_types}
+        for name in names:
+            collector = self.sources.get(name)
+            if collector is None:
+                collector = HFishCollector(name)
+                self.sources[name] = collector
+            collector._load_config()
+            collector._config_loaded = True
+        removed = [self.sources.pop(n) for n in [n for n in self.sources if n not in names]]
+        for collector in removed:
+            collector.retired = True
+        return removed
+
+    async def reload(self):
+        """refresh 的异步入口：在工作线程读库，被删除的源在同步结束后关闭连接池"""
+        for collector in await asyncio.to_thread(self.refresh):
+            task = asyncio.create_task(collector.close_when_idle())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def register_source(
+        self,
+        source_name: str,
+        host_port: str,
+        api_key: str,
+        sync_interval: int = 60,
+        enabled: bool = True,
+        api_base_url: Optional[str] = None,
+    ) -> HFishCollector:
+        """注册或更新一个 HFish 源"""
+        if not SOURCE_NAME_PATTERN.match(source_name):
+            raise ValueError("源名称只允许小写字母、数字、下划线和连字符，最长 32 位")
+        collector = self.sources.get(source_name) or HFishCollector(source_name)
+        collector.save_config(
+            host_port=host_port,
+            api_key=api_key,
+            sync_interval=sync_interval,
+            enabled=enabled,
+            api_base_url=api_base_url,
+        )
+        collector._config_loaded = True
+        collector.next_run_at = 0.0
+        self.sources[source_name] = collector
+        return collector
+
+    async def remove_source(self, source_name: str) -> bool:
+        """删除一个 HFish 源及其配置（默认源不可删除）"""
+        if source_name == DEFAULT_SOURCE_NAME:
+            raise ValueError("默认 HFish 源不可删除，请通过 /hfish/config 禁用")
+        collector = self.sources.pop(source_name, None)
+        db = SessionLocal()
+        try:
+            deleted = db.query(CollectorConfig).filter(
+                CollectorConfig.collector_type == _collector_type_for(source_name)
+            ).delete(synchronize_session=False)
+            db.commit()
         finally:
             db.close()
+        if collector is not None:
+            await collector.close_when_idle()
+        return bool(deleted) or collector is not None
+
+    def due_sources(self) -> List[HFishCollector]:
+        now = time.monotonic()
+        return [collector for collector in self.sources.values() if collector.is_due(now)]
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [self.sources[name].status() for name in sorted(self.sources)]
+
+    async def aclose(self):
+        for collector in list(self.sources.values()):
+            await collector.aclose()
+
+
+def get_max_concurrent_syncs() -> int:
+    try:
+        value = int(os.getenv("HFISH_MAX_CONCURRENT_SYNCS", "4"))
+    except ValueError:
+        value = 4
+    return max(1, value)
 
 
 # 全局单例
 hfish_collector = HFishCollector()
+hfish_federation = HFishFederation(hfish_collector)
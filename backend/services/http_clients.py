@@ -0,0 +1,191 @@
+"""
+出站 HTTP 客户端注册表。
+LLM、推送、TTS、MCP 等上游各用一个长驻 httpx.AsyncClient，连接保活复用，避免每次请求重新建立 TCP/TLS。
+每个上游的连接池上限与保活数可按环境变量调整；安装 h2 时启用 HTTP/2。
+在途请求数、请求总数与连接池占满次数写入 MetricsCollector（按上游区分）。
+客户端在 main.lifespan 中创建与关闭；lifespan 之外（脚本、测试）首次取用时按需创建。
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_LLM = "llm"
+UPSTREAM_PUSH = "push"
+UPSTREAM_TTS = "tts"
+UPSTREAM_MCP = "mcp"
+
+# 上游 -> 最大连接数；保活连接数默认与之相同（保活数偏小时，并发高峰中刚归还的连接会被关闭、下次重新建连）
+DEFAULT_POOL_LIMITS = {
+    UPSTREAM_LLM: 20,
+    UPSTREAM_PUSH: 20,
+    UPSTREAM_TTS: 10,
+    UPSTREAM_MCP: 20,
+}
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_TIMEOUT = 30.0
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, str(default)))
+    except ValueError:
+        value = default
+    return max(1, value)
+
+
+def get_pool_limits(upstream: str) -> httpx.Limits:
+    suffix = upstream.upper()
+    max_connections = _env_int(f"HTTP_POOL_MAX_CONNECTIONS_{suffix}", DEFAULT_POOL_LIMITS.get(upstream, 10))
+    max_keepalive = min(max_connections, _env_int(f"HTTP_POOL_MAX_KEEPALIVE_{suffix}", max_connections))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=get_keepalive_expiry(),
+    )
+
+
+def get_keepalive_expiry() -> float:
+    try:
+        value = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", str(DEFAULT_KEEPALIVE_EXPIRY)))
+    except ValueError:
+        value = DEFAULT_KEEPALIVE_EXPIRY
+    return max(0.0, value)
+
+
+def http2_enabled() -> bool:
+    """HTTP_CLIENT_HTTP2 开启且已安装 h2（httpx[http2]）时使用 HTTP/2"""
+    if os.getenv("HTTP_CLIENT_HTTP2", "true").strip().lower() not in {"1", "true", "yes", "on"}:
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """响应体读完或关闭时归还在途计数"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _MeteredTransport(httpx.AsyncHTTPTransport):
+    """统计在途请求数与连接池占满次数的传输层"""
+
+    def __init__(self, upstream: str, limits: httpx.Limits, http2: bool):
+        super().__init__(limits=limits, http2=http2)
+        self.upstream = upstream
+        self.max_connections = limits.max_connections
+        self.in_use = 0
+        metrics.set_gauge(f"http_pool_max_connections:{upstream}", self.max_connections)
+        metrics.set_gauge(f"http_pool_in_use:{upstream}", 0)
+
+    def _acquire(self) -> None:
+        metrics.inc(f"http_pool_requests_total:{self.upstream}")
+        if self.in_use >= self.max_connections:
+            # 连接已全部占用，本请求需排队等待空闲连接
+            metrics.inc(f"http_pool_saturated_total:{self.upstream}")
+        self.in_use += 1
+        metrics.set_gauge(f"http_pool_in_use:{self.upstream}", self.in_use)
+
+    def _release(self) -> None:
+        self.in_use -= 1
+        metrics.set_gauge(f"http_pool_in_use:{self.upstream}", self.in_use)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._acquire()
+        started = time.monotonic()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self._release()
+            metrics.record_latency(
+                "http_upstream", (time.monotonic() - started) * 1000,
+                upstream=self.upstream, method=request.method, status="error",
+            )
+            raise
+        # 到收到响应头为止的耗时（含排队等待空闲连接）
+        metrics.record_latency(
+            "http_upstream", (time.monotonic() - started) * 1000,
+            upstream=self.upstream, method=request.method, status=response.status_code,
+        )
+        released = False
+
+        def release_once() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release()
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release_once),
+            extensions=response.extensions,
+        )
+
+
+class HTTPClientRegistry:
+    """按上游复用 httpx.AsyncClient"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        # 连接绑定事件循环；换循环（测试、脚本多次 asyncio.run）时丢弃旧客户端
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._clients = {}
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """取上游共享客户端；请求超时由调用方按次传入"""
+        self._bind_loop()
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            limits = get_pool_limits(upstream)
+            http2 = http2_enabled()
+            client = httpx.AsyncClient(
+                transport=_MeteredTransport(upstream, limits, http2),
+                timeout=DEFAULT_TIMEOUT,
+            )
+            self._clients[upstream] = client
+            logger.info(
+                f"HTTP 客户端已创建: upstream={upstream} max_connections={limits.max_connections} http2={http2}"
+            )
+        return client
+
+    async def start(self) -> None:
+        """预建各上游客户端（main.lifespan 启动时调用）"""
+        for upstream in DEFAULT_POOL_LIMITS:
+            self.get(upstream)
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients = {}
+        if self._loop is not asyncio.get_running_loop():
+            self._loop = None
+            return
+        await asyncio.gather(*[client.aclose() for client in clients], return_exceptions=True)
+
+
+# 全局单例
+http_clients = HTTPClientRegistry()
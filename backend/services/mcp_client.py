@@ -1,14 +1,18 @@
 """MCP Client Service - MCP 工具调用"""
 
 import os
-import json
 import asyncio
+import ipaddress
+import json
 from typing import Dict, Any, Optional, List
 import httpx
 from datetime import datetime, timezone
 
 from core.database import SessionLocal, Device, Credential, ExecutionTask
+from services.audit_chain import audit_chain
 from services.audit_service import AuditService
+from services.http_clients import UPSTREAM_MCP, http_clients
+from services.mcp_stdio_pool import MCPStdioError, MCPStdioPool
 
 
 def _classify_error_retryable(error_msg: str, status_code: Optional[int] = None) -> bool:
@@ -52,6 +56,27 @@ def _classify_error_retryable(error_msg: str, status_code: Optional[int] = None)
     return True
 
 
+def _is_unknown_tool_error(result: Dict[str, Any]) -> bool:
+    """MCP 服务器未提供该工具"""
+    error_lower = str(result.get("error") or "").lower()
+    return any(p in error_lower for p in ("unknown tool", "tool not found", "method not found"))
+
+
+def _extract_batch_items(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """从批量工具响应中取逐 IP 结果：result.results，或 MCP content 首段 JSON 文本中的 results"""
+    payload = result.get("result")
+    if isinstance(payload, dict) and isinstance(payload.get("content"), list):
+        for block in payload["content"]:
+            if isinstance(block, dict) and block.get("type") == "text":
+                try:
+                    payload = json.loads(block.get("text") or "")
+                except ValueError:
+                    payload = None
+                break
+    items = payload.get("results") if isinstance(payload, dict) else None
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
 class MCPClient:
     """MCP 客户端 - 调用 MCP 工具执行交换机操作
 
@@ -66,7 +91,8 @@ class MCPClient:
         self.server_url = os.getenv("MCP_SERVER_URL", "http://localhost:3000")
         self.server_name = os.getenv("MCP_SERVER_NAME", "switch-controller")
         self.timeout = float(os.getenv("MCP_TIMEOUT", "30.0"))
-        self.http_client = httpx.AsyncClient(timeout=self.timeout)
+        self.mock_latency = float(os.getenv("MCP_MOCK_LATENCY", "0.5"))
+        self.stdio_pool: Optional[MCPStdioPool] = None
 
     async def call_tool(
         self, tool_name: str, arguments: Dict[str, Any]
@@ -85,7 +111,7 @@ class MCPClient:
         self, tool_name: str, arguments: Dict[str, Any]
     ) -> Dict[str, Any]:
         """模拟模式 - 用于开发和测试"""
-        await asyncio.sleep(0.5)  # 模拟网络延迟
+        await asyncio.sleep(self.mock_latency)  # 模拟网络延迟
 
         if tool_name == "block_ip":
             return {
@@ -110,6 +136,31 @@ class MCPClient:
                 },
                 "tool": tool_name,
             }
+        elif tool_name in ("block_ips", "unblock_ips"):
+            # 批量工具：一次 ACL 更新，逐 IP 返回结果
+            action = "block" if tool_name == "block_ips" else "unblock"
+            stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            results = []
+            for index, ip in enumerate(arguments.get("ips") or []):
+                try:
+                    ipaddress.ip_address(str(ip))
+                except ValueError:
+                    results.append({"ip": ip, "success": False, "error": f"invalid ip: {ip}"})
+                    continue
+                item = {"ip": ip, "success": True}
+                if action == "block":
+                    item["rule_id"] = f"rule_{stamp}_{index}"
+                results.append(item)
+            return {
+                "success": True,
+                "result": {
+                    "action": action,
+                    "device_id": arguments.get("device_id"),
+                    "results": results,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                },
+                "tool": tool_name,
+            }
         elif tool_name == "get_device_status":
             return {
                 "success": True,
@@ -171,10 +222,12 @@ class MCPClient:
                 },
             }
 
-            init_response = await self.http_client.post(
+            http_client = http_clients.get(UPSTREAM_MCP)
+            init_response = await http_client.post(
                 f"{self.server_url}/mcp/v1",
                 json=init_payload,
                 headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
             )
             init_response.raise_for_status()
             init_data = init_response.json()
@@ -190,10 +243,11 @@ class MCPClient:
                 "params": {"name": tool_name, "arguments": arguments},
             }
 
-            call_response = await self.http_client.post(
+            call_response = await http_client.post(
                 f"{self.server_url}/mcp/v1",
                 json=call_payload,
                 headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
             )
             call_response.raise_for_status()
             call_data = call_response.json()
@@ -238,64 +292,19 @@ class MCPClient:
                 "retryable": _classify_error_retryable(error_msg),
             }
 
+    def _get_stdio_pool(self) -> MCPStdioPool:
+        if self.stdio_pool is None:
+            mcp_command = os.getenv("MCP_STDIO_COMMAND", "npx -y @modelcontextprotocol/server-everything")
+            self.stdio_pool = MCPStdioPool(mcp_command.split())
+        return self.stdio_pool
+
     async def _call_stdio(
         self, tool_name: str, arguments: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """通过 stdio 调用本地 MCP 工具（JSON-RPC 2.0 协议）"""
+        """通过 stdio 调用本地 MCP 工具（JSON-RPC 2.0 协议，复用会话池中的长驻进程）"""
+        pool = self._get_stdio_pool()
         try:
-            # 获取 MCP 服务器命令
-            mcp_command = os.getenv("MCP_STDIO_COMMAND", "npx -y @modelcontextprotocol/server-everything")
-            cmd = mcp_command.split()
-
-            # 启动 MCP 服务器进程
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-
-            # 1. 发送 initialize 请求
-            init_request = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "initialize",
-                "params": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {},
-                    "clientInfo": {"name": "aimiguard", "version": "1.0.0"},
-                },
-            }
-            process.stdin.write((json.dumps(init_request) + "\n").encode())
-            await process.stdin.drain()
-
-            # 读取 initialize 响应
-            init_response = await asyncio.wait_for(
-                process.stdout.readline(), timeout=5.0
-            )
-            init_data = json.loads(init_response.decode())
-            if "error" in init_data:
-                raise Exception(f"Initialize failed: {init_data['error']}")
-
-            # 2. 发送 tools/call 请求
-            call_request = {
-                "jsonrpc": "2.0",
-                "id": 2,
-                "method": "tools/call",
-                "params": {"name": tool_name, "arguments": arguments},
-            }
-            process.stdin.write((json.dumps(call_request) + "\n").encode())
-            await process.stdin.drain()
-
-            # 读取 tools/call 响应
-            call_response = await asyncio.wait_for(
-                process.stdout.readline(), timeout=self.timeout
-            )
-            call_data = json.loads(call_response.decode())
-
-            # 关闭进程
-            process.stdin.close()
-            await process.wait()
+            call_data = await pool.call_tool(tool_name, arguments, timeout=self.timeout)
 
             if "error" in call_data:
                 error_msg = call_data["error"].get("message", str(call_data["error"]))
@@ -313,8 +322,6 @@ class MCPClient:
             }
 
         except asyncio.TimeoutError:
-            if process:
-                process.kill()
             return {
                 "success": False,
                 "error": f"Timeout after {self.timeout}s",
@@ -324,20 +331,19 @@ class MCPClient:
         except FileNotFoundError:
             return {
                 "success": False,
-                "error": f"MCP command not found: {mcp_command}",
+                "error": f"MCP command not found: {' '.join(pool.command)}",
                 "tool": tool_name,
                 "retryable": False,
             }
-        except json.JSONDecodeError as e:
+        except MCPStdioError as e:
+            # 会话进程退出：下次调用会重启会话
             return {
                 "success": False,
-                "error": f"Invalid JSON response: {str(e)}",
+                "error": f"MCP stdio connection lost: {e}",
                 "tool": tool_name,
-                "retryable": False,
+                "retryable": True,
             }
         except Exception as e:
-            if process:
-                process.kill()
             error_msg = str(e)[:500]
             return {
                 "success": False,
@@ -349,7 +355,11 @@ class MCPClient:
     # ===== 业务方法 =====
 
     async def block_ip(
-        self, ip: str, device_id: Optional[int] = None, operator: str = "system"
+        self,
+        ip: str,
+        device_id: Optional[int] = None,
+        operator: str = "system",
+        trace_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """封禁 IP"""
         result = await self.call_tool("block_ip", {"ip": ip, "device_id": device_id})
@@ -367,6 +377,7 @@ class MCPClient:
                 reason=result.get("error")
                 if not result.get("success")
                 else f"Blocked IP {ip}",
+                trace_id=trace_id,
             )
         finally:
             db.close()
@@ -374,7 +385,11 @@ class MCPClient:
         return result
 
     async def unblock_ip(
-        self, ip: str, device_id: Optional[int] = None, operator: str = "system"
+        self,
+        ip: str,
+        device_id: Optional[int] = None,
+        operator: str = "system",
+        trace_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """解封 IP"""
         result = await self.call_tool("unblock_ip", {"ip": ip, "device_id": device_id})
@@ -392,12 +407,97 @@ class MCPClient:
                 reason=result.get("error")
                 if not result.get("success")
                 else f"Unblocked IP {ip}",
+                trace_id=trace_id,
             )
         finally:
             db.close()
 
         return result
 
+    async def block_ips(
+        self,
+        ips: List[str],
+        device_id: Optional[int] = None,
+        operator: str = "system",
+        trace_ids: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """批量封禁 IP（单次 ACL 更新），result.results 为逐 IP 结果；trace_ids 为 IP → 调用方 trace_id"""
+        return await self._call_batch("block", ips, device_id, operator, trace_ids)
+
+    async def unblock_ips(
+        self,
+        ips: List[str],
+        device_id: Optional[int] = None,
+        operator: str = "system",
+        trace_ids: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """批量解封 IP（单次 ACL 更新），result.results 为逐 IP 结果；trace_ids 为 IP → 调用方 trace_id"""
+        return await self._call_batch("unblock", ips, device_id, operator, trace_ids)
+
+    async def _call_batch(
+        self,
+        action: str,
+        ips: List[str],
+        device_id: Optional[int],
+        operator: str,
+        trace_ids: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        tool_name = f"{action}_ips"
+        result = await self.call_tool(tool_name, {"ips": ips, "device_id": device_id})
+        if result.get("success"):
+            items = _extract_batch_items(result)
+        elif _is_unknown_tool_error(result):
+            # 服务器不支持批量工具：退化为并发的单 IP 调用
+            singles = await asyncio.gather(*[
+                self.call_tool(f"{action}_ip", {"ip": ip, "device_id": device_id}) for ip in ips
+            ])
+            items = [
+                {
+                    "ip": ip,
+                    "success": bool(single.get("success")),
+                    "error": single.get("error"),
+                    "retryable": single.get("retryable"),
+                }
+                for ip, single in zip(ips, singles)
+            ]
+            result = {"success": True, "result": {"action": action, "results": items}, "tool": tool_name}
+        else:
+            items = []
+
+        # 与单 IP 路径一致：每个 IP 一条 mcp_<action>_ip 审计，同批共用一次提交
+        by_ip = {item.get("ip"): item for item in items}
+        device = f"device:{device_id}" if device_id is not None else "device:default"
+        verb = "Blocked" if action == "block" else "Unblocked"
+        trace_ids = trace_ids or {}
+        db = SessionLocal()
+        try:
+            for ip in ips:
+                item = by_ip.get(ip)
+                if not result.get("success"):
+                    error = result.get("error") or "mcp_batch_failed"
+                elif item is None:
+                    error = "missing result in batch response"
+                else:
+                    error = None if item.get("success") else str(item.get("error") or "mcp_call_failed")
+                AuditService.log(
+                    db=db,
+                    actor=operator,
+                    action=f"mcp_{action}_ip",
+                    target=f"ip:{ip}",
+                    target_type="firewall_rule",
+                    target_ip=ip,
+                    result="failed" if error else "success",
+                    reason=error or f"{verb} IP {ip} (batch of {len(ips)} on {device})",
+                    trace_id=trace_ids.get(ip),
+                    auto_commit=False,
+                )
+            db.commit()
+            audit_chain.notify(db)
+        finally:
+            db.close()
+
+        return result
+
     async def get_device_status(self, device_id: int) -> Dict[str, Any]:
         """获取设备状态"""
         return await self.call_tool("get_device_status", {"device_id": device_id})
@@ -452,8 +552,9 @@ class MCPClient:
             db.close()
 
     async def close(self):
-        """关闭 HTTP 客户端"""
-        await self.http_client.aclose()
+        """关闭 stdio 会话池（HTTP 连接由 http_clients 注册表统一关闭）"""
+        if self.stdio_pool is not None:
+            await self.stdio_pool.aclose()
 
 
 # Global instance
@@ -0,0 +1,268 @@
+"""
+MCP stdio 会话池。
+长驻若干 MCP 服务器子进程，每个会话只做一次 initialize 握手；请求按 JSON-RPC id 复用同一会话，
+由读协程按 id 分发响应。会话进程退出时挂起请求立即失败，下次取用时自动重启；
+空闲超过 MCP_STDIO_PING_SECONDS 的会话在复用前先 ping 探活。全池并发调用数有上限。
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "aimiguard", "version": "1.0.0"}
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_INIT_TIMEOUT = 5.0
+DEFAULT_PING_SECONDS = 30.0
+# 单行 JSON-RPC 消息上限（ACL 列表等响应可能较大）
+READ_LIMIT = 4 * 1024 * 1024
+
+
+def get_pool_size() -> int:
+    try:
+        value = int(os.getenv("MCP_STDIO_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
+    except ValueError:
+        value = DEFAULT_POOL_SIZE
+    return max(1, value)
+
+
+def get_max_concurrency() -> int:
+    try:
+        value = int(os.getenv("MCP_STDIO_MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY)))
+    except ValueError:
+        value = DEFAULT_MAX_CONCURRENCY
+    return max(1, value)
+
+
+def get_init_timeout() -> float:
+    try:
+        value = float(os.getenv("MCP_STDIO_INIT_TIMEOUT", str(DEFAULT_INIT_TIMEOUT)))
+    except ValueError:
+        value = DEFAULT_INIT_TIMEOUT
+    return max(0.1, value)
+
+
+def get_ping_seconds() -> float:
+    try:
+        value = float(os.getenv("MCP_STDIO_PING_SECONDS", str(DEFAULT_PING_SECONDS)))
+    except ValueError:
+        value = DEFAULT_PING_SECONDS
+    return max(0.0, value)
+
+
+class MCPStdioError(Exception):
+    """会话不可用（进程退出、握手失败）"""
+
+
+class _StdioSession:
+    """单个 MCP 子进程会话：写请求、读协程按 id 分发响应"""
+
+    def __init__(self, command: List[str]):
+        self.command = command
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.inflight = 0
+        self.last_used = time.monotonic()
+        self._ids = itertools.count(1)
+        self._write_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed and self.process is not None and self.process.returncode is None
+
+    async def start(self, init_timeout: float) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=READ_LIMIT,
+        )
+        self._tasks = [
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._drain_stderr()),
+        ]
+        try:
+            response = await self.request(
+                "initialize",
+                {"protocolVersion": PROTOCOL_VERSION, "capabilities": {}, "clientInfo": CLIENT_INFO},
+                timeout=init_timeout,
+            )
+            if "error" in response:
+                raise MCPStdioError(f"Initialize failed: {response['error']}")
+            await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        except BaseException:
+            await self.close()
+            raise
+        logger.info(f"MCP stdio 会话已建立: pid={self.process.pid}")
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        if not self.alive:
+            raise MCPStdioError("MCP stdio session is not running")
+        async with self._write_lock:
+            self.process.stdin.write((json.dumps(message) + "\n").encode())
+            await self.process.stdin.drain()
+
+    async def request(self, method: str, params: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """发送请求并等待同 id 的响应消息"""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.inflight += 1
+        try:
+            # 读协程已退出时不会再有人完成这个 future：立即失败，由连接池重启会话，而不是等到超时
+            if not self.alive:
+                raise MCPStdioError("MCP stdio session is not running")
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self.pending.pop(request_id, None)
+            self.inflight -= 1
+            self.last_used = time.monotonic()
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line.decode())
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    # 服务器写到 stdout 的日志行
+                    logger.debug(f"MCP stdio 非 JSON 输出: {line[:200]!r}")
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                future = self.pending.get(message.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except Exception as e:
+            logger.warning(f"MCP stdio 读取失败: {e}")
+        finally:
+            # stdout 已关闭时进程退出码往往尚未回收，先标记关闭，避免连接池把新请求派给这个会话
+            self._closed = True
+            self._fail_pending(MCPStdioError("MCP stdio session closed"))
+
+    async def _drain_stderr(self) -> None:
+        # 必须持续读取 stderr，否则管道写满会阻塞子进程
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                return
+            logger.debug(f"MCP stdio stderr: {line.decode(errors='replace').rstrip()}")
+
+    def _fail_pending(self, error: Exception) -> None:
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        self._closed = True
+        self._fail_pending(MCPStdioError("MCP stdio session closed"))
+        if self.process is not None and self.process.returncode is None:
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=2.0)
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                self.process.kill()
+                await self.process.wait()
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class MCPStdioPool:
+    """MCP stdio 会话池：按负载选择会话，失效自动重启，全池并发受限"""
+
+    def __init__(self, command: List[str], size: Optional[int] = None, max_concurrency: Optional[int] = None):
+        self.command = command
+        self.size = size or get_pool_size()
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._slots: List[Optional[_StdioSession]] = [None] * self.size
+        self._slot_locks = [asyncio.Lock() for _ in range(self.size)]
+        self._starting: set[int] = set()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _bind_loop(self) -> None:
+        # 会话与锁绑定事件循环；换循环（测试、脚本多次 asyncio.run）时丢弃旧会话
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        for session in self._slots:
+            if session is not None and session.alive:
+                session.process.kill()
+        self._loop = loop
+        self._reset()
+
+    async def _session(self, index: int) -> _StdioSession:
+        """取出槽位上的可用会话，必要时探活或重启"""
+        async with self._slot_locks[index]:
+            session = self._slots[index]
+            if session is not None and session.alive and session.inflight == 0 \
+                    and time.monotonic() - session.last_used >= get_ping_seconds():
+                try:
+                    await session.request("ping", {}, timeout=get_init_timeout())
+                except Exception as e:
+                    logger.warning(f"MCP stdio 会话探活失败，重启: {e}")
+                    await session.close()
+            if session is None or not session.alive:
+                session = _StdioSession(self.command)
+                self._slots[index] = None
+                self._starting.add(index)
+                try:
+                    await session.start(get_init_timeout())
+                finally:
+                    self._starting.discard(index)
+                self._slots[index] = session
+            return session
+
+    def _pick_slot(self) -> int:
+        """优先空闲会话，其次未启动的槽位（扩容），否则选在途请求最少的会话"""
+        empty = None
+        least = None
+        for index, session in enumerate(self._slots):
+            if session is None or not session.alive:
+                if empty is None and index not in self._starting:
+                    empty = index
+            elif session.inflight == 0:
+                return index
+            elif least is None or session.inflight < self._slots[least].inflight:
+                least = index
+        if empty is not None:
+            return empty
+        if least is not None:
+            return least
+        # 所有槽位都在启动中：等待其中之一
+        return min(self._starting) if self._starting else 0
+
+    async def request(self, method: str, params: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        self._bind_loop()
+        async with self._semaphore:
+            session = await self._session(self._pick_slot())
+            return await session.request(method, params, timeout=timeout)
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """tools/call，返回 JSON-RPC 响应消息（含 result 或 error）"""
+        return await self.request("tools/call", {"name": tool_name, "arguments": arguments}, timeout)
+
+    async def aclose(self) -> None:
+        if self._loop is not asyncio.get_running_loop():
+            self._bind_loop()
+            return
+        sessions = [s for s in self._slots if s is not None]
+        self._reset()
+        await asyncio.gather(*[s.close() for s in sessions], return_exceptions=True)
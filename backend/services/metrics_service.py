@@ -1,74 +1,349 @@
 """
 可观测性核心指标采集服务。
-在内存中累计关键指标，供 /api/v1/system/metrics 读取。
+在内存中累计关键指标，供 /api/v1/system/metrics（JSON）与 /metrics（Prometheus 文本格式）读取。
+多 worker 部署时设置 METRICS_MULTIPROC_DIR：每个进程把累计值镜像到自己的 mmap 文件（无跨进程锁），
+读取时合并全部文件，任一 worker 响应的都是全局指标。
+延迟按固定对数桶累计为直方图（每个数量级 6 个桶，0.1ms ~ 100s），记录 O(1)、内存固定；
+分位数由桶内线性插值估算，相对误差不超过所在桶宽。
 """
+import math
+import os
+import re
 import time
+from bisect import bisect_left
 from collections import defaultdict
 from datetime import datetime, timezone
 from threading import Lock
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from services import metrics_store
 
-class MetricsCollector:
-    """线程安全的指标收集器"""
+# 延迟桶上界（毫秒），末尾隐含 +Inf 桶
+LATENCY_BUCKETS_MS: Tuple[float, ...] = tuple(
+    round(m * 10.0 ** e, 4) for e in range(-1, 5) for m in (1, 1.5, 2, 3, 5, 7)
+) + (100000.0,)
+
+PROMETHEUS_PREFIX = "aimiguan_"
+
+# 多进程合并时取各 worker 最大值的仪表（其余求和）
+MAX_MERGED_GAUGE_PREFIXES = ("hfish_sync_",)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, LabelSet]
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Histogram:
+    """固定桶延迟直方图"""
+
+    __slots__ = ("counts", "count", "sum", "max")
 
     def __init__(self):
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, index: int, ms: float) -> None:
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "Histogram":
+        clone = Histogram()
+        clone.merge(self)
+        return clone
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n == 0:
+                continue
+            if seen + n >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * max(0.0, rank - seen) / n
+                return min(value, self.max)
+            seen += n
+        return self.max
+
+    def stats(self) -> dict:
+        if self.count == 0:
+            return {"count": 0, "avg_ms": 0, "p50_ms": 0, "p95_ms": 0, "p99_ms": 0, "max_ms": 0}
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count, 2),
+            "p50_ms": round(self.quantile(0.5), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max, 2),
+        }
+
+
+class MetricsCollector:
+    """线程安全的指标收集器；设置 METRICS_MULTIPROC_DIR 时各 worker 写各自的 mmap 文件，读取时跨进程合并"""
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
         self._lock = Lock()
         self._counters: dict[str, int] = defaultdict(int)
-        self._latencies: dict[str, list[float]] = defaultdict(list)
+        self._gauges: dict[str, float] = {}
+        self._histograms: Dict[SeriesKey, Histogram] = {}
         self._started_at = time.monotonic()
         self._boot_time = datetime.now(timezone.utc)
+        self._multiproc_dir = multiproc_dir if multiproc_dir is not None else get_multiproc_dir()
+        self._store: Optional[metrics_store.MmapMetricsFile] = None
+        self._store_pid = 0
+        self._keys: Dict[tuple, str] = {}
+
+    @property
+    def multiprocess(self) -> bool:
+        return bool(self._multiproc_dir)
+
+    def _shared(self) -> Optional[metrics_store.MmapMetricsFile]:
+        """当前进程的共享文件；需持有 self._lock。fork 出的子进程换用自己的文件并清零继承来的累计值"""
+        if not self._multiproc_dir:
+            return None
+        pid = os.getpid()
+        if self._store_pid != pid:
+            if self._store_pid:
+                self._counters.clear()
+                self._gauges.clear()
+                self._histograms.clear()
+                self._keys.clear()
+            os.makedirs(self._multiproc_dir, exist_ok=True)
+            self._store = metrics_store.MmapMetricsFile(metrics_store.file_path(self._multiproc_dir, pid))
+            self._store_pid = pid
+        return self._store
+
+    def _key(self, *parts) -> str:
+        key = self._keys.get(parts)
+        if key is None:
+            key = self._keys[parts] = metrics_store.encode_key(*parts)
+        return key
 
     # ── 计数器 ──
 
     def inc(self, name: str, delta: int = 1):
         with self._lock:
             self._counters[name] += delta
+            store = self._shared()
+            if store is not None:
+                store.write(self._key("c", name), self._counters[name])
 
     def get_counter(self, name: str) -> int:
+        if self._multiproc_dir:
+            return self._collect()[0].get(name, 0)
         with self._lock:
             return self._counters.get(name, 0)
 
-    # ── 延迟记录 ──
+    # ── 仪表（瞬时值） ──
 
-    def record_latency(self, name: str, ms: float):
+    def set_gauge(self, name: str, value: float):
         with self._lock:
-            bucket = self._latencies[name]
-            bucket.append(ms)
-            if len(bucket) > 500:
-                self._latencies[name] = bucket[-500:]
+            self._gauges[name] = value
+            store = self._shared()
+            if store is not None:
+                store.write(self._key("g", name), value)
 
-    def get_latency_stats(self, name: str) -> dict:
+    def get_gauge(self, name: str) -> Optional[float]:
+        if self._multiproc_dir:
+            return self._collect()[1].get(name)
         with self._lock:
-            bucket = list(self._latencies.get(name, []))
-        if not bucket:
-            return {"count": 0, "avg_ms": 0, "p50_ms": 0, "p95_ms": 0, "max_ms": 0}
-        bucket.sort()
-        n = len(bucket)
-        return {
-            "count": n,
-            "avg_ms": round(sum(bucket) / n, 2),
-            "p50_ms": round(bucket[n // 2], 2),
-            "p95_ms": round(bucket[int(n * 0.95)], 2),
-            "max_ms": round(bucket[-1], 2),
-        }
+            return self._gauges.get(name)
+
+    # ── 延迟记录 ──
+
+    def record_latency(self, name: str, ms: float, **labels):
+        """记录一次耗时；labels 为维度标签（如 route/method/status/upstream），取值应为有限集合"""
+        index = bisect_left(LATENCY_BUCKETS_MS, ms)
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ())
+        with self._lock:
+            store = self._shared()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(index, ms)
+            if store is not None:
+                store.write(self._key("h", key, index), histogram.counts[index])
+                store.write(self._key("h", key, "count"), histogram.count)
+                store.write(self._key("h", key, "sum"), histogram.sum)
+                store.write(self._key("h", key, "max"), histogram.max)
+
+    # ── 跨进程合并 ──
+
+    def _collect(self) -> Tuple[Dict[str, int], Dict[str, float], Dict[SeriesKey, Histogram]]:
+        """返回 (计数器, 仪表, 直方图) 的副本；多进程模式下合并目录内全部 worker 文件"""
+        if not self._multiproc_dir:
+            with self._lock:
+                return (
+                    dict(self._counters),
+                    dict(self._gauges),
+                    {key: histogram.copy() for key, histogram in self._histograms.items()},
+                )
+
+        counters: Dict[str, int] = defaultdict(int)
+        gauges: Dict[str, float] = {}
+        histograms: Dict[SeriesKey, Histogram] = {}
+        for _, alive, values in metrics_store.read_dir(self._multiproc_dir):
+            for raw_key, value in values.items():
+                try:
+                    parts = metrics_store.decode_key(raw_key)
+                except ValueError:
+                    continue
+                kind = parts[0]
+                if kind == "c":
+                    # 已退出 worker 的累计值仍计入，重启 worker 不会让计数器回退
+                    counters[parts[1]] += int(value)
+                elif kind == "g":
+                    # 仪表是瞬时值，只取存活进程
+                    if alive:
+                        gauges[parts[1]] = _merge_gauge(parts[1], gauges.get(parts[1]), value)
+                elif kind == "h":
+                    name, labels = parts[1]
+                    key = (name, tuple((str(k), str(v)) for k, v in labels))
+                    histogram = histograms.get(key)
+                    if histogram is None:
+                        histogram = histograms[key] = Histogram()
+                    field = parts[2]
+                    if field == "count":
+                        histogram.count += int(value)
+                    elif field == "sum":
+                        histogram.sum += value
+                    elif field == "max":
+                        histogram.max = max(histogram.max, value)
+                    elif isinstance(field, int) and 0 <= field < len(histogram.counts):
+                        histogram.counts[field] += int(value)
+        return dict(counters), gauges, histograms
+
+    def get_latency_stats(self, name: str, **labels) -> dict:
+        """按名称汇总所有标签组合；传入 labels 时只统计标签完全匹配的序列"""
+        wanted = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        total = Histogram()
+        for (series_name, series_labels), histogram in self._collect()[2].items():
+            if series_name == name and (not labels or series_labels == wanted):
+                total.merge(histogram)
+        return total.stats()
+
+    def latency_series(self) -> List[dict]:
+        return _latency_series(self._collect()[2])
 
     # ── 快照 ──
 
     def snapshot(self) -> dict:
-        with self._lock:
-            counters = dict(self._counters)
-        latency_names = ["api_request", "ai_chat", "firewall_sync", "scan_dispatch"]
-        latencies = {name: self.get_latency_stats(name) for name in latency_names}
+        counters, gauges, histograms = self._collect()
+        merged: Dict[str, Histogram] = {}
+        for (name, _), histogram in histograms.items():
+            if name in merged:
+                merged[name].merge(histogram)
+            else:
+                merged[name] = histogram.copy()
+        merged.setdefault("api_request", Histogram())
+        latencies = {name: merged[name].stats() for name in sorted(merged)}
 
         uptime_s = time.monotonic() - self._started_at
         return {
             "uptime_seconds": round(uptime_s, 1),
             "boot_time": self._boot_time.isoformat().replace("+00:00", "Z"),
             "counters": counters,
+            "gauges": gauges,
             "latencies": latencies,
+            "latency_series": _latency_series(histograms),
         }
 
+    # ── Prometheus 文本格式 ──
+
+    def render_prometheus(self) -> str:
+        counters, gauges, histograms = self._collect()
+        lines: List[str] = []
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}uptime_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}uptime_seconds {time.monotonic() - self._started_at:.3f}")
+        _render_flat(lines, counters, "counter")
+        _render_flat(lines, gauges, "gauge")
+
+        typed = set()
+        for (name, labels), histogram in sorted(histograms.items()):
+            metric = f"{PROMETHEUS_PREFIX}{_metric_name(name)}_duration_seconds"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS_MS, histogram.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{_labels(labels, ('le', _format_float(bound / 1000)))} {cumulative}")
+            lines.append(f"{metric}_bucket{_labels(labels, ('le', '+Inf'))} {histogram.count}")
+            lines.append(f"{metric}_sum{_labels(labels)} {_format_float(histogram.sum / 1000)}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def get_multiproc_dir() -> Optional[str]:
+    """多 worker 部署时设置；目录应在服务启动前清空，避免累计旧进程的数据"""
+    return os.getenv("METRICS_MULTIPROC_DIR", "").strip() or None
+
+
+def _merge_gauge(name: str, current: Optional[float], value: float) -> float:
+    """各 worker 的仪表默认求和（连接池占用、缓存条目等按进程独立）；采集同步类取最大值"""
+    if current is None:
+        return value
+    if name.startswith(MAX_MERGED_GAUGE_PREFIXES):
+        return max(current, value)
+    return current + value
+
+
+def _latency_series(histograms: Dict[SeriesKey, Histogram]) -> List[dict]:
+    return [
+        {"name": name, "labels": dict(labels), **histogram.stats()}
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0])
+    ]
+
+
+def _metric_name(name: str) -> str:
+    cleaned = _INVALID_NAME_CHARS.sub("_", name)
+    return cleaned if not cleaned[:1].isdigit() else f"_{cleaned}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Iterable[Tuple[str, str]], *extra: Tuple[str, str]) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{_metric_name(k)}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def _format_float(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(round(value, 6))
+
+
+def _render_flat(lines: List[str], values: Dict[str, float], kind: str) -> None:
+    """计数器/仪表名中 "name:suffix" 的后缀（上游、采集源等）转为 key 标签"""
+    typed = set()
+    for raw_name in sorted(values, key=lambda n: n.partition(":")[::2]):
+        name, _, suffix = raw_name.partition(":")
+        metric = f"{PROMETHEUS_PREFIX}{_metric_name(name)}"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} {kind}")
+        labels = _labels((("key", suffix),)) if suffix else ""
+        lines.append(f"{metric}{labels} {_format_float(float(values[raw_name]))}")
+
 
 # 全局单例
 metrics = MetricsCollector()
@@ -0,0 +1,133 @@
+"""
+多进程指标存储：每个 worker 进程独占一个 mmap 文件（metrics_<pid>.db），只写自己的文件，请求路径上无跨进程锁；
+读取时合并目录下所有文件。
+文件布局：前 8 字节为已用长度；其后为追加写入的记录
+    [uint32 键长][UTF-8 键，补齐到 8 字节][float64 值]
+新键追加完整记录后才更新已用长度，已有键原地覆盖 8 字节值，读方无需加锁即可看到一致的记录。
+"""
+import json
+import mmap
+import os
+import re
+import struct
+from typing import Dict, Iterator, List, Tuple
+
+INITIAL_SIZE = 64 * 1024
+_HEADER = struct.Struct("Q")
+_KEY_LEN = struct.Struct("I")
+_VALUE = struct.Struct("d")
+_FILE_PATTERN = re.compile(r"^metrics_(\d+)\.db$")
+
+
+def _padded(length: int) -> int:
+    return (length + 7) // 8 * 8
+
+
+def encode_key(*parts) -> str:
+    return json.dumps(parts, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode_key(key: str) -> list:
+    return json.loads(key)
+
+
+class MmapMetricsFile:
+    """单进程写入的 键 → float64 映射"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # 同 pid 的旧文件（上次运行遗留、pid 复用）直接覆盖
+        self._file = open(path, "w+b")
+        self._file.truncate(INITIAL_SIZE)
+        self._size = INITIAL_SIZE
+        self._mm = mmap.mmap(self._file.fileno(), self._size)
+        self._used = _HEADER.size
+        _HEADER.pack_into(self._mm, 0, self._used)
+        self._offsets: Dict[str, int] = {}
+
+    def _grow(self, needed: int) -> None:
+        size = self._size
+        while size < needed:
+            size *= 2
+        self._mm.close()
+        self._file.truncate(size)
+        self._size = size
+        self._mm = mmap.mmap(self._file.fileno(), self._size)
+
+    def write(self, key: str, value: float) -> None:
+        offset = self._offsets.get(key)
+        if offset is None:
+            encoded = key.encode("utf-8")
+            record_size = _padded(_KEY_LEN.size + len(encoded)) + _VALUE.size
+            if self._used + record_size > self._size:
+                self._grow(self._used + record_size)
+            start = self._used
+            _KEY_LEN.pack_into(self._mm, start, len(encoded))
+            self._mm[start + _KEY_LEN.size:start + _KEY_LEN.size + len(encoded)] = encoded
+            offset = start + record_size - _VALUE.size
+            _VALUE.pack_into(self._mm, offset, value)
+            self._used = start + record_size
+            _HEADER.pack_into(self._mm, 0, self._used)
+            self._offsets[key] = offset
+            return
+        _VALUE.pack_into(self._mm, offset, value)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def read_file(path: str) -> Iterator[Tuple[str, float]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    pos = _HEADER.size
+    while pos + _KEY_LEN.size <= used:
+        key_len = _KEY_LEN.unpack_from(data, pos)[0]
+        value_pos = pos + _padded(_KEY_LEN.size + key_len)
+        if value_pos + _VALUE.size > used:
+            break
+        key = data[pos + _KEY_LEN.size:pos + _KEY_LEN.size + key_len].decode("utf-8")
+        yield key, _VALUE.unpack_from(data, value_pos)[0]
+        pos = value_pos + _VALUE.size
+
+
+def process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        # Windows 上 os.kill(pid, 0) 会发送 CTRL_C_EVENT，不能用来探活
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_dir(directory: str) -> List[Tuple[int, bool, Dict[str, float]]]:
+    """返回 [(pid, 进程是否存活, {键: 值})]"""
+    results = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return results
+    for name in sorted(names):
+        match = _FILE_PATTERN.match(name)
+        if not match:
+            continue
+        pid = int(match.group(1))
+        try:
+            values = dict(read_file(os.path.join(directory, name)))
+        except (OSError, ValueError):
+            continue
+        results.append((pid, process_alive(pid), values))
+    return results
+
+
+def file_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.db")
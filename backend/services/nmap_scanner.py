@@ -6,15 +6,149 @@ import asyncio
 import json
 import logging
 import os
-import subprocess
+import time
+import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
-from sqlalchemy.orm import Session
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session, sessionmaker
 
 from core.database import ScanTask, ScanFinding, Asset, CollectorConfig, SessionLocal
+from services.scan_finding_store import save_nmap_hosts
 
 logger = logging.getLogger(__name__)
 
+NMAP_SCAN_TIMEOUT_SECONDS = 3600  # 1小时超时
+NMAP_READ_CHUNK_SIZE = 64 * 1024
+NMAP_CANCEL_POLL_SECONDS = 5.0
+# 增量落库：累计主机数或距上次落库时间任一达到即写入
+NMAP_FLUSH_HOSTS = 50
+NMAP_FLUSH_INTERVAL_SECONDS = 2.0
+CANCELLED_MESSAGE = "Cancelled by user"
+
+HostsCallback = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+CancelCheck = Callable[[], Awaitable[bool]]
+
+# 扫描配置映射
+NMAP_PROFILE_ARGUMENTS = {
+    "quick": "-sS -T4 -F",
+    "default": "-sS -sV -T4 -p 1-1000",
+    "comprehensive": "-sS -sV -O -A -T4 -p-",
+    "vuln": "-sV --script=vuln -T4"
+}
+
+
+class ScanCancelled(Exception):
+    """扫描被取消"""
+
+
+def _parse_host_element(host: ET.Element) -> Optional[Dict[str, Any]]:
+    """解析单个 <host> 节点，非 up 状态或无 IPv4 地址时返回 None"""
+    # 状态
+    status = host.find('status')
+    if status is None or status.get('state') != 'up':
+        return None
+
+    host_info = {
+        'ip': '',
+        'mac_address': '',
+        'vendor': '',
+        'hostname': '',
+        'state': 'up',
+        'os_type': '',
+        'os_accuracy': '',
+        'open_ports': [],
+        'services': []
+    }
+
+    # IP 地址
+    for addr in host.findall('address'):
+        if addr.get('addrtype') == 'ipv4':
+            host_info['ip'] = addr.get('addr', '')
+        elif addr.get('addrtype') == 'mac':
+            host_info['mac_address'] = addr.get('addr', '')
+            host_info['vendor'] = addr.get('vendor', '')
+
+    # 主机名
+    hostnames = host.find('hostnames')
+    if hostnames is not None:
+        hostname = hostnames.find('hostname')
+        if hostname is not None:
+            host_info['hostname'] = hostname.get('name', '')
+
+    # 操作系统
+    os_elem = host.find('os')
+    if os_elem is not None:
+        osmatch = os_elem.find('osmatch')
+        if osmatch is not None:
+            host_info['os_type'] = osmatch.get('name', '')
+            host_info['os_accuracy'] = osmatch.get('accuracy', '')
+
+    # 端口和服务
+    ports = host.find('ports')
+    if ports is not None:
+        for port in ports.findall('port'):
+            state = port.find('state')
+            if state is not None and state.get('state') == 'open':
+                port_id = int(port.get('portid', 0))
+                host_info['open_ports'].append(port_id)
+
+                service = port.find('service')
+                if service is not None:
+                    service_info = {
+                        'port': port_id,
+                        'protocol': port.get('protocol', 'tcp'),
+                        'service': service.get('name', ''),
+                        'product': service.get('product', ''),
+                        'version': service.get('version', ''),
+                        'extrainfo': service.get('extrainfo', '')
+                    }
+                    host_info['services'].append(service_info)
+
+    return host_info if host_info['ip'] else None
+
+
+class NmapHostStream:
+    """
+    增量解析 Nmap XML：每个 <host> 闭合即产出主机信息，
+    并从根节点摘除已处理的子节点，/16 级别扫描内存保持平稳。
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._depth = 0
+
+    def consume(self, events: Iterable[Tuple[str, ET.Element]]) -> Iterator[Dict[str, Any]]:
+        for event, elem in events:
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                self._depth += 1
+                continue
+
+            self._depth -= 1
+            # 仅处理根节点的直接子节点（host / hosthint / taskprogress 等）
+            if self._depth != 1 or self._root is None:
+                continue
+            if elem.tag == "host":
+                host_info = _parse_host_element(elem)
+                if host_info:
+                    yield host_info
+            self._root.remove(elem)
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        self._parser.feed(data)
+        return list(self.consume(self._parser.read_events()))
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._parser.close()
+        return list(self.consume(self._parser.read_events()))
+
+
+def iter_nmap_hosts(xml_path: str) -> Iterator[Dict[str, Any]]:
+    """以 iterparse 逐个读取 XML 文件中的主机"""
+    yield from NmapHostStream().consume(ET.iterparse(xml_path, events=("start", "end")))
+
 
 class NmapScanner:
     """Nmap 扫描器"""
@@ -25,6 +159,8 @@ class NmapScanner:
         self.scan_interval: int = 604800  # 7天
         self.enabled: bool = False
         self._config_loaded: bool = False
+        self._processes: Dict[int, asyncio.subprocess.Process] = {}
+        self._cancelled: Set[int] = set()
     
     def _ensure_config_loaded(self):
         """懒加载配置（仅在首次使用时加载）"""
@@ -92,198 +228,187 @@ class NmapScanner:
         finally:
             db.close()
     
-    def execute_nmap_scan(self, target: str, arguments: str, output_path: str) -> bool:
+    async def execute_nmap_scan(
+        self,
+        target: str,
+        arguments: str,
+        output_path: str,
+        on_hosts: Optional[HostsCallback] = None,
+        scan_task_id: Optional[int] = None,
+        is_cancelled: Optional[CancelCheck] = None,
+    ) -> bool:
         """
-        执行 Nmap 扫描
-        
+        异步执行 Nmap 扫描，XML 经 stdout 流式解析，每完成一批主机即回调 on_hosts
+
         Args:
             target: 扫描目标（IP/CIDR/域名）
             arguments: Nmap 参数
-            output_path: XML 输出路径
-        
+            output_path: 原始 XML 落盘路径
+            on_hosts: 增量主机回调（协程，落库应放到工作线程）
+            scan_task_id: 扫描任务ID（用于 cancel_scan 定位进程）
+            is_cancelled: 周期性检查的取消条件（协程，如查询 ScanTask 状态是否已被改写）
+
         Returns:
             是否成功
+
+        Raises:
+            ScanCancelled: 扫描被取消
         """
         if not self.nmap_path or not os.path.exists(self.nmap_path):
             logger.error(f"Nmap 路径不存在: {self.nmap_path}")
             return False
-        
-        # 构建命令
+
+        # 构建命令（XML 输出到 stdout，边扫边解析）
         cmd = [
             self.nmap_path,
             target,
-            "-oX", output_path,  # XML 输出
+            "-oX", "-",
         ] + arguments.split()
-        
+
+        logger.info(f"执行 Nmap 扫描: {' '.join(cmd)}")
         try:
-            logger.info(f"执行 Nmap 扫描: {' '.join(cmd)}")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=3600,  # 1小时超时
-                encoding='utf-8',
-                errors='ignore'
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
             )
-            
-            if result.returncode != 0:
-                logger.error(f"Nmap 扫描失败: {result.stderr}")
+        except Exception as e:
+            logger.error(f"Nmap 启动失败: {e}", exc_info=True)
+            return False
+
+        if scan_task_id is not None:
+            self._processes[scan_task_id] = process
+        # stderr 并发读取，避免管道写满阻塞 nmap
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        stream = NmapHostStream()
+
+        try:
+            with open(output_path, "wb") as raw_output:
+                await asyncio.wait_for(
+                    self._pump_output(process, stream, raw_output, on_hosts, scan_task_id, is_cancelled),
+                    timeout=NMAP_SCAN_TIMEOUT_SECONDS,
+                )
+            returncode = await process.wait()
+
+            if scan_task_id is not None and scan_task_id in self._cancelled:
+                raise ScanCancelled(scan_task_id)
+
+            try:
+                hosts = stream.close()
+            except ET.ParseError as e:
+                logger.warning(f"Nmap XML 不完整: {e}")
+                hosts = []
+            if hosts and on_hosts:
+                await on_hosts(hosts)
+
+            if returncode != 0:
+                stderr = (await stderr_task).decode("utf-8", errors="ignore")
+                logger.error(f"Nmap 扫描失败: {stderr}")
                 return False
-            
+
             logger.info(f"Nmap 扫描完成，输出: {output_path}")
             return True
-        
-        except subprocess.TimeoutExpired:
+
+        except asyncio.TimeoutError:
             logger.error("Nmap 扫描超时")
             return False
-        except Exception as e:
-            logger.error(f"Nmap 扫描异常: {e}", exc_info=True)
+        finally:
+            if scan_task_id is not None:
+                self._processes.pop(scan_task_id, None)
+                self._cancelled.discard(scan_task_id)
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if not stderr_task.done():
+                stderr_task.cancel()
+
+    async def _pump_output(
+        self,
+        process: asyncio.subprocess.Process,
+        stream: "NmapHostStream",
+        raw_output: BinaryIO,
+        on_hosts: Optional[HostsCallback],
+        scan_task_id: Optional[int],
+        is_cancelled: Optional[CancelCheck],
+    ) -> None:
+        """读取 nmap stdout：原样落盘、增量解析，并按间隔检查取消条件"""
+        loop = asyncio.get_running_loop()
+        next_check = loop.time() + NMAP_CANCEL_POLL_SECONDS
+        while True:
+            try:
+                chunk: Optional[bytes] = await asyncio.wait_for(
+                    process.stdout.read(NMAP_READ_CHUNK_SIZE),
+                    timeout=max(0.0, next_check - loop.time()),
+                )
+            except asyncio.TimeoutError:
+                chunk = None
+
+            if loop.time() >= next_check:
+                next_check = loop.time() + NMAP_CANCEL_POLL_SECONDS
+                if scan_task_id is not None and is_cancelled and await is_cancelled():
+                    logger.info(f"扫描任务 {scan_task_id} 已被标记取消，终止 nmap")
+                    self._terminate(scan_task_id)
+
+            if chunk is None:
+                continue
+            if not chunk:
+                return
+            raw_output.write(chunk)
+            hosts = stream.feed(chunk)
+            if hosts and on_hosts:
+                await on_hosts(hosts)
+
+    def _terminate(self, scan_task_id: int) -> bool:
+        process = self._processes.get(scan_task_id)
+        if process is None:
             return False
-    
+        self._cancelled.add(scan_task_id)
+        if process.returncode is None:
+            process.terminate()
+        return True
+
+    async def cancel_scan(self, scan_task_id: int) -> bool:
+        """取消本进程内正在运行的 nmap 扫描，任务状态由 scan_target 收尾"""
+        return self._terminate(scan_task_id)
+
     def parse_nmap_xml(self, xml_path: str) -> List[Dict[str, Any]]:
         """
         解析 Nmap XML 输出
-        
+
         Args:
             xml_path: XML 文件路径
-        
+
         Returns:
             主机信息列表
         """
         try:
-            import xml.etree.ElementTree as ET
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            
-            hosts_data = []
-            
-            for host in root.findall('host'):
-                # 状态
-                status = host.find('status')
-                if status is None or status.get('state') != 'up':
-                    continue
-                
-                host_info = {
-                    'ip': '',
-                    'mac_address': '',
-                    'vendor': '',
-                    'hostname': '',
-                    'state': 'up',
-                    'os_type': '',
-                    'os_accuracy': '',
-                    'open_ports': [],
-                    'services': []
-                }
-                
-                # IP 地址
-                for addr in host.findall('address'):
-                    if addr.get('addrtype') == 'ipv4':
-                        host_info['ip'] = addr.get('addr', '')
-                    elif addr.get('addrtype') == 'mac':
-                        host_info['mac_address'] = addr.get('addr', '')
-                        host_info['vendor'] = addr.get('vendor', '')
-                
-                # 主机名
-                hostnames = host.find('hostnames')
-                if hostnames is not None:
-                    hostname = hostnames.find('hostname')
-                    if hostname is not None:
-                        host_info['hostname'] = hostname.get('name', '')
-                
-                # 操作系统
-                os_elem = host.find('os')
-                if os_elem is not None:
-                    osmatch = os_elem.find('osmatch')
-                    if osmatch is not None:
-                        host_info['os_type'] = osmatch.get('name', '')
-                        host_info['os_accuracy'] = osmatch.get('accuracy', '')
-                
-                # 端口和服务
-                ports = host.find('ports')
-                if ports is not None:
-                    for port in ports.findall('port'):
-                        state = port.find('state')
-                        if state is not None and state.get('state') == 'open':
-                            port_id = int(port.get('portid', 0))
-                            host_info['open_ports'].append(port_id)
-                            
-                            service = port.find('service')
-                            if service is not None:
-                                service_info = {
-                                    'port': port_id,
-                                    'protocol': port.get('protocol', 'tcp'),
-                                    'service': service.get('name', ''),
-                                    'product': service.get('product', ''),
-                                    'version': service.get('version', ''),
-                                    'extrainfo': service.get('extrainfo', '')
-                                }
-                                host_info['services'].append(service_info)
-                
-                if host_info['ip']:
-                    hosts_data.append(host_info)
-            
-            return hosts_data
-        
+            return list(iter_nmap_hosts(xml_path))
         except Exception as e:
             logger.error(f"解析 Nmap XML 失败: {e}", exc_info=True)
             return []
-    
-    def save_scan_results(self, scan_task_id: int, hosts_data: List[Dict[str, Any]], db: Session, trace_id: str) -> int:
+
+    def save_scan_results(
+        self,
+        scan_task_id: int,
+        hosts_data: Iterable[Dict[str, Any]],
+        db: Session,
+        trace_id: str,
+        chunk_size: Optional[int] = None,
+    ) -> int:
         """
-        保存扫描结果到数据库
+        保存扫描结果到数据库（按块批量写入）
         
         Args:
             scan_task_id: 扫描任务ID
-            hosts_data: 主机数据列表
+            hosts_data: 主机数据列表或迭代器（如 iter_nmap_hosts）
             db: 数据库会话
             trace_id: 追踪ID
+            chunk_size: 每块写入行数，默认 SCAN_FINDING_INSERT_CHUNK_SIZE
         
         Returns:
             保存的主机数量
         """
-        count = 0
-        
-        for host in hosts_data:
-            try:
-                # 为每个主机创建一个 ScanFinding（主机发现）
-                finding = ScanFinding(
-                    scan_task_id=scan_task_id,
-                    asset=host['ip'],
-                    mac_address=host.get('mac_address', ''),
-                    vendor=host.get('vendor', ''),
-                    hostname=host.get('hostname', ''),
-                    state=host.get('state', 'up'),
-                    os_type=host.get('os_type', ''),
-                    os_accuracy=host.get('os_accuracy', ''),
-                    evidence=json.dumps({
-                        'open_ports': host.get('open_ports', []),
-                        'services': host.get('services', [])
-                    }, ensure_ascii=False),
-                    status="NEW",
-                    trace_id=trace_id
-                )
-                db.add(finding)
-                count += 1
-                
-                # 为每个开放端口创建一个 ScanFinding（服务发现）
-                for service in host.get('services', []):
-                    service_finding = ScanFinding(
-                        scan_task_id=scan_task_id,
-                        asset=host['ip'],
-                        port=service['port'],
-                        service=f"{service['service']} {service.get('product', '')} {service.get('version', '')}".strip(),
-                        evidence=json.dumps(service, ensure_ascii=False),
-                        status="NEW",
-                        trace_id=trace_id
-                    )
-                    db.add(service_finding)
-            
-            except Exception as e:
-                logger.error(f"保存主机 {host.get('ip')} 失败: {e}", exc_info=True)
-                continue
-        
-        db.commit()
-        return count
+        return save_nmap_hosts(db, scan_task_id, hosts_data, trace_id, chunk_size)
     
     def get_win7_hosts(self, scan_task_id: int, db: Session) -> List[Dict[str, Any]]:
         """
@@ -327,6 +452,20 @@ class NmapScanner:
         
         return win7_hosts
     
+    def ensure_asset(self, target: str, db: Session) -> Asset:
+        """查找或创建扫描目标对应的 Asset"""
+        asset = db.query(Asset).filter(Asset.target == target).first()
+        if not asset:
+            asset = Asset(
+                target=target,
+                target_type="IP" if "." in target and "/" not in target else "CIDR",
+                enabled=1
+            )
+            db.add(asset)
+            db.commit()
+            db.refresh(asset)
+        return asset
+
     async def scan_target(self, target: str, profile: str, db: Session, trace_id: str) -> Dict[str, Any]:
         """
         扫描单个目标
@@ -342,27 +481,7 @@ class NmapScanner:
         """
         self._ensure_config_loaded()
         
-        # 扫描配置映射
-        profiles = {
-            "quick": "-sS -T4 -F",
-            "default": "-sS -sV -T4 -p 1-1000",
-            "comprehensive": "-sS -sV -O -A -T4 -p-",
-            "vuln": "-sV --script=vuln -T4"
-        }
-        
-        arguments = profiles.get(profile, profiles["default"])
-        
-        # 查找或创建 Asset
-        asset = db.query(Asset).filter(Asset.target == target).first()
-        if not asset:
-            asset = Asset(
-                target=target,
-                target_type="IP" if "." in target and "/" not in target else "CIDR",
-                enabled=1
-            )
-            db.add(asset)
-            db.commit()
-            db.refresh(asset)
+        asset = self.ensure_asset(target, db)
         
         # 创建 ScanTask
         scan_task = ScanTask(
@@ -378,59 +497,136 @@ class NmapScanner:
         db.add(scan_task)
         db.commit()
         db.refresh(scan_task)
+
+        return await self.run_scan_task(scan_task, db, trace_id)
+
+    async def run_scan_task(self, scan_task: ScanTask, db: Session, trace_id: str) -> Dict[str, Any]:
+        """
+        执行已创建的 ScanTask（分片子任务与续扫复用）
+        
+        Args:
+            scan_task: 扫描任务
+            db: 数据库会话（须为 scan_task 所属会话）
+            trace_id: 追踪ID
+        
+        Returns:
+            扫描结果
+        """
+        self._ensure_config_loaded()
+
+        arguments = NMAP_PROFILE_ARGUMENTS.get(scan_task.profile, NMAP_PROFILE_ARGUMENTS["default"])
+        target = scan_task.target
+
+        if scan_task.state != "RUNNING":
+            scan_task.state = "RUNNING"
+            scan_task.error_message = None
+            scan_task.started_at = datetime.now(timezone.utc)
+            scan_task.ended_at = None
+            db.commit()
         
         # 输出路径
         output_dir = "scan_outputs"
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, f"scan_{scan_task.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xml")
-        
-        try:
-            # 执行扫描
-            success = self.execute_nmap_scan(target, arguments, output_path)
-            
-            if not success:
-                scan_task.state = "FAILED"
-                scan_task.error_message = "Nmap 扫描执行失败"
-                scan_task.ended_at = datetime.now(timezone.utc)
-                db.commit()
-                return {"success": False, "message": "扫描执行失败", "task_id": scan_task.id}
-            
-            # 解析结果
-            hosts_data = self.parse_nmap_xml(output_path)
-            
-            if not hosts_data:
-                scan_task.state = "COMPLETED"
-                scan_task.raw_output_path = output_path
-                scan_task.ended_at = datetime.now(timezone.utc)
-                db.commit()
-                return {"success": True, "message": "扫描完成，未发现主机", "task_id": scan_task.id, "hosts_count": 0}
-            
-            # 保存结果
-            count = self.save_scan_results(scan_task.id, hosts_data, db, trace_id)
-            
-            # 更新任务状态
-            scan_task.state = "COMPLETED"
+        scan_task_id = scan_task.id
+
+        # 主机边扫边落库，缓冲区有上限；落库与状态查询在工作线程中使用各自的会话，不阻塞事件循环
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+        pending_hosts: List[Dict[str, Any]] = []
+        count = 0
+        last_flush = time.monotonic()
+
+        def save_in_thread(hosts: List[Dict[str, Any]]) -> int:
+            thread_db = session_factory()
+            try:
+                return self.save_scan_results(scan_task_id, hosts, thread_db, trace_id)
+            finally:
+                thread_db.close()
+
+        def state_in_thread() -> Optional[str]:
+            thread_db = session_factory()
+            try:
+                return thread_db.query(ScanTask.state).filter(ScanTask.id == scan_task_id).scalar()
+            finally:
+                thread_db.close()
+
+        async def flush_hosts() -> None:
+            nonlocal count, last_flush
+            if pending_hosts:
+                hosts = list(pending_hosts)
+                pending_hosts.clear()
+                count += await asyncio.to_thread(save_in_thread, hosts)
+            last_flush = time.monotonic()
+
+        async def on_hosts(hosts: List[Dict[str, Any]]) -> None:
+            pending_hosts.extend(hosts)
+            if (
+                len(pending_hosts) >= NMAP_FLUSH_HOSTS
+                or time.monotonic() - last_flush >= NMAP_FLUSH_INTERVAL_SECONDS
+            ):
+                await flush_hosts()
+
+        async def is_cancelled() -> bool:
+            # 其他进程可通过改写任务状态请求取消
+            state = await asyncio.to_thread(state_in_thread)
+            return state is not None and state != "RUNNING"
+
+        def finish(state: str, error_message: Optional[str] = None) -> None:
+            scan_task.state = state
             scan_task.raw_output_path = output_path
+            if error_message is not None:
+                scan_task.error_message = error_message
             scan_task.ended_at = datetime.now(timezone.utc)
             db.commit()
-            
+
+        try:
+            # 执行扫描
+            success = await self.execute_nmap_scan(
+                target,
+                arguments,
+                output_path,
+                on_hosts=on_hosts,
+                scan_task_id=scan_task_id,
+                is_cancelled=is_cancelled,
+            )
+            await flush_hosts()
+
+            if not success:
+                finish("FAILED", "Nmap 扫描执行失败")
+                return {"success": False, "message": "扫描执行失败", "task_id": scan_task_id, "hosts_count": count}
+
+            finish("COMPLETED")
+
+            if not count:
+                return {"success": True, "message": "扫描完成，未发现主机", "task_id": scan_task_id, "hosts_count": 0}
+
             logger.info(f"[{trace_id}] 扫描完成，发现 {count} 个主机")
-            
+
             return {
                 "success": True,
                 "message": f"扫描完成，发现 {count} 个主机",
-                "task_id": scan_task.id,
+                "task_id": scan_task_id,
                 "hosts_count": count,
                 "output_path": output_path
             }
-        
+
+        except ScanCancelled:
+            await flush_hosts()
+            finish("FAILED", CANCELLED_MESSAGE)
+            logger.info(f"[{trace_id}] 扫描已取消，已保存 {count} 个主机")
+            return {"success": False, "message": "扫描已取消", "task_id": scan_task_id, "hosts_count": count}
+
+        except asyncio.CancelledError:
+            # 外层任务已被取消，剩余主机的落库不能再被打断
+            await asyncio.shield(flush_hosts())
+            finish("FAILED", CANCELLED_MESSAGE)
+            raise
+
         except Exception as e:
             logger.error(f"[{trace_id}] 扫描失败: {e}", exc_info=True)
-            scan_task.state = "FAILED"
-            scan_task.error_message = str(e)
-            scan_task.ended_at = datetime.now(timezone.utc)
-            db.commit()
-            return {"success": False, "message": str(e), "task_id": scan_task.id}
+            db.rollback()
+            finish("FAILED", str(e))
+            return {"success": False, "message": str(e), "task_id": scan_task_id}
 
 
 # 全局单例
@@ -0,0 +1,193 @@
+"""
+仪表盘概览统计
+每张表一次 SUM(CASE ...) 聚合出全部计数，结果放入短 TTL 缓存，供所有 overview 接口共享。
+ORM 提交（含 query().update()/delete()）涉及相关表时立即失效；Core 批量写入（如告警入站）依赖 TTL 过期。
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import and_, case, event, func, or_
+from sqlalchemy.orm import Session
+
+from core.database import (
+    Asset,
+    CollectorConfig,
+    ExecutionTask,
+    ScanFinding,
+    ScanTask,
+    ThreatEvent,
+)
+
+DEFAULT_CACHE_TTL_SECONDS = 5.0
+TRACKED_MODELS = (Asset, CollectorConfig, ExecutionTask, ScanFinding, ScanTask, ThreatEvent)
+SCAN_FAILED_STATES = ["FAILED", "FAILED_TIMEOUT", "FAILED_PARSE", "UNREACHABLE"]
+
+_DIRTY_KEY = "overview_stats_dirty"
+
+
+def get_cache_ttl_seconds() -> float:
+    try:
+        value = float(os.getenv("OVERVIEW_CACHE_TTL_SECONDS", str(DEFAULT_CACHE_TTL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_CACHE_TTL_SECONDS
+    return max(0.0, value)
+
+
+def count_if(*conditions):
+    """SUM(CASE WHEN ... THEN 1 ELSE 0 END)，空表返回 0"""
+    return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+
+
+def _as_int_dict(row) -> Dict[str, int]:
+    return {key: int(value or 0) for key, value in row._mapping.items()}
+
+
+def compute_overview_counts(db: Session) -> Dict[str, Any]:
+    """单次遍历每张表，聚合 metrics / chain-status / todos 所需的全部计数"""
+    now = datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    last_24h = now - timedelta(hours=24)
+    last_7d = now - timedelta(days=7)
+    # 所有时间窗口中最早的起点，用于缩小扫描范围
+    window_start = min(today_start, last_7d)
+
+    threat = db.query(
+        count_if(ThreatEvent.created_at >= today_start).label("today_alerts"),
+        count_if(ThreatEvent.created_at >= last_24h).label("last_24h"),
+        count_if(ThreatEvent.created_at >= last_7d).label("last_7d"),
+        count_if(ThreatEvent.created_at >= last_7d, ThreatEvent.ai_score.isnot(None)).label("scored_7d"),
+        count_if(ThreatEvent.status == "PENDING").label("pending"),
+        count_if(ThreatEvent.status == "PENDING", ThreatEvent.ai_score >= 80).label("high_risk_pending"),
+    ).filter(
+        or_(ThreatEvent.created_at >= window_start, ThreatEvent.status == "PENDING")
+    ).one()
+
+    execution = db.query(
+        count_if(ExecutionTask.created_at >= last_7d).label("last_7d"),
+        count_if(ExecutionTask.created_at >= last_7d, ExecutionTask.state == "SUCCESS").label("success_7d"),
+        count_if(
+            ExecutionTask.created_at >= last_7d, ExecutionTask.state.in_(["FAILED", "RETRYING"])
+        ).label("failed_7d"),
+        count_if(ExecutionTask.state == "MANUAL_REQUIRED").label("manual_required"),
+        count_if(ExecutionTask.state == "SUCCESS", ExecutionTask.ended_at >= today_start).label("today_blocked"),
+    ).filter(
+        or_(
+            ExecutionTask.created_at >= window_start,
+            ExecutionTask.ended_at >= today_start,
+            ExecutionTask.state == "MANUAL_REQUIRED",
+        )
+    ).one()
+
+    asset = db.query(
+        func.count(Asset.id).label("total"),
+        count_if(Asset.enabled == 1).label("enabled"),
+    ).one()
+
+    scan_task = db.query(
+        count_if(ScanTask.created_at >= last_7d).label("last_7d"),
+        count_if(ScanTask.created_at >= today_start).label("today"),
+        count_if(ScanTask.state == "RUNNING").label("running"),
+        count_if(ScanTask.created_at >= last_7d, ScanTask.state == "REPORTED").label("reported_7d"),
+        count_if(ScanTask.created_at >= last_7d, ScanTask.state.in_(SCAN_FAILED_STATES)).label("failed_7d"),
+    ).filter(
+        or_(ScanTask.created_at >= window_start, ScanTask.state == "RUNNING")
+    ).one()
+
+    finding = db.query(
+        func.count(ScanFinding.id).label("total"),
+        count_if(ScanFinding.created_at >= last_7d).label("last_7d"),
+        count_if(ScanFinding.severity == "HIGH").label("high"),
+        count_if(ScanFinding.severity == "MEDIUM").label("medium"),
+        count_if(ScanFinding.severity == "HIGH", ScanFinding.status == "NEW").label("high_new"),
+    ).one()
+
+    collectors = {"hfish": False, "nmap": False}
+    enabled_rows = (
+        db.query(CollectorConfig.collector_type, CollectorConfig.config_value)
+        .filter(
+            CollectorConfig.collector_type.in_(list(collectors)),
+            CollectorConfig.config_key == "enabled",
+        )
+        .order_by(CollectorConfig.id)
+        .all()
+    )
+    for collector_type, value in enabled_rows:
+        collectors[collector_type] = str(value or "").strip().lower() in ("1", "true", "yes", "on")
+
+    return {
+        "threat": _as_int_dict(threat),
+        "execution": _as_int_dict(execution),
+        "asset": _as_int_dict(asset),
+        "scan_task": _as_int_dict(scan_task),
+        "finding": _as_int_dict(finding),
+        "collectors": collectors,
+        "generated_at": now,
+    }
+
+
+class OverviewCache:
+    """按数据库 + 统计名缓存聚合结果；失效通过代数计数避免计算中途失效后写回旧值"""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get_or_compute(self, db: Session, name: str, compute: Callable[[Session], Any]) -> Any:
+        key = (str(db.get_bind().url), name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = compute(db)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + get_cache_ttl_seconds(), value)
+        return value
+
+    def counts(self, db: Session) -> Dict[str, Any]:
+        return self.get_or_compute(db, "counts", compute_overview_counts)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+overview_cache = OverviewCache()
+
+
+def _touches_tracked(instances) -> bool:
+    return any(isinstance(instance, TRACKED_MODELS) for instance in instances)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session, flush_context) -> None:
+    if _touches_tracked(session.new) or _touches_tracked(session.dirty) or _touches_tracked(session.deleted):
+        session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_bulk(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, TRACKED_MODELS):
+        orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        overview_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
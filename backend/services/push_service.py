@@ -9,9 +9,8 @@ import smtplib
 from email.message import EmailMessage
 from typing import Any, Dict
 
-import httpx
-
 from core.database import PushChannel
+from services.http_clients import UPSTREAM_PUSH, http_clients
 
 
 def _bool_env(name: str, default: bool) -> bool:
@@ -52,11 +51,11 @@ class PushService:
             "trace_id": trace_id,
         }
 
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            if method == "GET":
-                response = await client.get(channel.target, params=payload, headers=headers)
-            else:
-                response = await client.post(channel.target, json=payload, headers=headers)
+        client = http_clients.get(UPSTREAM_PUSH)
+        if method == "GET":
+            response = await client.get(channel.target, params=payload, headers=headers, timeout=timeout_seconds)
+        else:
+            response = await client.post(channel.target, json=payload, headers=headers, timeout=timeout_seconds)
 
         ok = response.status_code < 400
         return {
@@ -73,8 +72,7 @@ class PushService:
             "msgtype": "text",
             "text": {"content": message},
         }
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(channel.target, json=payload)
+        response = await http_clients.get(UPSTREAM_PUSH).post(channel.target, json=payload, timeout=10.0)
         success = response.status_code < 400
         detail = f"wecom_status={response.status_code}"
         if success:
@@ -100,8 +98,7 @@ class PushService:
             "msgtype": "text",
             "text": {"content": message},
         }
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(channel.target, json=payload)
+        response = await http_clients.get(UPSTREAM_PUSH).post(channel.target, json=payload, timeout=10.0)
         success = response.status_code < 400
         detail = f"dingtalk_status={response.status_code}"
         if success:
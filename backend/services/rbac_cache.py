@@ -0,0 +1,214 @@
+"""
+RBAC 权限解析缓存。
+按版本号缓存 用户名 → 用户行、用户 → 角色 与 角色 → 权限集合：任何连接对 user / user_role / role_permission /
+role / permission 表的写入（ORM 与原生 SQL 均经 after_cursor_execute）都会递增版本号并清空缓存；条目另有 TTL，
+兜底其他进程对同一数据库的改动。版本标签同时写入 JWT（pv 声明），标签一致时直接信任令牌中的权限列表。
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, lazyload, make_transient_to_detached
+
+from core.database import Permission, Role, RolePermission, User, UserRole
+from services.metrics_service import metrics
+
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_ROLE = "viewer"
+
+RBAC_TABLES = frozenset({"user", "user_role", "role_permission", "role", "permission"})
+_WRITE_STATEMENT = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)"
+    r"\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+RoleList = Tuple[str, ...]
+
+
+def get_ttl_seconds() -> float:
+    """0 表示关闭缓存（每次都查库）"""
+    try:
+        value = float(os.getenv("RBAC_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_TTL_SECONDS
+    return max(0.0, value)
+
+
+def written_rbac_table(statement: str) -> Optional[str]:
+    """写语句命中 RBAC 表时返回表名"""
+    if not statement or statement.lstrip()[:1].upper() not in ("I", "U", "D"):
+        return None
+    match = _WRITE_STATEMENT.match(statement)
+    if match and match.group(1).lower() in RBAC_TABLES:
+        return match.group(1).lower()
+    return None
+
+
+class RBACCache:
+    """用户角色与角色权限的版本化缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._users: Dict[str, Tuple[float, Optional[User]]] = {}
+        self._user_roles: Dict[int, Tuple[float, Tuple[Tuple[int, str], ...]]] = {}
+        self._role_permissions: Dict[int, Tuple[float, FrozenSet[str]]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def version_tag(self) -> str:
+        """进程内唯一的版本标签，写入 JWT 的 pv 声明"""
+        return f"{self._epoch}.{self._version}"
+
+    def invalidate(self, reason: str = "manual") -> int:
+        with self._lock:
+            flushed = len(self._users) + len(self._user_roles) + len(self._role_permissions)
+            self._version += 1
+            self._users.clear()
+            self._user_roles.clear()
+            self._role_permissions.clear()
+        metrics.inc("rbac_cache_invalidations_total")
+        metrics.inc(f"rbac_cache_invalidations_total:{reason}")
+        return flushed
+
+    def forget_user(self, user_id: int) -> None:
+        with self._lock:
+            self._user_roles.pop(int(user_id), None)
+
+    def user(self, db: Session, username: str) -> Optional[User]:
+        """按用户名取用户；缓存的是脱离会话的列快照，经 merge(load=False) 挂回当前会话，不产生查询"""
+        now = time.monotonic()
+        cached = self._users.get(username)
+        if cached is not None and cached[0] > now:
+            self._hits += 1
+            snapshot = cached[1]
+            return db.merge(snapshot, load=False) if snapshot is not None else None
+
+        self._misses += 1
+        version = self._version
+        # 角色走缓存，不随用户查询联表加载 user_roles
+        user = db.query(User).options(lazyload(User.user_roles)).filter(User.username == username).first()
+        snapshot = None
+        if user is not None:
+            snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+            make_transient_to_detached(snapshot)
+        ttl = get_ttl_seconds()
+        with self._lock:
+            if ttl > 0 and version == self._version:
+                self._users[username] = (now + ttl, snapshot)
+        return user
+
+    def _load_user_roles(self, db: Session, user_id: int) -> Tuple[Tuple[int, str], ...]:
+        now = time.monotonic()
+        cached = self._user_roles.get(user_id)
+        if cached is not None and cached[0] > now:
+            self._hits += 1
+            return cached[1]
+        self._misses += 1
+        version = self._version
+        rows = (
+            db.query(Role.id, Role.name)
+            .join(UserRole, UserRole.role_id == Role.id)
+            .filter(UserRole.user_id == user_id)
+            .order_by(UserRole.id)
+            .all()
+        )
+        roles = tuple((int(row[0]), str(row[1])) for row in rows if row[1])
+        ttl = get_ttl_seconds()
+        with self._lock:
+            # 查询期间发生失效时不回填，避免写入旧数据
+            if ttl > 0 and version == self._version:
+                self._user_roles[user_id] = (now + ttl, roles)
+        return roles
+
+    def _load_role_permissions(self, db: Session, role_ids: Tuple[int, ...]) -> FrozenSet[str]:
+        now = time.monotonic()
+        permissions = set()
+        missing = []
+        for role_id in role_ids:
+            cached = self._role_permissions.get(role_id)
+            if cached is not None and cached[0] > now:
+                permissions.update(cached[1])
+            else:
+                missing.append(role_id)
+        if not missing:
+            self._hits += 1
+            return frozenset(permissions)
+
+        self._misses += 1
+        version = self._version
+        rows = (
+            db.query(RolePermission.role_id, Permission.name)
+            .join(Permission, Permission.id == RolePermission.permission_id)
+            .filter(RolePermission.role_id.in_(missing))
+            .all()
+        )
+        loaded: Dict[int, set] = {role_id: set() for role_id in missing}
+        for role_id, name in rows:
+            if name:
+                loaded[int(role_id)].add(str(name))
+        ttl = get_ttl_seconds()
+        with self._lock:
+            if ttl > 0 and version == self._version:
+                for role_id, names in loaded.items():
+                    self._role_permissions[role_id] = (now + ttl, frozenset(names))
+        for names in loaded.values():
+            permissions.update(names)
+        return frozenset(permissions)
+
+    def roles(self, db: Session, user_id: int) -> RoleList:
+        return tuple(name for _, name in self._load_user_roles(db, int(user_id)))
+
+    def primary_role(self, db: Session, user_id: int) -> str:
+        roles = self.roles(db, user_id)
+        return roles[0] if roles else DEFAULT_ROLE
+
+    def permissions(self, db: Session, user_id: int) -> FrozenSet[str]:
+        role_ids = tuple(role_id for role_id, _ in self._load_user_roles(db, int(user_id)))
+        if not role_ids:
+            return frozenset()
+        return self._load_role_permissions(db, role_ids)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "version": self.version_tag(),
+            "ttl_seconds": get_ttl_seconds(),
+            "users": len(self._users),
+            "user_roles": len(self._user_roles),
+            "roles": len(self._role_permissions),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+# 全局单例
+rbac_cache = RBACCache()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _invalidate_on_rbac_write(conn, cursor, statement, parameters, context, executemany):
+    table = written_rbac_table(statement)
+    if table is None:
+        return
+    conn.info["rbac_dirty"] = True
+    rbac_cache.invalidate(table)
+
+
+@event.listens_for(Engine, "commit")
+def _invalidate_on_rbac_commit(conn):
+    # 写入到提交之间其他会话可能读到旧数据并回填，提交时再失效一次
+    if conn.info.pop("rbac_dirty", False):
+        rbac_cache.invalidate("commit")
+
+
+@event.listens_for(Engine, "rollback")
+def _invalidate_on_rbac_rollback(conn):
+    if conn.info.pop("rbac_dirty", False):
+        rbac_cache.invalidate("rollback")
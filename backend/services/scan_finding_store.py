@@ -0,0 +1,116 @@
+"""
+ScanFinding 批量写入。
+绕过 ORM 工作单元，按块以 INSERT ... executemany 写入，块大小可通过 SCAN_FINDING_INSERT_CHUNK_SIZE 配置。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.database import ScanFinding
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSERT_CHUNK_SIZE = 1000
+
+_evidence_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def get_insert_chunk_size() -> int:
+    try:
+        value = int(os.getenv("SCAN_FINDING_INSERT_CHUNK_SIZE", str(DEFAULT_INSERT_CHUNK_SIZE)))
+    except ValueError:
+        value = DEFAULT_INSERT_CHUNK_SIZE
+    return max(1, value)
+
+
+def nmap_host_rows(scan_task_id: int, host: Dict[str, Any], trace_id: str) -> List[Dict[str, Any]]:
+    """Nmap 主机 -> 一条主机发现 + 每个开放服务一条服务发现"""
+    services = host.get('services', [])
+    rows = [
+        {
+            "scan_task_id": scan_task_id,
+            "asset": host['ip'],
+            "mac_address": host.get('mac_address', ''),
+            "vendor": host.get('vendor', ''),
+            "hostname": host.get('hostname', ''),
+            "state": host.get('state', 'up'),
+            "os_type": host.get('os_type', ''),
+            "os_accuracy": host.get('os_accuracy', ''),
+            "evidence": _evidence_encoder.encode({
+                'open_ports': host.get('open_ports', []),
+                'services': services
+            }),
+            "status": "NEW",
+            "trace_id": trace_id,
+        }
+    ]
+    for service in services:
+        rows.append(
+            {
+                "scan_task_id": scan_task_id,
+                "asset": host['ip'],
+                "port": service['port'],
+                "service": f"{service['service']} {service.get('product', '')} {service.get('version', '')}".strip(),
+                "evidence": _evidence_encoder.encode(service),
+                "status": "NEW",
+                "trace_id": trace_id,
+            }
+        )
+    return rows
+
+
+def insert_findings(db: Session, rows: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> int:
+    """按块 executemany 写入发现（不提交事务），返回写入行数"""
+    if not rows:
+        return 0
+    chunk_size = chunk_size or get_insert_chunk_size()
+
+    # executemany 要求每行参数键一致
+    columns = {column.name for column in ScanFinding.__table__.columns}
+    row_keys = sorted({key for row in rows for key in row if key in columns})
+    stmt = insert(ScanFinding.__table__)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        db.execute(stmt, [{key: row.get(key) for key in row_keys} for row in chunk])
+    return len(rows)
+
+
+def save_nmap_hosts(
+    db: Session,
+    scan_task_id: int,
+    hosts: Iterable[Dict[str, Any]],
+    trace_id: str,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    流式消费主机迭代器，攒满一块即写入并提交，内存只保留一块行数据
+
+    Returns:
+        保存的主机数量
+    """
+    chunk_size = chunk_size or get_insert_chunk_size()
+    pending: List[Dict[str, Any]] = []
+    count = 0
+
+    for host in hosts:
+        try:
+            rows = nmap_host_rows(scan_task_id, host, trace_id)
+        except Exception as e:
+            logger.error(f"保存主机 {host.get('ip')} 失败: {e}", exc_info=True)
+            continue
+        pending.extend(rows)
+        count += 1
+        if len(pending) >= chunk_size:
+            insert_findings(db, pending, chunk_size)
+            db.commit()
+            pending = []
+
+    insert_findings(db, pending, chunk_size)
+    db.commit()
+    return count
@@ -0,0 +1,244 @@
+"""
+Nmap 分片扫描规划
+大网段按固定前缀拆分为子网分片，每个分片对应一个子 ScanTask，由有界 worker 池并行执行；
+分片完成即把发现并入父任务。父任务保持 RUNNING 期间中断（进程崩溃、调度器停止）后，
+再次运行会续用父任务，只重扫未完成的分片。
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.database import ScanFinding, ScanTask, SessionLocal
+from services.nmap_scanner import NmapScanner, nmap_scanner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_PREFIX = 24
+
+
+def get_shard_prefix() -> int:
+    try:
+        value = int(os.getenv("NMAP_SHARD_PREFIX", str(DEFAULT_SHARD_PREFIX)))
+    except ValueError:
+        value = DEFAULT_SHARD_PREFIX
+    return min(32, max(8, value))
+
+
+def get_max_concurrent_shards() -> int:
+    default = os.cpu_count() or 4
+    try:
+        value = int(os.getenv("NMAP_MAX_CONCURRENT_SHARDS", str(default)))
+    except ValueError:
+        value = default
+    return max(1, value)
+
+
+def plan_shards(target: str, prefix: Optional[int] = None) -> List[str]:
+    """将 IPv4 网段拆分为 /prefix 子网；单 IP、域名、IPv6 及不大于分片的网段原样返回"""
+    prefix = prefix or get_shard_prefix()
+    try:
+        network = ipaddress.ip_network(target.strip(), strict=False)
+    except ValueError:
+        return [target]
+    if network.version != 4 or network.prefixlen >= prefix:
+        return [target]
+    return [str(subnet) for subnet in network.subnets(new_prefix=prefix)]
+
+
+class ShardedScanPlanner:
+    """分片扫描调度：父任务 + 分片子任务，有界并发执行并支持续扫"""
+
+    def __init__(self, scanner: NmapScanner):
+        self.scanner = scanner
+
+    def _find_resumable_parent(self, target: str, profile: str, db: Session) -> Optional[ScanTask]:
+        has_children = db.query(ScanTask.parent_task_id).filter(ScanTask.parent_task_id.isnot(None))
+        return (
+            db.query(ScanTask)
+            .filter(
+                ScanTask.tool_name == "nmap",
+                ScanTask.parent_task_id.is_(None),
+                ScanTask.target == target,
+                ScanTask.profile == profile,
+                ScanTask.state == "RUNNING",
+                ScanTask.id.in_(has_children),
+            )
+            .order_by(ScanTask.id.desc())
+            .first()
+        )
+
+    def prepare(self, target: str, profile: str, db: Session, trace_id: str) -> Tuple[ScanTask, List[int]]:
+        """
+        创建或续用父任务，返回父任务及待执行的分片子任务 ID
+
+        续扫时未完成分片的残留发现会被清理，避免与重扫结果重复。
+        """
+        parent = self._find_resumable_parent(target, profile, db)
+        if parent is not None:
+            pending = (
+                db.query(ScanTask)
+                .filter(ScanTask.parent_task_id == parent.id, ScanTask.state != "COMPLETED")
+                .order_by(ScanTask.id)
+                .all()
+            )
+            pending_ids = [child.id for child in pending]
+            if pending_ids:
+                db.query(ScanFinding).filter(ScanFinding.scan_task_id.in_(pending_ids)).delete(
+                    synchronize_session=False
+                )
+                for child in pending:
+                    child.state = "CREATED"
+                    child.error_message = None
+                    child.ended_at = None
+                db.commit()
+            logger.info(f"[{parent.trace_id}] 续扫 {target}：剩余 {len(pending_ids)} 个分片")
+            return parent, pending_ids
+
+        asset = self.scanner.ensure_asset(target, db)
+        now = datetime.now(timezone.utc)
+        parent = ScanTask(
+            asset_id=asset.id,
+            target=target,
+            target_type=asset.target_type,
+            tool_name="nmap",
+            profile=profile,
+            state="RUNNING",
+            trace_id=trace_id,
+            started_at=now,
+        )
+        db.add(parent)
+        db.flush()
+
+        children = [
+            ScanTask(
+                asset_id=asset.id,
+                target=shard,
+                target_type="CIDR" if "/" in shard else asset.target_type,
+                tool_name="nmap",
+                profile=profile,
+                parent_task_id=parent.id,
+                state="CREATED",
+                trace_id=trace_id,
+            )
+            for shard in plan_shards(target)
+        ]
+        db.add_all(children)
+        db.commit()
+        logger.info(f"[{trace_id}] 规划扫描 {target}：{len(children)} 个分片")
+        return parent, [child.id for child in children]
+
+    async def _run_shard(self, child_id: int) -> None:
+        db = SessionLocal()
+        try:
+            child = db.query(ScanTask).filter(ScanTask.id == child_id).first()
+            if child is None or child.state == "COMPLETED":
+                return
+            result = await self.scanner.run_scan_task(child, db, child.trace_id)
+            if result["success"] and child.parent_task_id is not None:
+                # 分片完成：发现并入父任务
+                db.query(ScanFinding).filter(ScanFinding.scan_task_id == child_id).update(
+                    {ScanFinding.scan_task_id: child.parent_task_id}, synchronize_session=False
+                )
+                db.commit()
+        finally:
+            db.close()
+
+    async def _worker(self, queue: "asyncio.Queue[int]") -> None:
+        while True:
+            try:
+                child_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self._run_shard(child_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"分片任务 {child_id} 执行异常: {e}", exc_info=True)
+
+    def _finalize(self, parent_id: int, db: Session) -> Dict[str, Any]:
+        parent = db.query(ScanTask).filter(ScanTask.id == parent_id).one()
+        children = db.query(ScanTask.id, ScanTask.state).filter(ScanTask.parent_task_id == parent_id).all()
+        completed_ids = [child_id for child_id, state in children if state == "COMPLETED"]
+        failed = len(children) - len(completed_ids)
+
+        # 兜底：分片已完成但合并前中断的发现
+        if completed_ids:
+            db.query(ScanFinding).filter(ScanFinding.scan_task_id.in_(completed_ids)).update(
+                {ScanFinding.scan_task_id: parent_id}, synchronize_session=False
+            )
+
+        hosts_count = (
+            db.query(ScanFinding)
+            .filter(ScanFinding.scan_task_id == parent_id, ScanFinding.port.is_(None))
+            .count()
+        )
+        parent.state = "FAILED" if failed else "COMPLETED"
+        parent.error_message = f"{failed}/{len(children)} 个分片失败" if failed else None
+        parent.ended_at = datetime.now(timezone.utc)
+        db.commit()
+
+        message = f"扫描完成，{len(children)} 个分片，发现 {hosts_count} 个主机"
+        if failed:
+            message = f"{parent.error_message}，已发现 {hosts_count} 个主机"
+        return {
+            "success": not failed,
+            "message": message,
+            "task_id": parent_id,
+            "target": parent.target,
+            "trace_id": parent.trace_id,
+            "hosts_count": hosts_count,
+            "shards": len(children),
+            "failed_shards": failed,
+        }
+
+    async def run(
+        self,
+        targets: List[str],
+        profile: str,
+        trace_id_factory: Callable[[], str],
+        concurrency: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        分片扫描一组目标，所有目标的分片共享同一个有界 worker 池
+
+        Args:
+            targets: 扫描目标（IP/CIDR/域名）
+            profile: 扫描配置
+            trace_id_factory: 为新建父任务生成 trace_id 的无参函数
+            concurrency: 并发分片数，默认 NMAP_MAX_CONCURRENT_SHARDS
+
+        Returns:
+            每个目标父任务的汇总结果
+        """
+        self.scanner._ensure_config_loaded()
+
+        db = SessionLocal()
+        try:
+            parent_ids: List[int] = []
+            queue: "asyncio.Queue[int]" = asyncio.Queue()
+            for target in targets:
+                parent, pending_ids = self.prepare(target, profile, db, trace_id_factory())
+                parent_ids.append(parent.id)
+                for child_id in pending_ids:
+                    queue.put_nowait(child_id)
+        finally:
+            db.close()
+
+        workers = min(concurrency or get_max_concurrent_shards(), max(1, queue.qsize()))
+        await asyncio.gather(*(self._worker(queue) for _ in range(workers)))
+
+        db = SessionLocal()
+        try:
+            return [self._finalize(parent_id, db) for parent_id in parent_ids]
+        finally:
+            db.close()
+
+
+# 全局单例
+scan_planner = ShardedScanPlanner(nmap_scanner)
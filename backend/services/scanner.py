@@ -13,6 +13,7 @@ from pathlib import Path
 from core.database import SessionLocal, ScanTask, ScanFinding, Asset
 from services.ai_engine import ai_engine
 from services.audit_service import AuditService
+from services.scan_finding_store import insert_findings
 
 
 class NmapParser:
@@ -379,30 +380,27 @@ class Scanner:
             findings = result.get("findings", [])
             scan_task.raw_output_path = result.get("output_file", "")
 
-            new_count = 0
+            # 一次查出任务内已有的去重键，避免逐条查询
+            existing_keys = {
+                (row.asset, row.port, row.service)
+                for row in db.query(ScanFinding.asset, ScanFinding.port, ScanFinding.service)
+                .filter(ScanFinding.scan_task_id == task_id)
+                .all()
+            }
+            rows: List[Dict[str, Any]] = []
             dedup_count = 0
             for finding in findings:
+                key = (target, finding.get("port"), finding.get("service"))
+                if key in existing_keys:
+                    dedup_count += 1
+                    continue
+
                 severity = NmapParser.determine_severity(
                     finding.get("service", ""),
                     finding.get("port", 0),
                     finding.get("scripts", []),
                 )
 
-                # 去重检查：同一任务内 asset+port+service 不重复入库
-                existing_finding = (
-                    db.query(ScanFinding)
-                    .filter(
-                        ScanFinding.scan_task_id == task_id,
-                        ScanFinding.asset == target,
-                        ScanFinding.port == finding.get("port"),
-                        ScanFinding.service == finding.get("service"),
-                    )
-                    .first()
-                )
-                if existing_finding:
-                    dedup_count += 1
-                    continue
-
                 # 构建证据字符串
                 evidence = f"Port: {finding.get('port')}/{finding.get('protocol')}\n"
                 evidence += (
@@ -413,20 +411,22 @@ class Scanner:
                     for script in finding["scripts"]:
                         evidence += f"  - {script['id']}: {script['output'][:200]}\n"
 
-                scan_finding = ScanFinding(
-                    scan_task_id=task_id,
-                    asset=target,
-                    port=finding.get("port"),
-                    service=finding.get("service"),
-                    vuln_id=None,
-                    cve=None,
-                    severity=severity,
-                    evidence=evidence[:2000],
-                    status="NEW",
-                    trace_id=trace_id,
+                rows.append(
+                    {
+                        "scan_task_id": task_id,
+                        "asset": target,
+                        "port": finding.get("port"),
+                        "service": finding.get("service"),
+                        "vuln_id": None,
+                        "cve": None,
+                        "severity": severity,
+                        "evidence": evidence[:2000],
+                        "status": "NEW",
+                        "trace_id": trace_id,
+                    }
                 )
-                db.add(scan_finding)
-                new_count += 1
+
+            new_count = insert_findings(db, rows)
 
             if dedup_count:
                 print(f"Task {task_id}: skipped {dedup_count} duplicate findings")
@@ -9,17 +9,23 @@
 """
 import asyncio
 import logging
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from services.hfish_collector import hfish_collector
+from services.hfish_collector import get_max_concurrent_syncs, hfish_federation
 from services.nmap_scanner import nmap_scanner
+from services.scan_planner import scan_planner
+from services.threat_rollup import get_compact_interval_seconds, threat_rollup
+from services.workflow_queue import workflow_run_queue
 from core.database import AuditLog, SessionLocal
 
 logger = logging.getLogger(__name__)
 
 SCHEDULER_ACTOR = "scheduler"
+HFISH_TICK_SECONDS = 5
+HFISH_REFRESH_SECONDS = 60
 
 
 def _write_audit(db, action: str, target: str, result: str,
@@ -59,45 +65,64 @@ class SchedulerService:
     def __init__(self):
         self.running = False
         self.hfish_task: Optional[asyncio.Task] = None
+        self.hfish_source_tasks: set[asyncio.Task] = set()
         self.nmap_task: Optional[asyncio.Task] = None
+        self.rollup_task: Optional[asyncio.Task] = None
+
+    async def _sync_hfish_source(self, collector, semaphore: asyncio.Semaphore):
+        """在全局并发上限内同步单个 HFish 源，并写审计"""
+        trace_id = f"hfish_sync_{uuid.uuid4().hex[:8]}"
+        try:
+            async with semaphore:
+                result = await collector.sync_once(trace_id)
+        finally:
+            collector.syncing = False
+        if result.get("in_progress"):
+            # 手动同步正在运行，本轮跳过
+            return
+
+        target = f"hfish_collector:{collector.source_name}"
+        db = SessionLocal()
+        try:
+            if result["success"]:
+                logger.info(f"HFish 源 {collector.source_name} 同步成功: {result['message']}")
+            else:
+                logger.warning(f"HFish 源 {collector.source_name} 同步失败: {result['message']}")
+            _write_audit(
+                db,
+                action="hfish_auto_sync",
+                target=target,
+                result="SUCCESS" if result["success"] else "FAILED",
+                trace_id=trace_id,
+                error_message=result.get("message"),
+            )
+        finally:
+            db.close()
 
     async def _hfish_sync_loop(self):
-        """HFish 同步循环（防御坚守自动任务）"""
+        """HFish 多源同步循环（防御坚守自动任务）
+
+        每个 tick 挑出已到期的源并发同步；每个源有独立的间隔、游标与失败退避，
+        全局并发由 HFISH_MAX_CONCURRENT_SYNCS 限制。
+        """
         logger.info("HFish 同步任务已启动（防御坚守自动运行）")
+        semaphore = asyncio.Semaphore(get_max_concurrent_syncs())
+        last_refresh = float("-inf")
 
         while self.running:
             try:
-                if hfish_collector.enabled:
-                    trace_id = f"hfish_sync_{uuid.uuid4().hex[:8]}"
-                    result = await hfish_collector.sync_once(trace_id)
+                # 定期重新发现源，兼容其他 worker 通过 API 注册/删除的源
+                if time.monotonic() - last_refresh >= HFISH_REFRESH_SECONDS:
+                    await hfish_federation.reload()
+                    last_refresh = time.monotonic()
+                for collector in hfish_federation.due_sources():
+                    # 提前占位，避免下一个 tick 在任务真正开始前重复调度
+                    collector.syncing = True
+                    task = asyncio.create_task(self._sync_hfish_source(collector, semaphore))
+                    self.hfish_source_tasks.add(task)
+                    task.add_done_callback(self.hfish_source_tasks.discard)
 
-                    db = SessionLocal()
-                    try:
-                        if result["success"]:
-                            logger.info(f"HFish 同步成功: {result['message']}")
-                            _write_audit(
-                                db,
-                                action="hfish_auto_sync",
-                                target="hfish_collector",
-                                result="SUCCESS",
-                                trace_id=trace_id,
-                                error_message=result.get("message"),
-                            )
-                        else:
-                            logger.warning(f"HFish 同步失败: {result['message']}")
-                            _write_audit(
-                                db,
-                                action="hfish_auto_sync",
-                                target="hfish_collector",
-                                result="FAILED",
-                                trace_id=trace_id,
-                                error_message=result.get("message"),
-                            )
-                    finally:
-                        db.close()
-
-                # 等待下一次同步
-                await asyncio.sleep(hfish_collector.sync_interval)
+                await asyncio.sleep(HFISH_TICK_SECONDS)
 
             except asyncio.CancelledError:
                 logger.info("HFish 同步任务被取消")
@@ -109,49 +134,38 @@ class SchedulerService:
     async def _nmap_scan_loop(self):
         """Nmap 定时扫描循环（主动探测自动任务）
 
-        每次扫描均通过 nmap_scanner.scan_target 创建 ScanTask 记录，
-        并将调度执行结果写入 AuditLog，确保自动任务全程可追溯。
+        每次扫描经 scan_planner 将网段拆分为分片子 ScanTask 并行执行，
+        结果并入每个网段的父任务，并将调度执行结果写入 AuditLog，确保自动任务全程可追溯。
+        上次扫描中断时，首轮会续扫未完成的分片。
         """
         logger.info("Nmap 定时扫描任务已启动（主动探测自动任务）")
 
         while self.running:
             try:
                 if nmap_scanner.enabled and nmap_scanner.ip_ranges:
+                    logger.info(f"[自动调度] 开始分片扫描 {len(nmap_scanner.ip_ranges)} 个网段")
+                    results = await scan_planner.run(
+                        nmap_scanner.ip_ranges,
+                        profile="default",
+                        trace_id_factory=lambda: f"nmap_auto_{uuid.uuid4().hex[:8]}",
+                    )
+
                     db = SessionLocal()
                     try:
-                        for ip_range in nmap_scanner.ip_ranges:
-                            trace_id = f"nmap_auto_{uuid.uuid4().hex[:8]}"
-                            logger.info(f"[自动调度] 开始扫描 {ip_range}，trace_id={trace_id}")
-
-                            result = await nmap_scanner.scan_target(
-                                target=ip_range,
-                                profile="default",
-                                db=db,
-                                trace_id=trace_id,
-                            )
-
+                        for result in results:
                             if result["success"]:
-                                logger.info(f"Nmap 自动扫描成功: {result['message']}")
-                                _write_audit(
-                                    db,
-                                    action="nmap_auto_scan",
-                                    target=ip_range,
-                                    result="SUCCESS",
-                                    trace_id=trace_id,
-                                    error_message=result.get("message"),
-                                    target_type="nmap_scan",
-                                )
+                                logger.info(f"Nmap 自动扫描成功: {result['target']} {result['message']}")
                             else:
-                                logger.warning(f"Nmap 自动扫描失败: {result['message']}")
-                                _write_audit(
-                                    db,
-                                    action="nmap_auto_scan",
-                                    target=ip_range,
-                                    result="FAILED",
-                                    trace_id=trace_id,
-                                    error_message=result.get("message"),
-                                    target_type="nmap_scan",
-                                )
+                                logger.warning(f"Nmap 自动扫描失败: {result['target']} {result['message']}")
+                            _write_audit(
+                                db,
+                                action="nmap_auto_scan",
+                                target=result["target"],
+                                result="SUCCESS" if result["success"] else "FAILED",
+                                trace_id=result["trace_id"],
+                                error_message=result.get("message"),
+                                target_type="nmap_scan",
+                            )
                     finally:
                         db.close()
 
@@ -164,6 +178,19 @@ class SchedulerService:
             except Exception as e:
                 logger.error(f"Nmap 扫描任务异常: {e}", exc_info=True)
                 await asyncio.sleep(300)  # 出错后等待5分钟再重试
+
+    async def _rollup_loop(self):
+        """ThreatEvent 汇总压实循环：把已结束的小时与迟到事件汇总进 threat_event_rollup"""
+        while self.running:
+            try:
+                await asyncio.to_thread(threat_rollup.compact)
+                await asyncio.sleep(get_compact_interval_seconds())
+            except asyncio.CancelledError:
+                logger.info("汇总压实任务被取消")
+                break
+            except Exception as e:
+                logger.error(f"汇总压实任务异常: {e}", exc_info=True)
+                await asyncio.sleep(get_compact_interval_seconds())
     
     async def start(self):
         """启动调度器"""
@@ -180,6 +207,12 @@ class SchedulerService:
         # 启动 Nmap 扫描任务
         self.nmap_task = asyncio.create_task(self._nmap_scan_loop())
         
+        # 启动统计汇总压实任务
+        self.rollup_task = asyncio.create_task(self._rollup_loop())
+        
+        # 启动工作流运行队列 worker（WORKFLOW_QUEUE_WORKERS=0 时本进程不消费）
+        await workflow_run_queue.start()
+        
         logger.info("后台调度器启动完成")
     
     async def stop(self):
@@ -206,6 +239,23 @@ class SchedulerService:
             except asyncio.CancelledError:
                 pass
         
+        if self.rollup_task:
+            self.rollup_task.cancel()
+            try:
+                await self.rollup_task
+            except asyncio.CancelledError:
+                pass
+        
+        await workflow_run_queue.stop()
+        
+        for task in list(self.hfish_source_tasks):
+            task.cancel()
+        if self.hfish_source_tasks:
+            await asyncio.gather(*self.hfish_source_tasks, return_exceptions=True)
+        
+        # 释放 HFish 共享连接池
+        await hfish_federation.aclose()
+        
         logger.info("后台调度器已停止")
     
     def is_running(self) -> bool:
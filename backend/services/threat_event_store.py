@@ -0,0 +1,119 @@
+"""
+ThreatEvent 批量去重与写入。
+按 (source_vendor, source_event_id) 分块批量查询已存在事件，
+并以 INSERT ... ON CONFLICT DO NOTHING 语义批量写入，依赖 idx_threat_event_dedup 唯一索引兜底并发重复。
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from core.database import ThreatEvent
+
+EventKey = Tuple[str, str]
+
+# SQLite 旧版本单条语句最多 999 个绑定参数，分块留足余量
+LOOKUP_CHUNK_SIZE = 500
+# 无 source_event_id 事件的占位键前缀（不会出现在真实事件 ID 中）
+_UNKEYED_PREFIX = "\x00unkeyed:"
+
+
+def event_key(payload: Dict[str, Any]) -> EventKey:
+    """去重键；没有 source_event_id 的事件不参与去重，用与该 payload 绑定的唯一占位值，避免互相归并"""
+    source_event_id = payload.get("source_event_id")
+    if not source_event_id:
+        return (payload.get("source_vendor") or "", f"{_UNKEYED_PREFIX}{id(payload)}")
+    return (payload.get("source_vendor") or "", source_event_id)
+
+
+def is_unkeyed(key: EventKey) -> bool:
+    return key[1].startswith(_UNKEYED_PREFIX)
+
+
+def find_existing_event_ids(
+    db: Session,
+    keys: Iterable[EventKey],
+    chunk_size: int = LOOKUP_CHUNK_SIZE,
+) -> Dict[EventKey, int]:
+    """返回已入库事件的 {(source_vendor, source_event_id): id}，按厂商分组分块 IN 查询。"""
+    ids_by_vendor: Dict[str, set] = defaultdict(set)
+    for vendor, source_event_id in keys:
+        if source_event_id and not source_event_id.startswith(_UNKEYED_PREFIX):
+            ids_by_vendor[vendor].add(source_event_id)
+
+    existing: Dict[EventKey, int] = {}
+    for vendor, id_set in ids_by_vendor.items():
+        source_event_ids = sorted(id_set)
+        for start in range(0, len(source_event_ids), chunk_size):
+            chunk = source_event_ids[start : start + chunk_size]
+            rows = (
+                db.query(ThreatEvent.id, ThreatEvent.source_event_id)
+                .filter(
+                    ThreatEvent.source_vendor == vendor,
+                    ThreatEvent.source_event_id.in_(chunk),
+                )
+                .all()
+            )
+            for row_id, source_event_id in rows:
+                existing.setdefault((vendor, source_event_id), int(row_id))
+    return existing
+
+
+def insert_events_ignore_conflicts(
+    db: Session,
+    payloads: List[Dict[str, Any]],
+) -> Dict[EventKey, int]:
+    """
+    批量写入事件，与已有去重键冲突的行被忽略（不提交事务）。
+
+    Returns:
+        实际新写入事件的 {event_key(payload): id}
+    """
+    if not payloads:
+        return {}
+
+    columns = {column.name for column in ThreatEvent.__table__.columns}
+    keyed: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+    unkeyed: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    for payload in payloads:
+        row = {key: value for key, value in payload.items() if key in columns}
+        if payload.get("source_event_id"):
+            # executemany 要求每行参数键一致：按键集合分组，缺省列交给列默认值而不是显式写 NULL
+            keyed[tuple(sorted(row))].append(row)
+        else:
+            unkeyed.append((payload, row))
+
+    inserted: Dict[EventKey, int] = {}
+    dialect = db.get_bind().dialect.name
+    table = ThreatEvent.__table__
+    if dialect in {"sqlite", "postgresql"}:
+        insert_factory = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = (
+            insert_factory(table)
+            .on_conflict_do_nothing()
+            .returning(table.c.id, table.c.source_vendor, table.c.source_event_id)
+        )
+        for rows in keyed.values():
+            for row_id, vendor, source_event_id in db.execute(stmt, rows).all():
+                inserted[(vendor or "", source_event_id)] = int(row_id)
+    else:
+        # 其他方言：先查后插，仍保持一次批量 flush
+        rows = [row for group in keyed.values() for row in group]
+        existing = find_existing_event_ids(db, [event_key(row) for row in rows])
+        events = [ThreatEvent(**row) for row in rows if event_key(row) not in existing]
+        db.add_all(events)
+        db.flush()
+        inserted.update({(event.source_vendor or "", event.source_event_id): int(event.id) for event in events})
+
+    # 无去重键的事件不会与唯一索引冲突，逐个 ORM 对象写入以取回各自的行 ID
+    if unkeyed:
+        events = [ThreatEvent(**row) for _, row in unkeyed]
+        db.add_all(events)
+        db.flush()
+        for (payload, _), event in zip(unkeyed, events):
+            inserted[event_key(payload)] = int(event.id)
+    return inserted
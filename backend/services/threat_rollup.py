@@ -0,0 +1,304 @@
+"""
+ThreatEvent 小时级汇总（rollup）。
+后台压实器把已结束的整点小时按 (来源厂商, 维度, 维度值) 计数写入 threat_event_rollup；
+统计接口对已汇总的整点区间读汇总表，只对区间首部不足一小时的部分与尚未压实的尾部读原始事件。
+
+增量依据：新插入事件按 id 水位（HFish 事件 created_at 为攻击时间，可能落在早已汇总的小时），
+AI 评分等后续更新按 updated_at 水位；涉及的小时整体重算，重算幂等。
+批量删除原始事件后需调用 reset()，下次压实时全量重建。
+"""
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, ThreatEvent, ThreatEventRollup, ThreatEventRollupState
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("total", "high", "threat_label", "service_name", "ip")
+HIGH_SCORE_THRESHOLD = 80
+DEFAULT_COMPACT_INTERVAL_SECONDS = 300
+# updated_at 水位回退量：覆盖压实期间提交、时间戳略早于水位的更新
+SCAN_OVERLAP = timedelta(seconds=60)
+STREAM_CHUNK_SIZE = 5000
+INSERT_CHUNK_SIZE = 1000
+STATE_ID = 1
+
+_DIMENSION_COLUMNS = {
+    "threat_label": ThreatEvent.threat_label,
+    "service_name": ThreatEvent.service_name,
+    "ip": ThreatEvent.ip,
+}
+
+Range = Tuple[datetime, datetime]
+
+
+def get_compact_interval_seconds() -> int:
+    try:
+        value = int(os.getenv("THREAT_ROLLUP_INTERVAL_SECONDS", str(DEFAULT_COMPACT_INTERVAL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_COMPACT_INTERVAL_SECONDS
+    return max(10, value)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value: datetime) -> datetime:
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+def _merge_hours(hours: Iterable[datetime]) -> List[Range]:
+    """把离散的整点小时合并成连续区间"""
+    ranges: List[Range] = []
+    for hour in sorted(set(hours)):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1] = (ranges[-1][0], hour + timedelta(hours=1))
+        else:
+            ranges.append((hour, hour + timedelta(hours=1)))
+    return ranges
+
+
+def _row_keys(row) -> Iterable[Tuple[str, str]]:
+    yield "total", ""
+    if row.ai_score is not None and row.ai_score >= HIGH_SCORE_THRESHOLD:
+        yield "high", ""
+    yield "threat_label", row.threat_label or ""
+    if row.service_name is not None:
+        yield "service_name", row.service_name
+    yield "ip", row.ip
+
+
+class ThreatRollupService:
+    """ThreatEvent 汇总：压实（写）与分段统计（读）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    # ── 压实 ──
+
+    def compact(self, bind: Optional[Engine] = None, now: Optional[datetime] = None) -> int:
+        """汇总新结束的小时及有新增/更新事件的历史小时，返回重算的小时区间数"""
+        session = Session(bind=bind) if bind is not None else SessionLocal()
+        try:
+            with self._lock:
+                return self._compact(session, _naive_utc(now or datetime.now(timezone.utc)))
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _compact(self, session: Session, now: datetime) -> int:
+        close_until = _floor_hour(now)
+        state = session.get(ThreatEventRollupState, STATE_ID)
+        if state is None:
+            state = ThreatEventRollupState(id=STATE_ID, last_event_id=0)
+            session.add(state)
+        max_event_id = session.query(func.max(ThreatEvent.id)).scalar() or 0
+
+        # 1) 自上次水位以来新结束的小时：整段重算
+        ranges: List[Range] = []
+        range_start = state.rolled_until
+        if range_start is None:
+            earliest = session.query(func.min(ThreatEvent.created_at)).scalar()
+            range_start = _floor_hour(_naive_utc(earliest)) if earliest is not None else close_until
+        if range_start < close_until:
+            ranges.append((range_start, close_until))
+
+        # 2) 已汇总小时内的迟到事件与更新：按小时重算
+        if state.rolled_until is not None:
+            changed = or_(ThreatEvent.id > state.last_event_id, ThreatEvent.updated_at > state.scanned_at) \
+                if state.scanned_at is not None else ThreatEvent.id > state.last_event_id
+            created_rows = (
+                session.query(ThreatEvent.created_at)
+                .filter(changed, ThreatEvent.id <= max_event_id, ThreatEvent.created_at < range_start)
+                .distinct()
+                .all()
+            )
+            ranges.extend(
+                _merge_hours(_floor_hour(_naive_utc(row[0])) for row in created_rows if row[0] is not None)
+            )
+
+        for start, end in ranges:
+            self._rebuild_range(session, start, end)
+
+        state.rolled_until = max(close_until, state.rolled_until or close_until)
+        state.last_event_id = max_event_id
+        state.scanned_at = now - SCAN_OVERLAP
+        state.updated_at = now
+        session.commit()
+        if ranges:
+            logger.info(f"ThreatEvent 汇总压实完成: {len(ranges)} 个区间，水位 {state.rolled_until}")
+        return len(ranges)
+
+    def _rebuild_range(self, session: Session, start: datetime, end: datetime) -> None:
+        session.query(ThreatEventRollup).filter(
+            ThreatEventRollup.bucket_start >= start,
+            ThreatEventRollup.bucket_start < end,
+        ).delete(synchronize_session=False)
+
+        counts: Counter = Counter()
+        rows = (
+            session.query(
+                ThreatEvent.created_at, ThreatEvent.source_vendor, ThreatEvent.ip,
+                ThreatEvent.threat_label, ThreatEvent.service_name, ThreatEvent.ai_score,
+            )
+            .filter(ThreatEvent.created_at >= start, ThreatEvent.created_at < end)
+            .yield_per(STREAM_CHUNK_SIZE)
+        )
+        for row in rows:
+            if row.created_at is None:
+                continue
+            bucket = _floor_hour(_naive_utc(row.created_at))
+            vendor = row.source_vendor or ""
+            for dimension, value in _row_keys(row):
+                counts[(bucket, vendor, dimension, value)] += 1
+
+        payload = [
+            {"bucket_start": bucket, "source_vendor": vendor, "dimension": dimension,
+             "dim_value": value, "count": count}
+            for (bucket, vendor, dimension, value), count in counts.items()
+        ]
+        table = ThreatEventRollup.__table__
+        for offset in range(0, len(payload), INSERT_CHUNK_SIZE):
+            session.execute(insert(table), payload[offset : offset + INSERT_CHUNK_SIZE])
+
+    def reset(self, db: Session) -> None:
+        """清空汇总与水位（不提交）；用于批量删除原始事件之后"""
+        db.query(ThreatEventRollup).delete(synchronize_session=False)
+        db.query(ThreatEventRollupState).delete(synchronize_session=False)
+
+    # ── 统计读取 ──
+
+    def _segments(self, db: Session, since: datetime, until: datetime) -> Tuple[Optional[Range], List[Range]]:
+        """[since, until) 拆成汇总区间与原始区间"""
+        state = db.get(ThreatEventRollupState, STATE_ID)
+        rolled_until = state.rolled_until if state is not None else None
+        first_full = _ceil_hour(since)
+        if rolled_until is None or rolled_until <= first_full or first_full >= until:
+            return None, [(since, until)]
+
+        rollup_end = min(rolled_until, until)
+        raw: List[Range] = []
+        if since < first_full:
+            raw.append((since, first_full))
+        if rollup_end < until:
+            raw.append((rollup_end, until))
+        return (first_full, rollup_end), raw
+
+    @staticmethod
+    def _raw_filters(ranges: List[Range], dimension: str, vendor: Optional[str]) -> list:
+        filters = [or_(*[and_(ThreatEvent.created_at >= a, ThreatEvent.created_at < b) for a, b in ranges])]
+        if vendor is not None:
+            filters.append(ThreatEvent.source_vendor == vendor)
+        if dimension == "high":
+            filters.append(ThreatEvent.ai_score >= HIGH_SCORE_THRESHOLD)
+        elif dimension == "service_name":
+            filters.append(ThreatEvent.service_name.isnot(None))
+        return filters
+
+    @staticmethod
+    def _rollup_filters(rollup: Range, dimension: str, vendor: Optional[str]) -> list:
+        filters = [
+            ThreatEventRollup.dimension == dimension,
+            ThreatEventRollup.bucket_start >= rollup[0],
+            ThreatEventRollup.bucket_start < rollup[1],
+        ]
+        if vendor is not None:
+            filters.append(ThreatEventRollup.source_vendor == vendor)
+        return filters
+
+    def count_by(
+        self,
+        db: Session,
+        dimension: str,
+        since: datetime,
+        vendor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[str, int]]:
+        """[since, 现在) 内按维度值计数，按计数降序；total / high 返回单个 ("", n)"""
+        since = _naive_utc(since)
+        rollup, raw = self._segments(db, since, _naive_utc(datetime.now(timezone.utc)))
+        counts: Counter = Counter()
+
+        if rollup is not None:
+            rows = (
+                db.query(ThreatEventRollup.dim_value, func.sum(ThreatEventRollup.count))
+                .filter(*self._rollup_filters(rollup, dimension, vendor))
+                .group_by(ThreatEventRollup.dim_value)
+                .all()
+            )
+            for value, cnt in rows:
+                counts[value or ""] += int(cnt or 0)
+
+        if raw:
+            column = _DIMENSION_COLUMNS.get(dimension)
+            filters = self._raw_filters(raw, dimension, vendor)
+            if column is None:
+                counts[""] += db.query(func.count(ThreatEvent.id)).filter(*filters).scalar() or 0
+            else:
+                rows = db.query(column, func.count(ThreatEvent.id)).filter(*filters).group_by(column).all()
+                for value, cnt in rows:
+                    counts[value or ""] += int(cnt or 0)
+
+        if dimension in ("total", "high"):
+            return [("", counts[""])]
+        return counts.most_common(limit)
+
+    def total(self, db: Session, since: datetime, vendor: Optional[str] = None) -> int:
+        return self.count_by(db, "total", since, vendor=vendor)[0][1]
+
+    def daily_counts(
+        self,
+        db: Session,
+        dimension: str,
+        since: datetime,
+        vendor: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """[since, 现在) 内按 UTC 日期计数（dimension 为 total 或 high），返回 {YYYY-MM-DD: n}"""
+        since = _naive_utc(since)
+        rollup, raw = self._segments(db, since, _naive_utc(datetime.now(timezone.utc)))
+        days: Dict[str, int] = defaultdict(int)
+
+        if rollup is not None:
+            rows = (
+                db.query(ThreatEventRollup.bucket_start, func.sum(ThreatEventRollup.count))
+                .filter(*self._rollup_filters(rollup, dimension, vendor))
+                .group_by(ThreatEventRollup.bucket_start)
+                .all()
+            )
+            for bucket, cnt in rows:
+                days[_naive_utc(bucket).strftime("%Y-%m-%d")] += int(cnt or 0)
+
+        if raw:
+            day = func.date(ThreatEvent.created_at)
+            rows = (
+                db.query(day, func.count(ThreatEvent.id))
+                .filter(*self._raw_filters(raw, dimension, vendor))
+                .group_by(day)
+                .all()
+            )
+            for value, cnt in rows:
+                days[str(value)] += int(cnt or 0)
+
+        return dict(days)
+
+
+# 全局单例
+threat_rollup = ThreatRollupService()
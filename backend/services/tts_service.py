@@ -9,7 +9,7 @@ from typing import Any, Dict, Optional
 import os
 import uuid
 
-import httpx
+from services.http_clients import UPSTREAM_TTS, http_clients
 
 
 def _bool_env(name: str, default: bool) -> bool:
@@ -90,8 +90,8 @@ class TTSService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-                response = await client.post(endpoint_url, json=payload, headers=headers)
+            client = http_clients.get(UPSTREAM_TTS)
+            response = await client.post(endpoint_url, json=payload, headers=headers, timeout=timeout_seconds)
             if response.status_code >= 400:
                 return {
                     "success": False,
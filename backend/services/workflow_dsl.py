@@ -15,6 +15,10 @@ WORKFLOW_DIR = Path(__file__).resolve().parents[1] / "workflow"
 DSL_SCHEMA_PATH = WORKFLOW_DIR / "dsl.schema.json"
 DEFENSE_DEFAULT_PATH = WORKFLOW_DIR / "defense_default_v1.json"
 
+# 并行分支：parallel 节点并发执行所有匹配的出边分支，各分支在 config.join 指定的 join 节点汇合
+PARALLEL_NODE_TYPE = "parallel"
+JOIN_NODE_TYPE = "join"
+
 
 class WorkflowDefinitionState(str, Enum):
     DRAFT = "DRAFT"
@@ -0,0 +1,284 @@
+"""
+工作流运行队列（数据库承载）。
+入队方只写入 QUEUED 运行（run_published_workflow(enqueue=True)）；各进程内的 worker 以租约认领并执行，
+执行期间周期续租。多个 uvicorn worker 与独立 worker 进程（backend/workflow_worker.py）可同时消费。
+
+认领是带条件的 UPDATE（比较并交换），SQLite 与 PostgreSQL 上都只有一个 worker 能认领成功；
+支持 FOR UPDATE SKIP LOCKED 的数据库上，候选行同时跳过他人已锁定的行，减少争用。
+租约过期仍处于 RUNNING/RETRYING 的运行视为孤儿（worker 崩溃或重启），
+由认领到它的 worker 记为 FAILED，并以相同触发来源从中断节点续跑。
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Mapping, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, WorkflowRun
+from services.workflow_dsl import WorkflowRunState
+from services.workflow_runtime import (
+    WorkflowAdapter,
+    WorkflowRuntimeResult,
+    execute_queued_run,
+    recover_orphaned_run,
+)
+
+logger = logging.getLogger(__name__)
+
+RUN_MODE_INLINE = "inline"
+RUN_MODE_QUEUE = "queue"
+DEFAULT_QUEUE_WORKERS = 2
+DEFAULT_LEASE_SECONDS = 30
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_MAX_RECOVERIES = 3
+
+CompletionHook = Callable[[Session, WorkflowRun], None]
+
+_ACTIVE_STATES = (WorkflowRunState.RUNNING.value, WorkflowRunState.RETRYING.value)
+
+
+def get_run_mode() -> str:
+    """WORKFLOW_RUN_MODE：inline 在触发方内联执行（默认），queue 写入运行队列"""
+    value = os.getenv("WORKFLOW_RUN_MODE", RUN_MODE_INLINE).strip().lower()
+    return RUN_MODE_QUEUE if value == RUN_MODE_QUEUE else RUN_MODE_INLINE
+
+
+def get_queue_workers() -> int:
+    """每个进程同时执行的队列运行数，0 表示本进程不消费队列"""
+    try:
+        value = int(os.getenv("WORKFLOW_QUEUE_WORKERS", str(DEFAULT_QUEUE_WORKERS)))
+    except ValueError:
+        value = DEFAULT_QUEUE_WORKERS
+    return max(0, value)
+
+
+def get_lease_seconds() -> int:
+    try:
+        value = int(os.getenv("WORKFLOW_QUEUE_LEASE_SECONDS", str(DEFAULT_LEASE_SECONDS)))
+    except ValueError:
+        value = DEFAULT_LEASE_SECONDS
+    return max(5, value)
+
+
+def get_poll_seconds() -> float:
+    try:
+        value = float(os.getenv("WORKFLOW_QUEUE_POLL_SECONDS", str(DEFAULT_POLL_SECONDS)))
+    except ValueError:
+        value = DEFAULT_POLL_SECONDS
+    return max(0.05, value)
+
+
+def get_max_recoveries() -> int:
+    try:
+        value = int(os.getenv("WORKFLOW_QUEUE_MAX_RECOVERIES", str(DEFAULT_MAX_RECOVERIES)))
+    except ValueError:
+        value = DEFAULT_MAX_RECOVERIES
+    return max(0, value)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _claimable(now: datetime):
+    """未被认领（或认领后未开始即失联）的 QUEUED 运行，以及租约过期的执行中运行"""
+    return or_(
+        and_(
+            WorkflowRun.run_state == WorkflowRunState.QUEUED.value,
+            or_(WorkflowRun.lease_owner.is_(None), WorkflowRun.lease_expires_at < now),
+        ),
+        and_(
+            WorkflowRun.run_state.in_(_ACTIVE_STATES),
+            WorkflowRun.lease_owner.isnot(None),
+            WorkflowRun.lease_expires_at < now,
+        ),
+    )
+
+
+class WorkflowRunQueue:
+    """工作流运行队列：租约认领、心跳续租、孤儿回收与完成回调"""
+
+    def __init__(self, worker_id: Optional[str] = None, session_factory: Callable[[], Session] = SessionLocal):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.session_factory = session_factory
+        self.running = False
+        self.worker_tasks: set[asyncio.Task] = set()
+        self._hooks: Dict[str, List[CompletionHook]] = {}
+
+    def register_completion_hook(self, trigger_source: str, hook: CompletionHook) -> None:
+        """运行结束（含回收后不再续跑）时按 trigger_source 回调，用于回写触发方业务状态"""
+        self._hooks.setdefault(trigger_source, []).append(hook)
+
+    # ── 认领与租约 ──
+
+    def claim(self, db: Session, limit: int = 1) -> List[int]:
+        """认领至多 limit 个运行并提交，返回运行 id"""
+        now = _utc_now()
+        candidates = [
+            row[0]
+            for row in db.query(WorkflowRun.id)
+            .filter(_claimable(now))
+            .order_by(WorkflowRun.id.asc())
+            .limit(limit * 2)
+            .with_for_update(skip_locked=True)
+            .all()
+        ]
+        claimed: List[int] = []
+        for run_id in candidates:
+            if len(claimed) >= limit:
+                break
+            updated = (
+                db.query(WorkflowRun)
+                .filter(WorkflowRun.id == run_id, _claimable(now))
+                .update(
+                    {
+                        "lease_owner": self.worker_id,
+                        "lease_expires_at": now + timedelta(seconds=get_lease_seconds()),
+                        "heartbeat_at": now,
+                        "claim_count": WorkflowRun.claim_count + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated:
+                claimed.append(run_id)
+        db.commit()
+        return claimed
+
+    def heartbeat(self, run_id: int) -> bool:
+        """续租；租约已被他人接管时返回 False"""
+        now = _utc_now()
+        db = self.session_factory()
+        try:
+            updated = (
+                db.query(WorkflowRun)
+                .filter(WorkflowRun.id == run_id, WorkflowRun.lease_owner == self.worker_id)
+                .update(
+                    {"lease_expires_at": now + timedelta(seconds=get_lease_seconds()), "heartbeat_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return bool(updated)
+        finally:
+            db.close()
+
+    async def _heartbeat_loop(self, run_id: int, worker: asyncio.Task) -> None:
+        interval = get_lease_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                alive = await asyncio.to_thread(self.heartbeat, run_id)
+            except Exception as e:
+                logger.warning(f"工作流运行 {run_id} 续租失败: {e}")
+                continue
+            if not alive:
+                logger.warning(f"工作流运行 {run_id} 租约已被接管，停止执行")
+                worker.cancel()
+                return
+
+    # ── 执行 ──
+
+    def _fire_hooks(self, db: Session, workflow_run: WorkflowRun) -> None:
+        for hook in self._hooks.get(workflow_run.trigger_source or "", []):
+            try:
+                hook(db, workflow_run)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"工作流运行 {workflow_run.id} 完成回调失败: {e}", exc_info=True)
+
+    async def process(
+        self,
+        run_id: int,
+        adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+    ) -> Optional[WorkflowRuntimeResult]:
+        """执行一个已认领的运行；孤儿运行先回收，续跑运行重新入队"""
+        db = self.session_factory()
+        try:
+            workflow_run = db.get(WorkflowRun, run_id)
+            if workflow_run is None or workflow_run.lease_owner != self.worker_id:
+                return None
+
+            if workflow_run.run_state in _ACTIVE_STATES:
+                resumed = recover_orphaned_run(db, run_id=run_id, max_recoveries=get_max_recoveries())
+                if resumed is not None:
+                    logger.warning(f"回收孤儿工作流运行 {run_id}，续跑运行 {resumed.id}")
+                else:
+                    logger.warning(f"回收孤儿工作流运行 {run_id}，不再续跑")
+                    self._fire_hooks(db, workflow_run)
+                return None
+
+            heartbeat = asyncio.create_task(self._heartbeat_loop(run_id, asyncio.current_task()))
+            try:
+                result = await execute_queued_run(db, run_id=run_id, adapters=adapters)
+            finally:
+                heartbeat.cancel()
+            self._fire_hooks(db, workflow_run)
+            return result
+        except asyncio.CancelledError:
+            db.rollback()
+            raise
+        except Exception as e:
+            # 运行保持 RUNNING，租约过期后按孤儿回收
+            db.rollback()
+            logger.error(f"工作流运行 {run_id} 执行异常: {e}", exc_info=True)
+            return None
+        finally:
+            db.close()
+
+    async def run_once(
+        self,
+        limit: int = 1,
+        adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+    ) -> int:
+        """认领并并发执行至多 limit 个运行，返回认领数"""
+        db = self.session_factory()
+        try:
+            run_ids = self.claim(db, limit)
+        finally:
+            db.close()
+        if run_ids:
+            # 租约被接管时单个运行会被取消，不影响同批其他运行与 worker 循环
+            await asyncio.gather(*[self.process(run_id, adapters) for run_id in run_ids], return_exceptions=True)
+        return len(run_ids)
+
+    async def _worker_loop(self) -> None:
+        while self.running:
+            try:
+                if not await self.run_once():
+                    await asyncio.sleep(get_poll_seconds())
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"工作流队列 worker 异常: {e}", exc_info=True)
+                await asyncio.sleep(get_poll_seconds())
+
+    async def start(self, workers: Optional[int] = None) -> None:
+        if self.running:
+            return
+        workers = get_queue_workers() if workers is None else workers
+        if workers <= 0:
+            return
+        self.running = True
+        for _ in range(workers):
+            task = asyncio.create_task(self._worker_loop())
+            self.worker_tasks.add(task)
+            task.add_done_callback(self.worker_tasks.discard)
+        logger.info(f"工作流运行队列已启动: {self.worker_id}，并发 {workers}")
+
+    async def stop(self) -> None:
+        """停止认领；执行中的运行被取消，租约过期后由其他 worker 回收"""
+        self.running = False
+        for task in list(self.worker_tasks):
+            task.cancel()
+        if self.worker_tasks:
+            await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+
+
+# 全局单例
+workflow_run_queue = WorkflowRunQueue()
@@ -3,11 +3,17 @@ from __future__ import annotations
 import ast
 import asyncio
 import json
+import os
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 import re
+import threading
+import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from types import CodeType
 from typing import Any, Awaitable, Callable, Mapping, Optional
 
 from sqlalchemy.orm import Session
@@ -17,16 +23,55 @@ from services.ai_engine import ai_engine
 from services.audit_service import AuditService
 from services.mcp_client import mcp_client
 from services.scanner import scanner
-from services.workflow_dsl import WorkflowDSL, WorkflowNode, WorkflowRunState, validate_workflow_dsl
+from services.workflow_dsl import (
+    JOIN_NODE_TYPE,
+    PARALLEL_NODE_TYPE,
+    WorkflowDSL,
+    WorkflowNode,
+    WorkflowRunState,
+    validate_workflow_dsl,
+)
 
 WorkflowAdapter = Callable[["WorkflowAdapterInput"], Awaitable["NodeExecutionResult"]]
 
+DEFAULT_MAX_PARALLEL_NODES = 4
+DEFAULT_JOURNAL_FLUSH_SECONDS = 1.0
+LEASE_EXPIRED_ERROR = "worker lease expired"
+# 产生外部副作用、自行管理事务或需要人工介入的节点：执行前后均落盘
+_DURABLE_NODE_TYPES = {
+    "mcp_action",
+    "manual_approval",
+    "approval",
+    "scan_task_create",
+    "scan_result_parse",
+    "scan_report",
+}
+
+
+def get_journal_flush_seconds() -> float:
+    """步骤状态写后日志的最长落盘间隔（秒），0 表示每个节点完成即提交"""
+    try:
+        value = float(os.getenv("WORKFLOW_JOURNAL_FLUSH_SECONDS", str(DEFAULT_JOURNAL_FLUSH_SECONDS)))
+    except ValueError:
+        value = DEFAULT_JOURNAL_FLUSH_SECONDS
+    return max(0.0, value)
+
+
+def get_max_parallel_nodes() -> int:
+    """单个运行内并行分支同时执行的节点数上限"""
+    try:
+        value = int(os.getenv("WORKFLOW_MAX_PARALLEL_NODES", str(DEFAULT_MAX_PARALLEL_NODES)))
+    except ValueError:
+        value = DEFAULT_MAX_PARALLEL_NODES
+    return max(1, value)
+
 
 @dataclass(slots=True)
 class CompiledTransition:
     to_node: str
     condition: str
     priority: int
+    code: CodeType | None = None
 
 
 @dataclass(slots=True)
@@ -163,15 +208,23 @@ class WorkflowRuntimeError(RuntimeError):
         self.output = output or {}
 
 
-def _evaluate_condition(condition: str, variables: Mapping[str, Any]) -> bool:
-    tree = _validate_condition_ast(condition)
+@lru_cache(maxsize=1024)
+def _compile_condition(condition: str) -> CodeType:
+    return compile(_validate_condition_ast(condition), "<workflow-condition>", "eval")
+
+
+def _evaluate_code(code: CodeType, variables: Mapping[str, Any]) -> bool:
     try:
-        value = eval(compile(tree, "<workflow-condition>", "eval"), {"__builtins__": {}}, dict(variables))
+        value = eval(code, {"__builtins__": {}}, dict(variables))
     except NameError:
         return False
     return bool(value)
 
 
+def _evaluate_condition(condition: str, variables: Mapping[str, Any]) -> bool:
+    return _evaluate_code(_compile_condition(condition), variables)
+
+
 def load_published_workflow(db: Session, workflow_key: str) -> tuple[WorkflowDefinition, WorkflowVersion, WorkflowDSL]:
     definition = (
         db.query(WorkflowDefinition)
@@ -211,13 +264,13 @@ def compile_workflow(payload: dict[str, Any] | WorkflowDSL) -> CompiledWorkflow:
     incoming_count = {node_id: 0 for node_id in nodes}
 
     for edge in dsl.edges:
-        _validate_condition_ast(edge.condition)
         incoming_count[edge.to_node] += 1
         nodes[edge.from_node].transitions.append(
             CompiledTransition(
                 to_node=edge.to_node,
                 condition=edge.condition,
                 priority=edge.priority,
+                code=_compile_condition(edge.condition),
             )
         )
 
@@ -227,6 +280,12 @@ def compile_workflow(payload: dict[str, Any] | WorkflowDSL) -> CompiledWorkflow:
 
     for node in nodes.values():
         node.transitions.sort(key=lambda item: (item.priority, item.to_node))
+        if node.node_type == PARALLEL_NODE_TYPE:
+            join_id = str(node.config.get("join") or "")
+            if join_id not in nodes or nodes[join_id].node_type != JOIN_NODE_TYPE:
+                raise ValueError(f"parallel node {node.id} requires config.join referencing a join node")
+            if not node.transitions:
+                raise ValueError(f"parallel node {node.id} requires at least one branch")
 
     terminal_node_ids = {node_id for node_id, node in nodes.items() if not node.transitions}
     runtime_states = {state.value if isinstance(state, WorkflowRunState) else str(state) for state in dsl.runtime.state_enum}
@@ -248,6 +307,70 @@ def compile_workflow(payload: dict[str, Any] | WorkflowDSL) -> CompiledWorkflow:
     )
 
 
+class CompiledWorkflowCache:
+    """
+    进程内已编译工作流缓存，键为 (workflow_id, version_id)。
+    命中时比对版本行的 dsl_json（发布会就地写入发布元数据），不一致即重新编译；
+    发布/回滚后由 API 主动失效。
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self._entries: OrderedDict[tuple[int, int], tuple[str, CompiledWorkflow]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get(self, version: WorkflowVersion) -> CompiledWorkflow:
+        key = (version.workflow_id, version.id)
+        dsl_json = version.dsl_json or ""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == dsl_json:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        compiled = compile_workflow(_json_loads(dsl_json))
+        with self._lock:
+            self._entries[key] = (dsl_json, compiled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, workflow_id: int | None = None) -> None:
+        with self._lock:
+            if workflow_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == workflow_id]:
+                del self._entries[key]
+
+
+# 全局单例
+compiled_workflow_cache = CompiledWorkflowCache()
+
+
+def load_published_compiled_workflow(
+    db: Session,
+    workflow_key: str,
+) -> tuple[WorkflowDefinition, WorkflowVersion, CompiledWorkflow]:
+    row = (
+        db.query(WorkflowDefinition, WorkflowVersion)
+        .join(
+            WorkflowVersion,
+            (WorkflowVersion.workflow_id == WorkflowDefinition.id)
+            & (WorkflowVersion.version == WorkflowDefinition.published_version),
+        )
+        .filter(WorkflowDefinition.workflow_key == workflow_key)
+        .first()
+    )
+    if row is None:
+        # 区分"未发布"与"发布版本缺失"的错误信息
+        load_published_workflow(db, workflow_key)
+        raise ValueError(f"published workflow not found: {workflow_key}")
+    definition, version = row
+    return definition, version, compiled_workflow_cache.get(version)
+
+
 def _extract_context_value(context: Mapping[str, Any], key: str, default: Any = None) -> Any:
     if key in context:
         return context[key]
@@ -590,6 +713,10 @@ async def _scan_report_adapter(payload: WorkflowAdapterInput) -> NodeExecutionRe
     )
 
 
+async def _control_adapter(payload: WorkflowAdapterInput) -> NodeExecutionResult:
+    return NodeExecutionResult(state=WorkflowRunState.SUCCESS.value, output={})
+
+
 async def _trigger_adapter(payload: WorkflowAdapterInput) -> NodeExecutionResult:
     return NodeExecutionResult(
         state=WorkflowRunState.SUCCESS.value,
@@ -704,6 +831,8 @@ _NODE_TYPE_ADAPTERS: dict[str, WorkflowAdapter] = {
     "scan_result_parse": _scan_result_parse_adapter,
     "scan_report": _scan_report_adapter,
     "audit": _audit_adapter,
+    PARALLEL_NODE_TYPE: _control_adapter,
+    JOIN_NODE_TYPE: _control_adapter,
 }
 
 _SERVICE_ADAPTERS: dict[str, WorkflowAdapter] = {
@@ -739,6 +868,7 @@ def _update_run(
     state: str,
     context: Mapping[str, Any],
     ended: bool = False,
+    commit: bool = True,
 ) -> None:
     now = _utc_now()
     workflow_run.run_state = state
@@ -748,8 +878,55 @@ def _update_run(
         workflow_run.started_at = now
     if ended:
         workflow_run.ended_at = now
-        workflow_run.output_payload = _json_dumps(context)
-    db.commit()
+        workflow_run.output_payload = workflow_run.context_json
+    if commit:
+        db.commit()
+
+
+class _RunJournal:
+    """
+    运行内写后日志：步骤状态变更先挂在会话上，在检查点合并为一次提交。
+    检查点：失败/重试/人工审批、副作用节点完成、距上次落盘超过 flush_seconds、运行结束。
+    进程崩溃最多丢失上个检查点之后的成功步骤记录；运行行在创建时已提交，可整体重放。
+    上下文有意保存完整快照而非增量：孤儿回收与人工重试直接读取 context_json / 步骤 input_payload 续跑，
+    增量存储需要按步骤回放合并，恢复路径更脆弱。写放大只通过减少提交次数、跳过未变化的上下文来控制。
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        flush_seconds: float | None = None,
+        *,
+        workflow_run: WorkflowRun | None = None,
+        context: Mapping[str, Any] | None = None,
+    ):
+        self.db = db
+        self.flush_seconds = get_journal_flush_seconds() if flush_seconds is None else flush_seconds
+        self.workflow_run = workflow_run
+        self.context = context
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def record(self, *rows: Any) -> None:
+        for row in rows:
+            self.db.add(row)
+        self.pending += 1
+
+    def maybe_checkpoint(self) -> None:
+        if self.pending and time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        if self.pending:
+            # 运行上下文随检查点落盘，孤儿回收据此续跑
+            if self.workflow_run is not None and self.context is not None:
+                context_json = _json_dumps(self.context)
+                if context_json != self.workflow_run.context_json:
+                    self.workflow_run.context_json = context_json
+                    self.workflow_run.updated_at = _utc_now()
+            self.db.commit()
+            self.pending = 0
+        self.last_flush = time.monotonic()
 
 
 def _load_workflow_run_bundle(
@@ -767,7 +944,7 @@ def _load_workflow_run_bundle(
     if row is None:
         raise WorkflowRuntimeError(f"workflow run not found: {run_id}")
     run, definition, version = row
-    compiled = compile_workflow(_json_loads(version.dsl_json))
+    compiled = compiled_workflow_cache.get(version)
     return run, definition, version, compiled
 
 
@@ -894,22 +1071,23 @@ def _create_step_run(
     trace_id: str,
     input_payload: Mapping[str, Any],
 ) -> WorkflowStepRun:
+    """创建已进入 RUNNING 的步骤记录（不提交，由写后日志在检查点落盘）"""
+    now = _utc_now()
     step = WorkflowStepRun(
         workflow_run_id=workflow_run.id,
         workflow_id=workflow_id,
         workflow_version_id=workflow_version_id,
         node_id=node.id,
         node_type=node.node_type,
-        step_state=WorkflowRunState.QUEUED.value,
+        step_state=WorkflowRunState.RUNNING.value,
         attempt=attempt,
         input_payload=_json_dumps(input_payload),
         trace_id=trace_id,
-        created_at=_utc_now(),
-        updated_at=_utc_now(),
+        started_at=now,
+        created_at=now,
+        updated_at=now,
     )
     db.add(step)
-    db.commit()
-    db.refresh(step)
     return step
 
 
@@ -924,11 +1102,14 @@ async def _execute_node(
     trace_id: str,
     context: dict[str, Any],
     adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+    journal: _RunJournal | None = None,
 ) -> NodeExecutionResult:
     max_attempts = int(getattr(node.retry_policy, "max_retries", 0)) + 1
     backoff_seconds = int(getattr(node.retry_policy, "backoff_seconds", 1))
     backoff_multiplier = float(getattr(node.retry_policy, "backoff_multiplier", 1.0))
     adapter = _resolve_adapter(node, adapters)
+    journal = journal or _RunJournal(db, flush_seconds=0.0)
+    durable = node.node_type in _DURABLE_NODE_TYPES
 
     for attempt in range(1, max_attempts + 1):
         step = _create_step_run(
@@ -941,10 +1122,9 @@ async def _execute_node(
             trace_id=trace_id,
             input_payload=context,
         )
-        step.step_state = WorkflowRunState.RUNNING.value
-        step.started_at = _utc_now()
-        step.updated_at = _utc_now()
-        db.commit()
+        journal.record(step)
+        if durable:
+            journal.checkpoint()
 
         try:
             result = await asyncio.wait_for(
@@ -966,7 +1146,8 @@ async def _execute_node(
                 step.output_payload = _json_dumps(result.output)
                 step.ended_at = _utc_now()
                 step.updated_at = _utc_now()
-                db.commit()
+                journal.record(step)
+                journal.checkpoint()
                 return result
 
             step.step_state = WorkflowRunState.SUCCESS.value
@@ -974,7 +1155,11 @@ async def _execute_node(
             step.error_message = None
             step.ended_at = _utc_now()
             step.updated_at = _utc_now()
-            db.commit()
+            journal.record(step)
+            if durable:
+                journal.checkpoint()
+            else:
+                journal.maybe_checkpoint()
             return result
         except asyncio.TimeoutError as exc:
             error = WorkflowRuntimeError(f"node timeout: {node.id}", retryable=True)
@@ -989,7 +1174,8 @@ async def _execute_node(
         step.output_payload = _json_dumps(error.output)
         step.ended_at = _utc_now()
         step.updated_at = _utc_now()
-        db.commit()
+        journal.record(step)
+        journal.checkpoint()
 
         if not should_retry:
             raise error
@@ -1002,15 +1188,136 @@ async def _execute_node(
     raise WorkflowRuntimeError(f"node execution exhausted: {node.id}")
 
 
+def _matching_transitions(node: CompiledNode, context: Mapping[str, Any]) -> list[str]:
+    return [
+        transition.to_node
+        for transition in node.transitions
+        if _evaluate_code(transition.code or _compile_condition(transition.condition), context)
+    ]
+
+
 def _select_next_node(node: CompiledNode, context: Mapping[str, Any]) -> str | None:
     if not node.transitions:
         return None
     for transition in node.transitions:
-        if _evaluate_condition(transition.condition, context):
+        code = transition.code or _compile_condition(transition.condition)
+        if _evaluate_code(code, context):
             return transition.to_node
     raise WorkflowRuntimeError(f"no transition matched for node {node.id}")
 
 
+@dataclass(slots=True)
+class _RunScope:
+    db: Session
+    workflow_run: WorkflowRun
+    workflow_id: int
+    workflow_version_id: int
+    compiled: CompiledWorkflow
+    actor: str
+    trace_id: str
+    adapters: Optional[Mapping[str, WorkflowAdapter]]
+    semaphore: asyncio.Semaphore
+    journal: _RunJournal
+
+
+def _fork_context(context: Mapping[str, Any]) -> dict[str, Any]:
+    branch = dict(context)
+    steps = context.get("steps")
+    if isinstance(steps, dict):
+        branch["steps"] = dict(steps)
+    return branch
+
+
+async def _run_path(
+    scope: _RunScope,
+    start_node_id: str,
+    context: dict[str, Any],
+    *,
+    stop_at: str | None = None,
+    trail: list[tuple[str, dict[str, Any]]] | None = None,
+    limited: bool = False,
+) -> str:
+    """
+    沿单条路径执行，直到终止节点、人工审批或到达汇合节点 stop_at。
+    遇到 parallel 节点时并发执行各分支，汇合后从 join 节点继续。返回 SUCCESS / MANUAL_REQUIRED。
+    """
+    current_node_id: str | None = start_node_id
+    while current_node_id is not None and current_node_id != stop_at:
+        node = scope.compiled.nodes[current_node_id]
+        execution = _execute_node(
+            scope.db,
+            workflow_run=scope.workflow_run,
+            workflow_id=scope.workflow_id,
+            workflow_version_id=scope.workflow_version_id,
+            node=node,
+            actor=scope.actor,
+            trace_id=scope.trace_id,
+            context=context,
+            adapters=scope.adapters,
+            journal=scope.journal,
+        )
+        if limited:
+            async with scope.semaphore:
+                result = await execution
+        else:
+            result = await execution
+        _merge_context(context, node.id, result.output)
+        if trail is not None:
+            trail.append((node.id, dict(result.output)))
+        if result.state == WorkflowRunState.MANUAL_REQUIRED.value:
+            return WorkflowRunState.MANUAL_REQUIRED.value
+
+        if node.node_type == PARALLEL_NODE_TYPE:
+            state = await _run_parallel(scope, node, context, trail)
+            if state == WorkflowRunState.MANUAL_REQUIRED.value:
+                return state
+            current_node_id = str(node.config["join"])
+            continue
+        current_node_id = _select_next_node(node, context)
+    return WorkflowRunState.SUCCESS.value
+
+
+async def _run_parallel(
+    scope: _RunScope,
+    node: CompiledNode,
+    context: dict[str, Any],
+    trail: list[tuple[str, dict[str, Any]]] | None,
+) -> str:
+    branches = _matching_transitions(node, context)
+    if not branches:
+        raise WorkflowRuntimeError(f"no transition matched for node {node.id}")
+
+    join_id = str(node.config["join"])
+    branch_trails: list[list[tuple[str, dict[str, Any]]]] = [[] for _ in branches]
+    outcomes = await asyncio.gather(
+        *[
+            _run_path(
+                scope,
+                branch_start,
+                _fork_context(context),
+                stop_at=join_id,
+                trail=branch_trail,
+                limited=True,
+            )
+            for branch_start, branch_trail in zip(branches, branch_trails)
+        ],
+        return_exceptions=True,
+    )
+
+    # 按分支（边优先级）顺序合并输出，结果与分支完成先后无关
+    for branch_trail in branch_trails:
+        for node_id, output in branch_trail:
+            _merge_context(context, node_id, output)
+            if trail is not None:
+                trail.append((node_id, output))
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    if WorkflowRunState.MANUAL_REQUIRED.value in outcomes:
+        return WorkflowRunState.MANUAL_REQUIRED.value
+    return WorkflowRunState.SUCCESS.value
+
+
 def _find_existing_run(
     db: Session,
     *,
@@ -1032,7 +1339,24 @@ def _find_existing_run(
     )
 
 
-async def run_compiled_workflow(
+def _runtime_result(
+    workflow_run: WorkflowRun,
+    context: Mapping[str, Any] | None = None,
+    *,
+    reused_existing: bool = False,
+) -> WorkflowRuntimeResult:
+    return WorkflowRuntimeResult(
+        run_id=workflow_run.id,
+        workflow_id=workflow_run.workflow_id,
+        workflow_version_id=workflow_run.workflow_version_id,
+        run_state=workflow_run.run_state,
+        trace_id=workflow_run.trace_id,
+        reused_existing=reused_existing,
+        context=dict(context) if context is not None else _json_loads(workflow_run.context_json),
+    )
+
+
+def create_workflow_run(
     db: Session,
     *,
     definition: WorkflowDefinition,
@@ -1043,30 +1367,14 @@ async def run_compiled_workflow(
     trigger_ref: str | None = None,
     actor: str = "system",
     trace_id: str | None = None,
-    adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
     start_node_id: str | None = None,
     initial_context: Optional[Mapping[str, Any]] = None,
-    force_new_run: bool = False,
-) -> WorkflowRuntimeResult:
+    run_state: str = WorkflowRunState.QUEUED.value,
+) -> tuple[WorkflowRun, dict[str, Any]]:
+    """写入运行记录并提交；QUEUED 运行由队列 worker 认领执行"""
+    if start_node_id is not None and start_node_id not in compiled.nodes:
+        raise WorkflowRuntimeError(f"invalid start node: {start_node_id}")
     final_trace_id = trace_id or str(input_payload.get("trace_id") or uuid.uuid4())
-    if not force_new_run:
-        existing = _find_existing_run(
-            db,
-            workflow_id=definition.id,
-            trigger_source=trigger_source,
-            trigger_ref=trigger_ref,
-        )
-        if existing is not None:
-            return WorkflowRuntimeResult(
-                run_id=existing.id,
-                workflow_id=existing.workflow_id,
-                workflow_version_id=existing.workflow_version_id,
-                run_state=existing.run_state,
-                trace_id=existing.trace_id,
-                reused_existing=True,
-                context=_json_loads(existing.context_json),
-            )
-
     context = _build_runtime_context(
         input_payload=input_payload,
         trace_id=final_trace_id,
@@ -1076,75 +1384,118 @@ async def run_compiled_workflow(
         trigger_ref=trigger_ref,
         initial_context=initial_context,
     )
+    now = _utc_now()
     workflow_run = WorkflowRun(
         workflow_id=definition.id,
         workflow_version_id=version.id,
-        run_state=WorkflowRunState.QUEUED.value,
+        run_state=run_state,
         trigger_source=trigger_source,
         trigger_ref=trigger_ref,
         input_payload=_json_dumps(input_payload),
         context_json=_json_dumps(context),
         trace_id=final_trace_id,
-        created_at=_utc_now(),
-        updated_at=_utc_now(),
+        actor=actor,
+        start_node_id=start_node_id,
+        started_at=now if run_state != WorkflowRunState.QUEUED.value else None,
+        created_at=now,
+        updated_at=now,
     )
     db.add(workflow_run)
     db.commit()
-    db.refresh(workflow_run)
+    return workflow_run, context
 
-    current_node_id = start_node_id or compiled.start_node_id
-    if current_node_id not in compiled.nodes:
-        raise WorkflowRuntimeError(f"invalid start node: {current_node_id}")
-    _update_run(db, workflow_run, state=WorkflowRunState.RUNNING.value, context=context)
+
+async def _execute_run(
+    db: Session,
+    *,
+    workflow_run: WorkflowRun,
+    compiled: CompiledWorkflow,
+    context: dict[str, Any],
+    adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+) -> WorkflowRuntimeResult:
+    journal = _RunJournal(db, workflow_run=workflow_run, context=context)
+    # 进入 RUNNING 与首批步骤合并提交
+    _update_run(db, workflow_run, state=WorkflowRunState.RUNNING.value, context=context, commit=False)
+    journal.record(workflow_run)
+    scope = _RunScope(
+        db=db,
+        workflow_run=workflow_run,
+        workflow_id=workflow_run.workflow_id,
+        workflow_version_id=workflow_run.workflow_version_id,
+        compiled=compiled,
+        actor=workflow_run.actor or "system",
+        trace_id=workflow_run.trace_id,
+        adapters=adapters,
+        semaphore=asyncio.Semaphore(get_max_parallel_nodes()),
+        journal=journal,
+    )
     try:
-        while current_node_id is not None:
-            node = compiled.nodes[current_node_id]
-            result = await _execute_node(
-                db,
-                workflow_run=workflow_run,
-                workflow_id=definition.id,
-                workflow_version_id=version.id,
-                node=node,
-                actor=actor,
-                trace_id=final_trace_id,
-                context=context,
-                adapters=adapters,
-            )
-            _merge_context(context, node.id, result.output)
-            if result.state == WorkflowRunState.MANUAL_REQUIRED.value:
-                _update_run(db, workflow_run, state=WorkflowRunState.MANUAL_REQUIRED.value, context=context, ended=True)
-                return WorkflowRuntimeResult(
-                    run_id=workflow_run.id,
-                    workflow_id=definition.id,
-                    workflow_version_id=version.id,
-                    run_state=workflow_run.run_state,
-                    trace_id=final_trace_id,
-                    context=dict(context),
-                )
-
-            next_node_id = _select_next_node(node, context)
-            if next_node_id is None:
-                _update_run(db, workflow_run, state=WorkflowRunState.SUCCESS.value, context=context, ended=True)
-                return WorkflowRuntimeResult(
-                    run_id=workflow_run.id,
-                    workflow_id=definition.id,
-                    workflow_version_id=version.id,
-                    run_state=workflow_run.run_state,
-                    trace_id=final_trace_id,
-                    context=dict(context),
-                )
-            current_node_id = next_node_id
+        state = await _run_path(scope, workflow_run.start_node_id or compiled.start_node_id, context)
+        _update_run(db, workflow_run, state=state, context=context, ended=True)
     except WorkflowRuntimeError as exc:
         context["last_error"] = str(exc)
         _update_run(db, workflow_run, state=WorkflowRunState.FAILED.value, context=context, ended=True)
-        return WorkflowRuntimeResult(
-            run_id=workflow_run.id,
+    return _runtime_result(workflow_run, context)
+
+
+async def run_compiled_workflow(
+    db: Session,
+    *,
+    definition: WorkflowDefinition,
+    version: WorkflowVersion,
+    compiled: CompiledWorkflow,
+    input_payload: Mapping[str, Any],
+    trigger_source: str,
+    trigger_ref: str | None = None,
+    actor: str = "system",
+    trace_id: str | None = None,
+    adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+    start_node_id: str | None = None,
+    initial_context: Optional[Mapping[str, Any]] = None,
+    force_new_run: bool = False,
+    enqueue: bool = False,
+) -> WorkflowRuntimeResult:
+    """执行工作流；enqueue=True 时只写入 QUEUED 运行，交由运行队列执行"""
+    if not force_new_run:
+        existing = _find_existing_run(
+            db,
             workflow_id=definition.id,
-            workflow_version_id=version.id,
-            run_state=workflow_run.run_state,
-            trace_id=final_trace_id,
-            context=dict(context),
+            trigger_source=trigger_source,
+            trigger_ref=trigger_ref,
         )
+        if existing is not None:
+            return _runtime_result(existing, reused_existing=True)
+
+    # 内联执行直接以 RUNNING 写入，避免被队列 worker 当作待认领运行
+    workflow_run, context = create_workflow_run(
+        db,
+        definition=definition,
+        version=version,
+        compiled=compiled,
+        input_payload=input_payload,
+        trigger_source=trigger_source,
+        trigger_ref=trigger_ref,
+        actor=actor,
+        trace_id=trace_id,
+        start_node_id=start_node_id,
+        initial_context=initial_context,
+        run_state=WorkflowRunState.QUEUED.value if enqueue else WorkflowRunState.RUNNING.value,
+    )
+    if enqueue:
+        return _runtime_result(workflow_run, context)
+    return await _execute_run(db, workflow_run=workflow_run, compiled=compiled, context=context, adapters=adapters)
+
+
+async def execute_queued_run(
+    db: Session,
+    *,
+    run_id: int,
+    adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+) -> WorkflowRuntimeResult:
+    """执行已认领的 QUEUED 运行（由运行队列调用）"""
+    workflow_run, _, _, compiled = _load_workflow_run_bundle(db, run_id=run_id)
+    context = _json_loads(workflow_run.context_json)
+    return await _execute_run(db, workflow_run=workflow_run, compiled=compiled, context=context, adapters=adapters)
 
 
 async def replay_workflow_run(
@@ -1214,6 +1565,83 @@ async def replay_workflow_run(
     )
 
 
+def _recovery_start_node(
+    compiled: CompiledWorkflow,
+    workflow_run: WorkflowRun,
+    steps: list[WorkflowStepRun],
+    context: Mapping[str, Any],
+) -> str | None:
+    """孤儿运行的续跑节点：最早的中断步骤；无中断步骤时取最后成功步骤的后继（None 表示已走完）"""
+    default_start = workflow_run.start_node_id or compiled.start_node_id
+    # 并行分支无法从单个分支续跑，整体重跑
+    if any(node.node_type == PARALLEL_NODE_TYPE for node in compiled.nodes.values()):
+        return default_start
+    for step in steps:
+        if step.step_state == WorkflowRunState.FAILED.value and step.error_message == LEASE_EXPIRED_ERROR:
+            return step.node_id
+    succeeded = [step for step in steps if step.step_state == WorkflowRunState.SUCCESS.value]
+    if not succeeded or succeeded[-1].node_id not in compiled.nodes:
+        return default_start
+    return _select_next_node(compiled.nodes[succeeded[-1].node_id], context)
+
+
+def recover_orphaned_run(db: Session, *, run_id: int, max_recoveries: int) -> WorkflowRun | None:
+    """
+    回收租约过期的 RUNNING/RETRYING 运行：中断步骤与原运行记为 FAILED，
+    并以相同触发来源从中断节点创建 QUEUED 续跑运行。返回续跑运行；超过续跑上限或无需续跑时返回 None。
+    """
+    workflow_run, definition, version, compiled = _load_workflow_run_bundle(db, run_id=run_id)
+    context = _json_loads(workflow_run.context_json)
+    steps = _load_step_runs(db, run_id=run_id)
+    now = _utc_now()
+    for step in steps:
+        if step.step_state in (WorkflowRunState.RUNNING.value, WorkflowRunState.RETRYING.value):
+            step.step_state = WorkflowRunState.FAILED.value
+            step.error_message = LEASE_EXPIRED_ERROR
+            step.ended_at = now
+            step.updated_at = now
+
+    try:
+        resume_node_id = _recovery_start_node(compiled, workflow_run, steps, context)
+    except WorkflowRuntimeError as exc:
+        context["last_error"] = str(exc)
+        resume_node_id = None
+    else:
+        if resume_node_id is None:
+            # 最后一步已完成、仅运行终态未落盘
+            _update_run(db, workflow_run, state=WorkflowRunState.SUCCESS.value, context=context, ended=True)
+            return None
+
+    recovery_count = int(context.get("recovery_count") or 0)
+    context["last_error"] = context.get("last_error") or LEASE_EXPIRED_ERROR
+    _update_run(db, workflow_run, state=WorkflowRunState.FAILED.value, context=context, ended=True)
+    if resume_node_id is None or recovery_count >= max_recoveries:
+        return None
+
+    initial_context = dict(context)
+    initial_context.pop("last_error", None)
+    initial_context.update(
+        replay_of_run_id=run_id,
+        replay_mode="lease_recovery",
+        resume_from_node_id=resume_node_id,
+        recovery_count=recovery_count + 1,
+    )
+    resumed, _ = create_workflow_run(
+        db,
+        definition=definition,
+        version=version,
+        compiled=compiled,
+        input_payload=_json_loads(workflow_run.input_payload),
+        trigger_source=workflow_run.trigger_source or "workflow_recovery",
+        trigger_ref=workflow_run.trigger_ref,
+        actor=workflow_run.actor or "system",
+        trace_id=workflow_run.trace_id,
+        start_node_id=resume_node_id,
+        initial_context=initial_context,
+    )
+    return resumed
+
+
 async def run_published_workflow(
     db: Session,
     *,
@@ -1224,9 +1652,9 @@ async def run_published_workflow(
     actor: str = "system",
     trace_id: str | None = None,
     adapters: Optional[Mapping[str, WorkflowAdapter]] = None,
+    enqueue: bool = False,
 ) -> WorkflowRuntimeResult:
-    definition, version, dsl = load_published_workflow(db, workflow_key)
-    compiled = compile_workflow(dsl)
+    definition, version, compiled = load_published_compiled_workflow(db, workflow_key)
     return await run_compiled_workflow(
         db,
         definition=definition,
@@ -1238,4 +1666,5 @@ async def run_published_workflow(
         actor=actor,
         trace_id=trace_id,
         adapters=adapters,
+        enqueue=enqueue,
     )
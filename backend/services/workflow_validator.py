@@ -6,7 +6,7 @@ from typing import Any
 
 from pydantic import ValidationError
 
-from services.workflow_dsl import WorkflowDSL, validate_workflow_dsl
+from services.workflow_dsl import JOIN_NODE_TYPE, PARALLEL_NODE_TYPE, WorkflowDSL, validate_workflow_dsl
 
 PUBLISH_TIMEOUT_LIMIT_SECONDS = 600
 PUBLISH_MAX_RETRIES = 3
@@ -26,6 +26,8 @@ NODE_TYPE_CATEGORY = {
     "scan_result_parse": "scan",
     "scan_report": "report",
     "audit": "audit",
+    PARALLEL_NODE_TYPE: "control",
+    JOIN_NODE_TYPE: "control",
 }
 
 SERVICE_ADAPTERS = {
@@ -183,6 +185,24 @@ def _reachable(entry_nodes: list[str], adjacency: dict[str, list[str]]) -> set[s
     return visited
 
 
+def _unjoined_branch_end(branch_start: str, join_id: str, adjacency: dict[str, list[str]]) -> str | None:
+    """从分支起点出发（不越过汇合节点），返回第一个未到达汇合节点就结束的节点"""
+    visited = {branch_start}
+    stack = [branch_start]
+    while stack:
+        node_id = stack.pop()
+        if node_id == join_id:
+            continue
+        next_nodes = adjacency.get(node_id, [])
+        if not next_nodes:
+            return node_id
+        for next_node in sorted(next_nodes, reverse=True):
+            if next_node not in visited:
+                visited.add(next_node)
+                stack.append(next_node)
+    return None
+
+
 def _normalize_condition(value: str) -> str:
     normalized = " ".join((value or "true").strip().lower().split())
     return normalized or "true"
@@ -242,8 +262,26 @@ def validate_workflow_publish(payload: dict[str, Any]) -> dict[str, Any]:
     if not terminal_nodes:
         errors.append(_issue("WF_RULE_NO_TERMINAL", "rule", "工作流缺少终止节点。", "runtime.terminal_states"))
 
+    nodes_by_id = {node.id: node for node in dsl.nodes}
+    parallel_nodes = [node for node in dsl.nodes if node.type == PARALLEL_NODE_TYPE]
+    for node in parallel_nodes:
+        join_id = str(node.config.get("join") or "")
+        join_node = nodes_by_id.get(join_id)
+        if join_node is None or join_node.type != JOIN_NODE_TYPE:
+            errors.append(_issue("WF_RULE_PARALLEL_JOIN_MISSING", "rule", f"并行节点 {node.id} 未通过 config.join 指定有效的汇合节点。", f"nodes[{node.id}].config.join", node_id=node.id, value=join_id or None))
+            continue
+        branches = [edge.to_node for edge in outgoing.get(node.id, [])]
+        if len(branches) < 2:
+            errors.append(_issue("WF_RULE_PARALLEL_BRANCHES", "rule", f"并行节点 {node.id} 至少需要两个分支。", "edges", node_id=node.id))
+        for branch_start in branches:
+            branch_end = _unjoined_branch_end(branch_start, join_id, adjacency)
+            if branch_end is not None:
+                errors.append(_issue("WF_RULE_PARALLEL_UNJOINED", "rule", f"并行节点 {node.id} 的分支在节点 {branch_end} 结束，未到达汇合节点 {join_id}。", "edges", node_id=node.id, value=branch_end))
+
+    parallel_ids = {node.id for node in parallel_nodes}
     for source, edges in outgoing.items():
-        if len(edges) <= 1:
+        # 并行节点的出边全部执行，不存在分支条件冲突
+        if len(edges) <= 1 or source in parallel_ids:
             continue
         by_condition: dict[str, list[Any]] = defaultdict(list)
         by_priority: dict[int, list[Any]] = defaultdict(list)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+独立的工作流运行队列 worker 进程。
+与 API 进程共享数据库，按租约认领 QUEUED 运行；可启动多个实例横向扩展。
+用法（backend 目录）：
+    python workflow_worker.py --workers 4
+"""
+import argparse
+import asyncio
+import signal
+
+from core.database import init_db
+from core.logging_config import setup_logging
+from services.workflow_queue import get_queue_workers, workflow_run_queue
+import api.defense  # noqa: F401  注册防御执行任务的完成回调
+
+
+async def _serve(workers: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await workflow_run_queue.start(workers)
+    print(f"✓ 工作流队列 worker 已启动: {workflow_run_queue.worker_id}，并发 {workers}")
+    await stop.wait()
+    await workflow_run_queue.stop()
+    print("✓ 工作流队列 worker 已停止")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="工作流运行队列 worker")
+    parser.add_argument("--workers", type=int, default=None, help="并发执行的运行数（默认 WORKFLOW_QUEUE_WORKERS）")
+    args = parser.parse_args()
+
+    setup_logging()
+    init_db()
+    workers = args.workers if args.workers is not None else get_queue_workers()
+    asyncio.run(_serve(max(1, workers)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""AI 评估微批基准：入库富化一批互不相同的攻击 IP，统计模型调用次数与总耗时。
+
+模型按本地 CPU 上的 Ollama 建模：同一时刻只处理一个生成请求，单次耗时 = --call-ms + --per-event-ms × 事件数。
+用法（项目根目录）：
+    python scripts/bench_ai_assess_batch.py --events 256 --batch 64 --call-ms 300 --per-event-ms 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import api.defense as defense_module  # noqa: E402
+from services.ai_engine import ai_engine  # noqa: E402
+
+
+def _stub_cpu_model(call_ms: float, per_event_ms: float) -> dict:
+    counter = {"calls": 0}
+    lock = asyncio.Lock()
+
+    async def generate_json(prompt, system=None):
+        events = None
+        for line in prompt.splitlines():
+            if line.startswith("events="):
+                events = json.loads(line[len("events="):])
+        async with lock:
+            counter["calls"] += 1
+            await asyncio.sleep((call_ms + per_event_ms * len(events or [None])) / 1000)
+        if events is None:
+            return {"score": 85, "reason": "cpu model", "action_suggest": "BLOCK"}
+        return {"results": [{"id": e["id"], "score": 85, "reason": "cpu model", "action_suggest": "BLOCK"} for e in events]}
+
+    ai_engine.llm_client.generate_json = generate_json
+    return counter
+
+
+async def _bench(events: int, batch: int, call_ms: float, per_event_ms: float) -> None:
+    counter = _stub_cpu_model(call_ms, per_event_ms)
+    payloads = [
+        {"ip": f"10.71.{i // 256 % 256}.{i % 256}", "attack_count": 3, "threat_label": "bruteforce"}
+        for i in range(events)
+    ]
+    started = time.perf_counter()
+    for offset in range(0, events, batch):
+        await defense_module._enrich_events_concurrently(payloads[offset:offset + batch], deadline_seconds=3600)
+    elapsed = time.perf_counter() - started
+    print(
+        f"events={events}  total={elapsed:.2f}s  events/sec={events / elapsed:.1f}  llm_calls={counter['calls']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=64, help="每批告警事件数（对应一次 /alerts 上报）")
+    parser.add_argument("--call-ms", type=float, default=300.0, help="单次生成的固定开销（提示词预填充等）")
+    parser.add_argument("--per-event-ms", type=float, default=40.0, help="每条事件增加的生成耗时")
+    args = parser.parse_args()
+    asyncio.run(_bench(args.events, args.batch, args.call_ms, args.per_event_ms))
+
+
+if __name__ == "__main__":
+    main()
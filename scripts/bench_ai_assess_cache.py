@@ -0,0 +1,63 @@
+"""AI 威胁评估基准：模拟暴力破解攻击期间的 HFish 告警批次，统计模型调用次数与入库前 AI 富化耗时。
+
+每批告警来自少量攻击 IP（同 IP 多条事件、攻击次数递增），经 api.defense._enrich_events_concurrently 评估；
+模型调用替换为固定延迟的桩（--llm-ms）。
+用法（项目根目录）：
+    python scripts/bench_ai_assess_cache.py --events 2000 --ips 20 --batch 200 --llm-ms 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import api.defense as defense_module  # noqa: E402
+from services.ai_engine import ai_engine  # noqa: E402
+
+
+def _stub_llm(latency: float) -> dict:
+    counter = {"calls": 0}
+
+    async def generate_json(prompt, system=None):
+        counter["calls"] += 1
+        await asyncio.sleep(latency)
+        return {"score": 90, "reason": "bruteforce campaign", "action_suggest": "BLOCK"}
+
+    ai_engine.llm_client.generate_json = generate_json
+    return counter
+
+
+async def _bench(events: int, ips: int, batch: int, latency: float) -> None:
+    counter = _stub_llm(latency)
+    payloads = [
+        {"ip": f"10.70.0.{i % ips}", "attack_count": 1 + i // ips, "threat_label": "bruteforce"}
+        for i in range(events)
+    ]
+    started = time.perf_counter()
+    for offset in range(0, events, batch):
+        await defense_module._enrich_events_concurrently(payloads[offset:offset + batch], deadline_seconds=600)
+    elapsed = time.perf_counter() - started
+    print(
+        f"events={events}  ips={ips}  batches={(events + batch - 1) // batch}  total={elapsed:.2f}s  "
+        f"per_batch={elapsed / ((events + batch - 1) // batch) * 1000:.0f}ms  llm_calls={counter['calls']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--ips", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=200, help="每批告警事件数（对应一次 /alerts 上报）")
+    parser.add_argument("--llm-ms", type=float, default=200.0)
+    args = parser.parse_args()
+    asyncio.run(_bench(args.events, args.ips, args.batch, args.llm_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""AI 对话首字延迟基准：对比整段返回的 ai_engine.chat 与流式 ai_engine.chat_stream 的首 token / 完整耗时。
+
+模型替换为桩：预填充 --prefill-ms 后按 --token-ms 逐 token 生成 --tokens 个 token（非流式需等全部生成完）。
+用法（项目根目录）：
+    python scripts/bench_ai_chat_stream.py --requests 5 --tokens 200 --prefill-ms 300 --token-ms 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services.ai_engine import ai_engine  # noqa: E402
+
+
+def _stub_model(tokens: int, prefill: float, per_token: float) -> None:
+    async def generate_stream(prompt, system=None):
+        await asyncio.sleep(prefill)
+        for i in range(tokens):
+            await asyncio.sleep(per_token)
+            yield f"t{i} "
+
+    async def generate(prompt, system=None):
+        return "".join([token async for token in generate_stream(prompt, system)])
+
+    ai_engine.llm_client.generate = generate
+    ai_engine.llm_client.generate_stream = generate_stream
+
+
+async def _bench(requests: int, tokens: int, prefill: float, per_token: float) -> None:
+    _stub_model(tokens, prefill, per_token)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await ai_engine.chat("如何处置该告警？", context={"summary": "bench"})
+    blocking = (time.perf_counter() - started) / requests * 1000
+    print(f"chat          first_token={blocking:.0f}ms  total={blocking:.0f}ms")
+
+    if not hasattr(ai_engine, "chat_stream"):
+        print("chat_stream   n/a")
+        return
+    first_total = 0.0
+    full_total = 0.0
+    for _ in range(requests):
+        started = time.perf_counter()
+        first = None
+        async for item in ai_engine.chat_stream("如何处置该告警？", context={"summary": "bench"}):
+            if first is None and item["type"] == "token":
+                first = time.perf_counter() - started
+        first_total += first
+        full_total += time.perf_counter() - started
+    print(
+        f"chat_stream   first_token={first_total / requests * 1000:.0f}ms  "
+        f"total={full_total / requests * 1000:.0f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--prefill-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(_bench(args.requests, args.tokens, args.prefill_ms / 1000, args.token_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
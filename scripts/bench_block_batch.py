@@ -0,0 +1,111 @@
+"""批量封禁基准（mock 模式）：1000 个已入队的封禁任务，逐个下发与按设备合批下发的耗时和 MCP 调用数。
+
+mock 设备按“同一时刻只处理一个配置会话”建模：对同一设备的 MCP 调用串行执行，每次耗时 --latency-ms。
+逐个下发等同于 1000 次单独审批（每个任务一次 block_ip），合批下发走批量审批的执行路径。
+用法（项目根目录）：
+    python scripts/bench_block_batch.py --blocks 1000 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+os.environ["MCP_MODE"] = "mock"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import api.defense as defense_module  # noqa: E402
+from core.database import ExecutionTask, SessionLocal, ThreatEvent, init_db  # noqa: E402
+from services.mcp_client import mcp_client  # noqa: E402
+
+
+def _serialize_device_calls() -> dict:
+    counter = {"calls": 0}
+    lock = asyncio.Lock()
+    original = mcp_client.call_tool
+
+    async def call_tool(tool_name, arguments):
+        async with lock:
+            counter["calls"] += 1
+            return await original(tool_name, arguments)
+
+    mcp_client.call_tool = call_tool
+    return counter
+
+
+def _queue_blocks(blocks: int, batch: str) -> list:
+    db = SessionLocal()
+    try:
+        events = [
+            ThreatEvent(
+                ip=f"10.99.{i // 256 % 256}.{i % 256}", source="bench", status="APPROVED",
+                trace_id=f"{batch}-{i}", ai_score=90,
+            )
+            for i in range(blocks)
+        ]
+        db.add_all(events)
+        db.flush()
+        tasks = [ExecutionTask(event_id=e.id, action="BLOCK", state="QUEUED", trace_id=e.trace_id) for e in events]
+        db.add_all(tasks)
+        db.commit()
+        return [t.id for t in tasks]
+    finally:
+        db.close()
+
+
+def _succeeded(task_ids: list) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ExecutionTask).filter(
+            ExecutionTask.id.in_(task_ids), ExecutionTask.state == "SUCCESS"
+        ).count()
+    finally:
+        db.close()
+
+
+async def _run_single(task_ids: list) -> None:
+    # 与逐个审批相同：每个任务一个后台执行，各自一次 block_ip
+    await asyncio.gather(*[
+        defense_module._run_execution_task_background(task_id, "bench", None) for task_id in task_ids
+    ])
+
+
+async def _run_batched(task_ids: list) -> None:
+    await defense_module._run_execution_tasks_bulk(task_ids, "bench", None)
+
+
+async def _bench(name: str, runner, blocks: int, counter: dict) -> None:
+    task_ids = _queue_blocks(blocks, name)
+    counter["calls"] = 0
+    started = time.perf_counter()
+    await runner(task_ids)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:8s} blocks={blocks}  total={elapsed:.2f}s  mcp_calls={counter['calls']}  "
+        f"succeeded={_succeeded(task_ids)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mock 设备单次 ACL 更新耗时")
+    args = parser.parse_args()
+
+    mcp_client.mock_latency = args.latency_ms / 1000
+    init_db()
+
+    async def run():
+        counter = _serialize_device_calls()
+        await _bench("single", _run_single, args.blocks, counter)
+        await _bench("batched", _run_batched, args.blocks, counter)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
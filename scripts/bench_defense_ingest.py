@@ -0,0 +1,81 @@
+"""HFish 告警入站吞吐基准：桩 LLM 注入固定延迟，测量不同批量下的 alerts/sec。
+
+用法（项目根目录）：
+    python scripts/bench_defense_ingest.py --latency-ms 200 --batches 1 50 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from core.database import init_db  # noqa: E402
+import api.defense as defense_module  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _install_stub_llm(latency_seconds: float) -> None:
+    async def stub_assess_threat(ip, attack_type, attack_count, history=None, trace_id=None):
+        await asyncio.sleep(latency_seconds)
+        return {"score": 85, "reason": f"stub score for {ip}", "action_suggest": "BLOCK"}
+
+    defense_module.ai_engine.assess_threat = stub_assess_threat
+
+
+def _payload(run: int, size: int) -> dict:
+    return {
+        "response_code": 0,
+        "list_infos": [
+            {
+                "client_id": f"bench-{run}-{i}",
+                "service_name": "ssh-honeypot",
+                "service_type": "ssh",
+                "attack_ip": f"10.{run % 250}.{i // 250}.{i % 250}",
+                "attack_count": 3,
+                "labels": "bruteforce",
+            }
+            for i in range(size)
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    _install_stub_llm(args.latency_ms / 1000.0)
+    client = TestClient(app)
+
+    print(
+        f"stub latency={args.latency_ms:.0f}ms "
+        f"concurrency={defense_module._get_ai_enrich_concurrency()} "
+        f"deadline={defense_module._get_ai_enrich_deadline_seconds():.1f}s"
+    )
+    print(f"{'batch':>6} {'rounds':>6} {'avg_s':>8} {'alerts/sec':>11}")
+    run = 0
+    for size in args.batches:
+        elapsed = 0.0
+        for _ in range(args.rounds):
+            run += 1
+            started = time.perf_counter()
+            response = client.post("/api/v1/defense/alerts", json=_payload(run, size))
+            elapsed += time.perf_counter() - started
+            response.raise_for_status()
+        avg = elapsed / args.rounds
+        print(f"{size:>6} {args.rounds:>6} {avg:>8.3f} {size / avg:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""出站 HTTP 基准：经 LocalLLMClient 调用本地 keep-alive 上游，统计耗时与建立的 TCP 连接数。
+
+上游为本地最小 HTTP/1.1 服务器；--connect-delay-ms 为每条新连接首个请求前的额外延迟，模拟 TCP+TLS 建连往返。
+用法（项目根目录）：
+    python scripts/bench_http_clients.py --requests 500 --concurrency 50 --connect-delay-ms 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+os.environ["LLM_PROVIDER"] = "ollama"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services.ai_engine import LocalLLMClient  # noqa: E402
+
+try:
+    from services.http_clients import http_clients  # noqa: E402
+except ImportError:  # 改动前的代码树没有客户端注册表
+    http_clients = None
+
+
+async def _start_upstream(connect_delay: float):
+    stats = {"connections": 0}
+
+    async def handle(reader, writer):
+        stats["connections"] += 1
+        await asyncio.sleep(connect_delay)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                body = json.dumps({"response": "ok"}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+    return server, stats, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+async def _bench(requests: int, concurrency: int, connect_delay: float) -> None:
+    server, stats, url = await _start_upstream(connect_delay)
+    os.environ["LLM_BASE_URL"] = url
+    llm = LocalLLMClient()
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            await llm.generate("ping")
+        elapsed = time.perf_counter() - started
+        print(f"sequential  requests={requests}  total={elapsed:.2f}s  connections={stats['connections']}")
+
+        stats["connections"] = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                await llm.generate("ping")
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(requests)])
+        elapsed = time.perf_counter() - started
+        print(
+            f"concurrent  requests={requests}  concurrency={concurrency}  total={elapsed:.2f}s  "
+            f"connections={stats['connections']}"
+        )
+    finally:
+        if http_clients is not None:
+            await http_clients.aclose()
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--connect-delay-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(_bench(args.requests, args.concurrency, args.connect_delay_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""MCP stdio 基准：批量 block_ip 的总耗时（逐个调用与并发调用）。
+
+使用 scripts/fake_mcp_stdio_server.py 作为 MCP 服务器，默认模拟 1 秒冷启动与 20ms 工具处理延迟。
+用法（项目根目录）：
+    python scripts/bench_mcp_stdio.py --sequential 20 --concurrent 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+os.environ["MCP_MODE"] = "stdio"
+_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mcp_stdio_server.py")
+os.environ.setdefault("MCP_STDIO_COMMAND", f"{sys.executable} {_SERVER}")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services.mcp_client import MCPClient  # noqa: E402
+
+
+async def _bench(sequential: int, concurrent: int) -> None:
+    client = MCPClient()
+    try:
+        started = time.perf_counter()
+        for i in range(sequential):
+            result = await client.call_tool("block_ip", {"ip": f"10.97.0.{i % 256}"})
+            assert result["success"], result
+        elapsed = time.perf_counter() - started
+        print(f"sequential  calls={sequential}  total={elapsed:.2f}s  per_call={elapsed / max(1, sequential) * 1000:.0f}ms")
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            client.call_tool("block_ip", {"ip": f"10.97.{i // 256 % 256}.{i % 256}"}) for i in range(concurrent)
+        ])
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for r in results if not r.get("success"))
+        print(f"concurrent  calls={concurrent}  total={elapsed:.2f}s  failed={failed}")
+    finally:
+        await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sequential", type=int, default=20)
+    parser.add_argument("--concurrent", type=int, default=200)
+    parser.add_argument("--startup", type=float, default=1.0, help="MCP 服务器冷启动耗时（秒）")
+    parser.add_argument("--call-delay", type=float, default=0.02, help="单次工具调用处理耗时（秒）")
+    args = parser.parse_args()
+
+    os.environ["FAKE_MCP_STARTUP"] = str(args.startup)
+    os.environ["FAKE_MCP_CALL_DELAY"] = str(args.call_delay)
+    asyncio.run(_bench(args.sequential, args.concurrent))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""中间件栈基准：本地 ASGI 客户端并发压测 main.app 的 /api/health（wrk 式固定并发），统计吞吐与延迟分位。
+
+每个请求使用不同的 X-Forwarded-For，限流判定照常执行但不触发 429。
+用法（项目根目录）：
+    python scripts/bench_middleware.py --requests 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "0"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+async def _bench(requests: int, concurrency: int) -> None:
+    latencies = []
+    counter = iter(range(requests))
+    statuses = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            for i in counter:
+                headers = {"X-Forwarded-For": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}
+                started = time.perf_counter()
+                resp = await client.get("/api/health", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(
+        f"requests={requests}  concurrency={concurrency}  rps={requests / elapsed:.0f}  "
+        f"p50={p50:.2f}ms  p99={p99:.2f}ms  statuses={statuses}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(_bench(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""限流中间件基准：逐次调用 RateLimitMiddleware._is_limited，统计单次判定耗时与常驻限流键数。
+
+两种流量：--spoofed 个伪造 X-Forwarded-For 的扫描源各请求一次；单个热点客户端在 --hot-rpm 限额下连续请求。
+用法（项目根目录）：
+    python scripts/bench_rate_limit.py --spoofed 200000 --hot 200000 --hot-rpm 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("TESTING", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from core.middleware import RateLimitMiddleware  # noqa: E402
+
+
+def _keys(middleware) -> int:
+    limiter = getattr(middleware, "limiter", None)
+    return len(limiter.store) if limiter is not None else len(middleware._hits)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spoofed", type=int, default=200000)
+    parser.add_argument("--hot", type=int, default=200000)
+    parser.add_argument("--hot-rpm", type=int, default=10000)
+    args = parser.parse_args()
+
+    middleware = RateLimitMiddleware(app=None, global_rpm=120, login_rpm=5)
+    started = time.perf_counter()
+    for i in range(args.spoofed):
+        middleware._is_limited(f"global:{(i >> 24) & 255}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}", 120)
+    elapsed = time.perf_counter() - started
+    print(f"spoofed  requests={args.spoofed}  per_call={elapsed / args.spoofed * 1e6:.2f}us  keys={_keys(middleware)}")
+
+    started = time.perf_counter()
+    for _ in range(args.hot):
+        middleware._is_limited("global:10.0.0.1", args.hot_rpm)
+    elapsed = time.perf_counter() - started
+    print(f"hot      requests={args.hot}  rpm={args.hot_rpm}  per_call={elapsed / args.hot * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
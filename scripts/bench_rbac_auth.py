@@ -0,0 +1,101 @@
+"""鉴权开销基准：直接调用 get_current_user + require_permissions 依赖，统计每次鉴权耗时与 SQL 语句数。
+
+用法（项目根目录）：
+    python scripts/bench_rbac_auth.py --requests 5000 --permissions 40
+"""
+import argparse
+import asyncio
+import hashlib
+import inspect
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from api import auth  # noqa: E402
+from core.database import Base, SessionLocal, engine  # noqa: E402
+
+
+def _seed(permissions: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(
+        text(
+            "INSERT INTO user (id, username, password_hash, enabled, created_at, updated_at) "
+            "VALUES (1, 'bench', :pw, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ),
+        {"pw": hashlib.sha256(b"bench").hexdigest()},
+    )
+    db.execute(text("INSERT INTO role (id, name, created_at, updated_at) VALUES (1, 'operator', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"))
+    db.execute(text("INSERT INTO user_role (user_id, role_id) VALUES (1, 1)"))
+    for i in range(permissions):
+        db.execute(
+            text("INSERT INTO permission (id, name, resource, action, created_at) VALUES (:id, :name, 'r', 'a', CURRENT_TIMESTAMP)"),
+            {"id": i + 1, "name": f"perm_{i}"},
+        )
+        db.execute(text("INSERT INTO role_permission (role_id, permission_id, created_at) VALUES (1, :id, CURRENT_TIMESTAMP)"), {"id": i + 1})
+    db.commit()
+    db.close()
+
+
+async def _login_token() -> str:
+    db = SessionLocal()
+    try:
+        resp = await auth.login(auth.LoginRequest(username="bench", password="bench"), db=db)
+        return resp.access_token
+    finally:
+        db.close()
+
+
+async def _bench(requests: int, permissions: int) -> None:
+    _seed(permissions)
+    token = await _login_token()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    dependency = auth.require_permissions("perm_0")
+    takes_request = "request" in inspect.signature(auth.get_current_user).parameters
+
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+            kwargs = {"credentials": credentials, "db": db}
+            if takes_request:
+                kwargs["request"] = request
+            user = await auth.get_current_user(**kwargs)
+            await dependency(request=request, current_user=user, db=db)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+    print(
+        f"requests={requests}  per_auth={elapsed / requests * 1e6:.0f}us  "
+        f"sql_per_auth={statements[0] / requests:.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--permissions", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(_bench(args.requests, args.permissions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""ScanFinding 写入基准：对比逐条 ORM add 与分块批量写入在 1k/10k/100k 条发现下的耗时。
+
+用法（项目根目录）：
+    python scripts/bench_scan_findings.py --findings 1000 10000 100000 --chunk-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from core.database import Asset, ScanFinding, ScanTask, SessionLocal, init_db  # noqa: E402
+from services.scan_finding_store import save_nmap_hosts  # noqa: E402
+
+SERVICES_PER_HOST = 9  # 每台主机 1 条主机发现 + 9 条服务发现
+
+
+def _hosts(findings: int):
+    for i in range(findings // (SERVICES_PER_HOST + 1)):
+        services = [
+            {"port": 20 + p, "protocol": "tcp", "service": "svc", "product": "bench", "version": "1.0", "extrainfo": ""}
+            for p in range(SERVICES_PER_HOST)
+        ]
+        yield {
+            "ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "mac_address": "",
+            "vendor": "",
+            "hostname": f"host-{i}",
+            "state": "up",
+            "os_type": "Linux",
+            "os_accuracy": "95",
+            "open_ports": [s["port"] for s in services],
+            "services": services,
+        }
+
+
+def _save_orm(db, task_id: int, hosts) -> int:
+    """旧实现：逐条 ORM add，最后一次提交"""
+    count = 0
+    for host in hosts:
+        db.add(ScanFinding(
+            scan_task_id=task_id, asset=host["ip"], mac_address=host["mac_address"], vendor=host["vendor"],
+            hostname=host["hostname"], state=host["state"], os_type=host["os_type"],
+            os_accuracy=host["os_accuracy"],
+            evidence=json.dumps({"open_ports": host["open_ports"], "services": host["services"]}, ensure_ascii=False),
+            status="NEW", trace_id="bench",
+        ))
+        count += 1
+        for service in host["services"]:
+            db.add(ScanFinding(
+                scan_task_id=task_id, asset=host["ip"], port=service["port"],
+                service=f"{service['service']} {service['product']} {service['version']}".strip(),
+                evidence=json.dumps(service, ensure_ascii=False), status="NEW", trace_id="bench",
+            ))
+    db.commit()
+    return count
+
+
+def _new_task(db) -> int:
+    asset = db.query(Asset).filter(Asset.target == "10.0.0.0/8").first()
+    if asset is None:
+        asset = Asset(target="10.0.0.0/8", target_type="CIDR", enabled=1)
+        db.add(asset)
+        db.commit()
+    task = ScanTask(asset_id=asset.id, target=asset.target, target_type="CIDR", tool_name="nmap",
+                    profile="default", state="RUNNING", trace_id="bench")
+    db.add(task)
+    db.commit()
+    return task.id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--findings", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'findings':>9} {'orm_s':>8} {'bulk_s':>8} {'speedup':>8} {'bulk rows/sec':>14}")
+    for findings in args.findings:
+        rows = findings // (SERVICES_PER_HOST + 1) * (SERVICES_PER_HOST + 1)
+        timings = []
+        for save in (
+            lambda db, task_id: _save_orm(db, task_id, _hosts(findings)),
+            lambda db, task_id: save_nmap_hosts(db, task_id, _hosts(findings), "bench", args.chunk_size),
+        ):
+            db = SessionLocal()
+            try:
+                task_id = _new_task(db)
+                started = time.perf_counter()
+                save(db, task_id)
+                timings.append(time.perf_counter() - started)
+                assert db.query(ScanFinding).filter(ScanFinding.scan_task_id == task_id).count() == rows
+            finally:
+                db.close()
+        orm_s, bulk_s = timings
+        print(f"{rows:>9} {orm_s:>8.2f} {bulk_s:>8.2f} {orm_s / bulk_s:>7.1f}x {rows / bulk_s:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""工作流运行队列基准：预先入队一批运行，由 1..N 个 worker 进程按租约认领执行，比较每秒运行数。
+
+适配器替换为固定延迟的桩（模拟 AI / MCP 调用的 I/O 等待），数据库为临时 SQLite 文件。
+用法（项目根目录）：
+    python scripts/bench_workflow_queue.py --runs 400 --processes 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# spawn 出的子进程继承环境变量，与父进程共用同一个数据库文件
+os.environ.setdefault("BENCH_DB_DIR", tempfile.mkdtemp(prefix="aimiguan-bench-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(os.environ['BENCH_DB_DIR'], 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from sqlalchemy import event  # noqa: E402
+
+from core.database import SessionLocal, WorkflowDefinition, WorkflowRun, WorkflowVersion, engine, init_db  # noqa: E402
+from services.workflow_dsl import WorkflowRunState, load_default_defense_workflow  # noqa: E402
+from services.workflow_queue import WorkflowRunQueue  # noqa: E402
+from services.workflow_runtime import NodeExecutionResult, run_published_workflow  # noqa: E402
+
+WORKFLOW_KEY = "bench_queue"
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_connection, _record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def _stub(latency: float, output: dict):
+    async def adapter(_payload):
+        await asyncio.sleep(latency)
+        return NodeExecutionResult(state=WorkflowRunState.SUCCESS.value, output=output)
+    return adapter
+
+
+def _adapters(latency: float) -> dict:
+    return {
+        "ai_engine.assess_threat": _stub(latency, {"score": 90, "reason": "bench", "action_suggest": "BLOCK"}),
+        "mcp_client.block_ip": _stub(latency, {"blocked": True}),
+        "audit_service.log": _stub(0, {"audited": True}),
+    }
+
+
+def _publish() -> None:
+    db = SessionLocal()
+    try:
+        dsl = load_default_defense_workflow()
+        dsl["workflow_id"] = WORKFLOW_KEY
+        definition = WorkflowDefinition(
+            workflow_key=WORKFLOW_KEY, name="bench", definition_state="PUBLISHED",
+            latest_version=1, published_version=1, created_by="bench", updated_by="bench",
+        )
+        db.add(definition)
+        db.flush()
+        db.add(WorkflowVersion(
+            workflow_id=definition.id, version=1, definition_state="PUBLISHED",
+            dsl_json=json.dumps(dsl, ensure_ascii=False), created_by="bench",
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _enqueue(runs: int, batch: str) -> None:
+    db = SessionLocal()
+    try:
+        for i in range(runs):
+            await run_published_workflow(
+                db,
+                workflow_key=WORKFLOW_KEY,
+                input_payload={
+                    "event": {"ip": f"10.98.{i // 256 % 256}.{i % 256}", "attack_count": 3},
+                    "approval_decisions": {"approval": True},
+                },
+                trigger_source="bench",
+                trigger_ref=f"{batch}-{i}",
+                enqueue=True,
+            )
+    finally:
+        db.close()
+
+
+def _worker(concurrency: int, latency: float, ready, go) -> None:
+    async def drain():
+        queue = WorkflowRunQueue()
+        adapters = _adapters(latency)
+
+        # 与常驻 worker 相同：每个协程各自认领一个运行，执行完再认领下一个
+        async def loop():
+            while await queue.run_once(adapters=adapters):
+                pass
+
+        await asyncio.gather(*[loop() for _ in range(concurrency)])
+
+    ready.set()
+    go.wait()
+    asyncio.run(drain())
+
+
+def _bench(runs: int, processes: int, concurrency: int, latency: float) -> float:
+    asyncio.run(_enqueue(runs, f"p{processes}"))
+    ctx = multiprocessing.get_context("spawn")
+    go = ctx.Event()
+    readies = [ctx.Event() for _ in range(processes)]
+    workers = [ctx.Process(target=_worker, args=(concurrency, latency, ready, go)) for ready in readies]
+    for proc in workers:
+        proc.start()
+    # 计时不含子进程启动与导入
+    for ready in readies:
+        ready.wait()
+    started = time.perf_counter()
+    go.set()
+    for proc in workers:
+        proc.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        pending = db.query(WorkflowRun).filter(WorkflowRun.run_state != WorkflowRunState.SUCCESS.value).count()
+        reclaimed = db.query(WorkflowRun).filter(WorkflowRun.claim_count > 1).count()
+    finally:
+        db.close()
+    if pending or reclaimed:
+        print(f"  warning: {pending} runs not completed, {reclaimed} runs claimed more than once")
+    return runs / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=400)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="每个 worker 进程同时执行的运行数")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="AI / MCP 桩的模拟延迟")
+    args = parser.parse_args()
+
+    init_db()
+    _publish()
+    for processes in args.processes:
+        rate = _bench(args.runs, processes, args.concurrency, args.latency_ms / 1000)
+        print(f"processes={processes}  concurrency={args.concurrency}  runs={args.runs}  runs/sec={rate:.1f}")
+
+
+if __name__ == "__main__":
+    main()
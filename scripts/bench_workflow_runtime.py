@@ -0,0 +1,106 @@
+"""工作流运行时基准：默认防御工作流（评分 → 审批 → 封禁 → 审计）的每秒运行数与每次运行的提交数。
+
+适配器全部替换为立即返回的桩，测得的即运行时自身的持久化开销。
+用法（项目根目录）：
+    python scripts/bench_workflow_runtime.py --runs 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_DB_DIR = tempfile.mkdtemp(prefix="aimiguan-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["TESTING"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from sqlalchemy import event  # noqa: E402
+
+from core.database import SessionLocal, WorkflowDefinition, WorkflowVersion, engine, init_db  # noqa: E402
+from services.workflow_dsl import WorkflowRunState, load_default_defense_workflow  # noqa: E402
+from services.workflow_runtime import NodeExecutionResult, run_published_workflow  # noqa: E402
+
+WORKFLOW_KEY = "bench_defense"
+
+
+def _publish(db) -> None:
+    dsl = load_default_defense_workflow()
+    dsl["workflow_id"] = WORKFLOW_KEY
+    definition = WorkflowDefinition(
+        workflow_key=WORKFLOW_KEY, name="bench", definition_state="PUBLISHED",
+        latest_version=1, published_version=1, created_by="bench", updated_by="bench",
+    )
+    db.add(definition)
+    db.flush()
+    db.add(WorkflowVersion(
+        workflow_id=definition.id, version=1, definition_state="PUBLISHED",
+        dsl_json=json.dumps(dsl, ensure_ascii=False), created_by="bench",
+    ))
+    db.commit()
+
+
+def _stub(output: dict):
+    async def adapter(_payload):
+        return NodeExecutionResult(state=WorkflowRunState.SUCCESS.value, output=output)
+    return adapter
+
+
+ADAPTERS = {
+    "ai_engine.assess_threat": _stub({"score": 90, "reason": "bench", "action_suggest": "BLOCK"}),
+    "mcp_client.block_ip": _stub({"blocked": True}),
+    "audit_service.log": _stub({"audited": True}),
+}
+
+
+async def _bench(runs: int) -> tuple[float, float]:
+    commits = 0
+
+    def on_commit(_conn):
+        nonlocal commits
+        commits += 1
+
+    event.listen(engine, "commit", on_commit)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for i in range(runs):
+            await run_published_workflow(
+                db,
+                workflow_key=WORKFLOW_KEY,
+                input_payload={
+                    "event": {"ip": f"10.99.{i // 256 % 256}.{i % 256}", "attack_count": 3},
+                    "approval_decisions": {"approval": True},
+                },
+                trigger_source="bench",
+                trigger_ref=f"bench-{i}",
+                adapters=ADAPTERS,
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+        event.remove(engine, "commit", on_commit)
+    return runs / elapsed, commits / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=300)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        _publish(db)
+    finally:
+        db.close()
+
+    asyncio.run(_bench(10))  # 预热
+    runs_per_sec, commits_per_run = asyncio.run(_bench(args.runs))
+    print(f"runs={args.runs}  runs/sec={runs_per_sec:.1f}  commits/run={commits_per_run:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""最小 MCP stdio 服务器（基准与测试用）。
+
+- FAKE_MCP_STARTUP：启动延迟（秒），模拟 `npx -y ...` 的冷启动
+- FAKE_MCP_CALL_DELAY：每次 tools/call 的处理延迟（秒）；调用在线程中处理，响应可乱序返回
+- FAKE_MCP_SPAWN_LOG：每次启动向该文件追加一行 pid
+工具 crash 使进程退出，工具 fail 返回 JSON-RPC 错误，其余工具回显参数。
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+_write_lock = threading.Lock()
+
+
+def _reply(message: dict) -> None:
+    with _write_lock:
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+
+def _handle_call(request_id, name: str, arguments: dict) -> None:
+    time.sleep(float(arguments.get("delay", os.getenv("FAKE_MCP_CALL_DELAY", "0"))))
+    if name == "fail":
+        _reply({"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": "invalid ip"}})
+        return
+    _reply({
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {"content": [{"type": "text", "text": json.dumps(arguments)}], "pid": os.getpid()},
+    })
+
+
+def main() -> None:
+    time.sleep(float(os.getenv("FAKE_MCP_STARTUP", "0")))
+    spawn_log = os.getenv("FAKE_MCP_SPAWN_LOG")
+    if spawn_log:
+        with open(spawn_log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+    print("fake mcp server ready", file=sys.stderr, flush=True)
+
+    for line in sys.stdin:
+        message = json.loads(line)
+        if "id" not in message:
+            continue
+        method = message.get("method")
+        if method == "initialize":
+            _reply({
+                "jsonrpc": "2.0",
+                "id": message["id"],
+                "result": {"protocolVersion": "2024-11-05", "capabilities": {}, "serverInfo": {"name": "fake"}},
+            })
+        elif method == "ping":
+            _reply({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+        elif method == "tools/call":
+            params = message.get("params") or {}
+            if params.get("name") == "crash":
+                os._exit(1)
+            threading.Thread(
+                target=_handle_call,
+                args=(message["id"], params.get("name"), params.get("arguments") or {}),
+                daemon=True,
+            ).start()
+        else:
+            _reply({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": "method not found"}})
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,29 @@ CREATE INDEX IF NOT EXISTS idx_threat_event_trace_id ON threat_event(trace_id);
 CREATE INDEX IF NOT EXISTS idx_threat_event_ip ON threat_event(ip);
 CREATE INDEX IF NOT EXISTS idx_threat_event_created_at ON threat_event(created_at);
 CREATE UNIQUE INDEX IF NOT EXISTS idx_threat_event_dedup ON threat_event(source_vendor, source_event_id) WHERE source_event_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_threat_event_updated_at ON threat_event(updated_at);
+
+-- 威胁事件小时汇总表（后台压实器维护，趋势/分布统计读此表）
+CREATE TABLE IF NOT EXISTS threat_event_rollup (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  bucket_start TEXT NOT NULL,
+  source_vendor TEXT NOT NULL DEFAULT '',
+  dimension TEXT NOT NULL,
+  dim_value TEXT NOT NULL DEFAULT '',
+  count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_threat_event_rollup_key ON threat_event_rollup(bucket_start, source_vendor, dimension, dim_value);
+CREATE INDEX IF NOT EXISTS idx_threat_event_rollup_dimension ON threat_event_rollup(dimension, bucket_start);
+
+-- 汇总压实水位（单行）
+CREATE TABLE IF NOT EXISTS threat_event_rollup_state (
+  id INTEGER PRIMARY KEY,
+  rolled_until TEXT,
+  last_event_id INTEGER NOT NULL DEFAULT 0,
+  scanned_at TEXT,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
 
 -- 执行任务表
 CREATE TABLE IF NOT EXISTS execution_task (
@@ -84,6 +107,7 @@ CREATE TABLE IF NOT EXISTS scan_task (
   tool_name TEXT NOT NULL,
   profile TEXT,
   script_set TEXT,
+  parent_task_id INTEGER,
   state TEXT NOT NULL CHECK(state IN ('CREATED','DISPATCHED','RUNNING','PARSED','REPORTED','FAILED','FAILED_TIMEOUT','FAILED_PARSE','UNREACHABLE')) DEFAULT 'CREATED',
   priority INTEGER DEFAULT 5,
   timeout_seconds INTEGER DEFAULT 3600,
@@ -95,10 +119,12 @@ CREATE TABLE IF NOT EXISTS scan_task (
   trace_id TEXT NOT NULL,
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
   updated_at TEXT NOT NULL DEFAULT (datetime('now')),
-  FOREIGN KEY (asset_id) REFERENCES asset(id)
+  FOREIGN KEY (asset_id) REFERENCES asset(id),
+  FOREIGN KEY (parent_task_id) REFERENCES scan_task(id)
 );
 
 CREATE INDEX IF NOT EXISTS idx_scan_task_state ON scan_task(state);
+CREATE INDEX IF NOT EXISTS ix_scan_task_parent_task_id ON scan_task(parent_task_id);
 CREATE INDEX IF NOT EXISTS idx_scan_task_asset_id ON scan_task(asset_id);
 CREATE INDEX IF NOT EXISTS idx_scan_task_trace_id ON scan_task(trace_id);
 CREATE INDEX IF NOT EXISTS idx_scan_task_created_at ON scan_task(created_at);
@@ -355,6 +381,12 @@ CREATE TABLE IF NOT EXISTS workflow_run (
   output_payload TEXT,
   context_json TEXT,
   trace_id TEXT NOT NULL,
+  actor TEXT,
+  start_node_id TEXT,
+  lease_owner TEXT,
+  lease_expires_at TEXT,
+  heartbeat_at TEXT,
+  claim_count INTEGER NOT NULL DEFAULT 0,
   started_at TEXT,
   ended_at TEXT,
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
@@ -367,6 +399,7 @@ CREATE INDEX IF NOT EXISTS idx_workflow_run_workflow_id ON workflow_run(workflow
 CREATE INDEX IF NOT EXISTS idx_workflow_run_workflow_version_id ON workflow_run(workflow_version_id);
 CREATE INDEX IF NOT EXISTS idx_workflow_run_state ON workflow_run(run_state);
 CREATE INDEX IF NOT EXISTS idx_workflow_run_created_at ON workflow_run(created_at);
+CREATE INDEX IF NOT EXISTS idx_workflow_run_lease ON workflow_run(run_state, lease_expires_at);
 CREATE INDEX IF NOT EXISTS idx_workflow_run_trace_id ON workflow_run(trace_id);
 
 -- 工作流节点运行轨迹（M1-02）
@@ -671,6 +704,7 @@ CREATE TABLE IF NOT EXISTS audit_log (
   trace_id TEXT NOT NULL,
   integrity_hash TEXT,
   prev_hash TEXT,
+  chain_seq INTEGER,
   created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
@@ -679,6 +713,18 @@ CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action);
 CREATE INDEX IF NOT EXISTS idx_audit_log_trace_id ON audit_log(trace_id);
 CREATE INDEX IF NOT EXISTS idx_audit_log_created_at ON audit_log(created_at);
 CREATE INDEX IF NOT EXISTS idx_audit_log_result ON audit_log(result);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_log_chain_seq ON audit_log(chain_seq);
+CREATE INDEX IF NOT EXISTS idx_audit_log_unsealed ON audit_log(id) WHERE integrity_hash IS NULL;
+
+CREATE TABLE IF NOT EXISTS audit_checkpoint (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  chain_seq INTEGER NOT NULL UNIQUE,
+  audit_log_id INTEGER NOT NULL,
+  chain_hash TEXT NOT NULL,
+  signature TEXT NOT NULL,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  FOREIGN KEY (audit_log_id) REFERENCES audit_log(id)
+);
 
 CREATE TABLE IF NOT EXISTS audit_export_job (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
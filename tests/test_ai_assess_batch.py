@@ -0,0 +1,86 @@
+"""AI 评估微批：非紧急评估合并为一次 generate_json，逐条校验评分，不合法条目回退逐条评估"""
+import asyncio
+import json
+
+import httpx
+
+from services.ai_engine import AIEngine, non_urgent_assessment
+
+
+def _batch_events(prompt: str) -> list:
+    line = next(line for line in prompt.splitlines() if line.startswith("events="))
+    return json.loads(line[len("events="):])
+
+
+def _stub_llm(monkeypatch, engine: AIEngine, batch_reply) -> dict:
+    calls = {"batch": [], "single": []}
+
+    async def generate_json(prompt, system=None):
+        if "events=" in prompt:
+            events = _batch_events(prompt)
+            calls["batch"].append([e["ip"] for e in events])
+            return batch_reply(events)
+        calls["single"].append(prompt)
+        return {"score": 55, "reason": "single", "action_suggest": "MONITOR"}
+
+    monkeypatch.setattr(engine.llm_client, "generate_json", generate_json)
+    return calls
+
+
+def test_non_urgent_assessments_share_one_prompt(monkeypatch):
+    monkeypatch.setenv("AI_ASSESS_BATCH_WINDOW_MS", "50")
+    engine = AIEngine()
+
+    def reply(events):
+        results = []
+        for index, event in enumerate(events):
+            if index == 0:
+                results.append({"id": event["id"], "score": 150, "reason": "r0", "action_suggest": "block"})
+            elif index == 1:
+                results.append({"id": event["id"], "score": "high", "reason": "malformed"})
+            elif index == 2:
+                continue  # 缺失条目
+            else:
+                results.append({"id": event["id"], "score": 40, "reason": f"r{index}", "action_suggest": "ignore"})
+        return {"results": results}
+
+    calls = _stub_llm(monkeypatch, engine, reply)
+
+    async def run():
+        with non_urgent_assessment():
+            return await asyncio.gather(*[
+                engine.assess_threat(f"10.60.0.{i}", "ssh", 3, trace_id=f"t{i}") for i in range(6)
+            ])
+
+    results = asyncio.run(run())
+
+    assert calls["batch"] == [[f"10.60.0.{i}" for i in range(6)]]
+    assert len(calls["single"]) == 2
+    assert results[0]["score"] == 100 and results[0]["action_suggest"] == "BLOCK"
+    assert results[1]["reason"] == "single" and results[2]["reason"] == "single"
+    assert results[3]["score"] == 40 and results[3]["action_suggest"] == "MONITOR"
+    assert [r["trace_id"] for r in results] == [f"t{i}" for i in range(6)]
+    assert all(r["degraded"] is False for r in results)
+
+
+def test_urgent_calls_bypass_batching_and_llm_outage_degrades_batch(monkeypatch):
+    monkeypatch.setenv("AI_ASSESS_BATCH_WINDOW_MS", "20")
+    engine = AIEngine()
+    calls = _stub_llm(monkeypatch, engine, lambda events: {"results": []})
+
+    urgent = asyncio.run(engine.assess_threat("10.61.0.1", "ssh", 1))
+    assert urgent["reason"] == "single"
+    assert calls["batch"] == [] and len(calls["single"]) == 1
+
+    async def unreachable(prompt, system=None):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(engine.llm_client, "generate_json", unreachable)
+
+    async def run():
+        with non_urgent_assessment():
+            return await asyncio.gather(*[engine.assess_threat(f"10.61.1.{i}", "ssh", 2) for i in range(3)])
+
+    degraded = asyncio.run(run())
+    assert all(r["degraded"] is True for r in degraded)
+    assert {r["fallback_reason"] for r in degraded} == {"llm_assess_failed:ConnectError"}
@@ -0,0 +1,98 @@
+"""AI 威胁评估缓存：同指纹并发合并、TTL 命中、LRU 与内存上限、缓存管理接口"""
+import asyncio
+
+from services.ai_engine import AIEngine, ai_engine
+from services.assessment_cache import AssessmentCache, attack_count_bucket, fingerprint
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _counting_llm(monkeypatch, engine: AIEngine, delay: float = 0.05) -> list:
+    calls = []
+
+    async def generate_json(prompt, system=None):
+        calls.append(prompt)
+        await asyncio.sleep(delay)
+        return {"score": 92, "reason": "bruteforce", "action_suggest": "BLOCK"}
+
+    monkeypatch.setattr(engine.llm_client, "generate_json", generate_json)
+    return calls
+
+
+def test_same_fingerprint_is_assessed_once(monkeypatch):
+    engine = AIEngine()
+    calls = _counting_llm(monkeypatch, engine)
+
+    async def run():
+        burst = await asyncio.gather(*[
+            engine.assess_threat("10.80.0.1", "SSH", 4 + i % 4, trace_id=f"t{i}") for i in range(50)
+        ])
+        again = await engine.assess_threat(" 10.80.0.1", "ssh", 7, trace_id="later")
+        other_bucket = await engine.assess_threat("10.80.0.1", "ssh", 8)
+        return burst, again, other_bucket
+
+    burst, again, other_bucket = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert [r["trace_id"] for r in burst] == [f"t{i}" for i in range(50)]
+    assert {r["score"] for r in burst} == {92}
+    assert again["trace_id"] == "later" and again["score"] == 92
+    assert other_bucket["degraded"] is False
+    stats = engine.assessment_cache.stats()
+    assert stats["entries"] == 2 and stats["inflight"] == 0
+
+
+def test_history_is_part_of_the_fingerprint(monkeypatch):
+    engine = AIEngine()
+    calls = _counting_llm(monkeypatch, engine, delay=0)
+
+    async def run():
+        await engine.assess_threat("10.80.1.1", "ssh", 4, history="3 prior blocks")
+        await engine.assess_threat("10.80.1.1", "ssh", 4, history="3 prior blocks")
+        await engine.assess_threat("10.80.1.1", "ssh", 4, history="first seen")
+        await engine.assess_threat("10.80.1.1", "ssh", 4)
+
+    asyncio.run(run())
+
+    assert len(calls) == 3
+    assert fingerprint("10.80.1.1", "ssh", 4) != fingerprint("10.80.1.1", "ssh", 4, "first seen")
+
+
+def test_lru_memory_caps_and_degraded_ttl(monkeypatch):
+    monkeypatch.setenv("AI_ASSESS_CACHE_MAX_ENTRIES", "3")
+    monkeypatch.setenv("AI_ASSESS_CACHE_FAILURE_TTL_SECONDS", "0")
+    cache = AssessmentCache()
+    for i in range(5):
+        cache.put(fingerprint(f"10.81.0.{i}", "ssh", 1), {"score": i}, ttl=60)
+    assert cache.get(fingerprint("10.81.0.0", "ssh", 1)) is None
+    assert cache.get(fingerprint("10.81.0.4", "ssh", 1)) == {"score": 4}
+    assert cache.stats()["entries"] == 3
+
+    monkeypatch.setenv("AI_ASSESS_CACHE_MAX_BYTES", "1024")
+    cache.put(fingerprint("10.81.1.1", "ssh", 1), {"reason": "x" * 600}, ttl=60)
+    cache.put(fingerprint("10.81.1.2", "ssh", 1), {"reason": "y" * 600}, ttl=60)
+    assert cache.stats()["bytes"] <= 1024
+    assert cache.get(fingerprint("10.81.1.1", "ssh", 1)) is None
+
+    async def degraded():
+        return {"score": 60, "degraded": True}
+
+    asyncio.run(cache.get_or_compute(fingerprint("10.81.2.1", "ssh", 1), degraded))
+    assert cache.get(fingerprint("10.81.2.1", "ssh", 1)) is None
+    assert [attack_count_bucket(n) for n in (0, 1, 2, 3, 4, 7, 8)] == [1, 1, 2, 2, 3, 3, 4]
+
+
+def test_cache_stats_and_flush_endpoints(client, admin_token, monkeypatch):
+    _counting_llm(monkeypatch, ai_engine, delay=0)
+    asyncio.run(ai_engine.assess_threat("10.82.0.1", "ssh", 3))
+
+    resp = client.get("/api/v1/system/ai-assess-cache", headers=_auth(admin_token))
+    assert resp.status_code == 200
+    assert resp.json()["data"]["entries"] >= 1
+
+    resp = client.delete("/api/v1/system/ai-assess-cache", headers=_auth(admin_token))
+    assert resp.status_code == 200
+    assert resp.json()["data"]["flushed"] >= 1
+    assert ai_engine.assessment_cache.stats()["entries"] == 0
@@ -0,0 +1,129 @@
+"""AI 流式对话：Ollama / OpenAI 兼容流式解析、SSE 转发与落库、提前关闭时释放上游连接"""
+import asyncio
+import json
+
+import httpx
+
+from services.ai_engine import AIEngine, LocalLLMClient, ai_engine
+from services.http_clients import http_clients
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _mock_upstream(monkeypatch, body: bytes, seen: list) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, content=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_clients, "get", lambda upstream: client)
+
+
+def test_llm_client_parses_ollama_and_openai_streams(monkeypatch):
+    llm = LocalLLMClient()
+    seen = []
+
+    llm.provider = "ollama"
+    ndjson = b"".join(
+        json.dumps(chunk).encode() + b"\n"
+        for chunk in ({"response": "先", "done": False}, {"response": "封禁", "done": False}, {"response": "", "done": True})
+    )
+    _mock_upstream(monkeypatch, ndjson, seen)
+
+    async def collect():
+        return [token async for token in llm.generate_stream("q", system="s")]
+
+    assert asyncio.run(collect()) == ["先", "封禁"]
+    assert seen[-1][0] == "/api/generate" and seen[-1][1]["stream"] is True
+
+    llm.provider = "openai"
+    sse = (
+        b'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+        b'data: {"choices":[{"delta":{"content":"Block"}}]}\n\n'
+        b'data: {"choices":[{"delta":{"content":" it"}}]}\n\n'
+        b"data: [DONE]\n\n"
+    )
+    _mock_upstream(monkeypatch, sse, seen)
+    assert asyncio.run(collect()) == ["Block", " it"]
+    assert seen[-1][0] == "/v1/chat/completions" and seen[-1][1]["stream"] is True
+
+
+def test_chat_stream_endpoint_forwards_tokens_and_persists_reply(client, admin_token, monkeypatch):
+    async def generate_stream(prompt, system=None):
+        for token in ["建议", "封禁 ", "10.9.0.1"]:
+            yield token
+
+    monkeypatch.setattr(ai_engine.llm_client, "generate_stream", generate_stream)
+
+    resp = client.post(
+        "/api/v1/ai/chat/stream",
+        json={"message": "怎么处理这个IP？"},
+        headers=_auth(admin_token),
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _sse_events(resp.text)
+    assert [name for name, _ in events] == ["meta", "token", "token", "token", "done"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "建议封禁 10.9.0.1"
+    done = events[-1][1]
+    assert done["message"] == "建议封禁 10.9.0.1"
+    assert done["meta"]["degraded"] is False and done["message_id"]
+
+    session_id = events[0][1]["session_id"]
+    messages = client.get(f"/api/v1/ai/sessions/{session_id}/messages", headers=_auth(admin_token)).json()
+    assert [(m["role"], m["content"]) for m in messages] == [
+        ("user", "怎么处理这个IP？"),
+        ("assistant", "建议封禁 10.9.0.1"),
+    ]
+
+
+def test_early_close_releases_upstream_and_outage_degrades():
+    engine = AIEngine()
+    upstream = {"closed": False, "produced": 0}
+
+    async def generate_stream(prompt, system=None):
+        try:
+            for i in range(1000):
+                upstream["produced"] += 1
+                yield f"t{i} "
+                await asyncio.sleep(0)
+        finally:
+            upstream["closed"] = True
+
+    engine.llm_client.generate_stream = generate_stream
+
+    async def consume_two():
+        stream = engine.chat_stream("hi")
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(consume_two())
+    assert [item["text"] for item in received] == ["t0 ", "t1 "]
+    assert upstream["closed"] is True and upstream["produced"] == 2
+
+    async def unreachable(prompt, system=None):
+        raise httpx.ConnectError("connection refused")
+        yield  # pragma: no cover
+
+    engine.llm_client.generate_stream = unreachable
+
+    async def collect():
+        return [item async for item in engine.chat_stream("hi", trace_id="t-1")]
+
+    items = asyncio.run(collect())
+    assert [item["type"] for item in items] == ["token", "done"]
+    assert items[-1]["degraded"] is True
+    assert items[-1]["fallback_reason"] == "llm_chat_failed:ConnectError"
+    assert items[-1]["text"] == items[0]["text"].strip()
@@ -0,0 +1,126 @@
+"""审计哈希链：单写入器批量封链、签名检查点与增量校验"""
+import asyncio
+import threading
+from importlib import import_module
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+chain_module = import_module("services.audit_chain")
+audit_module = import_module("services.audit_service")
+database = import_module("core.database")
+
+AuditService = audit_module.AuditService
+audit_chain = chain_module.audit_chain
+
+
+def test_concurrent_writers_do_not_fork_chain(db):
+    bind = db.get_bind()
+
+    def writer(n: int) -> None:
+        session = Session(bind=bind)
+        try:
+            for i in range(10):
+                AuditService.log(session, actor=f"writer-{n}", action="chain_test", target=f"t-{i}")
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    unsealed = db.execute(text("SELECT COUNT(*) FROM audit_log WHERE integrity_hash IS NULL")).scalar()
+    assert unsealed == 0
+    seqs = db.execute(text("SELECT chain_seq FROM audit_log ORDER BY chain_seq")).scalars().all()
+    assert seqs == list(range(1, len(seqs) + 1))
+
+    result = AuditService.verify_chain(db, full=True)
+    assert result["valid"] is True
+    assert result["checked"] == len(seqs)
+
+
+def test_checkpoints_enable_incremental_verify(db, monkeypatch):
+    monkeypatch.setenv("AUDIT_CHECKPOINT_INTERVAL", "5")
+    for i in range(12):
+        AuditService.log(db, actor="cp", action="checkpoint_test", target=f"t-{i}", auto_commit=False)
+    db.commit()
+    audit_chain.seal_pending(bind=db.get_bind())
+
+    checkpoints = db.query(database.AuditCheckpoint).order_by(database.AuditCheckpoint.chain_seq).all()
+    assert len(checkpoints) >= 2
+    assert all(cp.chain_seq % 5 == 0 for cp in checkpoints)
+
+    head = db.execute(text("SELECT MAX(chain_seq) FROM audit_log")).scalar()
+    result = AuditService.verify_chain(db)
+    assert result["valid"] is True
+    assert result["from_seq"] == checkpoints[-1].chain_seq
+    assert result["checked"] == head - checkpoints[-1].chain_seq
+    assert result["head_seq"] == head
+
+
+def test_tampering_is_detected(db):
+    for i in range(3):
+        AuditService.log(db, actor="tamper", action="tamper_test", target=f"t-{i}")
+    row_id, target = db.execute(
+        text("SELECT id, target FROM audit_log WHERE chain_seq = (SELECT MAX(chain_seq) FROM audit_log)")
+    ).first()
+
+    db.execute(text("UPDATE audit_log SET target = 'forged' WHERE id = :id"), {"id": row_id})
+    db.commit()
+    try:
+        result = AuditService.verify_chain(db)
+        assert result["valid"] is False
+        assert result["broken_at"] == row_id
+    finally:
+        db.execute(text("UPDATE audit_log SET target = :target WHERE id = :id"), {"id": row_id, "target": target})
+        db.commit()
+
+    checkpoint = db.query(database.AuditCheckpoint).order_by(database.AuditCheckpoint.chain_seq.desc()).first()
+    if checkpoint is not None:
+        signature = checkpoint.signature
+        checkpoint.signature = "0" * 64
+        db.commit()
+        try:
+            assert AuditService.verify_chain(db)["valid"] is False
+        finally:
+            checkpoint.signature = signature
+            db.commit()
+
+    assert AuditService.verify_chain(db, full=True)["valid"] is True
+
+
+@pytest.mark.asyncio
+async def test_background_writer_seals_in_batches(db):
+    await audit_chain.start()
+    try:
+        for i in range(5):
+            AuditService.log(db, actor="bg", action="background_test", target=f"t-{i}")
+        for _ in range(50):
+            unsealed = db.execute(text("SELECT COUNT(*) FROM audit_log WHERE integrity_hash IS NULL")).scalar()
+            if unsealed == 0:
+                break
+            await asyncio.sleep(0.05)
+        assert unsealed == 0
+    finally:
+        await audit_chain.stop()
+    assert not audit_chain.running
+
+
+def test_full_verify_endpoint_is_bounded_by_default(client, admin_token, db, monkeypatch):
+    for i in range(3):
+        AuditService.log(db, actor="bound-test", action="chain_test", target=f"b-{i}")
+    monkeypatch.setenv("AUDIT_VERIFY_FULL_LIMIT", "2")
+
+    data = client.get(
+        "/api/v1/system/audit/verify?full=true", headers={"Authorization": f"Bearer {admin_token}"}
+    ).json()["data"]
+    assert data["valid"] is True
+    assert data["checked"] == 2 and data["truncated"] is True
+
+    explicit = client.get(
+        "/api/v1/system/audit/verify?full=true&limit=3", headers={"Authorization": f"Bearer {admin_token}"}
+    ).json()["data"]
+    assert explicit["checked"] == 3
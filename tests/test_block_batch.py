@@ -0,0 +1,184 @@
+"""封禁合批：同设备请求合并为一次 block_ips、逐 IP 结果分发、批量审批与批量解封接口"""
+import asyncio
+import functools
+from uuid import uuid4
+
+from sqlalchemy.orm import sessionmaker
+
+from api import defense as defense_module
+from core.database import AuditLog, ExecutionTask, ThreatEvent
+from services.block_batcher import MCPBlockBatcher, block_batcher
+from services.mcp_client import MCPClient, mcp_client
+from services.workflow_rollout import set_defense_workflow_rollout
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _counting_client(monkeypatch, client: MCPClient, unknown_batch_tool: bool = False) -> list:
+    calls = []
+    original = client.call_tool
+
+    async def call_tool(tool_name, arguments):
+        calls.append((tool_name, arguments))
+        if unknown_batch_tool and tool_name.endswith("_ips"):
+            return {"success": False, "error": f"Unknown tool: {tool_name}", "tool": tool_name, "retryable": False}
+        return await original(tool_name, arguments)
+
+    monkeypatch.setattr(client, "mode", "mock")
+    monkeypatch.setattr(client, "mock_latency", 0.0)
+    monkeypatch.setattr(client, "call_tool", call_tool)
+    return calls
+
+
+def test_batcher_coalesces_per_device_and_fans_out_results(monkeypatch):
+    monkeypatch.setenv("MCP_BATCH_WINDOW_MS", "20")
+    client = MCPClient()
+    calls = _counting_client(monkeypatch, client)
+    batcher = MCPBlockBatcher(client)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.block("10.90.0.1", 1),
+            batcher.block("10.90.0.2", 1),
+            batcher.block("10.90.0.1", 1),
+            batcher.block("not-an-ip", 1),
+            batcher.block("10.90.0.3", 2),
+        )
+
+    ok1, ok2, dup, bad, other_device = asyncio.run(run())
+
+    # 窗口内只有一个 IP 的设备直接走单 IP 工具
+    assert sorted((name, args["device_id"], len(args.get("ips", [args.get("ip")]))) for name, args in calls) == [
+        ("block_ip", 2, 1),
+        ("block_ips", 1, 3),
+    ]
+    assert ok1["success"] is True and ok1["result"]["ip"] == "10.90.0.1"
+    assert ok2["success"] is True and ok2["result"]["rule_id"]
+    assert dup == ok1
+    assert bad["success"] is False and bad["retryable"] is False
+    assert other_device["success"] is True
+
+
+def test_batch_falls_back_to_single_calls_when_tool_missing(monkeypatch):
+    monkeypatch.setenv("MCP_BATCH_MAX_SIZE", "2")
+    client = MCPClient()
+    calls = _counting_client(monkeypatch, client, unknown_batch_tool=True)
+    batcher = MCPBlockBatcher(client)
+
+    async def run():
+        return await asyncio.gather(*[batcher.unblock(f"10.91.0.{i}") for i in range(4)])
+
+    results = asyncio.run(run())
+
+    assert all(r["success"] for r in results)
+    assert [name for name, _ in calls].count("unblock_ips") == 2
+    assert sorted(args["ip"] for name, args in calls if name == "unblock_ip") == [f"10.91.0.{i}" for i in range(4)]
+
+
+def test_bulk_approve_and_unblock_endpoints(monkeypatch, client, admin_token, test_db):
+    set_defense_workflow_rollout(
+        test_db, mode="legacy_only", gray_percent=0, double_write_metrics=False,
+        reason="bulk test", operator="tester", env=defense_module._get_rollout_env(), trace_id="trace-bulk",
+    )
+    calls = _counting_client(monkeypatch, mcp_client)
+
+    suffix = uuid4().hex[:8]
+    events = [
+        ThreatEvent(ip=f"10.92.0.{i}", source="bulk-test", status="PENDING", trace_id=f"bulk-{suffix}-{i}")
+        for i in range(5)
+    ]
+    test_db.add_all(events)
+    test_db.commit()
+    event_ids = [event.id for event in events]
+
+    resp = client.post(
+        "/api/v1/defense/events/bulk-approve",
+        json={"event_ids": event_ids + [999999999], "reason": "bulk"},
+        headers=_auth(admin_token),
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert [item["event_id"] for item in data["tasks"]] == event_ids
+    assert data["not_found"] == [999999999]
+
+    # TestClient 在响应返回前已执行完后台任务
+    test_db.expire_all()
+    tasks = test_db.query(ExecutionTask).filter(ExecutionTask.event_id.in_(event_ids)).all()
+    assert len(tasks) == 5 and {task.state for task in tasks} == {"SUCCESS"}
+    assert [name for name, _ in calls] == ["block_ips"]
+    assert sorted(calls[0][1]["ips"]) == sorted(event.ip for event in events)
+
+    resp = client.post(
+        "/api/v1/defense/ips/unblock",
+        json={"ips": ["10.92.0.1", "10.92.0.2", "bad-ip"], "device_id": 3},
+        headers=_auth(admin_token),
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["failed"] == 1
+    assert [item["success"] for item in data["items"]] == [True, True, False]
+    assert [name for name, _ in calls] == ["block_ips", "unblock_ips"]
+    operator_audit = (
+        test_db.query(AuditLog)
+        .filter(AuditLog.action == "bulk_unblock_ip", AuditLog.actor == "admin")
+        .order_by(AuditLog.id.desc())
+        .first()
+    )
+    assert operator_audit is not None and "10.92.0.1" in operator_audit.reason
+    audits = {
+        row.target: row
+        for row in test_db.query(AuditLog)
+        .filter(AuditLog.action == "mcp_unblock_ip", AuditLog.trace_id == operator_audit.trace_id)
+        .all()
+    }
+    assert set(audits) == {"ip:10.92.0.1", "ip:10.92.0.2", "ip:bad-ip"}
+    assert audits["ip:10.92.0.1"].result == "success" and audits["ip:bad-ip"].result == "failed"
+    assert all(row.actor == "admin" for row in audits.values())
+
+    blocked = test_db.query(AuditLog).filter(
+        AuditLog.action == "mcp_block_ip", AuditLog.target.in_([f"ip:{event.ip}" for event in events])
+    ).all()
+    assert len(blocked) == 5 and {row.result for row in blocked} == {"success"}
+
+
+def test_single_approvals_share_one_batch(monkeypatch, client, admin_token, test_db):
+    monkeypatch.setenv("MCP_BATCH_WINDOW_MS", "200")
+    set_defense_workflow_rollout(
+        test_db, mode="legacy_only", gray_percent=0, double_write_metrics=False,
+        reason="single batch test", operator="tester", env=defense_module._get_rollout_env(), trace_id="trace-single",
+    )
+    calls = _counting_client(monkeypatch, mcp_client)
+    suffix = uuid4().hex[:8]
+    events = [
+        ThreatEvent(ip=f"10.93.0.{i}", source="single-batch", status="PENDING", trace_id=f"single-{suffix}-{i}")
+        for i in range(3)
+    ]
+    test_db.add_all(events)
+    test_db.commit()
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    tasks = [ExecutionTask(event_id=event.id, action="BLOCK", state="QUEUED", trace_id=f"trace-{suffix}-{i}")
+             for i, event in enumerate(events)]
+    test_db.add_all(tasks)
+    test_db.commit()
+
+    async def run():
+        await asyncio.gather(*[
+            defense_module._run_execution_task_background(
+                task.id, task.trace_id, None, session_factory,
+                block_call=functools.partial(block_batcher.block, trace_id=task.trace_id),
+            )
+            for task in tasks
+        ])
+
+    asyncio.run(run())
+
+    assert [name for name, _ in calls] == ["block_ips"]
+    traces = {
+        row.target: row.trace_id
+        for row in test_db.query(AuditLog).filter(
+            AuditLog.action == "mcp_block_ip", AuditLog.target.in_([f"ip:{event.ip}" for event in events])
+        )
+    }
+    assert traces == {f"ip:{event.ip}": task.trace_id for event, task in zip(events, tasks)}
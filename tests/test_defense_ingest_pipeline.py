@@ -0,0 +1,103 @@
+"""HFish 告警入站流水线：批量去重、有界并发 AI 评估与截止时间降级"""
+import asyncio
+import json
+from importlib import import_module
+
+from sqlalchemy import text
+
+defense_module = import_module("api.defense")
+
+
+def _list_info(client_id: str, attack_ip: str) -> dict:
+    return {
+        "client_id": client_id,
+        "service_name": "ssh-honeypot",
+        "service_type": "ssh",
+        "attack_ip": attack_ip,
+        "attack_count": 2,
+        "labels": "ssh-brute",
+    }
+
+
+def test_ingest_limits_ai_concurrency(monkeypatch, client, db):
+    state = {"active": 0, "peak": 0}
+
+    async def slow_assess_threat(ip: str, attack_type: str, attack_count: int, history=None, trace_id=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return {"score": 91, "reason": f"AI score for {ip}", "action_suggest": "BLOCK"}
+
+    monkeypatch.setattr(defense_module.ai_engine, "assess_threat", slow_assess_threat)
+    monkeypatch.setenv("DEFENSE_AI_ENRICH_CONCURRENCY", "3")
+
+    payload = {
+        "response_code": 0,
+        "list_infos": [_list_info(f"pipeline-{i}", f"10.9.0.{i}") for i in range(12)],
+    }
+    response = client.post("/api/v1/defense/alerts", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["data"]["event_ids"]) == 12
+    assert 1 < state["peak"] <= 3
+
+    scores = db.execute(
+        text("SELECT ai_score FROM threat_event WHERE source_event_id LIKE 'pipeline-%'")
+    ).scalars().all()
+    assert scores == [91] * 12
+
+
+def test_ingest_dedupes_within_batch_and_against_history(monkeypatch, client):
+    async def fake_assess_threat(ip: str, attack_type: str, attack_count: int, history=None, trace_id=None):
+        return {"score": 60, "reason": "ok", "action_suggest": "MONITOR"}
+
+    monkeypatch.setattr(defense_module.ai_engine, "assess_threat", fake_assess_threat)
+
+    payload = {
+        "response_code": 0,
+        "list_infos": [_list_info("dup-1", "10.9.1.1"), _list_info("dup-1", "10.9.1.1")],
+    }
+    first = client.post("/api/v1/defense/alerts", json=payload).json()["data"]
+    assert len(first["event_ids"]) == 1
+    assert first["deduped_event_ids"] == first["event_ids"]
+
+    second = client.post("/api/v1/defense/alerts", json=payload).json()["data"]
+    assert second["event_ids"] == []
+    assert second["deduped_event_ids"] == first["event_ids"] * 2
+
+
+def test_ingest_deadline_falls_back_to_rule_assessment(monkeypatch, client, db):
+    async def hanging_assess_threat(ip: str, attack_type: str, attack_count: int, history=None, trace_id=None):
+        if ip.endswith(".1"):
+            return {"score": 95, "reason": "fast", "action_suggest": "BLOCK"}
+        await asyncio.sleep(5)
+        return {"score": 99, "reason": "too late", "action_suggest": "BLOCK"}
+
+    monkeypatch.setattr(defense_module.ai_engine, "assess_threat", hanging_assess_threat)
+    monkeypatch.setenv("DEFENSE_AI_ENRICH_DEADLINE_SECONDS", "0.2")
+
+    payload = {
+        "response_code": 0,
+        "list_infos": [_list_info("deadline-fast", "10.9.2.1"), _list_info("deadline-slow", "10.9.2.2")],
+    }
+    response = client.post("/api/v1/defense/alerts", json=payload)
+    assert response.status_code == 200
+    assert len(response.json()["data"]["event_ids"]) == 2
+
+    rows = {
+        row[0]: row
+        for row in db.execute(
+            text(
+                "SELECT source_event_id, ai_score, extra_json FROM threat_event "
+                "WHERE source_event_id LIKE 'deadline-%'"
+            )
+        ).fetchall()
+    }
+    assert rows["deadline-fast"][1] == 95
+    assert json.loads(rows["deadline-fast"][2])["ai_assessment"]["degraded"] is False
+
+    slow_meta = json.loads(rows["deadline-slow"][2])["ai_assessment"]
+    assert rows["deadline-slow"][1] == 70
+    assert slow_meta["degraded"] is True
+    assert slow_meta["degrade_reason"] == "batch_deadline_exceeded"
@@ -0,0 +1,237 @@
+"""HFish 采集器：共享异步客户端分页拉取与持久化增量游标"""
+import json
+from importlib import import_module
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+hfish_module = import_module("services.hfish_collector")
+
+
+def _make_collector(monkeypatch, pages):
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests_seen.append(body)
+        page = pages[body["page_no"] - 1] if body["page_no"] <= len(pages) else []
+        return httpx.Response(200, json={"code": 200, "data": {"detail_list": page}})
+
+    monkeypatch.setattr(hfish_module, "HFISH_PAGE_SIZE", 2)
+    collector = hfish_module.HFishCollector()
+    collector._config_loaded = True
+    collector.enabled = True
+    collector.api_base_url = "https://hfish.local:4433"
+    collector.api_key = "k"
+    collector._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return collector, requests_seen
+
+
+def _log(ip: str, create_time: int) -> dict:
+    return {"attack_ip": ip, "service_name": "ssh", "service_port": "22", "create_time": create_time}
+
+
+@pytest.mark.asyncio
+async def test_sync_once_paginates_and_persists_cursor(monkeypatch, db):
+    db.execute(text("DELETE FROM collector_config WHERE collector_type = 'hfish'"))
+    db.commit()
+    pages = [
+        [_log("3.3.3.1", 1700000100), _log("3.3.3.2", 1700000300)],
+        [_log("3.3.3.3", 1700000200)],
+    ]
+    collector, requests_seen = _make_collector(monkeypatch, pages)
+
+    result = await collector.sync_once("trace-hfish-sync")
+    await collector.aclose()
+
+    assert result["success"] is True
+    assert result["count"] == 3
+    assert result["total_fetched"] == 3
+    assert [r["page_no"] for r in requests_seen] == [1, 2]
+    assert collector.cursor == 1700000300
+
+    stored = db.execute(
+        text(
+            "SELECT config_value FROM collector_config "
+            "WHERE collector_type = 'hfish' AND config_key = 'sync_cursor'"
+        )
+    ).scalar()
+    assert stored == "1700000300"
+
+
+@pytest.mark.asyncio
+async def test_sync_once_resumes_from_cursor_and_keeps_it_on_failure(monkeypatch):
+    collector, requests_seen = _make_collector(monkeypatch, [[]])
+    collector.cursor = 1700000300
+
+    result = await collector.sync_once("trace-hfish-resume")
+    assert result == {"success": True, "message": "无新数据", "count": 0}
+    assert requests_seen[0]["start_time"] == 1700000300
+
+    def failing(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(502)
+
+    collector._http_client = httpx.AsyncClient(transport=httpx.MockTransport(failing))
+    result = await collector.sync_once("trace-hfish-fail")
+    await collector.aclose()
+    assert result["success"] is False
+    assert collector.cursor == 1700000300
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_backs_off_and_reports_health(monkeypatch):
+    collector, _ = _make_collector(monkeypatch, [[]])
+    collector.sync_interval = 10
+
+    def failing(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    collector._http_client = httpx.AsyncClient(transport=httpx.MockTransport(failing))
+    for _ in range(hfish_module.HFISH_DOWN_AFTER_FAILURES):
+        await collector.sync_once("trace-hfish-backoff")
+    await collector.aclose()
+
+    status = collector.status()
+    assert status["health"] == "down"
+    assert status["consecutive_failures"] == hfish_module.HFISH_DOWN_AFTER_FAILURES
+    assert 70 < status["retry_in_seconds"] <= 80
+    assert collector.is_due() is False
+
+
+def test_federation_registers_and_removes_sources(client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = client.post(
+        "/api/v1/defense/hfish/sources",
+        headers=headers,
+        json={"name": "branch-a", "host_port": "10.1.0.5:4433", "api_key": "a", "sync_interval": 30},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["health"] == "pending"
+
+    invalid = client.post(
+        "/api/v1/defense/hfish/sources",
+        headers=headers,
+        json={"name": "Bad Name", "host_port": "10.1.0.6:4433", "api_key": "b"},
+    )
+    assert invalid.status_code == 400
+
+    listed = client.get("/api/v1/defense/hfish/sources", headers=headers).json()["data"]
+    names = [item["name"] for item in listed]
+    assert "default" in names and "branch-a" in names
+
+    assert client.delete("/api/v1/defense/hfish/sources/branch-a", headers=headers).status_code == 200
+    assert client.delete("/api/v1/defense/hfish/sources/branch-a", headers=headers).status_code == 404
+    assert client.delete("/api/v1/defense/hfish/sources/default", headers=headers).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_concurrent_source_syncs(monkeypatch):
+    import asyncio
+
+    scheduler_module = import_module("services.scheduler_service")
+    state = {"active": 0, "peak": 0}
+
+    class SlowCollector:
+        def __init__(self, name):
+            self.source_name = name
+            self.syncing = True
+
+        async def sync_once(self, trace_id):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return {"success": True, "message": "ok", "count": 0}
+
+    monkeypatch.setattr(scheduler_module, "_write_audit", lambda *args, **kwargs: None)
+    scheduler = scheduler_module.SchedulerService()
+    semaphore = asyncio.Semaphore(2)
+    collectors = [SlowCollector(f"s{i}") for i in range(5)]
+    await asyncio.gather(*(scheduler._sync_hfish_source(c, semaphore) for c in collectors))
+
+    assert state["peak"] == 2
+    assert all(c.syncing is False for c in collectors)
+
+
+@pytest.mark.asyncio
+async def test_overlapping_sync_is_rejected_and_cursor_never_moves_back(monkeypatch):
+    import asyncio
+
+    collector, _ = _make_collector(monkeypatch, [[]])
+    release = asyncio.Event()
+
+    async def slow_page(start_time, end_time, page_no):
+        await release.wait()
+        return [_log("3.3.4.1", 1700000500)]
+
+    monkeypatch.setattr(collector, "_fetch_page", slow_page)
+    monkeypatch.setattr(collector, "_ingest_page", lambda page, trace_id: len(page))
+    saved = []
+    monkeypatch.setattr(collector, "_save_cursor", saved.append)
+
+    first = asyncio.create_task(collector.sync_once("trace-hfish-first"))
+    for _ in range(200):
+        if collector.sync_in_progress:
+            break
+        await asyncio.sleep(0.005)
+    assert collector.sync_in_progress and collector.status()["syncing"] is True
+    assert collector.is_due(now=float("inf")) is False
+
+    second = await collector.sync_once("trace-hfish-second")
+    assert second["success"] is False and second["in_progress"] is True
+
+    release.set()
+    assert (await first)["success"] is True
+    assert saved == [1700000500]
+    assert collector.sync_in_progress is False
+
+
+def test_save_cursor_only_moves_forward():
+    collector = hfish_module.HFishCollector("cursor-guard")
+    collector.cursor = 1700000900
+    collector._save_cursor(1700000100)
+    assert collector.cursor == 1700000900
+    collector.retired = True
+    collector._save_cursor(1700009999)
+    assert collector.cursor == 1700000900
+
+
+def test_sources_with_same_attack_are_stored_separately(monkeypatch, db):
+    log = _log("3.3.5.1", 1700000700)
+    default = hfish_module.HFishCollector()
+    branch = hfish_module.HFishCollector("branch-dedup")
+
+    assert default._build_event_id(log) != branch._build_event_id(log)
+    assert default.ingest_logs([log], db, "trace-default") == 1
+    assert branch.ingest_logs([log], db, "trace-branch") == 1
+    assert branch.ingest_logs([log], db, "trace-branch") == 0
+
+    sources = {
+        row[0]
+        for row in db.execute(
+            text("SELECT source FROM threat_event WHERE ip = '3.3.5.1' AND source_vendor = 'hfish'")
+        )
+    }
+    assert sources == {"hfish", "hfish:branch-dedup"}
+
+
+@pytest.mark.asyncio
+async def test_refresh_closes_removed_sources(monkeypatch):
+    federation = hfish_module.HFishFederation(hfish_module.HFishCollector())
+    removed = hfish_module.HFishCollector("gone")
+    client = removed._get_http_client()
+    federation.sources["gone"] = removed
+
+    await federation.reload()
+    await _drain_closing(federation)
+
+    assert "gone" not in federation.sources
+    assert removed.retired is True
+    assert client.is_closed
+
+
+async def _drain_closing(federation):
+    import asyncio
+
+    await asyncio.gather(*list(federation._closing))
@@ -0,0 +1,87 @@
+"""出站 HTTP 客户端注册表：上游连接复用、连接池上限与占满计数"""
+import asyncio
+import json
+
+from services.ai_engine import LocalLLMClient
+from services.http_clients import UPSTREAM_LLM, UPSTREAM_PUSH, HTTPClientRegistry, http_clients
+from services.metrics_service import metrics
+
+
+async def _start_upstream(delay: float = 0.0):
+    """最小 HTTP/1.1 keep-alive 服务器，记录建立的 TCP 连接数"""
+    stats = {"connections": 0, "requests": 0}
+
+    async def handle(reader, writer):
+        stats["connections"] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                stats["requests"] += 1
+                await asyncio.sleep(delay)
+                body = json.dumps({"response": "ok", "errcode": 0}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, stats, f"http://127.0.0.1:{port}"
+
+
+def test_llm_calls_reuse_one_keepalive_connection(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "ollama")
+
+    async def run():
+        server, stats, url = await _start_upstream()
+        monkeypatch.setenv("LLM_BASE_URL", url)
+        llm = LocalLLMClient()
+        before = metrics.get_counter(f"http_pool_requests_total:{UPSTREAM_LLM}")
+        try:
+            for _ in range(10):
+                assert await llm.generate("ping") == "ok"
+        finally:
+            await http_clients.aclose()
+            server.close()
+            await server.wait_closed()
+        return stats, metrics.get_counter(f"http_pool_requests_total:{UPSTREAM_LLM}") - before
+
+    stats, counted = asyncio.run(run())
+
+    assert stats == {"connections": 1, "requests": 10}
+    assert counted == 10
+    assert metrics.get_gauge(f"http_pool_in_use:{UPSTREAM_LLM}") == 0
+
+
+def test_pool_limit_caps_connections_and_counts_saturation(monkeypatch):
+    monkeypatch.setenv("HTTP_POOL_MAX_CONNECTIONS_PUSH", "2")
+    registry = HTTPClientRegistry()
+
+    async def run():
+        server, stats, url = await _start_upstream(delay=0.05)
+        before = metrics.get_counter(f"http_pool_saturated_total:{UPSTREAM_PUSH}")
+        try:
+            client = registry.get(UPSTREAM_PUSH)
+            responses = await asyncio.gather(*[client.post(url, json={"i": i}) for i in range(6)])
+        finally:
+            await registry.aclose()
+            server.close()
+            await server.wait_closed()
+        return stats, responses, metrics.get_counter(f"http_pool_saturated_total:{UPSTREAM_PUSH}") - before
+
+    stats, responses, saturated = asyncio.run(run())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert stats["requests"] == 6 and stats["connections"] <= 2
+    assert saturated == 4
+    assert metrics.get_gauge(f"http_pool_max_connections:{UPSTREAM_PUSH}") == 2
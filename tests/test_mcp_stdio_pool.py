@@ -0,0 +1,94 @@
+"""MCP stdio 会话池：长驻会话复用、请求 id 复用与乱序响应、进程退出后重启"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from services.mcp_client import MCPClient
+from services.mcp_stdio_pool import MCPStdioError, MCPStdioPool, _StdioSession
+
+FAKE_SERVER = Path(__file__).resolve().parent.parent / "scripts" / "fake_mcp_stdio_server.py"
+
+
+def _echoed(call_data: dict) -> dict:
+    return json.loads(call_data["result"]["content"][0]["text"])
+
+
+def _spawns(log: Path) -> int:
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+
+def test_pool_multiplexes_calls_over_long_lived_sessions(tmp_path, monkeypatch):
+    spawn_log = tmp_path / "spawns.log"
+    monkeypatch.setenv("FAKE_MCP_SPAWN_LOG", str(spawn_log))
+    pool = MCPStdioPool([sys.executable, str(FAKE_SERVER)], size=2, max_concurrency=8)
+
+    async def run():
+        try:
+            # 延迟递减：同一会话上的响应乱序返回，须按 id 对应
+            calls = [
+                pool.call_tool("block_ip", {"ip": f"10.95.0.{i}", "delay": (20 - i) * 0.01}, timeout=5)
+                for i in range(20)
+            ]
+            first = await asyncio.gather(*calls)
+            second = await pool.call_tool("unblock_ip", {"ip": "10.95.0.99"}, timeout=5)
+            return first, second
+        finally:
+            await pool.aclose()
+
+    first, second = asyncio.run(run())
+
+    assert [_echoed(r)["ip"] for r in first] == [f"10.95.0.{i}" for i in range(20)]
+    assert _echoed(second)["ip"] == "10.95.0.99"
+    assert 1 <= _spawns(spawn_log) <= 2
+
+
+def test_crashed_session_is_respawned(tmp_path, monkeypatch):
+    spawn_log = tmp_path / "spawns.log"
+    monkeypatch.setenv("FAKE_MCP_SPAWN_LOG", str(spawn_log))
+    monkeypatch.setenv("MCP_STDIO_COMMAND", f"{sys.executable} {FAKE_SERVER}")
+    monkeypatch.setenv("MCP_STDIO_POOL_SIZE", "1")
+    client = MCPClient()
+    client.mode = "stdio"
+
+    async def run():
+        try:
+            ok = await client.call_tool("block_ip", {"ip": "10.96.0.1"})
+            crashed = await client.call_tool("crash", {})
+            failed = await client.call_tool("fail", {"ip": "bad"})
+            recovered = await client.call_tool("block_ip", {"ip": "10.96.0.2"})
+            return ok, crashed, failed, recovered
+        finally:
+            await client.close()
+
+    ok, crashed, failed, recovered = asyncio.run(run())
+
+    assert ok["success"] is True
+    assert crashed["success"] is False and crashed["retryable"] is True
+    assert failed == {"success": False, "error": "invalid ip", "tool": "fail", "retryable": False}
+    assert recovered["success"] is True and _echoed(recovered)["ip"] == "10.96.0.2"
+    assert recovered["result"]["pid"] != ok["result"]["pid"]
+    assert _spawns(spawn_log) == 2
+
+
+def test_request_on_session_with_exited_reader_fails_fast():
+    async def run():
+        session = _StdioSession([sys.executable, str(FAKE_SERVER)])
+        await session.start(init_timeout=5)
+        try:
+            with pytest.raises(MCPStdioError):
+                await session.request("tools/call", {"name": "crash", "arguments": {}}, timeout=5)
+            # 读协程已退出、退出码可能尚未回收：不能再被视为可用
+            assert session.alive is False
+            started = time.monotonic()
+            with pytest.raises(MCPStdioError):
+                await session.request("ping", {}, timeout=5)
+            assert time.monotonic() - started < 1
+            assert not session.pending
+        finally:
+            await session.close()
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+"""直方图指标：分位数精度、标签维度、/metrics Prometheus 文本与 JSON 快照"""
+import random
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+from services.metrics_service import LATENCY_BUCKETS_MS, MetricsCollector, metrics
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_histogram_percentiles_and_labels():
+    collector = MetricsCollector()
+    rng = random.Random(7)
+    samples = [rng.uniform(1, 400) for _ in range(5000)]
+    for i, ms in enumerate(samples):
+        collector.record_latency("scan_dispatch", ms, tool="nmap" if i % 2 else "hfish")
+
+    stats = collector.get_latency_stats("scan_dispatch")
+    ordered = sorted(samples)
+    assert stats["count"] == 5000
+    assert stats["max_ms"] == round(ordered[-1], 2)
+    for key, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        exact = ordered[int(len(ordered) * q)]
+        assert abs(stats[key] - exact) / exact < 0.2
+    assert collector.get_latency_stats("scan_dispatch", tool="nmap")["count"] == 2500
+
+    collector.record_latency("custom_step", 10 ** 9)
+    snap = collector.snapshot()
+    assert set(snap["latencies"]) == {"api_request", "scan_dispatch", "custom_step"}
+    assert snap["latencies"]["custom_step"]["max_ms"] == 10 ** 9
+    assert {tuple(s["labels"].items()) for s in snap["latency_series"] if s["name"] == "scan_dispatch"} == {
+        (("tool", "hfish"),), (("tool", "nmap"),)
+    }
+
+
+def test_prometheus_exposition():
+    collector = MetricsCollector()
+    collector.inc("http_requests_total", 3)
+    collector.inc("hfish_sync_success_total:lab-1")
+    collector.set_gauge("http_pool_in_use:llm", 2)
+    collector.record_latency("api_request", 12, route="/api/health", method="GET", status=200)
+    collector.record_latency("api_request", 250000, route="/api/health", method="GET", status=200)
+
+    text = collector.render_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE aimiguan_http_requests_total counter" in lines
+    assert "aimiguan_http_requests_total 3.0" in lines
+    assert 'aimiguan_hfish_sync_success_total{key="lab-1"} 1.0' in lines
+    assert 'aimiguan_http_pool_in_use{key="llm"} 2.0' in lines
+    assert "# TYPE aimiguan_api_request_duration_seconds histogram" in lines
+    labels = 'method="GET",route="/api/health",status="200"'
+    assert f'aimiguan_api_request_duration_seconds_bucket{{{labels},le="0.015"}} 1' in lines
+    assert f'aimiguan_api_request_duration_seconds_bucket{{{labels},le="100.0"}} 1' in lines
+    assert f'aimiguan_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"aimiguan_api_request_duration_seconds_count{{{labels}}} 2" in lines
+    assert len([line for line in lines if "_bucket{" in line]) == len(LATENCY_BUCKETS_MS) + 1
+
+
+def test_metrics_endpoints(client, admin_token, monkeypatch):
+    client.get("/api/health")
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    # 未配置令牌：仅本机可抓取
+    assert client.get("/metrics").status_code == 403
+    local = TestClient(app, client=("127.0.0.1", 50000))
+    resp = local.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/health"' in resp.text
+
+    monkeypatch.setenv("METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert local.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=_auth("scrape-secret-x")).status_code == 401
+    assert client.get("/metrics", headers=_auth("scrape-secret")).status_code == 200
+
+    data = client.get("/api/v1/system/metrics", headers=_auth(admin_token)).json()["data"]
+    assert data["latencies"]["api_request"]["count"] >= 1
+    assert any(s["labels"].get("route") == "/api/health" for s in data["latency_series"])
+    assert metrics.get_latency_stats("api_request", route="/api/health", method="GET", status=200)["count"] >= 1
@@ -0,0 +1,77 @@
+"""多进程指标：各 worker 写自己的 mmap 文件，任一进程读取到的都是全局合并结果"""
+import os
+import subprocess
+import sys
+
+from services.metrics_service import MetricsCollector
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+WORKER = """
+import sys
+from services.metrics_service import metrics
+for i in range(500):
+    metrics.inc("api_requests_total")
+    metrics.record_latency("api_request", 5 + i % 50, route="/api/v1/defense/events", method="GET", status="200")
+metrics.set_gauge("http_pool_in_use:llm", 1)
+metrics.set_gauge("hfish_sync_lag_seconds:lab-1", float(sys.argv[1]))
+print("ready", flush=True)
+if sys.argv[2] == "stay":
+    sys.stdin.readline()
+"""
+
+
+def _spawn(directory: str, lag: int, mode: str) -> subprocess.Popen:
+    env = dict(os.environ, METRICS_MULTIPROC_DIR=directory)
+    proc = subprocess.Popen(
+        [sys.executable, "-c", WORKER, str(lag), mode],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdout.readline().strip() == "ready"
+    return proc
+
+
+def test_counters_and_histograms_aggregate_across_workers(tmp_path):
+    directory = str(tmp_path)
+    exited = [_spawn(directory, lag, "exit") for lag in (30, 40, 50)]
+    for proc in exited:
+        assert proc.wait(timeout=30) == 0
+    alive = _spawn(directory, 7, "stay")
+    try:
+        collector = MetricsCollector(multiproc_dir=directory)
+        collector.inc("api_requests_total", 10)
+
+        assert collector.get_counter("api_requests_total") == 4 * 500 + 10
+        stats = collector.get_latency_stats("api_request", route="/api/v1/defense/events", method="GET", status="200")
+        assert stats["count"] == 2000
+        assert stats["max_ms"] == 54
+        assert collector.snapshot()["latencies"]["api_request"]["count"] == 2000
+
+        # 仪表只合并存活进程：已退出 worker 的连接池占用与同步延迟不再计入
+        assert collector.get_gauge("http_pool_in_use:llm") == 1
+        assert collector.get_gauge("hfish_sync_lag_seconds:lab-1") == 7
+
+        text = collector.render_prometheus()
+        assert "aimiguan_api_requests_total 2010" in text
+        assert (
+            'aimiguan_api_request_duration_seconds_count{method="GET",route="/api/v1/defense/events",status="200"} 2000'
+            in text
+        )
+    finally:
+        alive.stdin.write("\n")
+        alive.stdin.flush()
+        alive.wait(timeout=30)
+
+
+def test_single_process_mode_keeps_state_in_memory(tmp_path):
+    collector = MetricsCollector(multiproc_dir="")
+    collector.inc("api_requests_total", 3)
+    collector.set_gauge("http_pool_in_use:llm", 2)
+    assert collector.get_counter("api_requests_total") == 3
+    assert collector.get_gauge("http_pool_in_use:llm") == 2
+    assert not collector.multiprocess
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,133 @@
+"""Nmap 分片扫描：网段拆分、有界并发、结果并入父任务与中断续扫"""
+import stat
+import sys
+from importlib import import_module
+
+import pytest
+
+nmap_module = import_module("services.nmap_scanner")
+planner_module = import_module("services.scan_planner")
+database = import_module("core.database")
+
+# 每个分片输出一台 .1 主机，并记录启动/结束时间用于统计并发
+FAKE_NMAP = """#!{python}
+import os, sys, time
+target = sys.argv[1]
+ip = target.split("/")[0].rsplit(".", 1)[0] + ".1"
+log = os.environ["FAKE_NMAP_LOG"]
+with open(log, "a") as f:
+    f.write("start %s %f\\n" % (target, time.time()))
+time.sleep(0.2)
+sys.stdout.write(
+    '<nmaprun><host><status state="up"/><address addr="%s" addrtype="ipv4"/>'
+    '<ports><port protocol="tcp" portid="80"><state state="open"/><service name="http"/></port></ports>'
+    '</host></nmaprun>' % ip
+)
+with open(log, "a") as f:
+    f.write("end %s %f\\n" % (target, time.time()))
+"""
+
+
+@pytest.fixture
+def planner(tmp_path, monkeypatch):
+    script = tmp_path / "nmap"
+    script.write_text(FAKE_NMAP.format(python=sys.executable))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FAKE_NMAP_LOG", str(tmp_path / "runs.log"))
+
+    scanner = nmap_module.NmapScanner()
+    scanner.nmap_path = str(script)
+    scanner._config_loaded = True
+    return planner_module.ShardedScanPlanner(scanner), tmp_path / "runs.log"
+
+
+def _runs(log_path):
+    if not log_path.exists():
+        return []
+    return [line.split() for line in log_path.read_text().splitlines()]
+
+
+def _peak_concurrency(runs):
+    active = peak = 0
+    for kind, _, _ in sorted(runs, key=lambda run: (float(run[2]), run[0] == "start")):
+        active += 1 if kind == "start" else -1
+        peak = max(peak, active)
+    return peak
+
+
+def test_plan_shards(monkeypatch):
+    assert planner_module.plan_shards("10.0.0.0/22") == [
+        "10.0.0.0/24",
+        "10.0.1.0/24",
+        "10.0.2.0/24",
+        "10.0.3.0/24",
+    ]
+    assert planner_module.plan_shards("10.0.0.0/24") == ["10.0.0.0/24"]
+    assert planner_module.plan_shards("10.0.0.5") == ["10.0.0.5"]
+    assert planner_module.plan_shards("scan.example.com") == ["scan.example.com"]
+
+    monkeypatch.setenv("NMAP_SHARD_PREFIX", "23")
+    assert len(planner_module.plan_shards("10.0.0.0/22")) == 2
+
+
+@pytest.mark.asyncio
+async def test_sharded_scan_runs_bounded_and_merges_into_parent(planner, db):
+    sharded, log_path = planner
+
+    results = await sharded.run(["10.30.0.0/22"], "quick", lambda: "trace-shard", concurrency=2)
+
+    result = results[0]
+    assert result["success"] is True
+    assert result["shards"] == 4
+    assert result["hosts_count"] == 4
+
+    runs = _runs(log_path)
+    assert len([run for run in runs if run[0] == "start"]) == 4
+    assert _peak_concurrency(runs) == 2
+
+    db.expire_all()
+    parent = db.query(database.ScanTask).filter(database.ScanTask.id == result["task_id"]).one()
+    assert parent.state == "COMPLETED"
+    children = db.query(database.ScanTask).filter(database.ScanTask.parent_task_id == parent.id).all()
+    assert sorted(child.target for child in children) == planner_module.plan_shards("10.30.0.0/22")
+    assert {child.state for child in children} == {"COMPLETED"}
+
+    findings = db.query(database.ScanFinding).filter(database.ScanFinding.scan_task_id == parent.id).all()
+    assert sorted(f.asset for f in findings if f.port is None) == [f"10.30.{i}.1" for i in range(4)]
+
+
+@pytest.mark.asyncio
+async def test_sharded_scan_resumes_unfinished_shards(planner, db):
+    sharded, log_path = planner
+
+    # 模拟上次运行中断：一个分片已完成并合并，一个分片运行中留有残留发现
+    parent, child_ids = sharded.prepare("10.31.0.0/22", "quick", db, "trace-resume")
+    done, interrupted = (
+        db.query(database.ScanTask).filter(database.ScanTask.id.in_(child_ids[:2])).order_by(database.ScanTask.id).all()
+    )
+    done.state = "COMPLETED"
+    interrupted.state = "RUNNING"
+    db.add(database.ScanFinding(scan_task_id=parent.id, asset="10.31.0.1", state="up", status="NEW", trace_id="trace-resume"))
+    db.add(database.ScanFinding(scan_task_id=interrupted.id, asset="10.31.1.99", state="up", status="NEW", trace_id="trace-resume"))
+    db.commit()
+
+    results = await sharded.run(["10.31.0.0/22"], "quick", lambda: "trace-new", concurrency=4)
+
+    result = results[0]
+    assert result["task_id"] == parent.id
+    assert result["trace_id"] == "trace-resume"
+    assert result["success"] is True
+    assert sorted(run[1] for run in _runs(log_path) if run[0] == "start") == [
+        "10.31.1.0/24",
+        "10.31.2.0/24",
+        "10.31.3.0/24",
+    ]
+
+    db.expire_all()
+    hosts = (
+        db.query(database.ScanFinding.asset)
+        .filter(database.ScanFinding.scan_task_id == parent.id, database.ScanFinding.port.is_(None))
+        .all()
+    )
+    assert sorted(asset for (asset,) in hosts) == [f"10.31.{i}.1" for i in range(4)]
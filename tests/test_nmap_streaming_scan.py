@@ -0,0 +1,151 @@
+"""Nmap 异步扫描：stdout 流式解析、主机增量落库与取消"""
+import asyncio
+import os
+import stat
+import sys
+import threading
+from importlib import import_module
+
+import pytest
+
+nmap_module = import_module("services.nmap_scanner")
+database = import_module("core.database")
+
+FAKE_NMAP = """#!{python}
+import os, sys, time
+hosts = int(os.environ.get("FAKE_NMAP_HOSTS", "3"))
+hang = os.environ.get("FAKE_NMAP_HANG") == "1"
+out = sys.stdout
+out.write('<?xml version="1.0"?>\\n<nmaprun scanner="nmap">\\n')
+for i in range(hosts):
+    out.write(
+        '<hosthint><status state="up"/></hosthint>'
+        '<host><status state="up"/><address addr="10.20.0.%d" addrtype="ipv4"/>'
+        '<ports><port protocol="tcp" portid="22"><state state="open"/>'
+        '<service name="ssh" product="OpenSSH" version="8.9"/></port></ports></host>\\n' % (i + 1)
+    )
+    out.flush()
+out.write('<host><status state="down"/><address addr="10.20.0.250" addrtype="ipv4"/></host>\\n')
+out.flush()
+if hang:
+    time.sleep(30)
+out.write('<runstats><finished exit="success"/></runstats></nmaprun>\\n')
+"""
+
+
+@pytest.fixture
+def fake_nmap(tmp_path, monkeypatch):
+    script = tmp_path / "nmap"
+    script.write_text(FAKE_NMAP.format(python=sys.executable))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.chdir(tmp_path)
+
+    scanner = nmap_module.NmapScanner()
+    scanner.nmap_path = str(script)
+    scanner._config_loaded = True
+    return scanner
+
+
+def _findings(db, task_id):
+    db.expire_all()
+    return db.query(database.ScanFinding).filter(database.ScanFinding.scan_task_id == task_id).all()
+
+
+async def _wait_for_hosts(db, expected):
+    for _ in range(200):
+        task = db.query(database.ScanTask).filter(database.ScanTask.target == "10.20.0.0/24").order_by(
+            database.ScanTask.id.desc()
+        ).first()
+        if task and task.state == "RUNNING":
+            hosts = [f for f in _findings(db, task.id) if f.port is None]
+            if len(hosts) >= expected:
+                return task.id
+        await asyncio.sleep(0.05)
+    raise AssertionError("hosts were not persisted progressively")
+
+
+def test_host_stream_parses_chunks_and_releases_nodes():
+    stream = nmap_module.NmapHostStream()
+    xml = (
+        b'<nmaprun><host><status state="up"/><address addr="10.0.0.1" addrtype="ipv4"/></host>'
+        b'<taskprogress percent="50"/>'
+        b'<host><status state="up"/><address addr="10.0.0.2" addrtype="ipv4"/></host></nmaprun>'
+    )
+    hosts = []
+    for i in range(0, len(xml), 7):
+        hosts.extend(stream.feed(xml[i : i + 7]))
+        if stream._root is not None:
+            assert len(stream._root) <= 1
+    hosts.extend(stream.close())
+
+    assert [h["ip"] for h in hosts] == ["10.0.0.1", "10.0.0.2"]
+    assert len(stream._root) == 0
+
+
+@pytest.mark.asyncio
+async def test_scan_target_streams_hosts_into_findings(fake_nmap, db):
+    result = await fake_nmap.scan_target("10.20.0.0/24", "quick", db, "trace-nmap-stream")
+
+    assert result["success"] is True
+    assert result["hosts_count"] == 3
+    assert os.path.exists(result["output_path"])
+    assert fake_nmap.parse_nmap_xml(result["output_path"])[0]["open_ports"] == [22]
+
+    task = db.query(database.ScanTask).filter(database.ScanTask.id == result["task_id"]).one()
+    assert task.state == "COMPLETED"
+    findings = _findings(db, task.id)
+    assert len([f for f in findings if f.port is None]) == 3
+    assert len([f for f in findings if f.port == 22]) == 3
+
+
+@pytest.mark.asyncio
+async def test_findings_are_saved_off_the_event_loop(fake_nmap, db, monkeypatch):
+    monkeypatch.setattr(nmap_module, "NMAP_FLUSH_HOSTS", 1)
+    loop_thread = threading.get_ident()
+    save_threads = []
+    original = fake_nmap.save_scan_results
+
+    def recording_save(scan_task_id, hosts, session, trace_id, chunk_size=None):
+        save_threads.append((threading.get_ident(), session is db))
+        return original(scan_task_id, hosts, session, trace_id, chunk_size)
+
+    monkeypatch.setattr(fake_nmap, "save_scan_results", recording_save)
+    result = await fake_nmap.scan_target("10.20.0.0/24", "quick", db, "trace-nmap-thread")
+
+    assert result["hosts_count"] == 3
+    assert save_threads and all(ident != loop_thread and not same for ident, same in save_threads)
+
+
+@pytest.mark.asyncio
+async def test_cancel_scan_kills_nmap_and_keeps_partial_findings(fake_nmap, db, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_HANG", "1")
+    monkeypatch.setattr(nmap_module, "NMAP_FLUSH_HOSTS", 1)
+
+    scan = asyncio.create_task(fake_nmap.scan_target("10.20.0.0/24", "quick", db, "trace-nmap-cancel"))
+    task_id = await _wait_for_hosts(db, 3)
+    assert await fake_nmap.cancel_scan(task_id) is True
+    result = await asyncio.wait_for(scan, timeout=5)
+
+    assert result["success"] is False
+    assert result["hosts_count"] == 3
+    task = db.query(database.ScanTask).filter(database.ScanTask.id == task_id).one()
+    assert task.state == "FAILED"
+    assert task.error_message == nmap_module.CANCELLED_MESSAGE
+    assert not fake_nmap._processes
+
+
+@pytest.mark.asyncio
+async def test_scan_stops_when_task_state_is_cancelled_elsewhere(fake_nmap, db, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_HANG", "1")
+    monkeypatch.setattr(nmap_module, "NMAP_FLUSH_HOSTS", 1)
+    monkeypatch.setattr(nmap_module, "NMAP_CANCEL_POLL_SECONDS", 0.05)
+
+    scan = asyncio.create_task(fake_nmap.scan_target("10.20.0.0/24", "quick", db, "trace-nmap-poll"))
+    task_id = await _wait_for_hosts(db, 3)
+    task = db.query(database.ScanTask).filter(database.ScanTask.id == task_id).one()
+    task.state = "FAILED"
+    task.error_message = nmap_module.CANCELLED_MESSAGE
+    db.commit()
+
+    result = await asyncio.wait_for(scan, timeout=5)
+    assert result["message"] == "扫描已取消"
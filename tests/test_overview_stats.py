@@ -0,0 +1,75 @@
+"""Overview 聚合：每表单次 SUM(CASE) 查询、共享 TTL 缓存与提交失效"""
+from importlib import import_module
+
+from sqlalchemy import event
+
+stats_module = import_module("services.overview_stats")
+database = import_module("core.database")
+
+OVERVIEW_TABLES = ("threat_event", "execution_task", "scan_task", "scan_finding", "asset", "collector_config")
+
+
+def _h(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        lowered = statement.lower()
+        if lowered.lstrip().startswith("select") and any(f"from {t}" in lowered for t in OVERVIEW_TABLES):
+            self.statements.append(statement)
+
+
+def _event(ip: str, status: str = "PENDING", score=None) -> "database.ThreatEvent":
+    return database.ThreatEvent(
+        ip=ip, source="hfish", status=status, ai_score=score, trace_id="trace-overview",
+    )
+
+
+def test_overview_endpoints_share_one_aggregated_snapshot(client, admin_token, db):
+    stats_module.overview_cache.invalidate()
+    with _StatementCounter(db.get_bind()) as counter:
+        assert client.get("/api/v1/overview/metrics", headers=_h(admin_token)).status_code == 200
+        first = len(counter.statements)
+        assert client.get("/api/v1/overview/chain-status", headers=_h(admin_token)).status_code == 200
+        assert client.get("/api/v1/overview/metrics", headers=_h(admin_token)).status_code == 200
+        cached = len(counter.statements) - first
+
+    assert first <= 6
+    assert cached == 0
+
+
+def test_orm_commit_invalidates_and_counts_match(client, admin_token, db):
+    before = client.get("/api/v1/overview/metrics", headers=_h(admin_token)).json()["data"]["defense"]
+
+    db.add_all([_event("10.50.0.1", score=92), _event("10.50.0.2", score=40), _event("10.50.0.3", status="BLOCKED")])
+    db.commit()
+
+    after = client.get("/api/v1/overview/metrics", headers=_h(admin_token)).json()["data"]["defense"]
+    assert after["today_alerts"] == before["today_alerts"] + 3
+    assert after["pending_events"] == before["pending_events"] + 2
+    assert after["high_risk_pending"] == before["high_risk_pending"] + 1
+
+    todos = client.get("/api/v1/overview/todos", headers=_h(admin_token)).json()["data"]
+    assert todos["counts"]["pending_events"] == after["pending_events"]
+
+
+def test_bulk_delete_invalidates_cache(client, admin_token, db):
+    client.get("/api/v1/overview/metrics", headers=_h(admin_token))
+    db.query(database.ThreatEvent).filter(database.ThreatEvent.trace_id == "trace-overview").delete()
+    db.commit()
+
+    counts = stats_module.overview_cache.counts(db)
+    fresh = stats_module.compute_overview_counts(db)
+    assert counts["threat"] == fresh["threat"]
@@ -0,0 +1,88 @@
+"""接口限流：GCRA 突发与回补、LRU 键数上限、SQLite 后端跨实例共享限额、中间件 429 响应"""
+import os
+import sqlite3
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.middleware import RateLimitMiddleware
+from core.rate_limit import MemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore
+from services.metrics_service import metrics
+
+
+class _Clock:
+    def __init__(self, store):
+        self.value = 1000.0
+        store.now = lambda: self.value
+
+
+def test_gcra_allows_burst_then_refills_one_slot_per_interval():
+    store = MemoryRateLimitStore(max_keys=100)
+    clock = _Clock(store)
+    limiter = RateLimiter(store)
+
+    assert [limiter.hit("k", 6)[0] for _ in range(6)] == [False] * 6
+    limited, retry_after = limiter.hit("k", 6)
+    assert limited is True and retry_after == 10
+
+    clock.value += 10
+    assert limiter.hit("k", 6)[0] is False
+    assert limiter.hit("k", 6)[0] is True
+    assert limiter.hit("other", 6)[0] is False
+
+
+def test_memory_store_evicts_least_recently_used_keys():
+    store = MemoryRateLimitStore(max_keys=100)
+    limiter = RateLimiter(store)
+    for i in range(1000):
+        limiter.hit(f"global:10.0.{i // 256}.{i % 256}", 60)
+    assert len(store) == 100
+
+
+def test_sqlite_store_fails_open_quickly_when_write_lock_is_held(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    limiter = RateLimiter(SQLiteRateLimitStore(path))
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        before = metrics.get_counter("rate_limit_store_busy_total")
+        started = time.perf_counter()
+        assert limiter.hit("global:10.0.0.1", 1) == (False, 0)
+        assert time.perf_counter() - started < 0.5
+        assert metrics.get_counter("rate_limit_store_busy_total") == before + 1
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+
+def test_sqlite_store_shares_quota_between_workers(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    worker_a = RateLimiter(SQLiteRateLimitStore(path))
+    worker_b = RateLimiter(SQLiteRateLimitStore(path))
+
+    results = [(worker_a if i % 2 else worker_b).hit("login:10.1.1.1", 5)[0] for i in range(5)]
+    assert results == [False] * 5
+    limited, retry_after = worker_a.hit("login:10.1.1.1", 5)
+    assert limited is True and 1 <= retry_after <= 12
+    assert worker_b.hit("login:10.1.1.1", 5)[0] is True
+    assert worker_b.hit("login:10.1.1.2", 5)[0] is False
+    assert len(worker_a.store) == 2
+
+
+def test_middleware_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setitem(os.environ, "TESTING", "0")
+    app = FastAPI()
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, global_rpm=100, login_rpm=2, limiter=RateLimiter(MemoryRateLimitStore()))
+    client = TestClient(app)
+
+    codes = [client.post("/api/v1/auth/login", headers={"X-Forwarded-For": "10.2.0.1"}).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    blocked = client.post("/api/v1/auth/login", headers={"X-Forwarded-For": "10.2.0.1"})
+    assert blocked.json()["code"] == 42900 and int(blocked.headers["Retry-After"]) >= 1
+    assert client.post("/api/v1/auth/login", headers={"X-Forwarded-For": "10.2.0.2"}).status_code == 200
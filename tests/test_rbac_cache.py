@@ -0,0 +1,112 @@
+"""RBAC 权限缓存：令牌内权限声明免查库、授权变更与禁用用户即时失效、缓存管理接口"""
+import hashlib
+from datetime import datetime, timezone
+
+from sqlalchemy import event, text
+
+from services.rbac_cache import rbac_cache, written_rbac_table
+
+RBAC_QUERY_TABLES = ("user_role", "role_permission")
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _seed_auditor(db) -> None:
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    db.execute(
+        text(
+            "INSERT OR IGNORE INTO user (id, username, password_hash, email, enabled, created_at, updated_at) "
+            "VALUES (40, 'rbac_auditor', :pw, 'rbac@example.com', 1, :now, :now)"
+        ),
+        {"pw": hashlib.sha256("auditor123".encode()).hexdigest(), "now": now},
+    )
+    db.execute(
+        text(
+            "INSERT OR IGNORE INTO role (id, name, description, created_at, updated_at) "
+            "VALUES (40, 'rbac_auditor', 'Auditor', :now, :now)"
+        ),
+        {"now": now},
+    )
+    db.execute(text("INSERT OR IGNORE INTO user_role (user_id, role_id) VALUES (40, 40)"))
+    db.execute(
+        text(
+            "INSERT OR IGNORE INTO role_permission (role_id, permission_id, created_at) "
+            "SELECT 40, id, :now FROM permission WHERE name = 'view_audit'"
+        ),
+        {"now": now},
+    )
+    db.commit()
+
+
+def _count_rbac_queries(engine, counter: list):
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and any(t in statement for t in RBAC_QUERY_TABLES):
+            counter.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before)
+    return lambda: event.remove(engine, "before_cursor_execute", before)
+
+
+def test_permission_claims_skip_rbac_queries_until_grant_changes(client, db):
+    _seed_auditor(db)
+    login = client.post("/api/v1/auth/login", json={"username": "rbac_auditor", "password": "auditor123"})
+    assert login.status_code == 200
+    token = login.json()["access_token"]
+    assert login.json()["user"]["permissions"] == ["view_audit"]
+
+    queries = []
+    stop = _count_rbac_queries(db.get_bind(), queries)
+    try:
+        for _ in range(5):
+            assert client.get("/api/v1/system/audit/logs", headers=_auth(token)).status_code == 200
+        assert queries == []
+
+        # 撤销授权后无需重新登录即生效
+        db.execute(text("DELETE FROM role_permission WHERE role_id = 40"))
+        db.commit()
+        denied = client.get("/api/v1/system/audit/logs", headers=_auth(token))
+        assert denied.status_code == 403
+        assert len(queries) == 2
+
+        db.execute(
+            text(
+                "INSERT INTO role_permission (role_id, permission_id, created_at) "
+                "SELECT 40, id, CURRENT_TIMESTAMP FROM permission WHERE name = 'view_audit'"
+            )
+        )
+        db.commit()
+        assert client.get("/api/v1/system/audit/logs", headers=_auth(token)).status_code == 200
+        assert client.get("/api/v1/system/audit/logs", headers=_auth(token)).status_code == 200
+        assert len(queries) == 4
+
+        db.execute(text("UPDATE user SET enabled = 0 WHERE id = 40"))
+        db.commit()
+        assert client.get("/api/v1/system/audit/logs", headers=_auth(token)).status_code == 401
+    finally:
+        stop()
+        db.execute(text("DELETE FROM user_role WHERE user_id = 40"))
+        db.execute(text("DELETE FROM role_permission WHERE role_id = 40"))
+        db.execute(text("DELETE FROM user WHERE id = 40"))
+        db.commit()
+
+
+def test_rbac_write_detection():
+    assert written_rbac_table("INSERT OR IGNORE INTO user_role (user_id, role_id) VALUES (1, 1)") == "user_role"
+    assert written_rbac_table('\n  DELETE FROM "role_permission" WHERE role_id = 2') == "role_permission"
+    assert written_rbac_table("UPDATE role SET name = 'x'") == "role"
+    assert written_rbac_table("INSERT INTO ai_chat_message (session_id, role, content) VALUES (1, 'user', 'x')") is None
+    assert written_rbac_table("SELECT * FROM user_role") is None
+
+
+def test_rbac_cache_stats_and_flush_endpoints(client, admin_token):
+    before = rbac_cache.version_tag()
+    resp = client.get("/api/v1/system/rbac-cache", headers=_auth(admin_token))
+    assert resp.status_code == 200
+    assert resp.json()["data"]["version"] == before
+
+    resp = client.delete("/api/v1/system/rbac-cache", headers=_auth(admin_token))
+    assert resp.status_code == 200
+    assert rbac_cache.version_tag() != before
+    assert client.get("/api/v1/system/rbac-cache", headers=_auth(admin_token)).status_code == 200
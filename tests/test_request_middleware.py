@@ -0,0 +1,90 @@
+"""纯 ASGI 请求中间件：追踪头与 request.state、结构化指标、流式响应直通、限流 429"""
+import asyncio
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from core.middleware import RequestMiddleware
+from core.rate_limit import MemoryRateLimitStore, RateLimiter
+from services.metrics_service import metrics
+
+
+def _app(**kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/echo")
+    async def echo(request: Request):
+        return {"trace_id": request.state.trace_id}
+
+    @app.get("/missing")
+    async def missing():
+        return {"ok": False}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+                await asyncio.sleep(0)
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    app.add_middleware(RequestMiddleware, limiter=RateLimiter(MemoryRateLimitStore()), **kwargs)
+    return app
+
+
+def test_trace_header_state_and_metrics():
+    client = TestClient(_app())
+    before = metrics.snapshot()["counters"].get("http_requests_total", 0)
+
+    resp = client.get("/echo", headers={"X-Trace-ID": "trace-abc"})
+    assert resp.headers["X-Trace-ID"] == "trace-abc"
+    assert resp.json() == {"trace_id": "trace-abc"}
+
+    generated = client.get("/echo")
+    assert generated.headers["X-Trace-ID"] == generated.json()["trace_id"]
+    assert client.get("/nope").headers["X-Trace-ID"]
+    assert metrics.snapshot()["counters"]["http_requests_total"] == before + 3
+
+
+def test_streaming_response_passes_through_in_chunks():
+    app = _app()
+    sent = []
+
+    async def run():
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+
+        async def receive():
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+
+    asyncio.run(run())
+    start = sent[0]
+    assert start["type"] == "http.response.start"
+    assert b"x-trace-id" in dict(start["headers"])
+    bodies = [m["body"] for m in sent[1:] if m["type"] == "http.response.body" and m.get("body")]
+    assert bodies == [b"data: 0\n\n", b"data: 1\n\n", b"data: 2\n\n"]
+
+
+def test_rate_limited_requests_get_429_without_trace(monkeypatch):
+    monkeypatch.setitem(os.environ, "TESTING", "0")
+    client = TestClient(_app(global_rpm=2, login_rpm=1))
+    headers = {"X-Forwarded-For": "10.3.0.1"}
+
+    assert [client.get("/echo", headers=headers).status_code for _ in range(2)] == [200, 200]
+    limited = client.get("/echo", headers=headers)
+    assert limited.status_code == 429
+    assert limited.json()["code"] == 42901 and limited.headers["Retry-After"]
+    assert "X-Trace-ID" not in limited.headers
+    assert client.get("/echo", headers={"X-Forwarded-For": "10.3.0.2"}).status_code == 200
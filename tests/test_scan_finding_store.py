@@ -0,0 +1,61 @@
+"""ScanFinding 分块批量写入与主机迭代器流式落库"""
+import json
+from importlib import import_module
+
+store = import_module("services.scan_finding_store")
+database = import_module("core.database")
+
+
+def _task(db) -> int:
+    asset = db.query(database.Asset).filter(database.Asset.target == "10.40.0.0/24").first()
+    if asset is None:
+        asset = database.Asset(target="10.40.0.0/24", target_type="CIDR", enabled=1)
+        db.add(asset)
+        db.commit()
+    task = database.ScanTask(
+        asset_id=asset.id, target=asset.target, target_type="CIDR", tool_name="nmap",
+        profile="quick", state="RUNNING", trace_id="trace-findings",
+    )
+    db.add(task)
+    db.commit()
+    return task.id
+
+
+def _host(i: int) -> dict:
+    services = [
+        {"port": 22, "protocol": "tcp", "service": "ssh", "product": "OpenSSH", "version": "9.0", "extrainfo": ""},
+        {"port": 80, "protocol": "tcp", "service": "http", "product": "", "version": "", "extrainfo": ""},
+    ]
+    return {"ip": f"10.40.0.{i}", "hostname": f"h{i}", "state": "up", "os_type": "Linux",
+            "open_ports": [22, 80], "services": services}
+
+
+def test_save_nmap_hosts_streams_iterator_in_chunks(db, monkeypatch):
+    task_id = _task(db)
+    executed = []
+    original_insert = store.insert_findings
+
+    def spy_insert(session, rows, chunk_size=None):
+        executed.append(len(rows))
+        return original_insert(session, rows, chunk_size)
+
+    monkeypatch.setattr(store, "insert_findings", spy_insert)
+    hosts = (_host(i) for i in range(1, 6))
+    assert store.save_nmap_hosts(db, task_id, hosts, "trace-findings", chunk_size=4) == 5
+    # 每台主机 3 行，攒满 4 行即写入一块
+    assert max(executed) <= 6 and sum(executed) == 15
+
+    findings = db.query(database.ScanFinding).filter(database.ScanFinding.scan_task_id == task_id).all()
+    host_rows = [f for f in findings if f.port is None]
+    assert len(findings) == 15 and len(host_rows) == 5
+    assert json.loads(host_rows[0].evidence)["open_ports"] == [22, 80]
+    assert host_rows[0].created_at is not None
+    assert {f.service for f in findings if f.port == 22} == {"ssh OpenSSH 9.0"}
+
+
+def test_save_nmap_hosts_skips_malformed_host(db):
+    task_id = _task(db)
+    hosts = [_host(1), {"hostname": "no-ip"}, _host(2)]
+    assert store.save_nmap_hosts(db, task_id, hosts, "trace-findings") == 2
+    count = db.query(database.ScanFinding).filter(database.ScanFinding.scan_task_id == task_id).count()
+    assert count == 6
@@ -375,7 +375,7 @@ def test_approve_event_block_retry_to_manual_required(monkeypatch):
     ):
         return {"score": 92, "reason": "AI high", "action_suggest": "BLOCK"}
 
-    async def fake_block_ip(ip: str, device_id=None):
+    async def fake_block_ip(ip: str, device_id=None, operator: str = "system", trace_id=None):
         return {"success": False, "error": "switch timeout"}
 
     async def fast_sleep(seconds: float):
@@ -564,7 +564,7 @@ def test_approve_event_permission_denied_for_viewer(monkeypatch):
     ):
         return {"score": 90, "reason": "AI high", "action_suggest": "BLOCK"}
 
-    async def fake_block_ip(ip: str, device_id=None):
+    async def fake_block_ip(ip: str, device_id=None, operator: str = "system", trace_id=None):
         return {"success": True}
 
     monkeypatch.setattr(defense_module.ai_engine, "assess_threat", fake_assess_threat)
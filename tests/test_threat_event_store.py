@@ -0,0 +1,88 @@
+"""ThreatEvent 批量去重：分块查询、冲突忽略写入与 HFish 采集入库"""
+from importlib import import_module
+
+from sqlalchemy import text
+
+store = import_module("services.threat_event_store")
+hfish_module = import_module("services.hfish_collector")
+
+
+def _payload(source_event_id: str, vendor: str = "hfish") -> dict:
+    return {
+        "ip": "10.8.0.1",
+        "source": "hfish",
+        "source_vendor": vendor,
+        "source_type": "attack_source",
+        "source_event_id": source_event_id,
+        "status": "PENDING",
+        "trace_id": "trace-store",
+    }
+
+
+def test_dedup_unique_index_exists(db):
+    indexes = db.execute(text("PRAGMA index_list(threat_event)")).fetchall()
+    dedup = [row for row in indexes if row[1] == "idx_threat_event_dedup"]
+    assert dedup and dedup[0][2] == 1
+
+
+def test_find_existing_event_ids_chunks_and_scopes_by_vendor(db):
+    inserted = store.insert_events_ignore_conflicts(db, [_payload(f"store-{i}") for i in range(7)])
+    store.insert_events_ignore_conflicts(db, [_payload("store-0", vendor="other")])
+    db.commit()
+    assert len(inserted) == 7
+
+    keys = [("hfish", f"store-{i}") for i in range(10)]
+    existing = store.find_existing_event_ids(db, keys, chunk_size=3)
+    assert existing == {key: inserted[key] for key in keys[:7]}
+
+
+def test_insert_events_ignore_conflicts_skips_existing_keys(db):
+    first = store.insert_events_ignore_conflicts(db, [_payload("conflict-1")])
+    db.commit()
+    second = store.insert_events_ignore_conflicts(db, [_payload("conflict-1"), _payload("conflict-2")])
+    db.commit()
+
+    assert list(second) == [("hfish", "conflict-2")]
+    count = db.execute(
+        text("SELECT COUNT(*) FROM threat_event WHERE source_event_id LIKE 'conflict-%'")
+    ).scalar()
+    assert count == 2
+    assert first[("hfish", "conflict-1")] not in second.values()
+
+
+def test_hfish_collector_ingest_logs_bulk_dedupes(db):
+    collector = hfish_module.HFishCollector()
+    logs = [
+        {"attack_ip": "1.1.1.1", "service_name": "ssh", "service_port": "22", "create_time": 1700000000},
+        {"attack_ip": "1.1.1.1", "service_name": "ssh", "service_port": "22", "create_time": 1700000000},
+        {"attack_ip": "2.2.2.2", "service_name": "http", "service_port": "80", "create_time": 1700000001},
+    ]
+    assert collector.ingest_logs(logs, db, "trace-collector") == 2
+    assert collector.ingest_logs(logs, db, "trace-collector") == 0
+
+
+def test_events_without_source_id_get_their_own_rows(db):
+    payloads = [_payload(None), _payload(None), _payload("keyed-1")]
+    inserted = store.insert_events_ignore_conflicts(db, payloads)
+    db.commit()
+
+    ids = [inserted[store.event_key(payload)] for payload in payloads]
+    assert len(set(ids)) == 3
+    assert store.find_existing_event_ids(db, [store.event_key(p) for p in payloads[:2]]) == {}
+
+
+def test_mixed_key_sets_keep_column_defaults(db):
+    partial = _payload("defaults-1")
+    del partial["status"]
+    full = dict(_payload("defaults-2"), status="BLOCKED", attack_count=5)
+    inserted = store.insert_events_ignore_conflicts(db, [partial, full])
+    db.commit()
+
+    rows = dict(
+        db.execute(
+            text("SELECT id, status || ':' || attack_count FROM threat_event WHERE id IN (:a, :b)"),
+            {"a": inserted[("hfish", "defaults-1")], "b": inserted[("hfish", "defaults-2")]},
+        ).fetchall()
+    )
+    assert rows[inserted[("hfish", "defaults-1")]] == "PENDING:1"
+    assert rows[inserted[("hfish", "defaults-2")]] == "BLOCKED:5"
@@ -0,0 +1,111 @@
+"""ThreatEvent 小时汇总：压实、迟到事件/更新增量重算与统计接口分段读取"""
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+
+from sqlalchemy import text
+
+rollup_module = import_module("services.threat_rollup")
+database = import_module("core.database")
+
+threat_rollup = rollup_module.threat_rollup
+VENDOR = "rollup-test"
+
+
+def _h(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _event(ip: str, hours_ago: float, vendor: str = VENDOR, score: int = 50,
+           label: str = "scan", service: str = "ssh") -> "database.ThreatEvent":
+    created = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    return database.ThreatEvent(
+        ip=ip, source=vendor, source_vendor=vendor, status="PENDING", trace_id="trace-rollup",
+        ai_score=score, threat_label=label, service_name=service, created_at=created, updated_at=created,
+    )
+
+
+def _snapshot(db, since):
+    return {
+        "total": threat_rollup.total(db, since, vendor=VENDOR),
+        "high": threat_rollup.count_by(db, "high", since, vendor=VENDOR),
+        "labels": sorted(threat_rollup.count_by(db, "threat_label", since, vendor=VENDOR)),
+        "ips": sorted(threat_rollup.count_by(db, "ip", since, vendor=VENDOR)),
+        "daily": threat_rollup.daily_counts(db, "total", since, vendor=VENDOR),
+    }
+
+
+def test_rollup_matches_raw_and_is_read_for_closed_hours(db):
+    threat_rollup.reset(db)
+    db.add_all([
+        _event("10.60.0.1", 50, score=90, label="brute"),
+        _event("10.60.0.1", 26.5, label="brute"),
+        _event("10.60.0.2", 3.2, score=85, service="http"),
+        _event("10.60.0.3", 0.0),
+        _event("10.60.0.9", 5, vendor="other-vendor"),
+    ])
+    db.commit()
+    since = datetime.now(timezone.utc) - timedelta(days=3)
+
+    raw = _snapshot(db, since)
+    assert raw["total"] == 4
+    assert raw["high"] == [("", 2)]
+
+    threat_rollup.compact(bind=db.get_bind())
+    assert db.query(database.ThreatEventRollup).count() > 0
+    assert _snapshot(db, since) == raw
+
+    # 已汇总小时的原始事件被绕过 ORM 删除后，统计仍来自汇总表
+    db.execute(text("DELETE FROM threat_event WHERE ip = '10.60.0.1'"))
+    db.commit()
+    assert threat_rollup.total(db, since, vendor=VENDOR) == 4
+
+    threat_rollup.reset(db)
+    db.commit()
+    assert threat_rollup.total(db, since, vendor=VENDOR) == 2
+
+
+def test_late_events_and_updates_are_recompacted(db):
+    threat_rollup.reset(db)
+    db.commit()
+    since = datetime.now(timezone.utc) - timedelta(days=2)
+    db.add(_event("10.61.0.1", 10))
+    db.commit()
+    threat_rollup.compact(bind=db.get_bind())
+    assert threat_rollup.total(db, since, vendor=VENDOR) == 1
+
+    # 迟到事件：created_at 落在已汇总的小时
+    late = _event("10.61.0.2", 20, score=10)
+    db.add(late)
+    db.commit()
+    threat_rollup.compact(bind=db.get_bind())
+    assert threat_rollup.total(db, since, vendor=VENDOR) == 2
+    assert threat_rollup.count_by(db, "high", since, vendor=VENDOR) == [("", 0)]
+
+    # AI 重新评分：updated_at 由 ORM 刷新
+    late.ai_score = 95
+    db.commit()
+    threat_rollup.compact(bind=db.get_bind())
+    assert threat_rollup.count_by(db, "high", since, vendor=VENDOR) == [("", 1)]
+
+
+def test_hfish_stats_and_trends_unchanged_by_compaction(client, admin_token, db):
+    threat_rollup.reset(db)
+    db.add_all([
+        _event("10.62.0.1", 30, vendor="hfish", label="brute", service="ssh"),
+        _event("10.62.0.1", 4, vendor="hfish", score=88, service="http"),
+        _event("10.62.0.2", 0.1, vendor="hfish", label=None, service=None),
+    ])
+    db.commit()
+
+    def fetch():
+        stats = client.get("/api/v1/defense/hfish/stats?days=7", headers=_h(admin_token)).json()["data"]
+        trends = client.get("/api/v1/overview/trends?range=7d", headers=_h(admin_token)).json()["data"]
+        stats["threat_stats"] = sorted(stats["threat_stats"], key=lambda r: r["level"])
+        stats["service_stats"] = sorted(stats["service_stats"], key=lambda r: r["name"])
+        stats["ip_stats"] = sorted(stats["ip_stats"], key=lambda r: r["ip"])
+        return stats, trends
+
+    before = fetch()
+    assert before[0]["total"] >= 3
+    threat_rollup.compact(bind=db.get_bind())
+    assert fetch() == before
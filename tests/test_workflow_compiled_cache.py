@@ -0,0 +1,125 @@
+"""已编译工作流缓存：按 (workflow_id, version_id) 复用，发布/回滚失效，条件预编译"""
+import asyncio
+from copy import deepcopy
+from importlib import import_module
+from uuid import uuid4
+
+from services.workflow_dsl import WorkflowRunState, load_default_defense_workflow
+
+runtime = import_module("services.workflow_runtime")
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _publish(client, headers, workflow_id: int, workflow_key: str, version: int):
+    resp = client.post(
+        f"/api/v1/workflows/{workflow_id}/publish",
+        json={
+            "version_tag": version,
+            "canary_percent": 100,
+            "approval_reason": "compiled cache test",
+            "approval_passed": True,
+            "confirmation_text": workflow_key,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+
+def _create_published(client, admin_token) -> tuple[int, str, dict]:
+    headers = _auth(admin_token)
+    workflow_key = f"wf-cache-{uuid4().hex[:8]}"
+    dsl = deepcopy(load_default_defense_workflow())
+    dsl.update(workflow_id=workflow_key, name=f"Workflow {workflow_key}", version=1, status="DRAFT")
+    resp = client.post(
+        "/api/v1/workflows",
+        json={"workflow_key": workflow_key, "name": dsl["name"], "dsl": dsl, "change_note": "init"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    workflow_id = resp.json()["data"]["id"]
+    _publish(client, headers, workflow_id, workflow_key, 1)
+    return workflow_id, workflow_key, dsl
+
+
+def _run(test_db, workflow_key: str, ref: str):
+    async def ai_low(_payload):
+        return runtime.NodeExecutionResult(
+            state=WorkflowRunState.SUCCESS.value,
+            output={"score": 10, "reason": "low", "action_suggest": "MONITOR"},
+        )
+
+    return asyncio.run(
+        runtime.run_published_workflow(
+            test_db,
+            workflow_key=workflow_key,
+            input_payload={"event": {"ip": "10.70.0.1", "attack_count": 1}},
+            trigger_source="unit_test",
+            trigger_ref=ref,
+            adapters={"ai_engine.assess_threat": ai_low},
+        )
+    )
+
+
+def _count_compiles(monkeypatch) -> list:
+    calls = []
+    original = runtime.compile_workflow
+
+    def spy(payload):
+        calls.append(payload)
+        return original(payload)
+
+    monkeypatch.setattr(runtime, "compile_workflow", spy)
+    return calls
+
+
+def test_published_workflow_compiled_once_per_version(client, admin_token, test_db, monkeypatch):
+    _, workflow_key, _ = _create_published(client, admin_token)
+    calls = _count_compiles(monkeypatch)
+
+    first = _run(test_db, workflow_key, f"cache-{uuid4().hex}")
+    second = _run(test_db, workflow_key, f"cache-{uuid4().hex}")
+
+    assert first.workflow_version_id == second.workflow_version_id
+    assert len(calls) == 1
+
+
+def test_publish_and_rollback_switch_compiled_version(client, admin_token, test_db, monkeypatch):
+    headers = _auth(admin_token)
+    workflow_id, workflow_key, dsl = _create_published(client, admin_token)
+    v1 = _run(test_db, workflow_key, f"cache-{uuid4().hex}")
+
+    update_dsl = deepcopy(dsl)
+    update_dsl["description"] = "version 2"
+    resp = client.put(
+        f"/api/v1/workflows/{workflow_id}",
+        json={"version_tag": 1, "name": dsl["name"], "dsl": update_dsl, "change_note": "v2"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    _publish(client, headers, workflow_id, workflow_key, 2)
+    calls = _count_compiles(monkeypatch)
+
+    v2 = _run(test_db, workflow_key, f"cache-{uuid4().hex}")
+    assert v2.workflow_version_id != v1.workflow_version_id
+    assert len(calls) == 1
+
+    resp = client.post(
+        f"/api/v1/workflows/{workflow_id}/rollback",
+        json={"target_version": 1, "reason": "rollback", "confirmation_text": workflow_key},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    rolled_back = _run(test_db, workflow_key, f"cache-{uuid4().hex}")
+    assert rolled_back.workflow_version_id == v1.workflow_version_id
+    assert len(calls) == 2
+
+
+def test_transitions_carry_precompiled_conditions():
+    compiled = runtime.compile_workflow(load_default_defense_workflow())
+    transitions = [t for node in compiled.nodes.values() for t in node.transitions]
+    assert transitions and all(t.code is not None for t in transitions)
+    assert runtime._evaluate_condition("score >= 80 && approved == true", {"score": 90, "approved": True})
+    assert not runtime._evaluate_condition("missing_var > 1", {})
@@ -90,7 +90,7 @@ def test_approve_event_uses_runtime_and_finishes_success(monkeypatch, client, ad
             "trace_id": trace_id,
         }
 
-    async def fake_block_ip(ip: str, device_id=None, operator: str = "system"):
+    async def fake_block_ip(ip: str, device_id=None, operator: str = "system", trace_id=None):
         return {"success": True, "result": {"ip": ip, "device_id": device_id, "operator": operator}}
 
     monkeypatch.setattr(defense_module.ai_engine, "assess_threat", fake_assess_threat)
@@ -185,7 +185,7 @@ def test_approve_event_runtime_failure_maps_to_manual_required(monkeypatch, clie
             "trace_id": trace_id,
         }
 
-    async def fake_block_ip(ip: str, device_id=None, operator: str = "system"):
+    async def fake_block_ip(ip: str, device_id=None, operator: str = "system", trace_id=None):
         return {"success": False, "error": "switch timeout", "retryable": True}
 
     async def fast_sleep(_seconds: float):
@@ -149,7 +149,7 @@ def test_rollout_full_then_rollback_to_legacy(monkeypatch, client, admin_token,
             "trace_id": trace_id,
         }
 
-    async def fake_block_ip(ip: str, device_id=None, operator: str = "system"):
+    async def fake_block_ip(ip: str, device_id=None, operator: str = "system", trace_id=None):
         return {"success": True, "result": {"ip": ip, "device_id": device_id, "operator": operator}}
 
     monkeypatch.setattr(defense_module.ai_engine, "assess_threat", fake_assess_threat)
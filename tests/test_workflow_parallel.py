@@ -0,0 +1,158 @@
+"""并行分支（parallel / join）：校验、并发执行、并发上限与确定性上下文合并"""
+import asyncio
+import time
+from uuid import uuid4
+
+from core.database import WorkflowStepRun
+from services.workflow_dsl import WorkflowRunState
+from services.workflow_runtime import NodeExecutionResult, run_published_workflow
+from services.workflow_validator import validate_workflow_publish
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _node(node_id: str, node_type: str, **config) -> dict:
+    return {"id": node_id, "type": node_type, "name": node_id, "config": config}
+
+
+def _parallel_dsl(workflow_key: str, join: str = "join") -> dict:
+    return {
+        "workflow_id": workflow_key,
+        "name": f"Parallel {workflow_key}",
+        "version": 1,
+        "nodes": [
+            _node("trigger", "trigger"),
+            _node("fork", "parallel", join=join),
+            _node("assess", "ai_assess", service="ai_engine.assess_threat"),
+            _node("notify", "notification", service="push_service.send_test"),
+            _node("audit", "audit", service="audit_service.log"),
+            _node("join", "join"),
+        ],
+        "edges": [
+            {"from": "trigger", "to": "fork"},
+            {"from": "fork", "to": "assess", "priority": 10},
+            {"from": "fork", "to": "notify", "priority": 20},
+            {"from": "fork", "to": "audit", "priority": 30},
+            {"from": "assess", "to": "join"},
+            {"from": "notify", "to": "join"},
+            {"from": "audit", "to": "join"},
+        ],
+    }
+
+
+def _publish(client, admin_token) -> str:
+    headers = _auth(admin_token)
+    workflow_key = f"wf-parallel-{uuid4().hex[:8]}"
+    dsl = _parallel_dsl(workflow_key)
+    resp = client.post(
+        "/api/v1/workflows",
+        json={"workflow_key": workflow_key, "name": dsl["name"], "dsl": dsl},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    workflow_id = resp.json()["data"]["id"]
+    resp = client.post(
+        f"/api/v1/workflows/{workflow_id}/publish",
+        json={
+            "version_tag": 1,
+            "canary_percent": 100,
+            "approval_reason": "parallel test",
+            "approval_passed": True,
+            "confirmation_text": workflow_key,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    return workflow_key
+
+
+class _Probe:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def adapter(self, delay: float, output: dict, state: str = WorkflowRunState.SUCCESS.value):
+        async def run(_payload):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.active -= 1
+            return NodeExecutionResult(state=state, output=output)
+        return run
+
+
+def _run(db, workflow_key: str, adapters: dict):
+    return asyncio.run(
+        run_published_workflow(
+            db,
+            workflow_key=workflow_key,
+            input_payload={"event": {"ip": "10.80.0.1"}},
+            trigger_source="unit_test",
+            trigger_ref=f"parallel-{uuid4().hex}",
+            adapters=adapters,
+        )
+    )
+
+
+def test_validator_checks_parallel_structure():
+    valid = validate_workflow_publish(_parallel_dsl("wf-parallel-valid"))
+    assert valid["valid"] is True, valid["errors"]
+
+    missing_join = validate_workflow_publish(_parallel_dsl("wf-parallel-missing", join="audit"))
+    assert "WF_RULE_PARALLEL_JOIN_MISSING" in {e["code"] for e in missing_join["errors"]}
+
+    escaping = _parallel_dsl("wf-parallel-escape")
+    escaping["edges"] = [e for e in escaping["edges"] if e != {"from": "audit", "to": "join"}]
+    codes = {e["code"] for e in validate_workflow_publish(escaping)["errors"]}
+    assert "WF_RULE_PARALLEL_UNJOINED" in codes
+
+
+def test_branches_run_concurrently_and_merge_in_branch_order(client, admin_token, test_db):
+    workflow_key = _publish(client, admin_token)
+    probe = _Probe()
+    adapters = {
+        # 优先级最高的分支最慢：合并结果仍按分支顺序，后序分支的同名键生效
+        "ai_engine.assess_threat": probe.adapter(0.3, {"score": 20, "shared": "assess"}),
+        "push_service.send_test": probe.adapter(0.2, {"sent": True, "shared": "notify"}),
+        "audit_service.log": probe.adapter(0.1, {"audited": True, "shared": "audit"}),
+    }
+
+    started = time.monotonic()
+    result = _run(test_db, workflow_key, adapters)
+    elapsed = time.monotonic() - started
+
+    assert result.run_state == WorkflowRunState.SUCCESS.value
+    assert probe.peak == 3
+    assert elapsed < 0.55
+    assert result.context["shared"] == "audit"
+    assert result.context["score"] == 20 and result.context["sent"] is True
+    node_ids = {
+        step.node_id
+        for step in test_db.query(WorkflowStepRun).filter(WorkflowStepRun.workflow_run_id == result.run_id)
+    }
+    assert node_ids == {"trigger", "fork", "assess", "notify", "audit", "join"}
+
+
+def test_parallel_cap_and_manual_required_branch(client, admin_token, test_db, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_MAX_PARALLEL_NODES", "1")
+    workflow_key = _publish(client, admin_token)
+    probe = _Probe()
+    adapters = {
+        "ai_engine.assess_threat": probe.adapter(0.05, {"score": 90}),
+        "push_service.send_test": probe.adapter(
+            0.05, {"approval_required": True}, state=WorkflowRunState.MANUAL_REQUIRED.value
+        ),
+        "audit_service.log": probe.adapter(0.05, {"audited": True}),
+    }
+
+    result = _run(test_db, workflow_key, adapters)
+
+    assert probe.peak == 1
+    assert result.run_state == WorkflowRunState.MANUAL_REQUIRED.value
+    # 其他分支照常完成，但不越过汇合节点
+    assert result.context["audited"] is True and result.context["score"] == 90
+    assert "join" not in result.context
@@ -0,0 +1,181 @@
+"""工作流运行队列：租约认领互斥、完成回调、孤儿运行回收续跑"""
+import asyncio
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy.orm import sessionmaker
+
+from core.database import WorkflowRun, WorkflowStepRun
+from services.workflow_dsl import WorkflowRunState, load_default_defense_workflow
+from services.workflow_queue import WorkflowRunQueue
+from services.workflow_runtime import LEASE_EXPIRED_ERROR, NodeExecutionResult, run_published_workflow
+
+TRIGGER = "unit_test_queue"
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _publish(client, admin_token) -> str:
+    headers = _auth(admin_token)
+    workflow_key = f"wf-queue-{uuid4().hex[:8]}"
+    dsl = deepcopy(load_default_defense_workflow())
+    dsl.update(workflow_id=workflow_key, name=f"Workflow {workflow_key}", version=1, status="DRAFT")
+    resp = client.post(
+        "/api/v1/workflows",
+        json={"workflow_key": workflow_key, "name": dsl["name"], "dsl": dsl},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    resp = client.post(
+        f"/api/v1/workflows/{resp.json()['data']['id']}/publish",
+        json={
+            "version_tag": 1,
+            "canary_percent": 100,
+            "approval_reason": "queue test",
+            "approval_passed": True,
+            "confirmation_text": workflow_key,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    return workflow_key
+
+
+def _stub(output: dict):
+    async def adapter(_payload):
+        return NodeExecutionResult(state=WorkflowRunState.SUCCESS.value, output=output)
+    return adapter
+
+
+ADAPTERS = {
+    "ai_engine.assess_threat": _stub({"score": 95, "reason": "high", "action_suggest": "BLOCK"}),
+    "mcp_client.block_ip": _stub({"blocked": True}),
+    "audit_service.log": _stub({"audited": True}),
+}
+
+
+def _enqueue(db, workflow_key: str) -> int:
+    result = asyncio.run(
+        run_published_workflow(
+            db,
+            workflow_key=workflow_key,
+            input_payload={
+                "event": {"ip": "10.91.0.1", "attack_count": 3},
+                "approval_decisions": {"approval": True},
+            },
+            trigger_source=TRIGGER,
+            trigger_ref=f"queue-{uuid4().hex}",
+            enqueue=True,
+        )
+    )
+    assert result.run_state == WorkflowRunState.QUEUED.value
+    return result.run_id
+
+
+def _queue(db, name: str) -> WorkflowRunQueue:
+    return WorkflowRunQueue(worker_id=name, session_factory=sessionmaker(bind=db.get_bind(), autoflush=False))
+
+
+def test_queued_run_claimed_by_one_worker_and_completed(client, admin_token, test_db):
+    workflow_key = _publish(client, admin_token)
+    run_id = _enqueue(test_db, workflow_key)
+    worker_a, worker_b = _queue(test_db, "worker-a"), _queue(test_db, "worker-b")
+    completed = []
+    worker_a.register_completion_hook(TRIGGER, lambda _db, run: completed.append((run.id, run.run_state)))
+
+    claimed_a = worker_a.claim(test_db, limit=100)
+    claimed_b = worker_b.claim(test_db, limit=100)
+    assert run_id in claimed_a and run_id not in claimed_b
+    assert not set(claimed_a) & set(claimed_b)
+
+    # 非租约持有者不执行
+    assert asyncio.run(worker_b.process(run_id, ADAPTERS)) is None
+    result = asyncio.run(worker_a.process(run_id, ADAPTERS))
+
+    assert result.run_state == WorkflowRunState.SUCCESS.value
+    assert completed == [(run_id, WorkflowRunState.SUCCESS.value)]
+    test_db.expire_all()
+    run = test_db.get(WorkflowRun, run_id)
+    assert run.lease_owner == "worker-a" and run.claim_count == 1
+    assert run_id not in worker_b.claim(test_db, limit=100)
+
+
+def _crash_during_block(db, workflow_key: str, worker: WorkflowRunQueue) -> int:
+    """worker 在执行封禁节点时失联：运行停在 RUNNING，租约随后过期"""
+    run_id = _enqueue(db, workflow_key)
+    assert run_id in worker.claim(db, limit=100)
+
+    async def hang(_payload):
+        await asyncio.Event().wait()
+
+    adapters = dict(ADAPTERS, **{"mcp_client.block_ip": hang})
+
+    async def crash():
+        try:
+            await asyncio.wait_for(worker.process(run_id, adapters), timeout=0.3)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(crash())
+    db.query(WorkflowRun).filter(WorkflowRun.id == run_id).update(
+        {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.commit()
+    return run_id
+
+
+def test_orphaned_run_recovered_from_interrupted_node(client, admin_token, test_db):
+    workflow_key = _publish(client, admin_token)
+    crashed, rescuer = _queue(test_db, "worker-crashed"), _queue(test_db, "worker-rescuer")
+    run_id = _crash_during_block(test_db, workflow_key, crashed)
+    test_db.expire_all()
+    assert test_db.get(WorkflowRun, run_id).run_state == WorkflowRunState.RUNNING.value
+
+    assert run_id in rescuer.claim(test_db, limit=100)
+    asyncio.run(rescuer.process(run_id, ADAPTERS))
+
+    test_db.expire_all()
+    orphan = test_db.get(WorkflowRun, run_id)
+    assert orphan.run_state == WorkflowRunState.FAILED.value
+    interrupted = (
+        test_db.query(WorkflowStepRun)
+        .filter(WorkflowStepRun.workflow_run_id == run_id, WorkflowStepRun.node_id == "block_action")
+        .one()
+    )
+    assert interrupted.step_state == WorkflowRunState.FAILED.value
+    assert interrupted.error_message == LEASE_EXPIRED_ERROR
+
+    resumed = (
+        test_db.query(WorkflowRun)
+        .filter(WorkflowRun.trigger_ref == orphan.trigger_ref, WorkflowRun.id != run_id)
+        .one()
+    )
+    assert resumed.run_state == WorkflowRunState.QUEUED.value
+    assert resumed.start_node_id == "block_action"
+    assert resumed.id in rescuer.claim(test_db, limit=100)
+    result = asyncio.run(rescuer.process(resumed.id, ADAPTERS))
+
+    assert result.run_state == WorkflowRunState.SUCCESS.value
+    assert result.context["replay_of_run_id"] == run_id and result.context["recovery_count"] == 1
+    steps = test_db.query(WorkflowStepRun).filter(WorkflowStepRun.workflow_run_id == resumed.id).all()
+    assert [step.node_id for step in sorted(steps, key=lambda s: s.id)] == ["block_action", "audit_log"]
+
+
+def test_recovery_limit_fails_run_and_fires_hook(client, admin_token, test_db, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_QUEUE_MAX_RECOVERIES", "0")
+    workflow_key = _publish(client, admin_token)
+    crashed, rescuer = _queue(test_db, "worker-crashed-2"), _queue(test_db, "worker-rescuer-2")
+    completed = []
+    rescuer.register_completion_hook(TRIGGER, lambda _db, run: completed.append((run.id, run.run_state)))
+    run_id = _crash_during_block(test_db, workflow_key, crashed)
+
+    assert run_id in rescuer.claim(test_db, limit=100)
+    asyncio.run(rescuer.process(run_id, ADAPTERS))
+
+    assert completed == [(run_id, WorkflowRunState.FAILED.value)]
+    test_db.expire_all()
+    trigger_ref = test_db.get(WorkflowRun, run_id).trigger_ref
+    assert test_db.query(WorkflowRun).filter(WorkflowRun.trigger_ref == trigger_ref).count() == 1
@@ -0,0 +1,126 @@
+"""步骤写后日志：运行内合并提交、失败步骤即时落盘、从失败处续跑"""
+import asyncio
+from copy import deepcopy
+from uuid import uuid4
+
+from sqlalchemy import event
+
+from core.database import WorkflowRun, WorkflowStepRun
+from services.workflow_dsl import WorkflowRunState, load_default_defense_workflow
+from services.workflow_runtime import (
+    NodeExecutionResult,
+    WorkflowRuntimeError,
+    replay_workflow_run,
+    run_published_workflow,
+)
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _publish(client, admin_token) -> str:
+    headers = _auth(admin_token)
+    workflow_key = f"wf-journal-{uuid4().hex[:8]}"
+    dsl = deepcopy(load_default_defense_workflow())
+    dsl.update(workflow_id=workflow_key, name=f"Workflow {workflow_key}", version=1, status="DRAFT")
+    resp = client.post(
+        "/api/v1/workflows",
+        json={"workflow_key": workflow_key, "name": dsl["name"], "dsl": dsl},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    resp = client.post(
+        f"/api/v1/workflows/{resp.json()['data']['id']}/publish",
+        json={
+            "version_tag": 1,
+            "canary_percent": 100,
+            "approval_reason": "journal test",
+            "approval_passed": True,
+            "confirmation_text": workflow_key,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    return workflow_key
+
+
+def _stub(output: dict):
+    async def adapter(_payload):
+        return NodeExecutionResult(state=WorkflowRunState.SUCCESS.value, output=output)
+    return adapter
+
+
+async def _mcp_down(_payload):
+    raise WorkflowRuntimeError("mcp down", retryable=False)
+
+
+def _run(db, workflow_key: str, adapters: dict):
+    return asyncio.run(
+        run_published_workflow(
+            db,
+            workflow_key=workflow_key,
+            input_payload={
+                "event": {"ip": "10.90.0.1", "attack_count": 3},
+                "approval_decisions": {"approval": True},
+            },
+            trigger_source="unit_test",
+            trigger_ref=f"journal-{uuid4().hex}",
+            adapters=adapters,
+        )
+    )
+
+
+def _steps(db, run_id: int) -> list:
+    return (
+        db.query(WorkflowStepRun)
+        .filter(WorkflowStepRun.workflow_run_id == run_id)
+        .order_by(WorkflowStepRun.id.asc())
+        .all()
+    )
+
+
+def test_step_transitions_coalesced_into_few_commits(client, admin_token, test_db):
+    workflow_key = _publish(client, admin_token)
+    commits = []
+    listener = lambda _session: commits.append(1)  # noqa: E731
+    event.listen(test_db, "after_commit", listener)
+    try:
+        result = _run(test_db, workflow_key, {"ai_engine.assess_threat": _stub({"score": 10})})
+    finally:
+        event.remove(test_db, "after_commit", listener)
+
+    assert result.run_state == WorkflowRunState.SUCCESS.value
+    steps = _steps(test_db, result.run_id)
+    assert len(steps) >= 3
+    # 旧实现每个节点 3 次提交（创建、RUNNING、结束）
+    assert len(commits) < len(steps)
+    assert all(step.step_state == WorkflowRunState.SUCCESS.value and step.ended_at for step in steps)
+    assert test_db.get(WorkflowRun, result.run_id).output_payload is not None
+
+
+def test_failed_step_is_persisted_and_resumable(client, admin_token, test_db):
+    workflow_key = _publish(client, admin_token)
+    high = _stub({"score": 95, "reason": "high", "action_suggest": "BLOCK"})
+    failed = _run(test_db, workflow_key, {
+        "ai_engine.assess_threat": high,
+        "mcp_client.block_ip": _mcp_down,
+    })
+    assert failed.run_state == WorkflowRunState.FAILED.value
+
+    # 其他会话可见：失败前的成功步骤与失败步骤均已提交
+    test_db.expire_all()
+    steps = _steps(test_db, failed.run_id)
+    assert steps[-1].step_state == WorkflowRunState.FAILED.value
+    assert all(step.step_state == WorkflowRunState.SUCCESS.value for step in steps[:-1])
+
+    replay = asyncio.run(
+        replay_workflow_run(
+            test_db,
+            run_id=failed.run_id,
+            mode="resume_from_failure",
+            adapters={"ai_engine.assess_threat": high, "mcp_client.block_ip": _stub({"blocked": True})},
+        )
+    )
+    assert replay.resumed_from_node_id == steps[-1].node_id
+    assert replay.replay_run.run_state != WorkflowRunState.FAILED.value